@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the multiplet executable.
+Inputs for a ladder of problem sizes are generated from a base input
+(multiplet_input.txt): 2p XPS/RPES of 3d^1 .. 3d^9, two-configuration
+blocks and long omega scans. Every case is run with the given executable
+and wall time, CPU time, peak RSS and the basis sizes (nstates of the
+ground, N-1 final and intermediate blocks) are stored as JSON. Two result
+files can be compared to flag regressions between builds.
+"""
+
+import sys
+import os
+import json
+import time
+import platform
+import tempfile
+
+from multiplet_params import MultipletInput, ci_items
+from multiplet_runner import run_multiplet, default_multiplet_path
+
+DEFAULT_TOLERANCE = 0.10
+# timings below this are dominated by process start-up and not compared
+MIN_COMPARE_TIME = 0.2
+
+
+# Rk values (eV) of the 2p-3d CI integrals that couple 2p6 3d^m to
+# 2p5 3d^(m+1): three 2p shells and one 3d shell (k = 0..2) or one 2p shell
+# and three 3d shells (k = 0..3), in every index order. Representative
+# magnitudes; they make the two configuration blocks mix as in a real
+# calculation instead of splitting into independent diagonal blocks.
+CI_INTEGRALS_2P3D = {3: [0, 0.8, 0], 1: [0, 1.0, 0, 0.6]}
+
+
+def _dn(n, extra=None):
+    """
+    Occupations of 2p^6 3d^n XPS and 2p -> 3d RPES
+
+    With extra the final block also holds the 2p^5 3d^n states of 2p
+    photoemission. The shells after 3d are the photoelectron continuum
+    (ncvsh in main.c), so ligand configurations cannot be added.
+    """
+    blocks = {
+        "ground": [[6, n, 0, 0, 0]],
+        "final": [[6, n - 1, 0, 0, 0]],
+        "intermediate": [[5, n + 1, 0, 0, 0]],
+    }
+    if extra:
+        blocks["final"].append([5, n, 0, 0, 0])
+    return blocks
+
+
+def _ci_integrals(lsh, occupations):
+    """CI integrals of CI_INTEGRALS_2P3D for the 2p/3d quadruples of all blocks"""
+    integrals = {}
+    for occs in occupations.values():
+        for *key, nk in ci_items(lsh, occs):
+            n2p = key.count(0)
+            if n2p in CI_INTEGRALS_2P3D and set(key) <= {0, 1}:
+                integrals[tuple(key)] = CI_INTEGRALS_2P3D[n2p]
+    return integrals
+
+
+def _scan(npoints, start=640., width=20.):
+    """omega (start, stop, delta) of npoints points across the 2p resonance"""
+    delta = width / npoints
+    return (start, start + delta * (npoints - 1), delta)
+
+
+# omega points of the d^n cases: every case runs long enough (about a second
+# or more) for its wall time to be compared, see MIN_COMPARE_TIME
+DN_OMEGA_POINTS = {1: 1000, 2: 100, 3: 10, 4: 10, 5: 10, 6: 10, 7: 20, 8: 60, 9: 200}
+
+
+def benchmark_cases(suite="quick"):
+    """
+    List the benchmark cases of a suite
+
+    Args:
+        suite: 'quick' (d^1..d^9, one two-configuration case and one
+            omega scan, about a minute) or 'full' (larger two-configuration
+            blocks and long scans)
+
+    Returns:
+        List of dicts with name, description, occupations (per block) and
+        omega (start, stop, delta) or None to keep the base input's value
+    """
+    cases = []
+    for n in range(1, 10):
+        npoints = DN_OMEGA_POINTS[n]
+        cases.append({"name": f"d{n}", "description": f"2p6 3d{n}, {npoints} omega points",
+                      "occupations": _dn(n), "omega": _scan(npoints)})
+    cases.append({"name": "d1_2conf", "description": "2p6 3d1, final states 3d0 + 2p5 3d1",
+                  "occupations": _dn(1, extra=True), "omega": _scan(200)})
+    cases.append({"name": "d5_scan100", "description": "2p6 3d5, 100 omega points",
+                  "occupations": _dn(5), "omega": _scan(100)})
+    if suite == "full":
+        cases.append({"name": "d8_2conf", "description": "2p6 3d8, final states 3d7 + 2p5 3d8",
+                      "occupations": _dn(8, extra=True), "omega": None})
+        cases.append({"name": "d2_2conf", "description": "2p6 3d2, final states 3d1 + 2p5 3d2",
+                      "occupations": _dn(2, extra=True), "omega": None})
+        cases.append({"name": "d5_scan1000", "description": "2p6 3d5, 1000 omega points",
+                      "occupations": _dn(5), "omega": _scan(1000)})
+        cases.append({"name": "d4_scan200", "description": "2p6 3d4, 200 omega points",
+                      "occupations": _dn(4), "omega": _scan(200)})
+    elif suite != "quick":
+        raise ValueError(f"Unknown suite '{suite}', use quick or full")
+    return cases
+
+
+def make_case_input(base, case):
+    """Input text of a benchmark case, built from a MultipletInput"""
+    variant = base.with_configurations(_ci_integrals(base.lsh, case["occupations"]),
+                                       **case["occupations"])
+    if case["omega"] is not None:
+        start, stop, delta = case["omega"]
+        variant.set("omega_start", start)
+        variant.set("omega_stop", stop)
+        variant.set("delta_omega", delta)
+    return variant
+
+
+def run_benchmarks(base_input_file, suite="quick", multiplet_path=None, repeat=1,
+                   names=None, work_dir=None, verbosity="summary", threads=None):
+    """
+    Run a benchmark suite
+
+    Args:
+        base_input_file: Input that provides parameters and Slater integrals
+        suite: 'quick' or 'full' (see benchmark_cases)
+        multiplet_path: Executable to benchmark
+        repeat: Runs per case; the fastest run is reported
+        names: Optional list of case names to run
+        work_dir: Directory for the runs (default: a temporary directory)
+        verbosity: Engine output level during the runs
+        threads: Engine threads (MULTIPLET_THREADS, default: all cores)
+
+    Returns:
+        Result dict (see README), ready for json.dump
+    """
+    if multiplet_path is None:
+        multiplet_path = default_multiplet_path()
+    base = MultipletInput.from_file(base_input_file)
+    cases = benchmark_cases(suite)
+    if names:
+        cases = [case for case in cases if case["name"] in names]
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "multiplet": os.path.abspath(multiplet_path),
+        "host": {"node": platform.node(), "system": platform.system(),
+                 "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "suite": suite,
+        "repeat": repeat,
+        "verbosity": verbosity,
+        "threads": threads,
+        "cases": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="multiplet-bench-") as tmp:
+        work_dir = work_dir or tmp
+        for case in cases:
+            variant = make_case_input(base, case)
+            counts = variant.state_counts()
+            runs = [run_multiplet(variant.text(), os.path.join(work_dir, case["name"]),
+                                  multiplet_path, verbosity=verbosity, threads=threads)
+                    for _ in range(repeat)]
+            best = min(runs, key=lambda r: r["wall_time"])
+            start, stop, delta = (variant.get(name) for name in
+                                  ("omega_start", "omega_stop", "delta_omega"))
+            entry = {
+                "name": case["name"],
+                "description": case["description"],
+                "nstates": counts["ground"],
+                "nnm1fst": counts["final"],
+                "nmstates": counts["intermediate"],
+                "nomega": int((stop - start) / delta + 1.00001),
+                "exit_code": best["exit_code"],
+                "error": best["error"],
+                "wall_time": best["wall_time"],
+                "wall_times": [r["wall_time"] for r in runs],
+                "cpu_time": best["cpu_time"],
+                "max_rss": best["max_rss"],
+            }
+            results["cases"].append(entry)
+            rss = f"{entry['max_rss'] / 1024**2:8.1f} MB" if entry["max_rss"] else "       -   "
+            print(f"{entry['name']:12s} {entry['nstates']:6d} {entry['nnm1fst']:6d} "
+                  f"{entry['nmstates']:6d} {entry['wall_time']:9.2f} s {rss}  exit {entry['exit_code']}")
+    return results
+
+
+def compare_results(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare two benchmark result dicts
+
+    Args:
+        baseline, current: Results of run_benchmarks (or loaded JSON)
+        tolerance: Relative change of wall time or peak RSS that counts as
+            a regression or improvement
+
+    Returns:
+        List of (case, metric, baseline value, current value, status)
+        where status is 'regression', 'improved', 'ok', 'failed' or
+        'different input'
+    """
+    base_cases = {case["name"]: case for case in baseline["cases"]}
+    rows = []
+    for case in current["cases"]:
+        old = base_cases.get(case["name"])
+        if old is None:
+            continue
+        if case["exit_code"] != 0:
+            rows.append((case["name"], "exit_code", old["exit_code"], case["exit_code"], "failed"))
+            continue
+        if any(old[k] != case[k] for k in ("nstates", "nnm1fst", "nmstates", "nomega")):
+            rows.append((case["name"], "nstates", old["nstates"], case["nstates"], "different input"))
+            continue
+        for metric in ("wall_time", "max_rss"):
+            a, b = old.get(metric), case.get(metric)
+            if not a or not b:
+                continue
+            if metric == "wall_time" and max(a, b) < MIN_COMPARE_TIME:
+                status = "ok"
+            elif b > a * (1 + tolerance):
+                status = "regression"
+            elif b < a * (1 - tolerance):
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append((case["name"], metric, a, b, status))
+    return rows
+
+
+def _format(metric, value):
+    if metric == "max_rss":
+        return f"{value / 1024**2:.1f} MB"
+    if metric == "wall_time":
+        return f"{value:.2f} s"
+    return str(value)
+
+
+if __name__ == "__main__":
+    usage = ("Usage: python benchmark.py run results.json [quick|full] [repeat] [case,case,...]\n"
+             "       python benchmark.py compare baseline.json results.json [tolerance]")
+    if len(sys.argv) < 3 or sys.argv[1] not in ("run", "compare"):
+        print(usage)
+        sys.exit(1)
+
+    if sys.argv[1] == "run":
+        suite = sys.argv[3] if len(sys.argv) > 3 else "quick"
+        repeat = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        names = sys.argv[5].split(",") if len(sys.argv) > 5 else None
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        print(f"{'case':12s} {'ground':>6s} {'final':>6s} {'interm':>6s} {'wall':>11s} {'peak RSS':>11s}")
+        results = run_benchmarks(os.path.join(script_dir, "multiplet_input.txt"),
+                                 suite, repeat=repeat, names=names)
+        with open(sys.argv[2], 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {sys.argv[2]}")
+        sys.exit(0 if all(case["exit_code"] == 0 for case in results["cases"]) else 1)
+
+    if len(sys.argv) < 4:
+        print(usage)
+        sys.exit(1)
+    with open(sys.argv[2], 'r') as f:
+        baseline = json.load(f)
+    with open(sys.argv[3], 'r') as f:
+        current = json.load(f)
+    tolerance = float(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_TOLERANCE
+    rows = compare_results(baseline, current, tolerance)
+    for name, metric, a, b, status in rows:
+        ratio = f"{b / a:6.2f}x" if isinstance(a, (int, float)) and a else ""
+        print(f"{name:12s} {metric:10s} {_format(metric, a):>10s} -> {_format(metric, b):>10s} "
+              f"{ratio:>8s}  {status}")
+    bad = [row for row in rows if row[4] in ("regression", "failed", "different input")]
+    print(f"{len(bad)} regressions or failed cases" if bad else "No regressions")
+    sys.exit(1 if bad else 0)
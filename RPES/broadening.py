@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Lorentzian, Gaussian and Voigt broadening of stick spectra.
+pes.dat, peslm.dat, xaq.dat and xaqx.dat list one line per multiplet
+level. They are broadened onto a uniform energy grid:
+- constant widths: the sticks are binned onto the grid and convolved by FFT
+  with the analytic transforms of the profiles (an exact Voigt profile is
+  the product of the Lorentzian and Gaussian transforms). Lines narrower
+  than FFT_STEPS_PER_FWHM grid steps are binned onto a finer grid, or
+  evaluated directly if that would need more than MAX_OVERSAMPLE points
+  per grid step
+- energy dependent widths (e.g. an egam/gam table as in the input file) or
+  a non-uniform grid: direct evaluation as one matrix product
+  (grid x levels) @ (levels x columns) of the exact Voigt profile ( through
+  the Faddeeva function ), so both ways give the same line shape
+Widths follow the engine: gamma is the Lorentzian half width at half
+maximum (the Gamma of 1/(omega + E_G - E_M + i Gamma)), sigma the Gaussian
+standard deviation. All profiles have unit area.
+"""
+
+import sys
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# energy (nlevels,), intensity (nlevels, ncolumns), column names
+Sticks = namedtuple("Sticks", ["energy", "intensity", "columns"])
+
+STICK_COLUMNS = {
+    "pes.dat": ["total"],
+    "xaq.dat": ["total", "q=-1", "q=0", "q=1"],
+    "xaqx.dat": ["total", "lcp", "lin", "rcp"],
+}
+
+SQRT2PI = np.sqrt(2. * np.pi)
+# linear binning is off by about 0.4 / m^2 of the peak height with m grid
+# steps per FWHM: 20 steps keep it below 1e-3
+FFT_STEPS_PER_FWHM = 20
+MAX_OVERSAMPLE = 16
+# the periodic images of a Lorentzian at distance d add (gamma / d)^2 of its
+# peak: keep them at least this many gammas away
+FFT_TAIL_GAMMAS = 100
+# elements of the (grid x levels) profile matrix per chunk of broaden_direct
+DIRECT_CHUNK = 1 << 20
+
+
+def _weideman_coefficients(n):
+    """Coefficients of Weideman's rational approximation of the Faddeeva function"""
+    m = 2 * n
+    k = np.arange(-m + 1, m)
+    scale = np.sqrt(n / np.sqrt(2.))
+    t = scale * np.tan(k * np.pi / (2. * m))
+    f = np.concatenate([[0.], np.exp(-t**2) * (scale**2 + t**2)])
+    a = np.real(np.fft.fft(np.fft.fftshift(f))) / (2. * m)
+    return scale, a[n:0:-1]
+
+
+# J.A.C. Weideman, SIAM J. Numer. Anal. 31, 1497 (1994), 32 terms: about
+# 1e-13 relative error of the Voigt profile
+_W_SCALE, _W_COEFFS = _weideman_coefficients(32)
+
+
+def faddeeva(z):
+    """Faddeeva function w(z) = exp(-z^2) erfc(-iz) for Im z >= 0"""
+    z = np.asarray(z, dtype=complex)
+    denominator = _W_SCALE - 1j * z
+    ratio = (_W_SCALE + 1j * z) / denominator
+    p = np.zeros_like(ratio)
+    for c in _W_COEFFS:
+        p = p * ratio + c
+    return 2. * p / denominator**2 + 1. / (np.sqrt(np.pi) * denominator)
+
+
+def voigt_fwhm(gamma, sigma):
+    """Full width at half maximum of a Voigt profile (Olivero and Longbothum, 0.02 %)"""
+    fl = 2. * np.asarray(gamma, dtype=float)
+    fg = 2. * np.sqrt(2. * np.log(2.)) * np.asarray(sigma, dtype=float)
+    return 0.5346 * fl + np.sqrt(0.2166 * fl**2 + fg**2)
+
+
+def uniform_step(grid):
+    """Step of a uniform grid of at least two points, None for any other grid"""
+    grid = np.asarray(grid, dtype=float)
+    if grid.ndim != 1 or len(grid) < 2:
+        return None
+    step = grid[1] - grid[0]
+    if step <= 0 or not np.allclose(np.diff(grid), step, rtol=1e-6, atol=0.):
+        return None
+    return step
+
+
+def read_sticks(path):
+    """
+    Read a stick spectrum written by multiplet
+
+    peslm.dat is returned with one column per (q, lms) pair, in the file
+    order q = -1, 0, 1 and lms = 0 .. nlms-1.
+    """
+    name = os.path.basename(path)
+    if name.startswith("peslm"):
+        with open(path, 'r') as f:
+            text = f.read().replace("q", " ").replace("n", " ")
+        data = np.array(text.split(), dtype=float).reshape(-1, 4)
+        nlms = int(data[:, 3].max()) + 1
+        data = data.reshape(-1, 3 * nlms, 4)
+        columns = [f"q={q:d},n={n:d}" for q, n in data[0, :, 2:].astype(int)]
+        return Sticks(data[:, 0, 0].copy(), data[:, :, 1].copy(), columns)
+
+    data = np.loadtxt(path, ndmin=2)
+    columns = STICK_COLUMNS.get(name, [f"col{i}" for i in range(1, data.shape[1])])
+    return Sticks(data[:, 0], data[:, 1:], columns)
+
+
+def make_grid(energy, step, margin):
+    """Uniform grid covering all sticks with margin added on both sides"""
+    emin = np.min(energy) - margin
+    emax = np.max(energy) + margin
+    return emin + step * np.arange(int(np.ceil((emax - emin) / step)) + 1)
+
+
+def table_widths(energy, gamma0, egam=(), gam=()):
+    """
+    Energy dependent widths from an egam/gam table
+
+    Uses the rule of the engine's input line (see rpes_model.gamma_grid):
+    gam[i] between egam[i] and egam[i+1], gam[-1] above egam[-1] and gamma0
+    everywhere else. egam must be in the energy units of the stick file.
+    """
+    from rpes_model import gamma_grid
+    return gamma_grid(energy, gamma0, egam, gam)
+
+
+def _bin_sticks(energy, intensity, start, step, npoints, npad):
+    """Deposit sticks on the padded grid start + step * i, split linearly between neighbours"""
+    x = (energy - start) / step + npad
+    i0 = np.floor(x).astype(int)
+    w1 = x - i0
+    n = npoints + 2 * npad
+    binned = np.zeros((n, intensity.shape[1]))
+    for idx, w in ((i0, 1. - w1), (i0 + 1, w1)):
+        ok = (idx >= 0) & (idx < n)
+        np.add.at(binned, idx[ok], intensity[ok] * w[ok, None])
+    return binned / step
+
+
+def check_widths(gamma, sigma):
+    """
+    Raise ValueError unless every line has a width: gamma, sigma >= 0
+    and gamma + sigma > 0 (a zero-width line has no profile)
+    """
+    gamma, sigma = np.broadcast_arrays(np.asarray(gamma, dtype=float), np.asarray(sigma, dtype=float))
+    if (gamma < 0).any() or (sigma < 0).any():
+        raise ValueError("line widths must not be negative")
+    if (gamma + sigma <= 0).any():
+        raise ValueError("gamma and sigma are both zero; a line needs a Lorentzian or Gaussian width")
+
+
+def broaden_fft(energy, intensity, grid, gammas, sigmas):
+    """
+    Broaden with constant widths by FFT convolution
+
+    Lines narrower than FFT_STEPS_PER_FWHM grid steps are convolved on a
+    grid oversampled by up to MAX_OVERSAMPLE, narrower ones evaluated
+    directly (broaden_direct).
+
+    Args:
+        energy: Stick energies (nlevels,)
+        intensity: Stick intensities (nlevels, ncolumns)
+        grid: Uniform energy grid (npoints,)
+        gammas, sigmas: Sequences of equal length with the widths of every
+            spectrum to produce; the sticks are transformed only once per
+            oversampling factor
+
+    Returns:
+        Array (nwidths, npoints, ncolumns)
+
+    Raises:
+        ValueError for zero or negative widths (see check_widths) or a
+        grid that is not uniform
+    """
+    check_widths(gammas, sigmas)
+    step = uniform_step(grid)
+    if step is None:
+        raise ValueError("FFT broadening needs a uniform grid of at least two points")
+    result = np.empty((len(gammas), len(grid), intensity.shape[1]))
+    transforms = {}
+    gamma_max = max(gammas)
+    for i, (gamma, sigma) in enumerate(zip(gammas, sigmas)):
+        oversample = int(np.ceil(FFT_STEPS_PER_FWHM * step / voigt_fwhm(gamma, sigma)))
+        if oversample > MAX_OVERSAMPLE:
+            result[i] = broaden_direct(energy, intensity, grid, gamma, sigma)
+            continue
+        oversample = max(oversample, 1)
+        npoints = (len(grid) - 1) * oversample + 1
+        # padding keeps the periodic images of long Lorentzian tails away
+        npad = max(npoints, int(np.ceil(FFT_TAIL_GAMMAS * gamma_max * oversample / (2. * step))))
+        if oversample not in transforms:
+            binned = _bin_sticks(energy, intensity, grid[0], step / oversample, npoints, npad)
+            k = 2. * np.pi * np.fft.rfftfreq(npoints + 2 * npad, d=step / oversample)
+            transforms[oversample] = np.fft.rfft(binned, axis=0), k
+        spectrum, k = transforms[oversample]
+        kernel = np.exp(-gamma * k - 0.5 * (sigma * k)**2)
+        conv = np.fft.irfft(spectrum * kernel[:, None], n=npoints + 2 * npad, axis=0)
+        result[i] = conv[npad:npad + npoints:oversample]
+    return result
+
+
+def profile(x, gamma, sigma):
+    """
+    Unit-area line shape at distance x from the line centre
+
+    Lorentzian for sigma = 0, Gaussian for gamma = 0 and otherwise the
+    exact Voigt profile Re w((x + i gamma) / (sigma sqrt 2)) / (sigma sqrt(2 pi)),
+    the line shape of the FFT path. Arguments broadcast.
+    Raises ValueError for zero or negative widths (see check_widths).
+    """
+    x, gamma, sigma = (np.asarray(a, dtype=float) for a in np.broadcast_arrays(x, gamma, sigma))
+    check_widths(gamma, sigma)
+    result = np.empty(x.shape)
+    lorentz, gauss = sigma == 0, gamma == 0
+    voigt = ~(lorentz | gauss)
+    g = gamma[lorentz]
+    result[lorentz] = g / np.pi / (x[lorentz]**2 + g**2)
+    s = sigma[gauss]
+    result[gauss] = np.exp(-0.5 * (x[gauss] / s)**2) / (SQRT2PI * s)
+    s = sigma[voigt] * np.sqrt(2.)
+    result[voigt] = faddeeva((x[voigt] + 1j * gamma[voigt]) / s).real / (np.sqrt(np.pi) * s)
+    return result
+
+
+def broaden_direct(energy, intensity, grid, gamma, sigma, chunk=None):
+    """
+    Broaden with per-level widths by direct summation
+
+    Args:
+        energy: Stick energies (nlevels,)
+        intensity: Stick intensities (nlevels, ncolumns)
+        grid: Energy grid (npoints,), need not be uniform
+        gamma, sigma: Scalars or arrays (nlevels,)
+        chunk: Grid points per matrix product (default: DIRECT_CHUNK
+            profile values)
+
+    Returns:
+        Array (npoints, ncolumns)
+
+    Raises:
+        ValueError for zero or negative widths (see check_widths)
+    """
+    gamma = np.broadcast_to(np.asarray(gamma, dtype=float), energy.shape)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), energy.shape)
+    check_widths(gamma, sigma)
+    if chunk is None:
+        chunk = max(1, DIRECT_CHUNK // max(1, len(energy)))
+    result = np.empty((len(grid), intensity.shape[1]))
+    for first in range(0, len(grid), chunk):
+        x = grid[first:first + chunk, None] - energy[None, :]
+        result[first:first + chunk] = profile(x, gamma[None, :], sigma[None, :]) @ intensity
+    return result
+
+
+def broaden(energy, intensity, grid, gamma=0., sigma=0.):
+    """
+    Broaden a stick spectrum onto an energy grid
+
+    Args:
+        energy: Stick energies (nlevels,)
+        intensity: Stick intensities (nlevels,) or (nlevels, ncolumns)
+        grid: Energy grid; constant widths on a uniform grid are broadened
+            by FFT, anything else directly
+        gamma: Lorentzian HWHM, a scalar or one value per level (see table_widths)
+        sigma: Gaussian standard deviation, a scalar or one value per level
+
+    Returns:
+        Broadened spectrum with shape (npoints,) or (npoints, ncolumns)
+
+    Raises:
+        ValueError if a level has gamma = sigma = 0 or a negative width
+    """
+    energy = np.asarray(energy, dtype=float)
+    intensity = np.asarray(intensity, dtype=float)
+    grid = np.asarray(grid, dtype=float)
+    column = intensity.ndim == 1
+    if column:
+        intensity = intensity[:, None]
+
+    gamma, sigma = np.asarray(gamma, dtype=float), np.asarray(sigma, dtype=float)
+    constant = (gamma.size > 0 and sigma.size > 0 and np.ptp(gamma) == 0 and np.ptp(sigma) == 0
+                and gamma.flat[0] + sigma.flat[0] > 0)
+    if constant and uniform_step(grid) is not None:
+        result = broaden_fft(energy, intensity, grid, [gamma.flat[0]], [sigma.flat[0]])[0]
+    else:
+        result = broaden_direct(energy, intensity, grid, gamma, sigma)
+    return result[:, 0] if column else result
+
+
+def broaden_batch(sources, grid, widths):
+    """
+    Broaden several stick spectra with several constant widths
+
+    Args:
+        sources: List of file paths or Sticks
+        grid: Uniform energy grid
+        widths: List of (gamma, sigma) pairs
+
+    Returns:
+        List with one array (nwidths, npoints, ncolumns) per source
+    """
+    gammas = [w[0] for w in widths]
+    sigmas = [w[1] for w in widths]
+    results = []
+    for source in sources:
+        sticks = read_sticks(source) if isinstance(source, str) else source
+        results.append(broaden_fft(sticks.energy, sticks.intensity, np.asarray(grid),
+                                   gammas, sigmas))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python broadening.py stick_file gamma sigma [step] [output_file]")
+        print("  gamma: Lorentzian HWHM, sigma: Gaussian standard deviation (eV)")
+        sys.exit(1)
+
+    sticks = read_sticks(sys.argv[1])
+    gamma, sigma = float(sys.argv[2]), float(sys.argv[3])
+    step = float(sys.argv[4]) if len(sys.argv) > 4 else 0.01
+    output_file = sys.argv[5] if len(sys.argv) > 5 else os.path.splitext(sys.argv[1])[0] + "_broad.dat"
+
+    grid = make_grid(sticks.energy, step, 10. * (gamma + sigma) + step)
+    try:
+        spectrum = broaden(sticks.energy, sticks.intensity, grid, gamma, sigma)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    np.savetxt(output_file, np.column_stack([grid, spectrum]), fmt="%15.8e",
+               header="energy " + " ".join(sticks.columns))
+    print(f"{len(sticks.energy)} levels broadened onto {len(grid)} points, written to {output_file}")
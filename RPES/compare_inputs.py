@@ -12,7 +12,7 @@ def strip_comments(line):
     return line.split('#')[0].strip()
 
 def compare_files(generated_file, reference_file):
-    """Compare generated input file with reference"""
+    """Compare generated input file with reference; returns the differences"""
     
     # Read the generated file
     with open(generated_file, 'r') as f:
@@ -56,6 +56,8 @@ def compare_files(generated_file, reference_file):
             print(f"{line_num:4d} | {gen} | {ref}")
     else:
         print("\nNo differences found! The files are identical.")
+    
+    return differences
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
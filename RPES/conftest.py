@@ -0,0 +1,157 @@
+"""
+Shared fixtures of the test_*.py files ( python -m pytest in this directory ).
+Tests that run the engine use $MULTIPLET_EXECUTABLE or the multiplet next
+to this file and are skipped if it cannot be started on this machine.
+test_gui.py is an interactive script ( it opens a window ) and is not
+collected.
+"""
+
+import os
+import subprocess
+
+import numpy as np
+import pytest
+
+from multiplet_params import MultipletInput
+from multiplet_runner import default_multiplet_path, run_multiplet
+
+collect_ignore = ["test_gui.py"]
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Test_Output holds the results of multiplet_input.txt
+REFERENCE_INPUT = os.path.join(SCRIPT_DIR, "multiplet_input.txt")
+TEST_OUTPUT = os.path.join(SCRIPT_DIR, "Test_Output")
+# omega start, stop and step of scan_input; Test_Output is its third point
+SCAN = (649.8, 653.8, 1.)
+TEST_OUTPUT_OMEGA = 651.8
+# text outputs compared with Test_Output ( rpesalms.dat depends on the
+# phases of the eigenvectors: compare the intensities of rpes.dat instead )
+COMPARED_OUTPUTS = ["pes.dat", "peslm.dat", "rp.dat", "rpc.dat", "rpes.dat", "xaq.dat",
+                    "xaqc.dat", "xaqx.dat", "xmat.dat"]
+
+
+def output_numbers(path):
+    """All numbers of an output file; labels such as '-1q 0n' or '21 x 21' are dropped"""
+    with open(path, 'r') as f:
+        text = f.read()
+    return np.array(text.replace("q", " ").replace("n", " ").replace("x", " ").split(), dtype=float)
+
+
+def level_sums(energy, values, decimals=5):
+    """
+    Levels and the values (rows) summed over the states of each level.
+    How the intensity of a degenerate level is shared among its states
+    depends on the eigenvectors LAPACK picks inside the level.
+    """
+    levels, index = np.unique(np.round(energy, decimals), return_inverse=True)
+    sums = np.zeros((len(levels),) + values.shape[1:])
+    np.add.at(sums, index, values)
+    return [levels, sums]
+
+
+def comparable_arrays(path):
+    """The numbers of an output file that do not depend on the eigenvectors, as a list of arrays"""
+    name = os.path.basename(path)
+    if name in ("xaq.dat", "xaqx.dat"):
+        data = np.loadtxt(path, ndmin=2)
+        return level_sums(data[:, 0], data[:, 1:])
+    if name == "rpes.dat":
+        data = np.loadtxt(path, ndmin=2)
+        arrays = []
+        for omega in np.unique(data[:, 0]):
+            rows = data[data[:, 0] == omega]
+            arrays += [np.array([omega])] + level_sums(rows[:, 1], rows[:, 2:])
+        return arrays
+    if name in ("rp.dat", "rpc.dat"):
+        numbers = output_numbers(path)
+        nfst = int(numbers[0])
+        ef = numbers[1:1 + nfst]
+        blocks = numbers[2 + nfst:].reshape(int(numbers[1 + nfst]), -1)
+        arrays = [blocks[:, 0]]
+        for block in blocks:
+            arrays += level_sums(ef, block[1:].reshape(nfst, -1))
+        return arrays
+    return [output_numbers(path)]
+
+
+def write_omega_rows(run_dir, omega, output_dir, names=("rpes.dat", "xaqc.dat")):
+    """Write the rows of one omega of the per-omega table files of a scan into output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name in names:
+        data = np.loadtxt(os.path.join(run_dir, name), ndmin=2)
+        np.savetxt(os.path.join(output_dir, name), data[np.abs(data[:, 0] - omega) < 1e-6],
+                   fmt="%.10e")
+
+
+def assert_outputs_close(run_dir, reference_dir, names=COMPARED_OUTPUTS, rtol=1e-5):
+    """
+    Compare output files (see comparable_arrays); values below 1e-8 of
+    the largest value of an array are compared absolutely
+    """
+    for name in names:
+        results = comparable_arrays(os.path.join(run_dir, name))
+        references = comparable_arrays(os.path.join(reference_dir, name))
+        assert len(results) == len(references), name
+        for result, reference in zip(results, references):
+            assert result.shape == reference.shape, name
+            np.testing.assert_allclose(result, reference, rtol=rtol,
+                                       atol=1e-8 * np.abs(reference).max(), err_msg=name)
+
+
+@pytest.fixture(scope="session")
+def multiplet_path():
+    """The engine executable; skips the test if it cannot be started"""
+    path = default_multiplet_path()
+    try:
+        proc = subprocess.Popen([path], stdin=subprocess.PIPE,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        pytest.skip(f"multiplet cannot be started here ({e}), set MULTIPLET_EXECUTABLE")
+    proc.kill()
+    proc.wait()
+    return path
+
+
+@pytest.fixture(scope="session")
+def reference_params():
+    """MultipletInput of multiplet_input.txt (2p6 3d5, the input of Test_Output)"""
+    return MultipletInput.from_file(REFERENCE_INPUT)
+
+
+@pytest.fixture(scope="session")
+def small_input(reference_params):
+    """Input text of a 2p6 3d8 run that takes a fraction of a second"""
+    return reference_params.with_configurations(ground=[[6, 8, 0, 0, 0]],
+                                                final=[[6, 7, 0, 0, 0]],
+                                                intermediate=[[5, 9, 0, 0, 0]]).text()
+
+
+@pytest.fixture(scope="session")
+def scan_input(reference_params):
+    """multiplet_input.txt with five omega points around its 651.8 eV"""
+    params = reference_params.copy()
+    for name, value in zip(("omega_start", "omega_stop", "delta_omega"), SCAN):
+        params.set(name, value)
+    return params.text()
+
+
+@pytest.fixture(scope="session")
+def scan_run(multiplet_path, scan_input, tmp_path_factory):
+    """Run directory of scan_input, run in one piece"""
+    run_dir = str(tmp_path_factory.mktemp("scan"))
+    record = run_multiplet(scan_input, run_dir, multiplet_path, checkpoint=False)
+    assert record["exit_code"] == 0, record["error"]
+    return run_dir
+
+
+@pytest.fixture(scope="session")
+def reference_run(multiplet_path, tmp_path_factory):
+    """Run directory of multiplet_input.txt with text and binary output"""
+    run_dir = str(tmp_path_factory.mktemp("reference"))
+    with open(REFERENCE_INPUT, 'r') as f:
+        input_text = f.read()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("MULTIPLET_OUTPUT", "both")
+        record = run_multiplet(input_text, run_dir, multiplet_path)
+    assert record["exit_code"] == 0, record["error"]
+    return run_dir
@@ -3,58 +3,125 @@
 Script to convert rpesalms.dat to rpesalms.edac format.
 This transforms the multiline columnar format to single line format
 without changing any values.
+The file is streamed: the layout is taken from the header counts
+(nomega ngst nfst nlms) and every Ef block is written as soon as it has
+been read, so memory use does not depend on the file size. With
+follow=True a file that is still being written by multiplet is converted
+while the engine appends to it.
 """
 
 import sys
-import re
+import time
 
-def convert_rpesalms(input_file, output_file):
+
+def read_lines(f, follow=False, poll_interval=0.5, timeout=60.):
+    """
+    Yield complete lines of a text file
+
+    Args:
+        f: File opened for reading
+        follow: At the end of the file wait for more data instead of stopping
+        poll_interval: Seconds between checks for new data in follow mode
+        timeout: Stop following after this many seconds without new data
+    """
+    partial = ""
+    idle = 0.
+    while True:
+        line = f.readline()
+        if line:
+            partial += line
+            if partial.endswith("\n"):
+                yield partial
+                partial = ""
+                idle = 0.
+            continue
+        if not follow or idle >= timeout:
+            break
+        time.sleep(poll_interval)
+        idle += poll_interval
+    if partial and not follow:
+        # last line of a complete file without trailing newline
+        yield partial
+
+
+def edac_lines(lines):
+    """
+    Convert a stream of rpesalms.dat lines into rpesalms.edac lines
+
+    The header line, omega lines, ground state weight lines and Ef lines are
+    passed through unchanged; the nlms amplitude lines that follow each Ef
+    line are joined into a single line. A truncated input ends the output
+    after the last complete Ef block.
+
+    Args:
+        lines: Iterator over the lines of rpesalms.dat
+
+    Yields:
+        Output lines
+    """
+    header = next(lines, None)
+    if header is None:
+        return
+    nomega, ngst, nfst, nlms = (int(n) for n in header.split()[:4])
+    yield header
+
+    for _ in range(nomega):
+        omega_line = next(lines, None)
+        if omega_line is None:
+            return
+        yield omega_line
+        for _ in range(ngst):
+            weight_line = next(lines, None)
+            if weight_line is None:
+                return
+            yield weight_line
+            for _ in range(nfst):
+                energy_line = next(lines, None)
+                if energy_line is None:
+                    return
+                data_values = []
+                for _ in range(nlms):
+                    line = next(lines, None)
+                    if line is None:
+                        return
+                    data_values.extend(line.split())
+                yield energy_line
+                yield "  " + " ".join(data_values) + "\n"
+
+
+def convert_rpesalms(input_file, output_file, follow=False, timeout=60.):
     """
     Convert rpesalms.dat to rpesalms.edac format
-    
+
     Args:
         input_file: Path to input rpesalms.dat file
         output_file: Path to output rpesalms.edac file
+        follow: Keep reading while multiplet is still writing input_file,
+            until all blocks announced in the header have been converted
+            or no new data arrived for timeout seconds
+
+    Returns:
+        Number of Ef blocks written
     """
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-    
-    # First 3 lines are header
-    header = lines[:3]
-    remaining_lines = lines[3:]
-    
-    output_lines = header.copy()
-    
-    i = 0
-    while i < len(remaining_lines):
-        # Get energy value line
-        energy_line = remaining_lines[i]
-        i += 1
-        output_lines.append(energy_line)
-        
-        # Collect all data values until next energy value or end of file
-        data_values = []
-        while i < len(remaining_lines) and not re.match(r'^-?\d+\.\d+', remaining_lines[i]):
-            # Process each line of data values
-            line = remaining_lines[i].strip()
-            values = re.findall(r'-?\d+\.\d+e[+-]\d+', line)
-            data_values.extend(values)
-            i += 1
-        
-        # Add collected data as a single line
-        output_lines.append("  " + " ".join(data_values) + "\n")
-    
-    # Write output file
-    with open(output_file, 'w') as f:
-        f.writelines(output_lines)
+    nblocks = 0
+    with open(input_file, 'r') as f, open(output_file, 'w') as out:
+        for line in edac_lines(read_lines(f, follow, timeout=timeout)):
+            out.write(line)
+            if line.startswith("  "):
+                nblocks += 1
+                if follow:
+                    out.flush()
+    return nblocks
+
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python convert_rpesalms.py input_file output_file")
+    args = [arg for arg in sys.argv[1:] if arg != "--follow"]
+    if len(args) < 2:
+        print("Usage: python convert_rpesalms.py [--follow] input_file output_file")
         sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    
-    convert_rpesalms(input_file, output_file)
-    print(f"Conversion complete. Output written to {output_file}") 
\ No newline at end of file
+
+    input_file = args[0]
+    output_file = args[1]
+
+    nblocks = convert_rpesalms(input_file, output_file, follow="--follow" in sys.argv)
+    print(f"Conversion complete. {nblocks} blocks written to {output_file}")
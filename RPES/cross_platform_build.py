@@ -3,18 +3,33 @@ import os
 import shutil
 import platform
 import PyInstaller.__main__
-from cross_platform_compile import compile_multiplet
+from cross_platform_compile import BUILD_PROFILES, compile_multiplet, tuned_profile, executable_name
 
-def build_application():
-    """Build the Orbitron-Multiplet application for the current platform"""
+def build_application(profile=None):
+    """
+    Build the Orbitron-Multiplet application for the current platform
+
+    Args:
+        profile: Build profile of the packaged multiplet executable (see
+            cross_platform_compile.BUILD_PROFILES); default the winner of
+            the last 'cross_platform_compile.py tune', which is packaged
+            as installed, else 'plain'
+    """
     
     print(f"Building Orbitron-Multiplet for {platform.system()}...")
     
-    # First, compile the multiplet executable for this platform
-    compile_success = compile_multiplet()
-    if not compile_success:
-        print("Failed to compile multiplet executable. Build aborted.")
-        return False
+    # First, compile the multiplet executable for this platform, unless
+    # tune already installed the fastest correct build
+    tuned = tuned_profile()
+    if profile is None and tuned and os.path.exists(executable_name()):
+        profile = tuned
+        print(f"Packaging the tuned build profile: {profile}")
+    else:
+        profile = profile or tuned or "plain"
+        compile_success = compile_multiplet(profile)
+        if not compile_success:
+            print("Failed to compile multiplet executable. Build aborted.")
+            return False
     
     # Determine platform-specific parameters
     icon_param = []
@@ -37,10 +52,10 @@ def build_application():
         path_sep = ":"
     
     # Determine executable name based on platform
-    if platform.system() == "Windows":
-        executable = "multiplet.exe"
-    else:
-        executable = "multiplet"
+    executable = executable_name()
+    # a build against a system BLAS/LAPACK is added as a binary, so that
+    # PyInstaller also collects the shared libraries it links
+    add_executable = "--add-binary" if BUILD_PROFILES.get(profile, {}).get("blas") else "--add-data"
     
     # Basic PyInstaller command
     pyinstaller_cmd = [
@@ -48,7 +63,7 @@ def build_application():
         '--name=Orbitron-Multiplet',
         '--onedir',
         '--windowed',
-        f'--add-data={executable}{path_sep}.',
+        f'{add_executable}={executable}{path_sep}.',
         f'--add-data=requirements.txt{path_sep}.',
         f'--add-data=GUI_README.md{path_sep}.',
         '--clean',
@@ -1,62 +1,389 @@
 #!/usr/bin/env python3
+"""
+Compile the multiplet executable for the current platform.
+
+Besides the plain build (the compiler defaults) there are named build
+profiles (BUILD_PROFILES): a debug build, an optimized build with
+vectorization and link-time optimization, and the optimized build linked
+against an optimized system BLAS/LAPACK instead of the bundled labla.f.
+'tune' builds every profile, runs the test input, checks the results
+against Test_Output and installs the fastest correct binary; the winner
+is recorded in build_profile.json and used by compile_multiplet and
+cross_platform_build. 'library' builds the engine as a shared library
+for the in-process binding multiplet_engine.py.
+"""
+import sys
 import os
+import json
+import time
 import platform
 import subprocess
 import shutil
+import tempfile
 
-def compile_multiplet():
-    """Compile the multiplet executable for the current platform"""
-    
-    print(f"Detected platform: {platform.system()}")
-    
-    # Create src directory if needed
-    os.makedirs("src", exist_ok=True)
-    
-    # Change to the src directory
-    os.chdir("src")
-    
-    # Check which platform we're on
-    if platform.system() == "Darwin":  # macOS
-        print("Compiling for macOS...")
-        # macOS-specific compilation
-        subprocess.run("gfortran -c labla.f", shell=True, check=True)
-        subprocess.run("gcc -c *.c", shell=True, check=True)
-        subprocess.run("gfortran *.o -o multiplet -framework Accelerate", shell=True, check=True)
-    
-    elif platform.system() == "Linux":
-        print("Compiling for Linux...")
-        # Linux-specific compilation
-        subprocess.run("gfortran -c labla.f", shell=True, check=True)
-        subprocess.run("gcc -c *.c", shell=True, check=True)
-        subprocess.run("gfortran *.o -o multiplet -lblas -llapack", shell=True, check=True)
-    
-    elif platform.system() == "Windows":
-        print("Compiling for Windows...")
-        # Windows-specific compilation (requires MinGW or similar)
-        # Note: This is just a placeholder, actual Windows compilation may need more work
-        subprocess.run("gfortran -c labla.f", shell=True, check=True)
-        subprocess.run("gcc -c *.c", shell=True, check=True)
-        subprocess.run("gfortran *.o -o multiplet.exe -lblas -llapack", shell=True, check=True)
-    
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# result of the last tune, see tune()
+PROFILE_RECORD = os.path.join(SCRIPT_DIR, "build_profile.json")
+# outputs of multiplet_input.txt compared with Test_Output by tune(); the sign
+# of rpesalms.dat (eigenvector phases) and xmat.dat may differ between LAPACKs
+CHECK_FILES = ["pes.dat", "peslm.dat", "rpes.dat", "rp.dat", "rpc.dat",
+               "xaq.dat", "xaqc.dat", "xaqx.dat"]
+DEFAULT_RTOL = 1e-3
+
+# cflags / fflags / ldflags of each profile; blas: link a system BLAS/LAPACK
+# ( see find_system_blas ) instead of compiling labla.f. No -march=native,
+# the binaries are packaged for other machines.
+BUILD_PROFILES = {
+    "plain": {"cflags": "", "fflags": "", "ldflags": "", "blas": False,
+              "description": "compiler defaults, bundled labla.f"},
+    "debug": {"cflags": "-O0 -g", "fflags": "-O0 -g", "ldflags": "-g", "blas": False,
+              "description": "no optimization, debug symbols"},
+    "optimized": {"cflags": "-O3 -ftree-vectorize -flto", "fflags": "-O3 -ftree-vectorize -flto",
+                  "ldflags": "-O3 -flto", "blas": False,
+                  "description": "-O3, vectorization and link-time optimization, bundled labla.f"},
+    "optimized-blas": {"cflags": "-O3 -ftree-vectorize -flto", "fflags": "",
+                       "ldflags": "-O3 -flto", "blas": True,
+                       "description": "as optimized, linked against the system BLAS/LAPACK"},
+}
+DEFAULT_PROFILE = "plain"
+
+# optimized BLAS/LAPACK libraries tried by find_system_blas, in order
+BLAS_CANDIDATES = {
+    "Darwin": ["-framework Accelerate"],
+    "Linux": ["-lopenblas", "-lflexiblas", "-lmkl_rt", "-lblis -llapack"],
+    "Windows": ["-lopenblas"],
+}
+
+
+def executable_name():
+    return "multiplet.exe" if platform.system() == "Windows" else "multiplet"
+
+
+def library_name():
+    """File name of the shared library ( see multiplet_engine.py )"""
+    if platform.system() == "Windows":
+        return "libmultiplet.dll"
+    if platform.system() == "Darwin":
+        return "libmultiplet.dylib"
+    return "libmultiplet.so"
+
+
+def openmp_flag():
+    """'-fopenmp' if gcc can build and link OpenMP code, else '' (serial build)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "omp.c")
+        with open(src, "w") as f:
+            f.write("#include <omp.h>\nint main() { return omp_get_max_threads() > 0 ? 0 : 1 ; }\n")
+        result = subprocess.run(["gcc", "-fopenmp", src, "-o", os.path.join(tmp, "omp")],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return "-fopenmp" if result.returncode == 0 else ""
+
+
+def find_system_blas():
+    """
+    Link flags of an optimized system BLAS/LAPACK
+
+    Every candidate of BLAS_CANDIDATES is tried by linking a program that
+    calls the LAPACK and BLAS routines used by multiplet.
+
+    Returns:
+        The flags of the first candidate that links and runs, or None
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "blas.c")
+        exe = os.path.join(tmp, "blas")
+        with open(src, "w") as f:
+            f.write("extern void dsyev_(), dsyevr_(), dgemm_() ;\n"
+                    "int main( int argc, char **argv ) {\n"
+                    "  if ( argc > 5 ) { dsyev_() ; dsyevr_() ; dgemm_() ; }\n"
+                    "  return 0 ; }\n")
+        for flags in BLAS_CANDIDATES.get(platform.system(), []):
+            result = subprocess.run(f"gfortran {src} -o {exe} {flags}", shell=True,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if result.returncode == 0 and subprocess.run([exe]).returncode == 0:
+                return flags
+    return None
+
+
+def link_flags(profile, blas=None):
+    """BLAS/LAPACK flags of a profile, None if it needs a system BLAS and there is none"""
+    if BUILD_PROFILES[profile]["blas"]:
+        return blas
+    if platform.system() == "Darwin":
+        return "-framework Accelerate"
+    return "-lblas -llapack"
+
+
+def build_profile(profile, src_dir=None, build_dir=None, blas=None, shared=False):
+    """
+    Build multiplet with a named build profile
+
+    Objects and executable go to build_dir, the sources are not touched.
+
+    Args:
+        profile: Key of BUILD_PROFILES
+        src_dir: Directory with the sources (default: src next to this script)
+        build_dir: Output directory (default: src_dir/build/<profile>)
+        blas: Link flags of the system BLAS/LAPACK for profiles that use
+            one (default: find_system_blas)
+        shared: Build the shared library ( library_name, src/library.c )
+            instead of the executable; default build_dir is then
+            src_dir/build/<profile>-shared
+
+    Returns:
+        Path of the executable or library
+
+    Raises:
+        ValueError for an unknown profile, RuntimeError if the profile
+        needs a system BLAS/LAPACK and none is found,
+        subprocess.CalledProcessError if the compiler fails
+    """
+    if profile not in BUILD_PROFILES:
+        raise ValueError(f"Unknown build profile '{profile}', use one of {list(BUILD_PROFILES)}")
+    settings = BUILD_PROFILES[profile]
+    src_dir = os.path.abspath(src_dir or os.path.join(SCRIPT_DIR, "src"))
+    build_dir = os.path.abspath(build_dir or os.path.join(
+        src_dir, "build", profile + ("-shared" if shared else "")))
+    if settings["blas"] and blas is None:
+        blas = find_system_blas()
+    libs = link_flags(profile, blas)
+    if libs is None:
+        raise RuntimeError(f"Profile '{profile}' needs an optimized BLAS/LAPACK, none found")
+
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+    # Multithreaded Hamiltonian and operator builders (MULTIPLET_THREADS)
+    omp = openmp_flag()
+    exe = library_name() if shared else executable_name()
+    cflags, fflags, ldflags = settings["cflags"], settings["fflags"], settings["ldflags"]
+    if shared:
+        # position independent code, no main() ( see main.c )
+        cflags += " -fPIC -DMULTIPLET_LIBRARY"
+        fflags += " -fPIC"
+        ldflags += " -shared"
+    commands = []
+    if not settings["blas"]:
+        commands.append(f"gfortran {fflags} -c {os.path.join(src_dir, 'labla.f')}")
+    commands.append(f"gcc {omp} {cflags} -c {os.path.join(src_dir, '*.c')}")
+    commands.append(f"gfortran {omp} {ldflags} *.o -o {exe} {libs}")
+    print(f"Building {'library' if shared else 'profile'} '{profile}' ({settings['description']}) in {build_dir}")
+    for command in commands:
+        print(" ".join(command.split()))
+        subprocess.run(command, shell=True, check=True, cwd=build_dir)
+    return os.path.join(build_dir, exe)
+
+
+def tuned_profile():
+    """Profile installed by the last tune (build_profile.json), None if never tuned"""
+    try:
+        with open(PROFILE_RECORD, 'r') as f:
+            return json.load(f).get("winner")
+    except (OSError, ValueError):
+        return None
+
+
+def _read_columns(path):
+    """Numeric rows of an output file, grouped by row width"""
+    groups = {}
+    with open(path, 'r') as f:
+        for line in f:
+            # peslm.dat labels its columns with q and n suffixes
+            fields = [field.rstrip("qn") for field in line.split()]
+            try:
+                row = [float(field) for field in fields]
+            except ValueError:
+                continue
+            if row:
+                groups.setdefault(len(row), []).append(row)
+    return groups
+
+
+def check_outputs(run_dir, reference_dir=None, rtol=DEFAULT_RTOL):
+    """
+    Compare the outputs of a run with reference outputs
+
+    Every column (rows grouped by their number of fields) must agree
+    within rtol relative to the largest magnitude in that column.
+
+    Args:
+        run_dir: Directory with the outputs of multiplet_input.txt
+        reference_dir: Reference outputs (default: Test_Output)
+        rtol: Tolerance relative to the column maxima
+
+    Returns:
+        List of problems (file: message), empty if the outputs agree
+    """
+    reference_dir = reference_dir or os.path.join(SCRIPT_DIR, "Test_Output")
+    problems = []
+    for name in CHECK_FILES:
+        try:
+            ref = _read_columns(os.path.join(reference_dir, name))
+            new = _read_columns(os.path.join(run_dir, name))
+        except OSError as e:
+            problems.append(f"{name}: {e}")
+            continue
+        if sorted((w, len(rows)) for w, rows in ref.items()) != \
+                sorted((w, len(rows)) for w, rows in new.items()):
+            problems.append(f"{name}: different number of rows or columns")
+            continue
+        worst = 0.
+        for width, rows in ref.items():
+            for col in range(width):
+                a = [row[col] for row in rows]
+                b = [row[col] for row in new[width]]
+                scale = max(abs(x) for x in a) or 1.
+                worst = max(worst, max(abs(x - y) for x, y in zip(a, b)) / scale)
+        if worst > rtol:
+            problems.append(f"{name}: relative deviation {worst:.2e} > {rtol:.0e}")
+    return problems
+
+
+def install_binary(path):
+    """Copy an executable or library next to this script ( where the GUI, runner and binding look for it )"""
+    target = os.path.join(SCRIPT_DIR, os.path.basename(path))
+    shutil.copy(path, target)
+    return target
+
+
+def tune(profiles=None, repeat=3, rtol=DEFAULT_RTOL, install=True):
+    """
+    Build every profile, time it and install the fastest correct binary
+
+    Each profile is built ( build_profile ), multiplet_input.txt is run
+    repeat times and the outputs of the fastest run are checked against
+    Test_Output ( check_outputs ). Profiles that fail to build, to run or
+    the check are skipped.
+
+    Args:
+        profiles: Profiles to try (default: all of BUILD_PROFILES)
+        repeat: Runs per profile; the fastest one counts
+        rtol: Tolerance of the output check
+        install: Install the winner next to this script and record the
+            results in build_profile.json
+
+    Returns:
+        dict with the results per profile and the winner (None if no
+        profile passed)
+    """
+    from multiplet_runner import run_multiplet
+
+    with open(os.path.join(SCRIPT_DIR, "multiplet_input.txt"), 'r') as f:
+        input_text = f.read()
+    blas = find_system_blas()
+    print(f"System BLAS/LAPACK: {blas or 'none found'}")
+    record = {"created": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "host": {"node": platform.node(), "system": platform.system(),
+                       "machine": platform.machine(), "cpu_count": os.cpu_count()},
+              "blas": blas, "rtol": rtol, "repeat": repeat, "profiles": {}, "winner": None}
+    with tempfile.TemporaryDirectory(prefix="multiplet-tune-") as tmp:
+        for profile in profiles or BUILD_PROFILES:
+            result = {"executable": None, "wall_time": None, "wall_times": [],
+                      "passed": False, "error": None}
+            record["profiles"][profile] = result
+            try:
+                result["executable"] = build_profile(profile, blas=blas)
+            except (ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+                result["error"] = str(e)
+                print(f"{profile}: skipped, {e}")
+                continue
+            runs = [run_multiplet(input_text, os.path.join(tmp, profile), result["executable"],
+                                  verbosity="quiet") for _ in range(repeat)]
+            result["wall_times"] = [run["wall_time"] for run in runs]
+            failed = [run for run in runs if run["exit_code"] != 0]
+            if failed:
+                result["error"] = failed[0]["error"] or f"exit code {failed[0]['exit_code']}"
+            else:
+                result["wall_time"] = min(result["wall_times"])
+                problems = check_outputs(os.path.join(tmp, profile), rtol=rtol)
+                result["passed"] = not problems
+                result["error"] = "; ".join(problems) or None
+            status = "ok" if result["passed"] else f"FAILED ({result['error']})"
+            wall = f"{result['wall_time']:8.2f} s" if result["wall_time"] is not None else "       -  "
+            print(f"{profile:16s} {wall}  {status}")
+
+    passed = [p for p, r in record["profiles"].items() if r["passed"]]
+    if passed:
+        record["winner"] = min(passed, key=lambda p: record["profiles"][p]["wall_time"])
+        print(f"Fastest correct profile: {record['winner']}")
+        if install:
+            print(f"Installed {install_binary(record['profiles'][record['winner']]['executable'])}")
     else:
+        print("No profile passed the output check, nothing installed")
+    if install:
+        with open(PROFILE_RECORD, 'w') as f:
+            json.dump(record, f, indent=2)
+    return record
+
+
+def compile_multiplet(profile=None):
+    """
+    Compile the multiplet executable for the current platform
+
+    Args:
+        profile: Build profile (see BUILD_PROFILES); default the profile
+            chosen by the last tune, else 'plain'
+    """
+
+    print(f"Detected platform: {platform.system()}")
+    if platform.system() not in ("Darwin", "Linux", "Windows"):
         print(f"Unsupported platform: {platform.system()}")
         return False
-    
-    # Copy the compiled executable to the parent directory
+    profile = profile or tuned_profile() or DEFAULT_PROFILE
+    print(f"Build profile: {profile}")
+
+    try:
+        executable = build_profile(profile)
+    except (ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"Build failed: {e}")
+        return False
+
+    # Copy the compiled executable next to this script
     print("Copying multiplet executable to parent directory...")
-    if platform.system() == "Windows":
-        shutil.copy("multiplet.exe", "..")
-    else:
-        shutil.copy("multiplet", "..")
-    
-    # Go back to the original directory
-    os.chdir("..")
-    
+    install_binary(executable)
     return True
 
+
+def build_library(profile=None):
+    """
+    Build the shared library for multiplet_engine.py and install it next to this script
+
+    Args:
+        profile: Build profile; default the profile chosen by the last
+            tune, else 'optimized'
+
+    Returns:
+        Path of the installed library, None if the build failed
+    """
+    profile = profile or tuned_profile() or "optimized"
+    try:
+        return install_binary(build_profile(profile, shared=True))
+    except (ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"Build failed: {e}")
+        return None
+
+
 if __name__ == "__main__":
-    success = compile_multiplet()
+    if len(sys.argv) > 1 and sys.argv[1] not in list(BUILD_PROFILES) + ["tune", "library"]:
+        print("Usage: python cross_platform_compile.py [profile]")
+        print("       python cross_platform_compile.py tune [repeat] [profile,profile,...]")
+        print("       python cross_platform_compile.py library [profile]")
+        print(f"Profiles: {', '.join(BUILD_PROFILES)}")
+        sys.exit(1)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "tune":
+        repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+        profiles = sys.argv[3].split(",") if len(sys.argv) > 3 else None
+        record = tune(profiles, repeat)
+        sys.exit(0 if record["winner"] else 1)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "library":
+        path = build_library(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"Installed {path}" if path else "Compilation failed.")
+        sys.exit(0 if path else 1)
+
+    success = compile_multiplet(sys.argv[1] if len(sys.argv) > 1 else None)
     if success:
         print("Compilation successful!")
     else:
-        print("Compilation failed.") 
\ No newline at end of file
+        print("Compilation failed.")
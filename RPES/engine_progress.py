@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Timing and progress records of the multiplet engine.
+With MULTIPLET_PROGRESS=1 the engine writes one '@progress key=value ...'
+line to stderr after every expensive phase (calcham, dsyev, o1ptospama,
+o2ptospama, fbasvmst, fstvmst), after every omega point and at the end
+(see src/progress.c). ProgressTracker collects them into a phase timeline,
+the omega progress with an ETA and the peak RSS of the engine.
+"""
+
+import sys
+
+PROGRESS_PREFIX = "@progress"
+
+# phase name -> short description, in the order the engine runs them
+PHASES = {
+    "calcham": "Hamiltonian build",
+    "dsyev": "diagonalization",
+    "o1ptospama": "dipole matrix elements",
+    "o2ptospama": "Auger (VAI) matrix elements",
+    "fbasvmst": "(F_basis|V|M) assembly",
+    "fstvmst": "(F|V|M) assembly",
+    "omega": "omega loop",
+}
+
+_INT_FIELDS = ("n", "i", "rss")
+_FLOAT_FIELDS = ("time", "elapsed", "omega")
+
+
+def parse_progress(line):
+    """
+    Parse one progress record
+
+    Returns:
+        dict of the record fields (n, i and rss as int, time, elapsed and
+        omega as float, rss in kB) or None if line contains no progress
+        record. A record may follow unterminated stdout text of a shared log.
+    """
+    start = line.find(PROGRESS_PREFIX)
+    if start < 0:
+        return None
+    record = {}
+    for field in line[start + len(PROGRESS_PREFIX):].split():
+        key, _, value = field.partition("=")
+        if key in _INT_FIELDS:
+            value = int(value)
+        elif key in _FLOAT_FIELDS:
+            value = float(value)
+        record[key] = value
+    return record
+
+
+def format_duration(seconds):
+    """Human readable duration, e.g. '42 s', '3 min 05 s', '1 h 12 min'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+
+
+class ProgressTracker:
+    """Collects progress records of one engine run"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # timeline entries [phase, block, n, time, calls], in order of appearance
+        self.phases = []
+        self.omega_done = 0
+        # points done before this run ( resumed from a checkpoint )
+        self.omega_first = None
+        self.nomega = 0
+        self.omega = None
+        self.omega_time = 0.
+        self.elapsed = 0.
+        self.peak_rss = 0
+        self.done = False
+        self.partial = ""
+
+    def feed(self, text):
+        """
+        Process a chunk of engine stderr
+
+        Progress records are consumed; the other complete lines are
+        returned (incomplete lines wait for the next chunk).
+        """
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        other = []
+        for line in lines:
+            record = parse_progress(line)
+            if record is None:
+                other.append(line + "\n")
+            else:
+                other.append(line[:line.find(PROGRESS_PREFIX)])
+                self.update(record)
+        return "".join(other)
+
+    def update(self, record):
+        """Add one parsed record"""
+        self.elapsed = record.get("elapsed", self.elapsed)
+        self.peak_rss = max(self.peak_rss, record.get("rss", 0))
+        phase = record.get("phase")
+        if phase == "done":
+            self.done = True
+        elif phase == "omega":
+            self.omega_done = record.get("i", self.omega_done)
+            if self.omega_first is None:
+                self.omega_first = self.omega_done - 1
+            self.nomega = record.get("n", self.nomega)
+            self.omega = record.get("omega", self.omega)
+            self.omega_time += record.get("time", 0.)
+        else:
+            # repeated calls (e.g. the three dipole components) are summed
+            if self.phases and self.phases[-1][:2] == [phase, record.get("block")]:
+                self.phases[-1][3] += record.get("time", 0.)
+                self.phases[-1][4] += 1
+            else:
+                self.phases.append([phase, record.get("block"), record.get("n"),
+                                    record.get("time", 0.), 1])
+
+    def fraction(self):
+        """Finished fraction of the omega loop (0 before it starts)"""
+        return self.omega_done / self.nomega if self.nomega else 0.
+
+    def eta(self):
+        """Estimated seconds until the omega loop finishes, None before the first point"""
+        if not self.omega_done:
+            return None
+        computed = max(self.omega_done - (self.omega_first or 0), 1)
+        return self.omega_time / computed * (self.nomega - self.omega_done)
+
+    def status(self):
+        """One line summary: current phase, omega progress, ETA and peak RSS"""
+        if self.done:
+            text = f"Finished after {format_duration(self.elapsed)}"
+        elif self.omega_done:
+            text = (f"omega {self.omega_done}/{self.nomega} ({self.omega:.3f}), "
+                    f"ETA {format_duration(self.eta())}")
+        elif self.phases:
+            phase, block = self.phases[-1][:2]
+            text = f"{PHASES.get(phase, phase)} ({block}) done at {format_duration(self.elapsed)}"
+        else:
+            text = "Starting"
+        if self.peak_rss:
+            text += f", peak RSS {self.peak_rss / 1024:.0f} MB"
+        return text
+
+    def timeline(self):
+        """
+        Phase timeline as rows (phase, block, n, calls, seconds); the omega
+        loop is the last row once it has started
+        """
+        rows = [(phase, block, n, calls, time) for phase, block, n, time, calls in self.phases]
+        if self.omega_done:
+            rows.append(("omega", f"{self.omega_done}/{self.nomega}", self.nomega,
+                         self.omega_done - (self.omega_first or 0), self.omega_time))
+        return rows
+
+    def report(self):
+        """Timeline as text with the share of the elapsed time"""
+        total = max(self.elapsed, 1e-9)
+        lines = [f"{'phase':12s} {'block':13s} {'n':>7s} {'calls':>5s} {'time':>10s} {'share':>6s}"]
+        for phase, block, n, calls, time in self.timeline():
+            lines.append(f"{phase:12s} {block:13s} {n:7d} {calls:5d} {time:10.3f} {100 * time / total:5.1f}%")
+        lines.append(f"total {self.elapsed:.3f} s, peak RSS {self.peak_rss / 1024:.1f} MB")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """Timeline and totals in a JSON friendly form"""
+        return {
+            "phases": [{"phase": phase, "block": block, "n": n, "calls": calls, "time": time}
+                       for phase, block, n, calls, time in self.timeline()],
+            "elapsed": self.elapsed,
+            "peak_rss_kb": self.peak_rss,
+            "finished": self.done,
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python engine_progress.py multiplet.log")
+        print("  (log of a run with MULTIPLET_PROGRESS=1)")
+        sys.exit(1)
+
+    tracker = ProgressTracker()
+    with open(sys.argv[1], 'r') as f:
+        for line in f:
+            record = parse_progress(line)
+            if record is not None:
+                tracker.update(record)
+    print(tracker.report())
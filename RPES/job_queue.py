@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Job queue widget for the multiplet GUI.
+Input file / output directory pairs are queued and run with a
+configurable number of concurrent engine processes. Every job has its own
+QProcess started in its output directory (setWorkingDirectory, the GUI
+never changes its own working directory), its own log file and progress
+tracker, and can be cancelled and retried independently. Before a job is
+started it is checked against the result cache and the pre-flight memory
+estimate; a job waits while the estimates of the running jobs plus its
+own exceed the memory limit.
+"""
+
+import os
+import time
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QPushButton, QFileDialog, QGroupBox, QMessageBox, QSpinBox,
+                             QComboBox, QCheckBox, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView)
+from PyQt6.QtCore import QProcess, QProcessEnvironment, QIODevice, QTimer
+
+from multiplet_runner import (INPUT_NAME, LOG_NAME, VERBOSITY_LEVELS, default_multiplet_path,
+                              result_settings, output_files, threads_per_job,
+                              checkpoint_setting)
+from result_cache import ResultCache
+from engine_progress import ProgressTracker, format_duration
+from preflight import check as preflight_check, memory_limit, format_size
+
+REFRESH_INTERVAL_MS = 1000
+
+# job states
+QUEUED = "Queued"
+RUNNING = "Running"
+DONE = "Done"
+CACHED = "Cached"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+REJECTED = "Rejected"
+FINISHED_STATES = (DONE, CACHED, FAILED, CANCELLED, REJECTED)
+RETRY_STATES = (FAILED, CANCELLED, REJECTED)
+
+COLUMNS = ["Input", "Output directory", "Status", "Elapsed"]
+
+
+class QueuedJob:
+    """One input / output directory pair of the queue"""
+
+    def __init__(self, input_path, output_dir):
+        self.input_path = os.path.abspath(input_path)
+        self.output_dir = os.path.abspath(output_dir)
+        self.reset()
+
+    def reset(self):
+        self.state = QUEUED
+        self.message = ""
+        self.prepared = False
+        self.input_text = None
+        self.process = None
+        self.log_file = None
+        self.tracker = ProgressTracker()
+        self.estimate = None
+        self.cache_key = None
+        self.start = None
+        self.elapsed = 0.
+
+    def memory(self):
+        """Predicted peak memory in bytes (0 if unknown)"""
+        return self.estimate["memory"] if self.estimate else 0
+
+    def status(self):
+        if self.state == RUNNING:
+            return self.tracker.status()
+        if self.message:
+            return f"{self.state}: {self.message}"
+        return self.state
+
+    def current_elapsed(self):
+        if self.state == RUNNING and self.start is not None:
+            return time.monotonic() - self.start
+        return self.elapsed
+
+
+class JobQueue(QWidget):
+    """Queue of multiplet runs with a concurrency limit, cancel and retry"""
+
+    def __init__(self, parent=None, multiplet_path=None):
+        super().__init__(parent)
+        self.multiplet_path = multiplet_path or default_multiplet_path()
+        self.jobs = []
+        self.cache = None
+
+        layout = QVBoxLayout()
+
+        # New jobs: one input / output pair, or several inputs below one directory
+        add_group = QGroupBox("Add Jobs")
+        add_layout = QVBoxLayout()
+        pair_layout = QHBoxLayout()
+        self.input_edit = QLineEdit()
+        self.input_edit.setPlaceholderText("Input file")
+        input_button = QPushButton("Browse")
+        input_button.clicked.connect(self.browse_input)
+        self.output_edit = QLineEdit()
+        self.output_edit.setPlaceholderText("Output directory")
+        output_button = QPushButton("Browse")
+        output_button.clicked.connect(self.browse_output)
+        add_button = QPushButton("Add")
+        add_button.clicked.connect(self.add_from_fields)
+        pair_layout.addWidget(self.input_edit)
+        pair_layout.addWidget(input_button)
+        pair_layout.addWidget(self.output_edit)
+        pair_layout.addWidget(output_button)
+        pair_layout.addWidget(add_button)
+        add_layout.addLayout(pair_layout)
+        many_button = QPushButton("Add Several Inputs...")
+        many_button.setToolTip("Each input runs in a directory named after it below a chosen directory")
+        many_button.clicked.connect(self.add_several)
+        add_layout.addWidget(many_button)
+        add_group.setLayout(add_layout)
+        layout.addWidget(add_group)
+
+        # Settings of the runs
+        settings_layout = QHBoxLayout()
+        settings_layout.addWidget(QLabel("Concurrent jobs:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.concurrency_spin.setValue(max(1, min(4, (os.cpu_count() or 1) // 2)))
+        self.concurrency_spin.valueChanged.connect(self.schedule)
+        settings_layout.addWidget(self.concurrency_spin)
+        settings_layout.addWidget(QLabel("Engine output:"))
+        self.verbosity_combo = QComboBox()
+        self.verbosity_combo.addItems(["Quiet (errors only)", "Summary", "Full (all dumps)"])
+        self.verbosity_combo.setCurrentIndex(1)
+        settings_layout.addWidget(self.verbosity_combo)
+        self.use_cache = QCheckBox("Reuse cached results")
+        self.use_cache.setChecked(True)
+        settings_layout.addWidget(self.use_cache)
+        settings_layout.addStretch()
+        layout.addLayout(settings_layout)
+
+        # Job table
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        for label, slot in (("Cancel Selected", self.cancel_selected),
+                            ("Retry Selected", self.retry_selected),
+                            ("Remove Finished", self.remove_finished)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        buttons.addStretch()
+        self.summary_label = QLabel()
+        buttons.addWidget(self.summary_label)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        # elapsed times and progress of the running jobs
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    # adding jobs
+
+    def browse_input(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Input File", "", "Text Files (*.txt)")
+        if file_path:
+            self.input_edit.setText(file_path)
+
+    def browse_output(self):
+        dir_path = QFileDialog.getExistingDirectory(self, "Select Output Directory")
+        if dir_path:
+            self.output_edit.setText(dir_path)
+
+    def add_from_fields(self):
+        input_path, output_dir = self.input_edit.text(), self.output_edit.text()
+        if not input_path or not output_dir:
+            QMessageBox.warning(self, "Error", "Please select an input file and an output directory")
+            return
+        if self.add_job(input_path, output_dir):
+            self.input_edit.clear()
+
+    def add_several(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select Input Files", "", "Text Files (*.txt)")
+        if not paths:
+            return
+        parent = QFileDialog.getExistingDirectory(self, "Directory for the Output Directories")
+        if not parent:
+            return
+        for path in paths:
+            self.add_job(path, os.path.join(parent, os.path.splitext(os.path.basename(path))[0]))
+
+    def add_job(self, input_path, output_dir):
+        """
+        Queue one run; returns False (with a message box) if the input
+        does not exist or another unfinished job uses the output directory
+        """
+        if not os.path.isfile(input_path):
+            QMessageBox.warning(self, "Error", f"Input file {input_path} not found")
+            return False
+        output_dir = os.path.abspath(output_dir)
+        if any(job.output_dir == output_dir and job.state not in FINISHED_STATES for job in self.jobs):
+            QMessageBox.warning(self, "Error", f"{output_dir} is already used by a queued job")
+            return False
+        self.jobs.append(QueuedJob(input_path, output_dir))
+        self.schedule()
+        return True
+
+    # running jobs
+
+    def running(self):
+        return [job for job in self.jobs if job.state == RUNNING]
+
+    def schedule(self):
+        """Start queued jobs while there are free slots and memory"""
+        limit = memory_limit()
+        for job in self.jobs:
+            running = self.running()
+            if len(running) >= self.concurrency_spin.value():
+                break
+            if job.state != QUEUED:
+                continue
+            if not self.prepare(job):
+                continue
+            # wait for memory held by running jobs; a job that does not fit alone was rejected
+            if running and limit and job.memory() + sum(j.memory() for j in running) > limit:
+                job.message = (f"waiting for memory ({format_size(job.memory())} "
+                               f"estimated, {format_size(limit)} available)")
+                break
+            self.start(job)
+        self.refresh()
+
+    def prepare(self, job):
+        """
+        Cache lookup and pre-flight check of a queued job; returns False
+        if the job is finished by them
+        """
+        if job.prepared:
+            return True
+        try:
+            with open(job.input_path, 'r') as f:
+                job.input_text = f.read()
+            os.makedirs(job.output_dir, exist_ok=True)
+        except OSError as e:
+            job.state, job.message = FAILED, str(e)
+            return False
+        if self.use_cache.isChecked():
+            try:
+                if self.cache is None:
+                    self.cache = ResultCache()
+                job.cache_key = self.cache.key(job.input_text, self.multiplet_path,
+                                               result_settings(os.environ))
+                if self.cache.fetch(job.cache_key, job.output_dir) is not None:
+                    job.state, job.message = CACHED, "results copied from the cache"
+                    return False
+            except OSError as e:
+                job.cache_key = None
+                job.message = f"result cache not available: {e}"
+        ok, job.estimate, message = preflight_check(job.input_text)
+        if not ok:
+            job.state, job.message = REJECTED, message
+            return False
+        job.prepared = True
+        return True
+
+    def start(self, job):
+        """Start the engine of a job in its output directory"""
+        input_path = os.path.join(job.output_dir, INPUT_NAME)
+        log_path = os.path.join(job.output_dir, LOG_NAME)
+        # a cancelled or crashed long run continues from its checkpoint
+        checkpoint, resume = checkpoint_setting(job.output_dir, job.estimate)
+        try:
+            with open(input_path, 'w') as f:
+                f.write(job.input_text)
+            # stdout (opened by QProcess) and our copy of stderr both append to the
+            # log, which a resumed run continues
+            if not resume:
+                open(log_path, 'w').close()
+            job.log_file = open(log_path, 'a')
+        except OSError as e:
+            job.state, job.message = FAILED, str(e)
+            return
+
+        process = QProcess(self)
+        process.setWorkingDirectory(job.output_dir)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("MULTIPLET_VERBOSITY", VERBOSITY_LEVELS[self.verbosity_combo.currentIndex()])
+        env.insert("MULTIPLET_PROGRESS", "1")
+        env.insert("MULTIPLET_THREADS", str(threads_per_job(self.concurrency_spin.value())))
+        env.insert("MULTIPLET_CHECKPOINT", "1" if checkpoint else "0")
+        process.setProcessEnvironment(env)
+        process.setStandardInputFile(input_path)
+        process.setStandardOutputFile(log_path, QIODevice.OpenModeFlag.Append)
+        process.readyReadStandardError.connect(lambda: self.handle_stderr(job))
+        process.finished.connect(lambda exit_code, exit_status: self.finished(job, exit_code, exit_status))
+        process.errorOccurred.connect(lambda error: self.process_error(job, error))
+
+        job.process = process
+        job.tracker.reset()
+        job.state, job.message = RUNNING, "resumed from checkpoint" if resume else ""
+        job.start = time.monotonic()
+        process.start(self.multiplet_path, [])
+
+    def handle_stderr(self, job):
+        """Progress records of a job; the raw stream goes to its log"""
+        data = job.process.readAllStandardError().data().decode(errors='replace')
+        if job.log_file is not None:
+            job.log_file.write(data)
+            job.log_file.flush()
+        job.tracker.feed(data)
+
+    def finished(self, job, exit_code, exit_status):
+        if job.state != RUNNING:
+            return
+        self.handle_stderr(job)
+        if exit_status == QProcess.ExitStatus.CrashExit:
+            job.state, job.message = FAILED, "engine crashed"
+        elif exit_code != 0:
+            job.state, job.message = FAILED, f"exit code {exit_code}, see {LOG_NAME}"
+        else:
+            job.state = DONE
+            if job.cache_key is not None:
+                try:
+                    self.cache.store(job.cache_key, job.output_dir, output_files(os.environ))
+                except OSError as e:
+                    job.message = f"could not store results in cache: {e}"
+        self.stop(job)
+
+    def process_error(self, job, error):
+        # errors of running processes are followed by finished()
+        if job.state == RUNNING and error == QProcess.ProcessError.FailedToStart:
+            job.state, job.message = FAILED, job.process.errorString()
+            self.stop(job)
+
+    def stop(self, job):
+        """Bookkeeping after a job has ended; starts the next queued jobs"""
+        job.elapsed = time.monotonic() - job.start
+        if job.log_file is not None:
+            job.log_file.close()
+            job.log_file = None
+        job.process.deleteLater()
+        job.process = None
+        self.schedule()
+
+    # cancel, retry, remove
+
+    def selected_jobs(self):
+        rows = sorted({index.row() for index in self.table.selectedIndexes()})
+        return [self.jobs[row] for row in rows if row < len(self.jobs)]
+
+    def cancel(self, job):
+        if job.state == RUNNING:
+            job.state, job.message = CANCELLED, ""
+            job.process.kill()
+            job.process.waitForFinished(1000)
+            self.stop(job)
+        elif job.state == QUEUED:
+            job.state, job.message = CANCELLED, ""
+
+    def cancel_selected(self):
+        for job in self.selected_jobs():
+            self.cancel(job)
+        self.schedule()
+
+    def cancel_all(self):
+        # queued jobs first, so that no job is started when a running one ends
+        for state in (QUEUED, RUNNING):
+            for job in self.jobs:
+                if job.state == state:
+                    self.cancel(job)
+        self.refresh()
+
+    def retry_selected(self):
+        for job in self.selected_jobs():
+            if job.state in RETRY_STATES:
+                job.reset()
+        self.schedule()
+
+    def remove_finished(self):
+        self.jobs = [job for job in self.jobs if job.state not in FINISHED_STATES]
+        self.refresh()
+
+    # display
+
+    def refresh(self):
+        """Show the state of all jobs"""
+        self.table.setRowCount(len(self.jobs))
+        for row, job in enumerate(self.jobs):
+            values = [os.path.basename(job.input_path), job.output_dir, job.status(),
+                      format_duration(job.current_elapsed()) if job.start is not None else ""]
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    self.table.setItem(row, column, QTableWidgetItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+            self.table.item(row, 0).setToolTip(job.input_path)
+        counts = {}
+        for job in self.jobs:
+            counts[job.state] = counts.get(job.state, 0) + 1
+        self.summary_label.setText(", ".join(f"{n} {state.lower()}" for state, n in counts.items())
+                                   or "No jobs")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Bounded console widget for engine output.
+The multiplet engine can print hundreds of thousands of lines (state
+vectors, sparse matrix lines). Output is collected in a ring buffer and
+shown in batches from a timer, the view keeps only the last max_lines
+lines, and the complete output is streamed to a log file. A filter hides
+numeric dumps or everything except warnings and errors.
+"""
+
+import re
+from collections import deque
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+                             QPlainTextEdit)
+from PyQt6.QtCore import QTimer
+
+MAX_LINES = 5000
+FLUSH_INTERVAL_MS = 100
+
+# verbosity levels of a line: lower is more important
+LEVEL_WARNING = 0
+LEVEL_MESSAGE = 1
+LEVEL_DETAIL = 2
+
+FILTERS = [
+    ("All output", LEVEL_DETAIL),
+    ("Messages (hide numeric dumps)", LEVEL_MESSAGE),
+    ("Warnings and errors", LEVEL_WARNING),
+]
+
+_warning_re = re.compile(r"warning|error|fail|trouble|unknown", re.IGNORECASE)
+_letter_re = re.compile(r"[A-Za-z]")
+
+
+def line_level(line):
+    """Verbosity level of one output line"""
+    if _warning_re.search(line):
+        return LEVEL_WARNING
+    if _letter_re.search(line):
+        return LEVEL_MESSAGE
+    return LEVEL_DETAIL
+
+
+class LogConsole(QWidget):
+    """Read-only console with a line cap, timer-batched updates and a log file"""
+
+    def __init__(self, parent=None, max_lines=MAX_LINES, interval_ms=FLUSH_INTERVAL_MS):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        # last max_lines lines as (level, text), for re-filtering the view
+        self.lines = deque(maxlen=max_lines)
+        self.pending = deque(maxlen=max_lines)
+        self.partial = ""
+        self.total_lines = 0
+        self.log_file = None
+        self.log_path = None
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Show:"))
+        self.filter_combo = QComboBox()
+        for label, _ in FILTERS:
+            self.filter_combo.addItem(label)
+        self.filter_combo.currentIndexChanged.connect(self.refilter)
+        controls.addWidget(self.filter_combo)
+        controls.addStretch()
+        self.status_label = QLabel()
+        controls.addWidget(self.status_label)
+        layout.addLayout(controls)
+
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setMaximumBlockCount(max_lines)
+        self.view.setUndoRedoEnabled(False)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def max_level(self):
+        return FILTERS[self.filter_combo.currentIndex()][1]
+
+    def open_log(self, path, append=False):
+        """Stream all following output to path (replacing an older log unless append)"""
+        self.close_log()
+        self.log_path = path
+        self.log_file = open(path, 'a' if append else 'w')
+
+    def close_log(self):
+        """Write out pending output and close the log file"""
+        if self.partial:
+            self._add_lines([self.partial])
+            self.partial = ""
+        self.flush()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def log(self, text):
+        """Write text to the log file only"""
+        if self.log_file is not None:
+            self.log_file.write(text)
+
+    def write(self, text, log=True):
+        """
+        Add a chunk of engine output; incomplete lines wait for the next chunk
+
+        With log=False the chunk is only shown (e.g. when the raw output
+        was logged with log() before filtering)
+        """
+        if log:
+            self.log(text)
+        text = self.partial + text
+        lines = text.split("\n")
+        self.partial = lines.pop()
+        self._add_lines(lines)
+
+    def message(self, text):
+        """Add a message of the GUI itself; it is shown with every filter"""
+        lines = text.split("\n")
+        if self.log_file is not None:
+            self.log_file.write(text + "\n")
+        for line in lines:
+            self.lines.append((LEVEL_WARNING, line))
+            self.pending.append((LEVEL_WARNING, line))
+        self.total_lines += len(lines)
+
+    def _add_lines(self, lines):
+        for line in lines:
+            entry = (line_level(line), line)
+            self.lines.append(entry)
+            self.pending.append(entry)
+        self.total_lines += len(lines)
+
+    def flush(self):
+        """Show pending lines in one update (called from the timer)"""
+        if not self.pending:
+            return
+        max_level = self.max_level()
+        shown = [line for level, line in self.pending if level <= max_level]
+        self.pending.clear()
+        if shown:
+            self.view.appendPlainText("\n".join(shown))
+        self._update_status()
+
+    def refilter(self):
+        """Rebuild the view from the retained lines with the current filter"""
+        max_level = self.max_level()
+        self.pending.clear()
+        self.view.setPlainText("\n".join(line for level, line in self.lines
+                                         if level <= max_level))
+        self.view.verticalScrollBar().setValue(self.view.verticalScrollBar().maximum())
+        self._update_status()
+
+    def clear(self):
+        self.lines.clear()
+        self.pending.clear()
+        self.partial = ""
+        self.total_lines = 0
+        self.view.clear()
+        self._update_status()
+
+    def _update_status(self):
+        text = f"{self.total_lines} lines"
+        if self.total_lines > self.max_lines:
+            text += f", last {self.max_lines} kept"
+        if self.log_path:
+            text += f" (full log: {self.log_path})"
+        self.status_label.setText(text)
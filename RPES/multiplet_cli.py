@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Command-line entry point for headless work (cluster nodes, scripts).
+One script with the subcommands run, sweep, convert, compare and
+estimate. It never imports Qt, and each subcommand imports only the
+modules it uses when it is called (NumPy only for binary run
+directories), so the start-up is that of the Python interpreter. Every
+subcommand takes many files per invocation.
+"""
+
+import sys
+import os
+
+USAGE = """Usage: python multiplet_cli.py command [options] files...
+
+  run [--dir DIR] [--jobs N] [--max-memory SIZE] input_file...
+        run each input in DIR/<input name> (default: next to the input),
+        N at a time (default 1)
+  sweep [--workers N] [--max-memory SIZE] base_input grid.json sweep_dir
+        parameter sweep, see multiplet_sweep.py
+  convert [--follow] [--dir DIR] rpesalms.dat|run_dir...
+        rpesalms.dat -> rpesalms.edac (into DIR, default: next to the input);
+        run directories with binary output are written as text first
+  compare reference_file input_file...
+        compare inputs with a reference input, see compare_inputs.py
+  estimate [--max-memory SIZE] input_file...
+        state counts, peak memory and run time, see preflight.py
+"""
+
+
+def _options(args, flags=(), values=()):
+    """
+    Split command-line arguments into options and files
+
+    Args:
+        args: Arguments after the subcommand
+        flags: Options without a value, e.g. '--follow'
+        values: Options with a value, e.g. '--dir'
+
+    Returns:
+        (dict option name -> value (True for flags), list of other arguments)
+    """
+    options, files = {}, []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in flags:
+            options[arg[2:]] = True
+        elif arg in values:
+            if not args:
+                raise SystemExit(f"{arg} needs a value")
+            options[arg[2:]] = args.pop(0)
+        elif arg.startswith("--"):
+            raise SystemExit(f"Unknown option {arg}\n\n{USAGE}")
+        else:
+            files.append(arg)
+    return options, files
+
+
+def _max_memory(options):
+    if "max-memory" not in options:
+        return None
+    from preflight import parse_size
+    return parse_size(options["max-memory"])
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def cmd_run(args):
+    """Run inputs, several at a time; returns the number of failed runs"""
+    options, inputs = _options(args, values=("--dir", "--jobs", "--max-memory"))
+    if not inputs:
+        raise SystemExit(USAGE)
+    from concurrent.futures import ThreadPoolExecutor
+    from multiplet_runner import run_multiplet, threads_per_job
+    cache = None
+    if os.environ.get("MULTIPLET_CACHE_DIR"):
+        from result_cache import ResultCache
+        cache = ResultCache()
+    njobs = int(options.get("jobs", 1))
+    max_memory = _max_memory(options)
+
+    def run(path):
+        parent = options.get("dir", os.path.dirname(os.path.abspath(path)))
+        with open(path, 'r') as f:
+            input_text = f.read()
+        return path, run_multiplet(input_text, os.path.join(parent, _stem(path)), cache=cache,
+                                   threads=threads_per_job(njobs) if njobs > 1 else None,
+                                   max_memory=max_memory)
+
+    failed = 0
+    # the engines are child processes, threads only wait for them
+    with ThreadPoolExecutor(max_workers=njobs) as pool:
+        for path, record in pool.map(run, inputs):
+            if record["error"] or record["exit_code"] != 0:
+                failed += 1
+                print(f"{path}: failed ({record['error'] or 'exit code %s' % record['exit_code']})")
+            else:
+                source = " from cache" if record["cached"] else " resumed" if record["resumed"] else ""
+                print(f"{path}: {record['wall_time']:.2f} s{source}, "
+                      f"{len(record['outputs'])} output files in {record['run_dir']}")
+    return failed
+
+
+def cmd_sweep(args):
+    """Parameter sweep; returns the number of failed or rejected runs"""
+    options, files = _options(args, values=("--workers", "--max-memory"))
+    if len(files) != 3:
+        raise SystemExit(USAGE)
+    import json
+    from multiplet_sweep import run_sweep, MANIFEST_NAME
+    with open(files[1], 'r') as f:
+        grid = json.load(f)
+    cache = None
+    if os.environ.get("MULTIPLET_CACHE_DIR"):
+        from result_cache import ResultCache
+        cache = ResultCache()
+    workers = int(options["workers"]) if "workers" in options else None
+    manifest = run_sweep(files[0], grid, files[2], max_workers=workers, cache=cache,
+                         max_memory=_max_memory(options))
+    bad = [job for job in manifest["jobs"] if job["exit_code"] != 0]
+    print(f"{len(manifest['jobs'])} runs in {manifest['wall_time']:.1f} s, {len(bad)} failed or rejected; "
+          f"manifest {os.path.join(files[2], MANIFEST_NAME)}")
+    for job in bad:
+        print(f"  {job['name']}: {job['error'] or 'exit code %s' % job['exit_code']}")
+    return len(bad)
+
+
+def cmd_convert(args):
+    """Convert rpesalms.dat files (or run directories) to rpesalms.edac"""
+    options, paths = _options(args, flags=("--follow",), values=("--dir",))
+    if not paths:
+        raise SystemExit(USAGE)
+    from convert_rpesalms import convert_rpesalms
+    if "dir" in options:
+        os.makedirs(options["dir"], exist_ok=True)
+    failed = 0
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                run_dir = path
+                path = os.path.join(run_dir, "rpesalms.dat")
+                if not os.path.exists(path) and os.path.exists(os.path.join(run_dir, "rpesalms.bin")):
+                    from multiplet_data import bin_to_text
+                    bin_to_text(run_dir)
+            if "dir" in options:
+                # rpesalms.dat of several runs are told apart by their directories
+                name = _stem(path)
+                if name == "rpesalms":
+                    name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+                output_file = os.path.join(options["dir"], name + ".edac")
+            else:
+                output_file = os.path.splitext(path)[0] + ".edac"
+            nblocks = convert_rpesalms(path, output_file, follow=options.get("follow", False))
+            print(f"{path}: {nblocks} blocks written to {output_file}")
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"{path}: {e}")
+    return failed
+
+
+def cmd_compare(args):
+    """Compare inputs with a reference; returns the number of differing inputs"""
+    _, files = _options(args)
+    if len(files) < 2:
+        raise SystemExit(USAGE)
+    from compare_inputs import compare_files
+    reference, different = files[0], 0
+    for path in files[1:]:
+        print(f"== {path}")
+        if compare_files(path, reference):
+            different += 1
+    return different
+
+
+def cmd_estimate(args):
+    """
+    Pre-flight estimates; returns the number of inputs over the memory
+    limit or unreadable
+    """
+    options, inputs = _options(args, values=("--max-memory",))
+    if not inputs:
+        raise SystemExit(USAGE)
+    from multiplet_params import MultipletInput
+    from preflight import check, summary
+    max_memory = _max_memory(options)
+    failed = 0
+    for path in inputs:
+        print(f"== {path}")
+        try:
+            ok, result, message = check(MultipletInput.from_file(path), max_memory)
+        except (OSError, ValueError, IndexError, KeyError) as e:
+            failed += 1
+            print(f"input could not be read: {e}")
+            continue
+        if result is None:
+            # parsed, but the state counting failed (see preflight.check)
+            failed += 1
+            print("input could not be estimated")
+            continue
+        for line in summary(result):
+            print(line)
+        if not ok:
+            failed += 1
+            print(message)
+    return failed
+
+
+COMMANDS = {
+    "run": cmd_run,
+    "sweep": cmd_sweep,
+    "convert": cmd_convert,
+    "compare": cmd_compare,
+    "estimate": cmd_estimate,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(USAGE)
+        sys.exit(1)
+    try:
+        failed = COMMANDS[sys.argv[1]](sys.argv[2:])
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    sys.exit(1 if failed else 0)
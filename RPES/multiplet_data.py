@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+NumPy readers for multiplet output files.
+Text files are parsed in bulk with numpy instead of line by line, binary
+files (MULTIPLET_OUTPUT=binary) are memory-mapped, and the results are
+returned as arrays with one axis per loop of the file layout (see README).
+"""
+
+import sys
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# amplitudes: complex (nomega, ngst, nfst, nlms, 3), q = -1, 0, 1 on the last axis
+RpesAmplitudes = namedtuple("RpesAmplitudes", ["amplitudes", "omega", "gstweight", "ef"])
+
+
+# Fixed-width layout written by printrpesmatele (main.c): Ef lines are
+# "%17.10e\n", amplitude lines are 3 x "   %13.6e %13.6e" plus "\n"
+EF_LINE = 18
+AMP_LINE = 91
+POW10 = np.array([10.0 ** i for i in range(130)])
+
+
+def _parse_e13(f):
+    """
+    Parse '%13.6e' fields, each preceded by one blank
+
+    Args:
+        f: uint8 array (..., 14) holding ' ' + '%13.6e' text
+
+    Returns:
+        float array (...), or None if the fields do not have this layout
+    """
+    if not ((f[..., 3] == ord('.')).all() and (f[..., 10] == ord('e')).all()):
+        return None
+    d = f.astype(np.int16) - ord('0')
+    mant = (d[..., 2] * 1e6 + d[..., 4] * 1e5 + d[..., 5] * 1e4 + d[..., 6] * 1e3
+            + d[..., 7] * 100. + d[..., 8] * 10. + d[..., 9])
+    k = d[..., 12] * 10 + d[..., 13]
+    k = np.where(f[..., 11] == ord('-'), -k, k) - 6
+    # one correctly rounded multiplication or division, as in strtod
+    val = np.where(k >= 0, mant * POW10[np.abs(k)], mant / POW10[np.abs(k)])
+    val[f[..., 1] == ord('-')] *= -1
+    return val
+
+
+def _floats(data):
+    """
+    Whitespace separated numbers of bytes data as a float array; an
+    incomplete last number (file still being written) is dropped
+    """
+    tokens = data.split()
+    try:
+        return np.array(tokens, dtype=float)
+    except ValueError:
+        return np.array(tokens[:-1], dtype=float)
+
+
+def _load_rpesalms_fixed(buf, pos, nomega, ngst, nfst, nlms):
+    """Fast path for the fixed-width layout; returns None if buf does not match it"""
+    fst_bytes = EF_LINE + AMP_LINE * nlms
+    omega, gstweight, ef, blocks = [], None, None, []
+    for _ in range(nomega):
+        line_end = buf.find(b'\n', pos)
+        if line_end < 0:
+            break
+        omega_value = float(buf[pos:line_end])
+        pos = line_end + 1
+        block = np.empty((ngst, nfst, nlms, 3, 2))
+        weights = []
+        for igst in range(ngst):
+            line_end = buf.find(b'\n', pos)
+            if line_end < 0 or line_end + 1 + nfst * fst_bytes > len(buf):
+                block = None
+                break
+            weights.append(float(buf[pos:line_end]))
+            pos = line_end + 1
+            region = np.frombuffer(buf, np.uint8, nfst * fst_bytes, pos).reshape(nfst, fst_bytes)
+            pos += nfst * fst_bytes
+            if (region[:, EF_LINE - 1] != ord('\n')).any() or (region[:, -1] != ord('\n')).any():
+                return None
+            fields = region[:, EF_LINE:].reshape(nfst, nlms, AMP_LINE)[:, :, :90]
+            values = _parse_e13(fields.reshape(nfst, nlms, 3, 30)[..., 2:].reshape(nfst, nlms, 3, 2, 14))
+            if values is None:
+                return None
+            block[igst] = values
+            if ef is None:
+                ef = _floats(region[:, :EF_LINE].tobytes())
+        if block is None:
+            break
+        omega.append(omega_value)
+        gstweight = np.array(weights)
+        blocks.append(block)
+
+    if not blocks:
+        return None
+    reim = np.array(blocks)
+    return RpesAmplitudes(reim[..., 0] + 1j * reim[..., 1], np.array(omega), gstweight, ef)
+
+
+def load_rpesalms(input_file):
+    """
+    Load rpesalms.dat into a complex amplitude array
+
+    The header line 'nomega ngst nfst nlms' fixes the size of every omega
+    block, so the numeric blocks are parsed in bulk and reshaped instead of
+    being matched line by line. Files in the fixed-width layout written by
+    the engine are decoded directly from the bytes; anything else is parsed
+    with numpy's text parser. A file that is still being written by the
+    engine is read up to its last complete omega block.
+
+    Args:
+        input_file: Path to rpesalms.dat
+
+    Returns:
+        RpesAmplitudes with
+            amplitudes: complex array (nomega, ngst, nfst, nlms, 3)
+            omega: photon energies (nomega,)
+            gstweight: ground state weights (ngst,)
+            ef: final state energies E_G - E_f (nfst,)
+    """
+    with open(input_file, 'rb') as f:
+        buf = f.read()
+    header_end = buf.index(b'\n') + 1
+    nomega, ngst, nfst, nlms = (int(v) for v in buf[:header_end].split()[:4])
+
+    fixed = _load_rpesalms_fixed(buf, header_end, nomega, ngst, nfst, nlms)
+    if fixed is not None:
+        return fixed
+
+    values = _floats(buf[header_end:])
+    fst_size = 1 + 6 * nlms
+    gst_size = 1 + nfst * fst_size
+    omega_size = 1 + ngst * gst_size
+    ncomplete = min(nomega, values.size // omega_size)
+    blocks = values[:ncomplete * omega_size].reshape(ncomplete, omega_size)
+
+    omega = blocks[:, 0].copy()
+    gst_blocks = blocks[:, 1:].reshape(ncomplete, ngst, gst_size)
+    fst_blocks = gst_blocks[:, :, 1:].reshape(ncomplete, ngst, nfst, fst_size)
+    reim = fst_blocks[:, :, :, 1:].reshape(ncomplete, ngst, nfst, nlms, 3, 2)
+    amplitudes = reim[..., 0] + 1j * reim[..., 1]
+
+    if ncomplete > 0:
+        gstweight = gst_blocks[0, :, 0].copy()
+        ef = fst_blocks[0, 0, :, 0].copy()
+    else:
+        gstweight = np.full(ngst, 1. / ngst)
+        ef = np.zeros(nfst)
+    return RpesAmplitudes(amplitudes, omega, gstweight, ef)
+
+
+# Binary output of the engine (MULTIPLET_OUTPUT=binary or both, see src/binout.c)
+BIN_MAGIC = b"MPLTBIN1"
+BIN_DTYPES = {1: np.dtype('<f8'), 2: np.dtype('<c16')}
+BIN_NAMES = ["omega", "ef", "gstweight", "rpesalms", "xmat", "rp", "rpc", "peslm"]
+
+
+def read_bin_header(path):
+    """
+    Read the header of a binary output file
+
+    Returns:
+        (dtype, shape, offset) where offset is the position of the data.
+        The first dimension of shape is reduced to the number of complete
+        records actually present in the file.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(16)
+        if len(head) < 16 or head[:8] != BIN_MAGIC:
+            raise ValueError(f"{path} is not a multiplet binary file")
+        dtype_code, ndim = np.frombuffer(head[8:16], dtype='<i4')
+        dims = [int(d) for d in np.frombuffer(f.read(8 * ndim), dtype='<i8')]
+    dtype = BIN_DTYPES[int(dtype_code)]
+    offset = 16 + 8 * int(ndim)
+    if dims:
+        record = dtype.itemsize * int(np.prod(dims[1:], dtype=np.int64))
+        available = (os.path.getsize(path) - offset) // record if record else dims[0]
+        dims[0] = min(dims[0], available)
+    return dtype, tuple(dims), offset
+
+
+def read_bin(path, mmap=True):
+    """
+    Open a binary output file as a NumPy array
+
+    Args:
+        path: Path to a .bin file written by the engine
+        mmap: Return a read-only numpy.memmap, so slices (one omega, one
+            final state) are read from disk on access only. With
+            mmap=False the whole array is read into memory.
+    """
+    dtype, shape, offset = read_bin_header(path)
+    if mmap:
+        if 0 in shape:
+            return np.zeros(shape, dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        count = int(np.prod(shape, dtype=np.int64))
+        return np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+
+def write_bin(path, array):
+    """Write an array in the engine's binary format"""
+    array = np.asarray(array)
+    code = 2 if np.iscomplexobj(array) else 1
+    array = np.ascontiguousarray(array, dtype=BIN_DTYPES[code])
+    with open(path, 'wb') as f:
+        f.write(BIN_MAGIC)
+        f.write(np.array([code, array.ndim], dtype='<i4').tobytes())
+        f.write(np.array(array.shape, dtype='<i8').tobytes())
+        array.tofile(f)
+
+
+def load_run_bin(run_dir, mmap=True):
+    """
+    Open all binary outputs of a run directory
+
+    Returns:
+        dict with the arrays that exist: omega (nomega,), ef (nfst,),
+        gstweight (ngst,), rpesalms (nomega, ngst, nfst, nlms, 3) complex,
+        xmat (nomega, norb, norb, 3) complex, rp (nomega, nfst),
+        rpc (nomega, nfst, 3) and peslm (nfst, 3, nlms)
+    """
+    arrays = {}
+    for name in BIN_NAMES:
+        path = os.path.join(run_dir, name + ".bin")
+        if os.path.exists(path):
+            arrays[name] = read_bin(path, mmap)
+    return arrays
+
+
+def _write_rows(f, fmt, rows):
+    f.write("".join(fmt % tuple(row) for row in rows))
+
+
+def bin_to_text(run_dir, output_dir=None):
+    """
+    Write the text .dat files from the binary output of a run
+
+    Produces rpesalms.dat, xmat.dat, rp.dat, rpc.dat and peslm.dat in the
+    same format as the engine's text output mode.
+
+    Args:
+        run_dir: Directory with the .bin files
+        output_dir: Where to write the .dat files (default: run_dir)
+
+    Returns:
+        List of written file paths
+    """
+    if output_dir is None:
+        output_dir = run_dir
+    data = load_run_bin(run_dir)
+    omega, ef, gstweight = data["omega"], data["ef"], data["gstweight"]
+    written = []
+
+    def out(name):
+        path = os.path.join(output_dir, name)
+        written.append(path)
+        return open(path, 'w')
+
+    if "rpesalms" in data:
+        amp = data["rpesalms"]
+        nomega, ngst, nfst, nlms, _ = amp.shape
+        with out("rpesalms.dat") as f:
+            f.write(f"{nomega} {ngst} {nfst} {nlms}\n")
+            for io in range(nomega):
+                f.write("%17.10e\n" % omega[io])
+                for ig in range(ngst):
+                    f.write("%f\n" % gstweight[ig])
+                    reim = np.stack([amp[io, ig].real, amp[io, ig].imag], axis=-1)
+                    for j in range(nfst):
+                        f.write("%17.10e\n" % ef[j])
+                        _write_rows(f, "   %13.6e %13.6e" * 3 + "\n", reim[j].reshape(nlms, 6))
+
+    if "xmat" in data:
+        xmat = data["xmat"]
+        nomega, norb = xmat.shape[:2]
+        with out("xmat.dat") as f:
+            f.write(f"{nomega} {norb} x {norb}\n")
+            for io in range(nomega):
+                f.write("%17.10e\n" % omega[io])
+                reim = np.stack([xmat[io].real, xmat[io].imag], axis=-1)
+                _write_rows(f, " %13.6e %13.6e" * 3 + "\n", reim.reshape(norb * norb, 6))
+                f.write("\n")
+
+    for name, fmt in (("rp", "%15.8e\n"), ("rpc", "%15.8e %15.8e %15.8e\n")):
+        if name not in data:
+            continue
+        values = data[name]
+        with out(name + ".dat") as f:
+            f.write(f"{len(ef)}\n")
+            _write_rows(f, "%11.6f\n", ef[:, None])
+            f.write(f"{values.shape[0]}\n")
+            for io in range(values.shape[0]):
+                f.write("\n%15.8e\n\n" % omega[io])
+                _write_rows(f, fmt, values[io].reshape(len(ef), -1))
+
+    if "peslm" in data:
+        peslm = data["peslm"]
+        nfst, _, nlms = peslm.shape
+        with out("peslm.dat") as f:
+            for ist in range(nfst):
+                for iq in range(3):
+                    for iso in range(nlms):
+                        f.write("%11.6f %16.10f %2dq %2dn\n" % (-ef[ist], peslm[ist, iq, iso], iq - 1, iso))
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python multiplet_data.py rpesalms.dat")
+        print("       python multiplet_data.py --to-text run_dir [output_dir]")
+        sys.exit(1)
+
+    if sys.argv[1] == "--to-text":
+        for path in bin_to_text(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None):
+            print(f"Wrote {path}")
+        sys.exit(0)
+
+    if sys.argv[1].endswith(".bin"):
+        array = read_bin(sys.argv[1])
+        print(f"{sys.argv[1]}: {array.dtype} {array.shape}")
+        sys.exit(0)
+
+    data = load_rpesalms(sys.argv[1])
+    nomega, ngst, nfst, nlms, _ = data.amplitudes.shape
+    print(f"nomega = {nomega}, ngst = {ngst}, nfst = {nfst}, nlms = {nlms}")
+    if nomega:
+        print(f"omega = {data.omega[0]} .. {data.omega[-1]}, Ef = {data.ef.min()} .. {data.ef.max()}")
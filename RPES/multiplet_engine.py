@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+In-process binding to the multiplet engine.
+The C sources built as a shared library (python cross_platform_compile.py
+library) are called through ctypes: the parameters go in as a
+MultipletInput (or input text), nothing is written to disk and the
+energies and matrix elements come back as NumPy arrays. Compared with
+run_multiplet this saves the process start-up, the rebuild of the w3j
+table and the text output round trips, which dominate fitting loops that
+call the engine many times.
+"""
+
+import sys
+import os
+import time
+import ctypes
+import platform
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from multiplet_params import MultipletInput
+from multiplet_runner import VERBOSITY_LEVELS
+
+# struct Results in src/globals.h
+_COUNTS = ["nground", "nfinal", "nintermediate", "gstdeg", "npesorb", "nomega"]
+_ARRAYS = ["groundenergy", "nm1fenergy", "menergy", "gamst", "omega",
+           "pesmatele", "xasmatele", "rpesalms"]
+
+
+class _Results(ctypes.Structure):
+    _fields_ = ([(name, ctypes.c_int) for name in _COUNTS]
+                + [("gstenergy", ctypes.c_double)]
+                + [(name, ctypes.POINTER(ctypes.c_double)) for name in _ARRAYS])
+
+
+# The field names of rpes_model.RpesModel keep their meaning, so results can
+# be passed to rpes_model.xas_spectrum, rp_spectrum and rpc_spectrum:
+#   groundenergy (nground,), nm1fenergy (nfst,), menergy (nm,), gamst (nm,)
+#   pesmatele (3, nlms, ngst, nfst), xasmatele (3, ngst, nm), omega (nomega,)
+#   rpesalms (nomega, ngst, nfst, nlms, 3) complex, the layout of rpesalms.bin
+#   pes (nfst, 2): E_f - E_G and intensity, as pes.dat
+#   xas (nm, 5): E_M - E_G, total and q = -1, 0, 1 intensities, as xaq.dat
+EngineResult = namedtuple("EngineResult", [
+    "gstenergy", "gstweight", "groundenergy", "nm1fenergy", "menergy", "gamst",
+    "pesmatele", "xasmatele", "omega", "rpesalms", "pes", "xas"])
+
+# the engine keeps global state: one run at a time per process
+_lock = threading.Lock()
+_libraries = {}
+
+
+def default_library_path():
+    """Path of the shared library ($MULTIPLET_LIBRARY or next to this script)"""
+    if os.environ.get("MULTIPLET_LIBRARY"):
+        return os.environ["MULTIPLET_LIBRARY"]
+    if platform.system() == "Windows":
+        name = "libmultiplet.dll"
+    elif platform.system() == "Darwin":
+        name = "libmultiplet.dylib"
+    else:
+        name = "libmultiplet.so"
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+
+
+def load_library(path=None):
+    """
+    Load the engine library (once per path)
+
+    Raises:
+        OSError if the library cannot be loaded
+    """
+    path = os.path.abspath(path or default_library_path())
+    if path not in _libraries:
+        if not os.path.exists(path):
+            raise OSError(f"{path} not found, build it with 'python cross_platform_compile.py library'")
+        lib = ctypes.CDLL(path)
+        lib.multiplet_run.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.c_int,
+                                      ctypes.POINTER(_Results)]
+        lib.multiplet_run.restype = ctypes.c_int
+        lib.multiplet_free.argtypes = [ctypes.POINTER(_Results)]
+        lib.multiplet_free.restype = None
+        _libraries[path] = lib
+    return _libraries[path]
+
+
+def _array(pointer, shape):
+    return np.ctypeslib.as_array(pointer, shape=(int(np.prod(shape)),)).reshape(shape).copy()
+
+
+def _sticks(gstenergy, gstdeg, nm1fenergy, menergy, pesmatele, xasmatele):
+    """PES and XAS stick spectra, as pes.dat and xaq.dat ( without their 1e-10 cutoff )"""
+    pes = np.column_stack([nm1fenergy - gstenergy,
+                           (pesmatele**2).sum(axis=(0, 1, 2)) / gstdeg])
+    xasq = (xasmatele**2).sum(axis=1).T / gstdeg
+    xas = np.column_stack([menergy - gstenergy, xasq.sum(axis=1), xasq])
+    return pes, xas
+
+
+def run_engine(params, verbosity="quiet", threads=None, library=None):
+    """
+    Run one calculation in this process
+
+    Args:
+        params: MultipletInput or the text of an input file
+        verbosity: Engine output on stdout, 'quiet', 'summary' or 'full'
+            (or 0, 1, 2); None keeps $MULTIPLET_VERBOSITY
+        threads: Engine threads (see multiplet_runner.engine_environment);
+            None keeps $MULTIPLET_THREADS
+        library: Path of the shared library (default: default_library_path)
+
+    Returns:
+        EngineResult
+
+    Raises:
+        ValueError if the input is incomplete, RuntimeError if the engine
+        stops with an error (its message is on stdout)
+    """
+    if not isinstance(params, MultipletInput):
+        params = MultipletInput(params)
+    if isinstance(verbosity, str):
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Unknown verbosity '{verbosity}', use one of {VERBOSITY_LEVELS}")
+        verbosity = VERBOSITY_LEVELS.index(verbosity)
+    lib = load_library(library)
+    # the engine reads a plain stream of numbers, comments are stripped
+    text = " ".join(params.tokens) + "\n"
+
+    res = _Results()
+    with _lock:
+        status = lib.multiplet_run(text.encode(), -1 if verbosity is None else int(verbosity),
+                                   -1 if threads is None else int(threads), ctypes.byref(res))
+        if status != 0:
+            raise RuntimeError(f"multiplet engine stopped with status {status}")
+        try:
+            nfst, nm, ngst = res.nfinal, res.nintermediate, res.gstdeg
+            nlms, nomega = res.npesorb, res.nomega
+            gstenergy = res.gstenergy
+            groundenergy = _array(res.groundenergy, (res.nground,))
+            nm1fenergy = _array(res.nm1fenergy, (nfst,))
+            menergy = _array(res.menergy, (nm,))
+            gamst = _array(res.gamst, (nm,))
+            omega = _array(res.omega, (nomega,))
+            pesmatele = _array(res.pesmatele, (3, nlms, ngst, nfst))
+            xasmatele = _array(res.xasmatele, (3, ngst, nm))
+            rpesalms = _array(res.rpesalms, (nomega, ngst, nfst, nlms, 3, 2)).view(complex)[..., 0]
+        finally:
+            lib.multiplet_free(ctypes.byref(res))
+
+    pes, xas = _sticks(gstenergy, ngst, nm1fenergy, menergy, pesmatele, xasmatele)
+    return EngineResult(gstenergy=gstenergy, gstweight=np.full(ngst, 1. / ngst),
+                        groundenergy=groundenergy, nm1fenergy=nm1fenergy, menergy=menergy,
+                        gamst=gamst, pesmatele=pesmatele, xasmatele=xasmatele, omega=omega,
+                        rpesalms=rpesalms, pes=pes, xas=xas)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python multiplet_engine.py input_file [repeat]")
+        print("Runs the input in this process through the shared library")
+        print("(python cross_platform_compile.py library) and prints a summary.")
+        sys.exit(1)
+
+    params = MultipletInput.from_file(sys.argv[1])
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = run_engine(params)
+        print(f"run {i + 1}: {time.perf_counter() - start:.3f} s")
+    print(f"gstenergy = {result.gstenergy:.6f}, {len(result.gstweight)} degenerate ground states")
+    print(f"states: {len(result.nm1fenergy)} final, {len(result.menergy)} intermediate, "
+          f"{result.pesmatele.shape[1]} photoelectron orbitals, {len(result.omega)} omega points")
+    print(f"rpesalms {result.rpesalms.shape}, strongest PES line at "
+          f"{result.pes[result.pes[:, 1].argmax(), 0]:.4f}")
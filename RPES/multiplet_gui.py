@@ -12,11 +12,19 @@ import subprocess
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit,
                              QFileDialog, QFormLayout, QGroupBox, QGridLayout, QMessageBox,
-                             QSpinBox, QDoubleSpinBox, QScrollArea)
-from PyQt6.QtCore import Qt, QProcess
+                             QSpinBox, QDoubleSpinBox, QScrollArea, QCheckBox, QComboBox,
+                             QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import Qt, QProcess, QProcessEnvironment
 
 # Import the converter module
 from convert_rpesalms import convert_rpesalms
+from result_cache import ResultCache
+from multiplet_runner import (LOG_NAME, VERBOSITY_LEVELS, result_settings, output_files,
+                              checkpoint_setting)
+from log_console import LogConsole
+from engine_progress import ProgressTracker
+from preflight import check as preflight_check
+from job_queue import JobQueue
 
 class MultipletGUI(QMainWindow):
     def __init__(self):
@@ -35,10 +43,12 @@ class MultipletGUI(QMainWindow):
         self.input_tab = QWidget()
         self.run_tab = QWidget()
         self.convert_tab = QWidget()
+        self.job_queue = JobQueue()
         
         # Add tabs to widget
         self.tabs.addTab(self.input_tab, "Create Input")
         self.tabs.addTab(self.run_tab, "Run Multiplet")
+        self.tabs.addTab(self.job_queue, "Job Queue")
         self.tabs.addTab(self.convert_tab, "Convert Output")
         
         # Set up each tab
@@ -428,16 +438,57 @@ class MultipletGUI(QMainWindow):
         output_group.setLayout(output_layout)
         layout.addWidget(output_group)
         
-        # Run button
+        # Result cache
+        self.use_cache = QCheckBox("Reuse cached results for identical inputs")
+        self.use_cache.setChecked(True)
+        layout.addWidget(self.use_cache)
+        self.cache_key = None
+        
+        # Amount of diagnostic output printed by the engine
+        verbosity_layout = QHBoxLayout()
+        verbosity_layout.addWidget(QLabel("Engine output:"))
+        self.verbosity_combo = QComboBox()
+        self.verbosity_combo.addItems(["Quiet (errors only)", "Summary", "Full (all dumps)"])
+        self.verbosity_combo.setCurrentIndex(2)
+        verbosity_layout.addWidget(self.verbosity_combo)
+        verbosity_layout.addStretch()
+        layout.addLayout(verbosity_layout)
+        
+        # Run button, or hand the run to the job queue
+        run_layout = QHBoxLayout()
         self.run_button = QPushButton("Run Multiplet")
         self.run_button.clicked.connect(self.run_multiplet)
-        layout.addWidget(self.run_button)
+        run_layout.addWidget(self.run_button)
+        queue_button = QPushButton("Add to Job Queue")
+        queue_button.clicked.connect(self.add_to_queue)
+        run_layout.addWidget(queue_button)
+        layout.addLayout(run_layout)
+        
+        # Progress: omega loop with ETA, peak memory and the phase timeline
+        progress_group = QGroupBox("Progress")
+        progress_layout = QVBoxLayout()
+        self.progress = ProgressTracker()
+        self.omega_progress = QProgressBar()
+        self.omega_progress.setFormat("omega %v / %m")
+        self.omega_progress.setValue(0)
+        progress_layout.addWidget(self.omega_progress)
+        self.progress_label = QLabel("Not running")
+        progress_layout.addWidget(self.progress_label)
+        self.timeline_table = QTableWidget(0, 6)
+        self.timeline_table.setHorizontalHeaderLabels(["Phase", "Block", "Size", "Calls",
+                                                       "Time (s)", "Share"])
+        self.timeline_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.timeline_table.verticalHeader().setVisible(False)
+        self.timeline_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.timeline_table.setMaximumHeight(180)
+        progress_layout.addWidget(self.timeline_table)
+        progress_group.setLayout(progress_layout)
+        layout.addWidget(progress_group)
         
         # Console output
         console_group = QGroupBox("Console Output")
         console_layout = QVBoxLayout()
-        self.console_output = QTextEdit()
-        self.console_output.setReadOnly(True)
+        self.console_output = LogConsole()
         console_layout.addWidget(self.console_output)
         console_group.setLayout(console_layout)
         layout.addWidget(console_group)
@@ -620,8 +671,17 @@ class MultipletGUI(QMainWindow):
         # Make sure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         
-        # Clear console output
+        # An interrupted checkpointed run in the output directory is continued
+        checkpoint, resume = checkpoint_setting(output_dir)
+        
+        # Clear console output and log the full output in the output directory
         self.console_output.clear()
+        self.progress.reset()
+        self.update_progress()
+        try:
+            self.console_output.open_log(os.path.join(output_dir, LOG_NAME), append=resume)
+        except OSError as e:
+            self.console_output.message(f"Could not open log file: {e}")
         
         # Disable run button during execution
         self.run_button.setEnabled(False)
@@ -630,37 +690,128 @@ class MultipletGUI(QMainWindow):
         script_dir = os.path.dirname(os.path.abspath(__file__))
         multiplet_path = os.path.join(script_dir, "multiplet")
         
-        # Change to output directory
-        os.chdir(output_dir)
+        with open(input_file, 'r') as f:
+            input_content = f.read()
+        
+        # Take the results from the cache if this input was run before
+        self.cache_key = None
+        self.cache_output_dir = output_dir
+        if self.use_cache.isChecked():
+            try:
+                self.cache = ResultCache()
+                self.cache_key = self.cache.key(input_content, multiplet_path,
+                                                result_settings(os.environ))
+                if self.cache.fetch(self.cache_key, output_dir) is not None:
+                    self.console_output.message("Identical input found in the result cache "
+                                                f"({self.cache.cache_dir}).\n"
+                                                f"Cached results copied to {output_dir}")
+                    self.console_output.close_log()
+                    self.cache_key = None
+                    self.run_button.setEnabled(True)
+                    return
+            except OSError as e:
+                self.console_output.message(f"Result cache not available: {e}")
+                self.cache_key = None
+        
+        # Runs that would not fit into memory are refused unless confirmed (see preflight.py)
+        ok, estimate, message = preflight_check(input_content)
+        if not ok:
+            answer = QMessageBox.question(self, "Memory",
+                                          f"The run will probably fail: {message}.\n"
+                                          "Run anyway?",
+                                          defaultButton=QMessageBox.StandardButton.No)
+            if answer != QMessageBox.StandardButton.Yes:
+                self.console_output.message(f"Run not started: {message}")
+                self.console_output.close_log()
+                self.cache_key = None
+                self.run_button.setEnabled(True)
+                return
+        # long runs checkpoint their omega loop
+        checkpoint, resume = checkpoint_setting(output_dir, estimate)
+        
+        # Run in the output directory without changing our own working directory
+        self.process.setWorkingDirectory(output_dir)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("MULTIPLET_VERBOSITY", VERBOSITY_LEVELS[self.verbosity_combo.currentIndex()])
+        env.insert("MULTIPLET_PROGRESS", "1")
+        env.insert("MULTIPLET_CHECKPOINT", "1" if checkpoint else "0")
+        self.process.setProcessEnvironment(env)
+        if resume:
+            self.console_output.message(f"Resuming the interrupted run in {output_dir}")
         
         # Start the process
         self.process.start(multiplet_path, [])
         
         # Send input file content to process stdin
-        with open(input_file, 'r') as f:
-            input_content = f.read()
-        
         self.process.write(input_content.encode())
         self.process.closeWriteChannel()
     
+    def add_to_queue(self):
+        """Queue the selected input and output directory in the Job Queue tab"""
+        input_file = self.input_file_path.text()
+        output_dir = self.output_dir_path.text()
+        if not input_file or not output_dir:
+            QMessageBox.warning(self, "Error", "Please select an input file and an output directory")
+            return
+        if self.job_queue.add_job(input_file, output_dir):
+            self.tabs.setCurrentWidget(self.job_queue)
+    
     def handle_stdout(self):
         """Handle standard output from the process"""
-        data = self.process.readAllStandardOutput().data().decode()
-        self.console_output.append(data)
+        data = self.process.readAllStandardOutput().data().decode(errors='replace')
+        self.console_output.write(data)
     
     def handle_stderr(self):
-        """Handle standard error from the process"""
-        data = self.process.readAllStandardError().data().decode()
-        self.console_output.append(data)
+        """Handle standard error from the process; progress records update the Progress box"""
+        data = self.process.readAllStandardError().data().decode(errors='replace')
+        self.console_output.log(data)
+        self.console_output.write(self.progress.feed(data), log=False)
+        self.update_progress()
+    
+    def update_progress(self):
+        """Show the state of self.progress"""
+        tracker = self.progress
+        self.omega_progress.setMaximum(max(tracker.nomega, 1))
+        self.omega_progress.setValue(tracker.omega_done)
+        self.progress_label.setText(tracker.status() if tracker.elapsed or tracker.done
+                                    else "Not running")
+        rows = tracker.timeline()
+        total = max(tracker.elapsed, 1e-9)
+        self.timeline_table.setRowCount(len(rows))
+        for i, (phase, block, n, calls, time) in enumerate(rows):
+            values = [phase, block, str(n), str(calls), f"{time:.3f}", f"{100 * time / total:.1f}%"]
+            for j, value in enumerate(values):
+                self.timeline_table.setItem(i, j, QTableWidgetItem(value))
     
     def process_finished(self, exit_code, exit_status):
         """Handle process completion"""
         self.run_button.setEnabled(True)
+        self.update_progress()
         
         if exit_code == 0:
-            self.console_output.append("\nMultiplet calculation completed successfully!")
+            self.console_output.message("\nMultiplet calculation completed successfully!")
+            if self.cache_key is not None:
+                try:
+                    self.cache.store(self.cache_key, self.cache_output_dir,
+                                     output_files(os.environ))
+                except OSError as e:
+                    self.console_output.message(f"Could not store results in cache: {e}")
+            self.cache_key = None
         else:
-            self.console_output.append(f"\nMultiplet calculation failed with exit code {exit_code}")
+            self.console_output.message(f"\nMultiplet calculation failed with exit code {exit_code}")
+        self.console_output.close_log()
+    
+    def closeEvent(self, event):
+        """Ask before closing while queued jobs are running; they are cancelled"""
+        if self.job_queue.running():
+            answer = QMessageBox.question(self, "Quit",
+                                          f"{len(self.job_queue.running())} queued jobs are running. "
+                                          "Cancel them and quit?")
+            if answer != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+        self.job_queue.cancel_all()
+        event.accept()
     
     def browse_convert_input(self):
         """Browse for rpesalms.dat file to convert"""
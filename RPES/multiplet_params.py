@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Positional view of a multiplet input file.
+The multiplet executable reads its input as one whitespace separated
+stream of numbers (scanf), so the meaning of a token depends only on its
+position. This module walks the stream in the same order as main.c,
+reading.c, makeham.c and interact2list.c and gives names to the tokens,
+so that single parameters can be read or replaced without disturbing the
+rest of the file.
+"""
+
+import sys
+import itertools
+
+from compare_inputs import strip_comments
+
+# Parameters at fixed positions: name -> index of the first token
+HEADER_PARAMETERS = {
+    "e2p": 0,
+    "e3d": 1,
+    "cf": 2,            # 5x5 crystal field matrix, 25 tokens
+    "hmag": 27,
+    "theta": 28,
+    "omega_start": 29,
+    "omega_stop": 30,
+    "delta_omega": 31,
+    "gamma": 32,
+}
+
+BLOCKS = ("ground", "final", "intermediate")
+
+
+def noverk(n, k):
+    """Binomial coefficient (n over k), 0 outside the valid range (as in combinations.c)"""
+    if n < 0 or k < 0 or k > n:
+        return 0
+    res = 1
+    for j in range(1, k + 1):
+        res = res * (n - j + 1) // j
+    return res
+
+
+def isaconf(lsh, occ):
+    """True if every shell occupation is between 0 and 4l+2"""
+    return all(0 <= o <= 4 * l + 2 for l, o in zip(lsh, occ))
+
+
+def ci_items(lsh, occs):
+    """
+    List the Coulomb/CI integrals Rk(ish4,ish3;ish1,ish2) that calcham asks for
+
+    Mirrors the loops in calcham and cilistitemadd: every distinct shell
+    quadruple is read once, in order of first appearance, with
+    nk = min(l4+l1, l2+l3) + 1 values.
+
+    Args:
+        lsh: l-values of all shells
+        occs: occupation numbers of the configurations of one block
+
+    Returns:
+        List of (ish1, ish2, ish3, ish4, nk) tuples in reading order
+    """
+    nshells = len(lsh)
+    confset = set(tuple(occ) for occ in occs)
+    items = []
+    seen = set()
+    for occ in occs:
+        d = list(occ)
+        for i1 in range(nshells):
+            d[i1] -= 1
+            if isaconf(lsh, d):
+                for i2 in range(nshells):
+                    d[i2] -= 1
+                    if isaconf(lsh, d):
+                        for i3 in range(nshells):
+                            d[i3] += 1
+                            if isaconf(lsh, d):
+                                for i4 in range(nshells):
+                                    d[i4] += 1
+                                    key = (i1, i2, i3, i4)
+                                    if (isaconf(lsh, d) and tuple(d) in confset
+                                            and key not in seen):
+                                        seen.add(key)
+                                        nk = min(lsh[i4] + lsh[i1], lsh[i2] + lsh[i3]) + 1
+                                        items.append(key + (nk,))
+                                    d[i4] -= 1
+                            d[i3] -= 1
+                    d[i2] += 1
+            d[i1] += 1
+    return items
+
+
+def count_states(lsh, occs):
+    """
+    Number of Slater determinants of a list of configurations
+
+    This is the nstates that readconfs/makestates build for one block, and
+    the dimension of the Hamiltonian diagonalised for it.
+    """
+    total = 0
+    for occ in occs:
+        n = 1
+        for l, o in zip(lsh, occ):
+            n *= noverk(4 * l + 2, o)
+        total += n
+    return total
+
+
+def format_value(value):
+    """Format a number the way it should appear in an input file"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return f"{float(value):.12g}"
+
+
+class MultipletInput:
+    """
+    Named access to the token stream of a multiplet input file
+
+    Attributes set by parsing:
+        nshells, lsh: number of shells and their l-values
+        ngam: number of (egam, gam) pairs after the omega line
+        blocks: dict with 'ground', 'final' and 'intermediate' entries, each
+            a dict with 'occ' (list of occupation lists), 'rk' (list of
+            (ish1, ish2, ish3, ish4, nk, start) tuples) and 'start'/'stop'
+            token positions of the block
+        auger: list of (ish3, nk, start) tuples for the Auger integrals
+    """
+
+    def __init__(self, text):
+        self.lines = text.splitlines()
+        # (line number, column) of every token, and the token strings
+        self.positions = []
+        self.tokens = []
+        for iline, line in enumerate(self.lines):
+            for icol, token in enumerate(strip_comments(line).split()):
+                self.positions.append((iline, icol))
+                self.tokens.append(token)
+        self.base_tokens = list(self.tokens)
+        self._modified_lines = set()
+        self._parse()
+
+    @classmethod
+    def from_file(cls, path):
+        """Parse an input file from disk"""
+        with open(path, 'r') as f:
+            return cls(f.read())
+
+    def copy(self):
+        """Return an independent copy including any modifications"""
+        return MultipletInput(self.text())
+
+    def _take(self, count):
+        start = self._pos
+        if start + count > len(self.tokens):
+            raise ValueError(f"Input ends after {len(self.tokens)} values, "
+                             f"expected at least {start + count}")
+        self._pos += count
+        return start
+
+    def _ints(self, start, count):
+        return [int(float(t)) for t in self.tokens[start:start + count]]
+
+    def _parse(self):
+        self._pos = 0
+        self._take(33)  # e2p e3d, cf[25], hmag theta, ommin ommax deltaom gamma0
+        self.ngam = self._ints(self._take(1), 1)[0]
+        self.egam_start = self._take(2 * self.ngam)
+
+        self.nshells = self._ints(self._take(1), 1)[0]
+        self.lsh = self._ints(self._take(self.nshells), self.nshells)
+        self.ksi_start = self._take(self.nshells)
+        if self.nshells <= 3:
+            raise ValueError("multiplet needs more than 3 shells (radip trouble)")
+        self.radip_start = self._take(3)
+
+        self.blocks = {}
+        for name in BLOCKS:
+            block = {"start": self._pos}
+            nconfs = self._ints(self._take(1), 1)[0]
+            occ = []
+            for _ in range(nconfs):
+                occ.append(self._ints(self._take(self.nshells), self.nshells))
+            block["occ"] = occ
+            block["rk"] = [item + (self._take(item[-1]),)
+                           for item in ci_items(self.lsh, occ)]
+            block["stop"] = self._pos
+            self.blocks[name] = block
+
+        self.auger = []
+        l0, l1 = self.lsh[0], self.lsh[1]
+        for ish3 in range(2, self.nshells):
+            nk = min(l0 + l1, l1 + self.lsh[ish3]) + 1
+            self.auger.append((ish3, nk, self._take(nk)))
+        self.ntokens = self._pos
+        del self._pos
+
+    def state_counts(self):
+        """Number of basis states of the ground, final (N-1) and intermediate blocks"""
+        return {name: count_states(self.lsh, self.blocks[name]["occ"]) for name in BLOCKS}
+
+    def with_configurations(self, integrals=None, **occs):
+        """
+        Return a new input with other configurations in some blocks
+
+        The Rk values required by the new configurations are taken from
+        integrals, then from the same shell quadruple in the same block of
+        this input, then from any block, and are 0 if none has them.
+
+        Args:
+            integrals: Optional dict (ish1, ish2, ish3, ish4) -> list of Rk
+                values, e.g. the CI integrals that couple the configurations
+            ground, final, intermediate: Lists of occupation lists; blocks
+                that are not given are kept
+
+        Returns:
+            MultipletInput
+        """
+        known = {}
+        for key, values in (integrals or {}).items():
+            for name in BLOCKS:
+                known[(name,) + tuple(key)] = [str(v) for v in values]
+        for name in BLOCKS:
+            for *key, nk, start in self.blocks[name]["rk"]:
+                values = self.tokens[start:start + nk]
+                known.setdefault((name,) + tuple(key), values)
+                known.setdefault(tuple(key), values)
+
+        new_lines = []
+        for name in BLOCKS:
+            block_occs = occs.get(name, self.blocks[name]["occ"])
+            new_lines.append(str(len(block_occs)))
+            for occ in block_occs:
+                if len(occ) != self.nshells:
+                    raise ValueError(f"{name}: occupation {occ} needs {self.nshells} shells")
+                new_lines.append(" ".join(str(o) for o in occ))
+            for *key, nk in ci_items(self.lsh, block_occs):
+                values = known.get((name,) + tuple(key), known.get(tuple(key), []))
+                values = (list(values) + ["0"] * nk)[:nk]
+                new_lines.append(" ".join(values))
+
+        first = self.positions[self.blocks[BLOCKS[0]]["start"]][0]
+        last = self.positions[self.blocks[BLOCKS[-1]]["stop"] - 1][0]
+        text = self.text().splitlines()
+        return MultipletInput("\n".join(text[:first] + new_lines + text[last + 1:]) + "\n")
+
+    def _address(self, name):
+        """Return (start, count) of a named parameter"""
+        if name in HEADER_PARAMETERS:
+            return HEADER_PARAMETERS[name], (25 if name == "cf" else 1)
+        if name == "ksi":
+            return self.ksi_start, self.nshells
+        if name == "radip":
+            return self.radip_start, 3
+        raise KeyError(f"Unknown parameter '{name}'")
+
+    def _rk_slices(self, blocks=BLOCKS):
+        for name in blocks:
+            for *_, nk, start in self.blocks[name]["rk"]:
+                yield start, nk
+
+    def get(self, name):
+        """
+        Return the value of a named parameter
+
+        Scalars are returned as float, 'cf' as a 5x5 nested list and
+        'ksi'/'radip' as lists.
+        """
+        start, count = self._address(name)
+        values = [float(t) for t in self.tokens[start:start + count]]
+        if name == "cf":
+            return [values[5 * i:5 * i + 5] for i in range(5)]
+        if count == 1 and name not in ("ksi", "radip"):
+            return values[0]
+        return values
+
+    def set(self, name, value):
+        """
+        Replace a named parameter
+
+        Besides the names accepted by get(), 'slater_scale' multiplies all
+        Slater-Condon integrals of the ground, final and intermediate
+        blocks, and 'auger_scale' multiplies the Auger integrals.
+        Scale factors always apply to the values of the base input, so
+        setting them twice does not compound.
+        """
+        if name in ("slater_scale", "auger_scale"):
+            if name == "slater_scale":
+                slices = list(self._rk_slices())
+            else:
+                slices = [(start, nk) for _, nk, start in self.auger]
+            for start, count in slices:
+                for i in range(start, start + count):
+                    self._set_token(i, format_value(float(self.base_tokens[i]) * float(value)))
+            return
+
+        start, count = self._address(name)
+        if count == 1:
+            values = [value]
+        elif name == "cf":
+            values = [v for row in value for v in row] if isinstance(value[0], (list, tuple)) else list(value)
+        else:
+            values = list(value)
+        if len(values) != count:
+            raise ValueError(f"Parameter '{name}' needs {count} values, got {len(values)}")
+        for i, v in enumerate(values):
+            self._set_token(start + i, format_value(v))
+
+    def _set_token(self, index, token):
+        self.tokens[index] = token
+        self._modified_lines.add(self.positions[index][0])
+
+    def text(self):
+        """Return the input text, rewriting only lines with changed values"""
+        lines = list(self.lines)
+        line_tokens = {}
+        for (iline, icol), token in zip(self.positions, self.tokens):
+            if iline in self._modified_lines:
+                line_tokens.setdefault(iline, []).append(token)
+        for iline, tokens in line_tokens.items():
+            line = lines[iline]
+            comment = line[line.index('#'):] if '#' in line else ""
+            new_line = " ".join(tokens)
+            lines[iline] = f"{new_line:<31} {comment}".rstrip() if comment else new_line
+        return "\n".join(lines) + "\n"
+
+
+def expand_grid(grid):
+    """
+    Expand a parameter grid into a list of parameter dicts
+
+    Args:
+        grid: dict mapping parameter names to lists of values. The
+            cartesian product of all lists is returned, in the order
+            of the dict.
+    """
+    names = list(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(grid[n] for n in names))]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python multiplet_params.py input_file")
+        sys.exit(1)
+
+    inp = MultipletInput.from_file(sys.argv[1])
+    print(f"{inp.ntokens} of {len(inp.tokens)} values used, nshells = {inp.nshells}, l = {inp.lsh}")
+    for name in HEADER_PARAMETERS:
+        print(f"{name:12s} = {inp.get(name)}")
+    for name in BLOCKS:
+        block = inp.blocks[name]
+        print(f"{name:12s}: occupations {block['occ']}, {len(block['rk'])} Rk integrals")
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Headless runner for the multiplet executable.
+Each calculation runs in its own directory (passed to the child as its
+working directory), so several runs can be active in one Python process
+without touching the process-wide current directory. A run directory
+left with a checkpoint by an interrupted run is resumed from its last
+completed omega point.
+"""
+
+import sys
+import os
+import time
+import platform
+import subprocess
+
+from engine_progress import ProgressTracker, parse_progress
+from preflight import check as preflight_check
+
+# Output files written by the multiplet executable into its working directory
+OUTPUT_FILES = [
+    "pes.dat", "peslm.dat", "rpesalms.dat", "rpes.dat", "rp.dat", "rpc.dat",
+    "xaq.dat", "xaqc.dat", "xaqx.dat", "xmat.dat",
+]
+# Written as text in every output mode but none, see src/options.c
+ALWAYS_TEXT_FILES = ["pes.dat", "rpes.dat", "xaq.dat", "xaqc.dat", "xaqx.dat"]
+# MULTIPLET_OUTPUT=binary or both, see src/binout.c
+BINARY_OUTPUT_FILES = [
+    "omega.bin", "ef.bin", "gstweight.bin", "rpesalms.bin", "xmat.bin", "rp.bin",
+    "rpc.bin", "peslm.bin",
+]
+# MULTIPLET_DUMP=1, see rpes_model.py
+DUMP_FILES = [
+    "gstenergy.bin", "gstweight.bin", "nm1fenergy.bin", "menergy.bin", "gamst.bin",
+    "xasmatele.bin", "fstvmst.bin", "pesmatele.bin",
+]
+
+INPUT_NAME = "multiplet_input.txt"
+LOG_NAME = "multiplet.log"
+
+# Written by the engine during the omega loop with MULTIPLET_CHECKPOINT=1 and
+# removed when it completes, see src/checkpoint.c
+CHECKPOINT_FILES = ("checkpoint.bin", "checkpoint.omega")
+
+# Runs estimated to take longer (seconds, see preflight.estimate) are checkpointed
+CHECKPOINT_MIN_TIME = 600.
+
+# Values of MULTIPLET_VERBOSITY, see src/options.c
+VERBOSITY_LEVELS = ("quiet", "summary", "full")
+
+# Blocks with an eigenpair selection MULTIPLET_EIGEN_<BLOCK>, see src/options.c
+EIGEN_BLOCKS = ("ground", "final", "intermediate")
+
+
+def default_multiplet_path():
+    """Path of the multiplet executable ($MULTIPLET_EXECUTABLE or next to this script)"""
+    if os.environ.get("MULTIPLET_EXECUTABLE"):
+        return os.environ["MULTIPLET_EXECUTABLE"]
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    name = "multiplet.exe" if platform.system() == "Windows" else "multiplet"
+    return os.path.join(script_dir, name)
+
+
+def threads_per_job(njobs):
+    """Engine threads per run when njobs runs share the CPU cores"""
+    return max(1, (os.cpu_count() or 1) // max(1, njobs))
+
+
+def engine_environment(verbosity=None, eigen=None, threads=None):
+    """
+    Environment for a multiplet child process
+
+    Args:
+        verbosity: 'quiet', 'summary' or 'full' (or 0, 1, 2); None keeps
+            MULTIPLET_VERBOSITY of the current environment (default full)
+        eigen: Optional dict block -> eigenpair selection, e.g.
+            {"ground": "lowest", "intermediate": "window:630:670"}; blocks
+            are 'ground', 'final' and 'intermediate', selections 'all',
+            'lowest', 'lowest:K' (completed to the end of a degenerate
+            level) and 'window:EMIN:EMAX'. Windows are not for the ground
+            block and relative to the ground-state energy: E - E_ground is
+            the energy axis of pes.dat for final states and the resonance
+            photon energy (near 640 eV for 2p) for intermediate states
+        threads: Threads of the engine's Hamiltonian and operator builders
+            (MULTIPLET_THREADS, needs an OpenMP build); None keeps the
+            current environment (default: all cores). The results do not
+            depend on it.
+    """
+    env = dict(os.environ)
+    if verbosity is not None:
+        if isinstance(verbosity, int):
+            verbosity = VERBOSITY_LEVELS[verbosity]
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Unknown verbosity '{verbosity}', use one of {VERBOSITY_LEVELS}")
+        env["MULTIPLET_VERBOSITY"] = verbosity
+    for block, selection in (eigen or {}).items():
+        if block not in EIGEN_BLOCKS:
+            raise ValueError(f"Unknown block '{block}', use one of {EIGEN_BLOCKS}")
+        env["MULTIPLET_EIGEN_" + block.upper()] = selection
+    if threads is not None:
+        env["MULTIPLET_THREADS"] = str(int(threads))
+    return env
+
+
+def result_settings(env):
+    """
+    Settings of an engine environment that change the results (for
+    result_cache keys): the eigenpair selections other than 'all', the
+    output mode other than text and the dump of the omega-loop arrays
+    """
+    settings = {name: env[name] for name in ("MULTIPLET_EIGEN_" + b.upper() for b in EIGEN_BLOCKS)
+                if env.get(name, "all") != "all"}
+    if env.get("MULTIPLET_OUTPUT", "text") != "text":
+        settings["MULTIPLET_OUTPUT"] = env["MULTIPLET_OUTPUT"]
+    if env.get("MULTIPLET_DUMP", "0") not in ("", "0"):
+        settings["MULTIPLET_DUMP"] = env["MULTIPLET_DUMP"]
+    return settings or None
+
+
+def output_files(env):
+    """Names of the output files of a run with the engine environment env"""
+    mode = env.get("MULTIPLET_OUTPUT", "text")
+    if mode == "none":
+        return []
+    names = list(OUTPUT_FILES) if mode in ("text", "both") else list(ALWAYS_TEXT_FILES)
+    if mode in ("binary", "both"):
+        names += BINARY_OUTPUT_FILES
+    if env.get("MULTIPLET_DUMP", "0") not in ("", "0"):
+        names += [name for name in DUMP_FILES if name not in names]
+    return names
+
+
+def has_checkpoint(run_dir):
+    """True if run_dir holds the checkpoint of an interrupted run"""
+    return os.path.exists(os.path.join(run_dir, CHECKPOINT_FILES[0]))
+
+
+def checkpoint_setting(run_dir, estimate=None, checkpoint=None):
+    """
+    Whether a run checkpoints its omega loop, and whether it resumes
+
+    Args:
+        run_dir: Run directory
+        estimate: preflight.estimate of the run, or None
+        checkpoint: True or False to decide; None checkpoints runs in a
+            directory with a checkpoint, with $MULTIPLET_CHECKPOINT=1 or
+            estimated to take at least CHECKPOINT_MIN_TIME
+
+    Returns:
+        (checkpoint, resume): the value of MULTIPLET_CHECKPOINT, and True
+        if the engine will continue an interrupted run in run_dir (it
+        starts from the beginning if the checkpoint is of another input)
+    """
+    resume = has_checkpoint(run_dir)
+    if checkpoint is None:
+        checkpoint = (resume or os.environ.get("MULTIPLET_CHECKPOINT", "0") not in ("", "0")
+                      or (estimate is not None and estimate["total_time"] >= CHECKPOINT_MIN_TIME))
+    return bool(checkpoint), bool(checkpoint) and resume
+
+
+def _wait(proc):
+    """
+    Wait for a child process and return (exit_code, cpu_time, max_rss)
+
+    cpu_time (user + system seconds) and max_rss (peak resident set size in
+    bytes) are None where os.wait4 is not available (Windows).
+    """
+    if not hasattr(os, "wait4"):
+        return proc.wait(), None, None
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    return proc.returncode, usage.ru_utime + usage.ru_stime, usage.ru_maxrss * scale
+
+
+def _existing_outputs(run_dir, names=OUTPUT_FILES):
+    return [os.path.join(run_dir, name) for name in names
+            if os.path.exists(os.path.join(run_dir, name))]
+
+
+def run_multiplet(input_text, run_dir, multiplet_path=None, cache=None, verbosity=None,
+                  progress=None, eigen=None, threads=None, max_memory=None, started=None,
+                  checkpoint=None):
+    """
+    Run one multiplet calculation in run_dir
+
+    The input text is written to run_dir/multiplet_input.txt and fed to
+    the executable on stdin; stdout and stderr go to run_dir/multiplet.log.
+    If run_dir holds the checkpoint of an interrupted run, the engine
+    continues it and the log is appended to.
+
+    Args:
+        input_text: Content of the multiplet input file
+        run_dir: Directory for input, log and output files (created if needed)
+        multiplet_path: Path to the multiplet executable (default: next to this script)
+        cache: Optional result_cache.ResultCache. On a hit the cached outputs
+            are placed in run_dir and the engine is not started; successful
+            runs are added to the cache.
+        verbosity: Amount of engine output in the log, 'quiet', 'summary'
+            or 'full' (default: $MULTIPLET_VERBOSITY or full)
+        progress: Optional callable. The engine then writes timing and
+            progress records (MULTIPLET_PROGRESS=1) and progress is called
+            with an engine_progress.ProgressTracker after every record
+        eigen: Eigenpair selection per block (see engine_environment)
+        threads: Engine threads (see engine_environment)
+        max_memory: Memory limit in bytes for the pre-flight check (see
+            preflight.check; default $MULTIPLET_MAX_MEMORY or the physical
+            memory, 0 disables it). A run whose predicted peak memory
+            exceeds it is rejected without starting the engine.
+        started: Optional callable, called with the subprocess.Popen of
+            the engine once it runs (e.g. to kill it from another thread)
+        checkpoint: Checkpoint the omega loop, so that running again in
+            run_dir resumes an interrupted run (see checkpoint_setting;
+            default: for long runs and to resume a checkpointed run)
+
+    Returns:
+        dict with run_dir, exit_code, wall_time (seconds), cpu_time
+        (seconds) and max_rss (bytes) of the engine, outputs (list of output
+        file paths that exist after the run), cached (True if the results
+        came from the cache) and error (None or a message if the executable
+        could not be started or was rejected), estimate (see
+        preflight.estimate, None for cached runs or unparsable inputs) and
+        rejected (True if the pre-flight check rejected the run), resumed
+        (True if an interrupted run was continued); with progress also
+        progress (phase timeline, see ProgressTracker.to_dict)
+    """
+    if multiplet_path is None:
+        multiplet_path = default_multiplet_path()
+    run_dir = os.path.abspath(run_dir)
+    os.makedirs(run_dir, exist_ok=True)
+
+    input_path = os.path.join(run_dir, INPUT_NAME)
+    log_path = os.path.join(run_dir, LOG_NAME)
+    with open(input_path, 'w') as f:
+        f.write(input_text)
+
+    record = {
+        "run_dir": run_dir,
+        "exit_code": None,
+        "wall_time": 0.,
+        "cpu_time": None,
+        "max_rss": None,
+        "outputs": [],
+        "log": log_path,
+        "cached": False,
+        "error": None,
+        "estimate": None,
+        "rejected": False,
+        "resumed": False,
+    }
+    env = engine_environment(verbosity, eigen, threads)
+    tracker = None
+    if progress is not None:
+        env["MULTIPLET_PROGRESS"] = "1"
+        tracker = ProgressTracker()
+    start = time.perf_counter()
+
+    key = None
+    if cache is not None:
+        try:
+            key = cache.key(input_text, multiplet_path, result_settings(env))
+        except OSError as e:
+            record["error"] = str(e)
+            return record
+        if cache.fetch(key, run_dir) is not None:
+            record.update(exit_code=0, cached=True,
+                          wall_time=time.perf_counter() - start,
+                          outputs=_existing_outputs(run_dir, output_files(env)))
+            return record
+
+    ok, record["estimate"], message = preflight_check(input_text, max_memory, eigen)
+    if not ok:
+        record.update(error=message, rejected=True, wall_time=time.perf_counter() - start)
+        return record
+    checkpoint, record["resumed"] = checkpoint_setting(run_dir, record["estimate"], checkpoint)
+    env["MULTIPLET_CHECKPOINT"] = "1" if checkpoint else "0"
+
+    try:
+        with open(input_path, 'r') as stdin, open(log_path, 'a' if record["resumed"] else 'w') as log:
+            proc = subprocess.Popen([os.path.abspath(multiplet_path)], stdin=stdin,
+                                    stdout=log, cwd=run_dir, env=env,
+                                    stderr=subprocess.STDOUT if tracker is None else subprocess.PIPE)
+            if started is not None:
+                started(proc)
+            if tracker is not None:
+                # stderr lines go to the same log (shared file offset) and are parsed
+                for line in proc.stderr:
+                    os.write(log.fileno(), line)
+                    entry = parse_progress(line.decode(errors='replace'))
+                    if entry is not None:
+                        tracker.update(entry)
+                        progress(tracker)
+                proc.stderr.close()
+            record["exit_code"], record["cpu_time"], record["max_rss"] = _wait(proc)
+    except OSError as e:
+        record["error"] = str(e)
+    record["wall_time"] = time.perf_counter() - start
+    record["outputs"] = _existing_outputs(run_dir, output_files(env))
+    if tracker is not None:
+        record["progress"] = tracker.to_dict()
+
+    if key is not None and record["exit_code"] == 0:
+        cache.store(key, run_dir, output_files(env))
+    return record
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python multiplet_runner.py input_file run_dir")
+        print("Set MULTIPLET_CACHE_DIR to reuse results of identical inputs and")
+        print("MULTIPLET_VERBOSITY=quiet|summary|full to control the engine output.")
+        sys.exit(1)
+
+    cache = None
+    if os.environ.get("MULTIPLET_CACHE_DIR"):
+        from result_cache import ResultCache
+        cache = ResultCache()
+
+    def show_progress(tracker):
+        if sys.stdout.isatty():
+            print(f"\r{tracker.status():79s}", end="", flush=True)
+
+    with open(sys.argv[1], 'r') as f:
+        record = run_multiplet(f.read(), sys.argv[2], cache=cache, progress=show_progress)
+    if sys.stdout.isatty() and not record["cached"]:
+        print()
+    if record["error"]:
+        print(f"Error: {record['error']}")
+        sys.exit(1)
+    source = " (from cache)" if record["cached"] else " (resumed)" if record["resumed"] else ""
+    print(f"Exit code {record['exit_code']} after {record['wall_time']:.2f} s{source}, "
+          f"{len(record['outputs'])} output files in {record['run_dir']}")
+    if record.get("progress", {}).get("phases"):
+        for phase in record["progress"]["phases"]:
+            print(f"  {phase['phase']:12s} {phase['block']:13s} {phase['time']:9.3f} s")
+        print(f"  peak RSS {record['progress']['peak_rss_kb'] / 1024:.1f} MB")
+    sys.exit(record["exit_code"])
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Parameter sweeps for the multiplet executable.
+A base input file is combined with a parameter grid (JSON), every grid
+point is written into its own run directory and the runs are executed in
+parallel on a bounded process pool. Exit codes, wall times and output
+paths of all runs are collected in sweep_dir/manifest.json.
+
+Example grid file:
+    {"theta": [0, 45, 90], "slater_scale": [0.7, 0.8]}
+"""
+
+import sys
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from multiplet_params import MultipletInput, expand_grid
+from multiplet_runner import run_multiplet, default_multiplet_path, threads_per_job
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _run_job(job):
+    """Worker entry point: run one grid point (must be picklable)"""
+    record = run_multiplet(job["input_text"], job["run_dir"], job["multiplet_path"],
+                           cache=job.get("cache"), verbosity=job.get("verbosity"),
+                           eigen=job.get("eigen"), threads=job.get("threads"),
+                           max_memory=job.get("max_memory"))
+    record["name"] = job["name"]
+    record["params"] = job["params"]
+    return record
+
+
+def make_jobs(base_input_file, grid, sweep_dir, multiplet_path=None, cache=None,
+              verbosity=None):
+    """
+    Build the list of jobs of a sweep without running them
+
+    Args:
+        base_input_file: Path to the base multiplet input file
+        grid: dict mapping parameter names (see multiplet_params) to value lists
+        sweep_dir: Directory that will hold one run_NNNN directory per grid point
+        multiplet_path: Path to the multiplet executable
+        cache: Optional result_cache.ResultCache shared by all jobs
+        verbosity: Engine output level of all runs (see multiplet_runner.run_multiplet)
+
+    Returns:
+        List of job dicts with name, params, run_dir, input_text,
+        multiplet_path, cache and verbosity
+    """
+    if multiplet_path is None:
+        multiplet_path = default_multiplet_path()
+    base = MultipletInput.from_file(base_input_file)
+    sweep_dir = os.path.abspath(sweep_dir)
+
+    jobs = []
+    for i, params in enumerate(expand_grid(grid)):
+        variant = base.copy()
+        for name, value in params.items():
+            variant.set(name, value)
+        name = f"run_{i:04d}"
+        jobs.append({
+            "name": name,
+            "params": params,
+            "run_dir": os.path.join(sweep_dir, name),
+            "input_text": variant.text(),
+            "multiplet_path": os.path.abspath(multiplet_path),
+            "cache": cache,
+            "verbosity": verbosity,
+        })
+    return jobs
+
+
+def run_sweep(base_input_file, grid, sweep_dir, multiplet_path=None, max_workers=None,
+              cache=None, verbosity=None, threads=None, max_memory=None):
+    """
+    Run a parameter sweep and write its manifest
+
+    Args:
+        base_input_file: Path to the base multiplet input file
+        grid: dict mapping parameter names to value lists
+        sweep_dir: Output directory of the sweep
+        multiplet_path: Path to the multiplet executable
+        max_workers: Number of parallel runs (default: number of CPU cores)
+        cache: Optional result_cache.ResultCache; grid points with cached
+            results are not recomputed
+        verbosity: Engine output level of all runs, e.g. 'summary' to keep
+            the logs small (default: $MULTIPLET_VERBOSITY or full)
+        threads: Engine threads per run (default: the CPU cores divided
+            among the max_workers parallel runs)
+        max_memory: Memory limit per run for the pre-flight check (see
+            multiplet_runner.run_multiplet); jobs predicted to exceed it
+            are marked rejected in the manifest with their estimate, e.g.
+            to be resubmitted on a machine with more memory
+
+    Returns:
+        The manifest dict (also written to sweep_dir/manifest.json)
+    """
+    jobs = make_jobs(base_input_file, grid, sweep_dir, multiplet_path, cache, verbosity)
+    os.makedirs(sweep_dir, exist_ok=True)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+    if threads is None:
+        threads = threads_per_job(max_workers)
+    for job in jobs:
+        job["threads"] = threads
+        job["max_memory"] = max_memory
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        records = list(pool.map(_run_job, jobs))
+
+    manifest = {
+        "base_input": os.path.abspath(base_input_file),
+        "grid": grid,
+        "multiplet": jobs[0]["multiplet_path"] if jobs else multiplet_path,
+        "max_workers": max_workers,
+        "threads": threads,
+        "max_memory": max_memory,
+        "wall_time": time.perf_counter() - start,
+        "jobs": records,
+    }
+    write_manifest(sweep_dir, manifest)
+    return manifest
+
+
+def write_manifest(sweep_dir, manifest):
+    """Write manifest.json atomically into sweep_dir"""
+    path = os.path.join(sweep_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python multiplet_sweep.py base_input grid.json sweep_dir [max_workers]")
+        sys.exit(1)
+
+    base_input_file = sys.argv[1]
+    with open(sys.argv[2], 'r') as f:
+        grid = json.load(f)
+    sweep_dir = sys.argv[3]
+    max_workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    cache = None
+    if os.environ.get("MULTIPLET_CACHE_DIR"):
+        from result_cache import ResultCache
+        cache = ResultCache()
+
+    manifest = run_sweep(base_input_file, grid, sweep_dir, max_workers=max_workers, cache=cache)
+    rejected = [job for job in manifest["jobs"] if job["rejected"]]
+    failed = [job for job in manifest["jobs"] if job["exit_code"] != 0 and not job["rejected"]]
+    cached = [job for job in manifest["jobs"] if job["cached"]]
+    print(f"{len(manifest['jobs'])} runs in {manifest['wall_time']:.1f} s "
+          f"on {manifest['max_workers']} workers, {len(cached)} from cache, {len(failed)} failed, "
+          f"{len(rejected)} rejected by the memory check")
+    for job in rejected:
+        print(f"  {job['name']}: {job['error']}")
+    print(f"Manifest written to {os.path.join(sweep_dir, MANIFEST_NAME)}")
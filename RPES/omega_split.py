@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Parallel omega scans.
+The omega loop of multiplet is independent for every photon energy, so a
+scan can be split into contiguous sub-ranges that run as separate
+multiplet processes (each in its own part_NN directory). Afterwards the
+per-omega outputs are merged back into single files with the header
+counts corrected; the omega-independent outputs (pes.dat, peslm.dat,
+xaq*.dat) are taken from the first part.
+"""
+
+import sys
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from multiplet_params import MultipletInput
+from multiplet_runner import default_multiplet_path, threads_per_job
+from multiplet_sweep import _run_job, write_manifest
+
+# Files written inside the omega loop and how their headers look
+#   'counts': first line "nomega ...", the rest are omega blocks
+#   'axis':   nfst, nfst energies, nomega, then omega blocks (rp.dat, rpc.dat)
+#   'plain':  no header, one or more lines per omega
+OMEGA_FILES = {
+    "rpesalms.dat": "counts",
+    "xmat.dat": "counts",
+    "rp.dat": "axis",
+    "rpc.dat": "axis",
+    "rpes.dat": "plain",
+    "xaqc.dat": "plain",
+}
+OMEGA_BIN_FILES = ["omega.bin", "rpesalms.bin", "xmat.bin", "rp.bin", "rpc.bin"]
+
+
+def omega_count(start, stop, delta):
+    """Number of omega points, computed as in main.c"""
+    return int((stop - start) / delta + 1.00001)
+
+
+def split_ranges(start, stop, delta, nparts):
+    """
+    Split an omega grid into contiguous sub-ranges
+
+    Args:
+        start, stop, delta: omega_start, omega_stop and delta_omega of the input
+        nparts: Requested number of sub-ranges (reduced if there are fewer points)
+
+    Returns:
+        List of (start, stop) pairs that together cover the original grid
+    """
+    nomega = omega_count(start, stop, delta)
+    nparts = max(1, min(nparts, nomega))
+    ranges = []
+    first = 0
+    for i in range(nparts):
+        count = nomega // nparts + (1 if i < nomega % nparts else 0)
+        ranges.append((start + first * delta, start + (first + count - 1) * delta))
+        first += count
+    return ranges
+
+
+def _copy_lines(src, dst, skip=0):
+    """Append src to the open file dst, skipping the first skip lines"""
+    with open(src, 'r') as f:
+        for _ in range(skip):
+            f.readline()
+        shutil.copyfileobj(f, dst)
+
+
+def _merge_text(name, kind, part_dirs, output_dir):
+    paths = [os.path.join(d, name) for d in part_dirs]
+    with open(os.path.join(output_dir, name), 'w') as out:
+        if kind == "plain":
+            for path in paths:
+                _copy_lines(path, out)
+            return
+
+        if kind == "counts":
+            headers = []
+            for path in paths:
+                with open(path, 'r') as f:
+                    headers.append(f.readline().split())
+            fields = headers[0]
+            fields[0] = str(sum(int(h[0]) for h in headers))
+            out.write(" ".join(fields) + "\n")
+            for path in paths:
+                _copy_lines(path, out, skip=1)
+            return
+
+        # 'axis': the energy axis is the same in all parts
+        nomega = 0
+        for path in paths:
+            with open(path, 'r') as f:
+                nfst = int(f.readline())
+                for _ in range(nfst):
+                    f.readline()
+                nomega += int(f.readline())
+        with open(paths[0], 'r') as f:
+            for _ in range(nfst + 1):
+                out.write(f.readline())
+        out.write(f"{nomega}\n")
+        for path in paths:
+            _copy_lines(path, out, skip=nfst + 2)
+
+
+def _merge_bin(name, part_dirs, output_dir):
+    from multiplet_data import read_bin_header
+
+    headers = [read_bin_header(os.path.join(d, name)) for d in part_dirs]
+    dtype, shape, offset = headers[0]
+    dims = np.array((sum(h[1][0] for h in headers),) + shape[1:], dtype='<i8')
+    with open(os.path.join(output_dir, name), 'wb') as out:
+        with open(os.path.join(part_dirs[0], name), 'rb') as f:
+            out.write(f.read(offset - 8 * len(dims)))
+        out.write(dims.tobytes())
+        for d, (_, part_shape, part_offset) in zip(part_dirs, headers):
+            nbytes = dtype.itemsize * int(np.prod(part_shape, dtype=np.int64))
+            with open(os.path.join(d, name), 'rb') as f:
+                f.seek(part_offset)
+                while nbytes > 0:
+                    chunk = f.read(min(nbytes, 1 << 24))
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    nbytes -= len(chunk)
+
+
+def merge_parts(part_dirs, output_dir):
+    """
+    Merge the outputs of omega sub-range runs
+
+    Args:
+        part_dirs: Run directories in omega order
+        output_dir: Directory for the merged files
+
+    Returns:
+        List of merged or copied file paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    first = part_dirs[0]
+    for name in sorted(os.listdir(first)):
+        if not (name.endswith(".dat") or name.endswith(".bin")):
+            continue
+        if not all(os.path.exists(os.path.join(d, name)) for d in part_dirs):
+            continue
+        if name in OMEGA_FILES:
+            _merge_text(name, OMEGA_FILES[name], part_dirs, output_dir)
+        elif name in OMEGA_BIN_FILES:
+            _merge_bin(name, part_dirs, output_dir)
+        elif os.path.abspath(first) != os.path.abspath(output_dir):
+            shutil.copyfile(os.path.join(first, name), os.path.join(output_dir, name))
+        written.append(os.path.join(output_dir, name))
+    return written
+
+
+def run_split(input_file, nparts, split_dir, output_dir=None, multiplet_path=None,
+              cache=None, verbosity=None, threads=None):
+    """
+    Run an omega scan as nparts concurrent multiplet processes and merge the results
+
+    Args:
+        input_file: Path to the multiplet input file
+        nparts: Number of omega sub-ranges (and parallel processes)
+        split_dir: Directory for the part_NN run directories and manifest.json
+        output_dir: Directory for the merged output files (default: split_dir)
+        multiplet_path: Path to the multiplet executable
+        cache: Optional result_cache.ResultCache used for the parts
+        verbosity: Engine output level of the parts (see multiplet_runner.run_multiplet)
+        threads: Engine threads per part (default: the CPU cores divided
+            among the parts)
+
+    Returns:
+        The manifest dict (also written to split_dir/manifest.json)
+    """
+    if multiplet_path is None:
+        multiplet_path = default_multiplet_path()
+    if output_dir is None:
+        output_dir = split_dir
+    base = MultipletInput.from_file(input_file)
+    ranges = split_ranges(base.get("omega_start"), base.get("omega_stop"),
+                          base.get("delta_omega"), nparts)
+
+    if threads is None:
+        threads = threads_per_job(len(ranges))
+    split_dir = os.path.abspath(split_dir)
+    os.makedirs(split_dir, exist_ok=True)
+    jobs = []
+    for i, (start, stop) in enumerate(ranges):
+        part = base.copy()
+        part.set("omega_start", start)
+        part.set("omega_stop", stop)
+        name = f"part_{i:02d}"
+        jobs.append({
+            "name": name,
+            "params": {"omega_start": start, "omega_stop": stop},
+            "run_dir": os.path.join(split_dir, name),
+            "input_text": part.text(),
+            "multiplet_path": os.path.abspath(multiplet_path),
+            "cache": cache,
+            "verbosity": verbosity,
+            "threads": threads,
+        })
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        records = list(pool.map(_run_job, jobs))
+
+    manifest = {
+        "input": os.path.abspath(input_file),
+        "nparts": len(jobs),
+        "multiplet": os.path.abspath(multiplet_path),
+        "jobs": records,
+        "merged": [],
+    }
+    if all(record["exit_code"] == 0 for record in records):
+        manifest["merged"] = merge_parts([job["run_dir"] for job in jobs], output_dir)
+    manifest["wall_time"] = time.perf_counter() - start_time
+    write_manifest(split_dir, manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python omega_split.py input_file nparts split_dir [output_dir]")
+        sys.exit(1)
+
+    manifest = run_split(sys.argv[1], int(sys.argv[2]), sys.argv[3],
+                         sys.argv[4] if len(sys.argv) > 4 else None)
+    failed = [job for job in manifest["jobs"] if job["exit_code"] != 0]
+    if failed:
+        print(f"Failed parts: {', '.join(job['name'] for job in failed)} "
+              f"(see multiplet.log in the part directories)")
+        for job in failed:
+            if job.get("rejected"):
+                print(f"  {job['name']}: {job['error']}")
+        sys.exit(1)
+    print(f"{manifest['nparts']} parts in {manifest['wall_time']:.1f} s, "
+          f"{len(manifest['merged'])} files merged")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Pre-flight estimate of the size and cost of a multiplet run.
+From the shells and configurations of an input the basis sizes of the
+ground, final and intermediate blocks are counted with the combinatorics
+of readconfs/noverk, and from these the peak memory of the dense arrays
+allocated in main.c (Hamiltonians, eigenvectors, (F|V|M), the omega
+block buffers) and the time of the diagonalizations, matrix elements
+and omega loop are predicted. This takes milliseconds, so run_multiplet
+and run_sweep check every job before it is started and reject jobs that
+cannot fit into memory.
+
+The times are calibrated on an -O2 build with the bundled labla.f and
+are good to a factor of a few; an optimized BLAS/LAPACK (see
+cross_platform_compile.py tune) is several times faster.
+"""
+
+import sys
+import os
+
+from multiplet_params import MultipletInput, count_states
+
+# first photoelectron shell ( ncvsh in main.c ): shells 0 and 1 are core and valence
+NCVSH = 2
+MIN_OMEGABLOCK_DOUBLES = 1 << 24   # OMEGABLOCKMEM in main.c
+BASE_MEMORY = 12 * 1024**2          # executable, w3j table, sparse matrices
+
+# seconds per operation, see the module docstring
+SEC_DSYEV = 2e-9       # per n^3, all eigenpairs
+SEC_DSYEVR = 0.6e-9    # per n^3, selected eigenpairs
+SEC_PESMATELE = 5e-9   # per (photoelectron orbital, final state, final basis state)
+SEC_FBASVMST = 2e-8    # per (final basis state, intermediate state)
+SEC_FLOP = 1.5e-10     # DGEMM
+SEC_OUTPUT = 1e-7      # per printed amplitude of the omega loop
+
+EIGEN_BLOCKS = ("ground", "final", "intermediate")
+
+
+def parse_size(text):
+    """Bytes from '2000000', '512M', '16G' or '1.5T'"""
+    text = str(text).strip().upper().rstrip("B")
+    scale = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}.get(text[-1:], 1)
+    if scale > 1:
+        text = text[:-1]
+    return int(float(text) * scale)
+
+
+def format_size(nbytes):
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(nbytes) < 1024 or unit == "GB":
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024.
+
+
+def memory_limit():
+    """
+    Memory available to one run in bytes
+
+    $MULTIPLET_MAX_MEMORY (e.g. '16G') if set, else the physical memory
+    of this machine, None if it cannot be determined
+    """
+    if os.environ.get("MULTIPLET_MAX_MEMORY"):
+        return parse_size(os.environ["MULTIPLET_MAX_MEMORY"])
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _selection(eigen, block):
+    """Eigenpair selection of a block: from eigen, else $MULTIPLET_EIGEN_<BLOCK>, else 'all'"""
+    selection = (eigen or {}).get(block)
+    if selection is None:
+        selection = os.environ.get("MULTIPLET_EIGEN_" + block.upper(), "all")
+    return selection
+
+
+def _kept(nbasis, selection):
+    """
+    Eigenpairs kept for a selection ( see solve_eigen ) and whether dsyevr is used
+
+    'lowest' is 'lowest:1'. 'lowest:K' keeps K states and the engine
+    completes the level of the K-th, so the number is exact without
+    degeneracy and a lower bound with it. A window counts all states, an
+    upper bound.
+    """
+    if selection == "all":
+        return nbasis, False
+    if selection == "lowest":
+        return min(1, nbasis), True
+    if selection.startswith("lowest:"):
+        return min(int(selection.split(":")[1]), nbasis), True
+    return nbasis, True
+
+
+def state_counts(params, eigen=None):
+    """
+    Basis and state counts of a run, named as in main.c
+
+    Args:
+        params: MultipletInput or input text
+        eigen: Eigenpair selection per block (see multiplet_runner.engine_environment)
+
+    Returns:
+        dict with nstates (ground basis), nnm1bas and nnm1fst (final N-1
+        basis and eigenstates kept), nmbas and nmstates (intermediate),
+        npesorb (photoelectron spin-orbitals), nfbas and nfstates (final
+        N-1 x photoelectron basis and states) and nomega
+    """
+    if not isinstance(params, MultipletInput):
+        params = MultipletInput(params)
+    lsh = params.lsh
+    nstates, nnm1bas, nmbas = (count_states(lsh, params.blocks[name]["occ"]) for name in EIGEN_BLOCKS)
+    nnm1fst, _ = _kept(nnm1bas, _selection(eigen, "final"))
+    nmstates, _ = _kept(nmbas, _selection(eigen, "intermediate"))
+    npesorb = sum(4 * l + 2 for l in lsh[NCVSH:])
+    start, stop, delta = (params.get(name) for name in ("omega_start", "omega_stop", "delta_omega"))
+    nomega = int((stop - start) / delta + 1.00001) if delta > 0 else 1
+    return {
+        "nstates": nstates,
+        "nnm1bas": nnm1bas,
+        "nnm1fst": nnm1fst,
+        "nmbas": nmbas,
+        "nmstates": nmstates,
+        "npesorb": npesorb,
+        "nfbas": nnm1bas * npesorb,
+        "nfstates": nnm1fst * npesorb,
+        "nomega": max(nomega, 1),
+    }
+
+
+def estimate(params, eigen=None, gstdeg=1, omega_block=None):
+    """
+    Predict peak memory and run time of a multiplet run
+
+    Args:
+        params: MultipletInput or input text
+        eigen: Eigenpair selection per block (default: $MULTIPLET_EIGEN_*)
+        gstdeg: Assumed degeneracy of the ground state (known only after
+            the first diagonalization)
+        omega_block: Omega points per block (default: $MULTIPLET_OMEGA_BLOCK or 32)
+
+    Returns:
+        dict with the counts of state_counts, memory (predicted peak in
+        bytes), memory_phase (the phase of the peak), memory_phases
+        (bytes per phase), time (seconds per phase) and total_time
+    """
+    counts = state_counts(params, eigen)
+    n_g, n_f, n_m = counts["nstates"], counts["nnm1bas"], counts["nmbas"]
+    k_f, k_m, lms = counts["nnm1fst"], counts["nmstates"], counts["npesorb"]
+    nfbas, nomega, g = counts["nfbas"], counts["nomega"], gstdeg
+    if omega_block is None:
+        omega_block = int(os.environ.get("MULTIPLET_OMEGA_BLOCK", 32))
+
+    dsyevr = {block: _kept(1, _selection(eigen, block))[1] for block in EIGEN_BLOCKS}
+    lowest = {block: _selection(eigen, block).startswith("lowest") for block in EIGEN_BLOCKS}
+
+    def diag(n, kept, block):
+        # matrix, plus for dsyevr the kept eigenvectors ( 'lowest[:K]' computes 7 more )
+        if not dsyevr[block]:
+            return 8. * n * n
+        return 8. * n * n + 8. * n * min(n, kept + 7 * lowest[block])
+
+    # omega block buffers, as in main.c
+    nomblk = max(1, min(omega_block, nomega))
+    lrablk = lms * k_f * 6 * g
+    if lrablk * nomblk > MIN_OMEGABLOCK_DOUBLES:
+        nomblk = 1 if lrablk > MIN_OMEGABLOCK_DOUBLES else MIN_OMEGABLOCK_DOUBLES // lrablk
+
+    final_vectors = 8. * n_f * k_f
+    final_basis = 24. * nfbas                 # fstate and fstvec
+    fstvmst = 8. * lms * k_f * k_m            # all blocks nonzero ( upper bound )
+    phases = {
+        "ground": diag(n_g, _kept(n_g, _selection(eigen, "ground"))[0], "ground"),
+        "final": 8. * n_g * g + diag(n_f, k_f, "final"),
+        "pesmatele": 8. * n_g * g + final_vectors + final_basis + 8. * 3 * lms * g * k_f,
+        "intermediate": final_vectors + final_basis + diag(n_m, k_m, "intermediate"),
+        "fstvmst": final_vectors + final_basis + 8. * n_m * k_m + 8. * n_f * k_m + fstvmst,
+        "omega": (final_vectors + final_basis + 8. * n_m * k_m + fstvmst
+                  + 8. * k_m * 6 * g * nomblk + 8. * lrablk * nomblk + 16. * 3 * lms * g * k_f),
+    }
+    phases = {name: int(BASE_MEMORY + nbytes) for name, nbytes in phases.items()}
+    peak_phase = max(phases, key=phases.get)
+
+    def diag_time(n, block):
+        return (SEC_DSYEVR if dsyevr[block] else SEC_DSYEV) * float(n)**3
+
+    time = {
+        "dsyev ground": diag_time(n_g, "ground"),
+        "dsyev final": diag_time(n_f, "final"),
+        "pesmatele": SEC_PESMATELE * lms * k_f * nfbas,
+        "dsyev intermediate": diag_time(n_m, "intermediate"),
+        "fstvmst": SEC_FBASVMST * nfbas * k_m + SEC_FLOP * 2. * lms * n_f * k_f * k_m,
+        "omega loop": nomega * (SEC_FLOP * 2. * lms * k_f * k_m * 6 * g
+                                + SEC_OUTPUT * 3 * lms * g * k_f),
+    }
+    result = dict(counts)
+    result.update(memory=phases[peak_phase], memory_phase=peak_phase, memory_phases=phases,
+                  time=time, total_time=sum(time.values()), gstdeg=gstdeg)
+    return result
+
+
+def check(params, max_memory=None, eigen=None):
+    """
+    Decide whether a run fits into memory
+
+    Args:
+        params: MultipletInput or input text
+        max_memory: Limit in bytes (default: memory_limit()); 0 disables the check
+        eigen: Eigenpair selection per block
+
+    Returns:
+        (ok, estimate, message): ok is False if the predicted peak memory
+        exceeds the limit; estimate is None and ok True if the input
+        cannot be parsed (the engine then reports the error)
+    """
+    try:
+        result = estimate(params, eigen)
+    except (ValueError, IndexError, KeyError):
+        return True, None, None
+    limit = memory_limit() if max_memory is None else max_memory
+    if limit and result["memory"] > limit:
+        return False, result, (f"estimated peak memory {format_size(result['memory'])} "
+                               f"({result['memory_phase']}) exceeds the limit of {format_size(limit)}")
+    return True, result, None
+
+
+def summary(result):
+    """Human readable lines of an estimate"""
+    lines = [
+        f"ground basis      nstates  = {result['nstates']}",
+        f"final (N-1) basis nnm1bas  = {result['nnm1bas']}, kept nnm1fst = {result['nnm1fst']}",
+        f"intermediate      nmbas    = {result['nmbas']}, kept nmstates = {result['nmstates']}",
+        f"photoelectron     npesorb  = {result['npesorb']}, nfstates = {result['nfstates']}",
+        f"omega points      nomega   = {result['nomega']}",
+        f"peak memory       {format_size(result['memory'])} ({result['memory_phase']}, "
+        f"ground state degeneracy {result['gstdeg']} assumed)",
+    ]
+    for name, seconds in result["time"].items():
+        lines.append(f"  {name:18s} {seconds:10.2f} s")
+    lines.append(f"  {'total':18s} {result['total_time']:10.2f} s")
+    return lines
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python preflight.py input_file [max_memory]")
+        print("max_memory e.g. 16G (default: $MULTIPLET_MAX_MEMORY or the physical memory)")
+        sys.exit(1)
+
+    params = MultipletInput.from_file(sys.argv[1])
+    max_memory = parse_size(sys.argv[2]) if len(sys.argv) > 2 else None
+    ok, result, message = check(params, max_memory)
+    for line in summary(result):
+        print(line)
+    print(message if not ok else "fits into memory")
+    sys.exit(0 if ok else 1)
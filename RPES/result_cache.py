@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for multiplet results.
+Results are keyed on the normalized input text (comments and blank lines
+removed, see compare_inputs.strip_comments) together with a hash of the
+multiplet executable. On a hit the stored output files are copied into
+the requested directory instead of running the engine (not hard-linked:
+the engine truncates its output files when it runs again in that
+directory, which would overwrite the cache entry).
+The cache has a size cap with least-recently-used eviction, and all
+updates are done with atomic renames so that several users and processes
+can share one cache directory on a scratch disk.
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+from compare_inputs import strip_comments
+from multiplet_runner import OUTPUT_FILES
+
+DEFAULT_MAX_BYTES = 10 * 1024**3
+ENTRY_INFO = "entry.json"
+
+# executable path -> (size, mtime, sha256), so the binary is hashed once per process
+_executable_hashes = {}
+
+
+def default_cache_dir():
+    """Cache directory ($MULTIPLET_CACHE_DIR or ~/.cache/orbitron-multiplet)"""
+    return os.environ.get("MULTIPLET_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "orbitron-multiplet"))
+
+
+def normalize_input(input_text):
+    """Input text without comments, blank lines and repeated whitespace"""
+    lines = [" ".join(strip_comments(line).split()) for line in input_text.splitlines()]
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+def file_sha256(path):
+    """sha256 hex digest of a file, cached on (size, mtime)"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    cached = _executable_hashes.get(path)
+    if cached and cached[:2] == (st.st_size, st.st_mtime):
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    _executable_hashes[path] = (st.st_size, st.st_mtime, h.hexdigest())
+    return h.hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+class ResultCache:
+    """
+    Directory of cached multiplet results
+
+    Each entry is a subdirectory named by its key holding the output files
+    and entry.json. The modification time of the entry directory is the
+    time of last use and decides the eviction order.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """
+        Args:
+            cache_dir: Cache directory (default: default_cache_dir())
+            max_bytes: Size cap in bytes (default: $MULTIPLET_CACHE_MAX_MB or 10 GB)
+        """
+        self.cache_dir = os.path.abspath(cache_dir or default_cache_dir())
+        if max_bytes is None:
+            mb = os.environ.get("MULTIPLET_CACHE_MAX_MB")
+            max_bytes = int(float(mb) * 1024**2) if mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, input_text, multiplet_path, extra=None):
+        """
+        Cache key of a calculation
+
+        Args:
+            input_text: Content of the multiplet input file
+            multiplet_path: Path to the multiplet executable
+            extra: Optional dict of further settings that change the output
+        """
+        h = hashlib.sha256()
+        h.update(normalize_input(input_text).encode())
+        h.update(file_sha256(multiplet_path).encode())
+        if extra:
+            h.update(json.dumps(extra, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def fetch(self, key, output_dir):
+        """
+        Place the cached results of key into output_dir
+
+        Returns:
+            List of files placed in output_dir, or None on a cache miss
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, ENTRY_INFO), 'r') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        os.makedirs(output_dir, exist_ok=True)
+        placed = []
+        try:
+            for name in info["files"]:
+                src = os.path.join(entry, name)
+                dst = os.path.join(output_dir, name)
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                shutil.copy2(src, dst)
+                placed.append(dst)
+        except OSError:
+            # entry was evicted by another process while we were reading it
+            return None
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return placed
+
+    def store(self, key, output_dir, files=None):
+        """
+        Copy the output files of a finished run into the cache
+
+        Args:
+            key: Cache key from key()
+            output_dir: Directory with the output files
+            files: File names to store (default: multiplet_runner.OUTPUT_FILES;
+                see multiplet_runner.output_files for other output modes)
+
+        Returns:
+            True if a new entry was added
+        """
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            os.utime(entry)
+            return False
+
+        names = [name for name in (OUTPUT_FILES if files is None else files)
+                 if os.path.exists(os.path.join(output_dir, name))]
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            for name in names:
+                shutil.copyfile(os.path.join(output_dir, name), os.path.join(tmp, name))
+            with open(os.path.join(tmp, ENTRY_INFO), 'w') as f:
+                json.dump({"files": names, "created": time.time()}, f)
+            os.rename(tmp, entry)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """List (last_used, size, key) of all entries, oldest first"""
+        result = []
+        for key in os.listdir(self.cache_dir):
+            path = self._entry(key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                result.append((os.path.getmtime(path), _dir_size(path), key))
+            except OSError:
+                pass
+        return sorted(result)
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total <= max_bytes:
+                break
+            trash = os.path.join(self.cache_dir, f".trash-{os.getpid()}-{key}")
+            try:
+                os.rename(self._entry(key), trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+if __name__ == "__main__":
+    cache = ResultCache(sys.argv[1] if len(sys.argv) > 1 else None)
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"{cache.cache_dir}: {len(entries)} entries, "
+          f"{total / 1024**2:.1f} MB of {cache.max_bytes / 1024**2:.0f} MB")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Recompute RPES amplitudes for new omega grids and lifetimes.
+With MULTIPLET_DUMP=1 the engine writes the quantities used inside its
+omega loop (menergy, gamst, xasmatele, fstvmst, pesmatele, nm1fenergy,
+gstenergy). From these the resonant amplitudes
+
+    A(omega) = sum_M (F|V|M) (M|D|G) / (omega + E_G - E_M + i Gamma_M) + (F|D|G)
+
+are evaluated for a whole omega array at once as one matrix product over
+the intermediate states, without diagonalising anything again.
+"""
+
+import sys
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from multiplet_data import read_bin
+
+DUMP_NAMES = ["gstenergy", "gstweight", "nm1fenergy", "menergy", "gamst",
+              "xasmatele", "fstvmst", "pesmatele"]
+
+# xasmatele (3, ngst, nm), fstvmst (nlms, nfst, nm), pesmatele (3, nlms, ngst, nfst)
+RpesModel = namedtuple("RpesModel", DUMP_NAMES)
+
+# polarisation vectors (LCP, linear, RCP) in the q = -1, 0, 1 basis, as eps in main.c
+EPS = np.array([[.5, np.sqrt(.5), .5],
+                [-np.sqrt(.5), 0., np.sqrt(.5)],
+                [.5, -np.sqrt(.5), .5]])
+
+
+def load_model(run_dir):
+    """Read the dump files of a run made with MULTIPLET_DUMP=1"""
+    arrays = {}
+    for name in DUMP_NAMES:
+        path = os.path.join(run_dir, name + ".bin")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found, run multiplet with MULTIPLET_DUMP=1")
+        arrays[name] = read_bin(path, mmap=False)
+    arrays["gstenergy"] = float(arrays["gstenergy"][0])
+    return RpesModel(**arrays)
+
+
+def gamma_grid(menergy, gamma0, egam=(), gam=()):
+    """
+    Lifetime broadening of every intermediate state, as the gamst loop in main.c
+
+    Args:
+        menergy: Intermediate state energies
+        gamma0: Gamma of states outside all intervals
+        egam, gam: Interval boundaries and their Gamma values (input line
+            'ommin ommax deltaom gamma0 ngam egam gam ...')
+    """
+    menergy = np.asarray(menergy)
+    gamma = np.full(menergy.shape, float(gamma0))
+    if len(egam):
+        egam = np.asarray(egam, dtype=float)
+        gam = np.asarray(gam, dtype=float)
+        for i in range(len(egam) - 1):
+            gamma[(egam[i] < menergy) & (menergy < egam[i + 1])] = gam[i]
+        gamma[menergy > egam[-1]] = gam[-1]
+    return gamma
+
+
+def _resonance(model, omega, gamma):
+    if gamma is None:
+        gamma = model.gamst
+    gamma = np.broadcast_to(np.asarray(gamma, dtype=float), model.menergy.shape)
+    # (nomega, nm)
+    return 1. / (omega[:, None] + model.gstenergy - model.menergy[None, :] + 1j * gamma[None, :])
+
+
+def rpes_amplitudes(model, omega, gamma=None, chunk=256):
+    """
+    Resonant photoemission amplitudes for an array of photon energies
+
+    Args:
+        model: RpesModel from load_model()
+        omega: Photon energies
+        gamma: Lifetime broadening, a scalar or one value per intermediate
+            state (default: gamst of the engine run, see gamma_grid)
+        chunk: Number of omega values per matrix product
+
+    Returns:
+        Complex array (nomega, ngst, nfst, nlms, 3), the layout of
+        multiplet_data.load_rpesalms and rpesalms.bin
+    """
+    omega = np.atleast_1d(np.asarray(omega, dtype=float))
+    nlms, nfst, nm = model.fstvmst.shape
+    ngst = model.xasmatele.shape[1]
+    fvm = model.fstvmst.reshape(nlms * nfst, nm)
+    direct = model.pesmatele.transpose(2, 3, 1, 0)   # (ngst, nfst, nlms, 3)
+
+    result = np.empty((len(omega), ngst, nfst, nlms, 3), dtype=complex)
+    for first in range(0, len(omega), chunk):
+        om = omega[first:first + chunk]
+        # (M|D|G) / (omega + E_G - E_M + i Gamma) as (nm, nomega*3*ngst)
+        cm = model.xasmatele[None, :, :, :] * _resonance(model, om, gamma)[:, None, None, :]
+        cm = cm.reshape(-1, nm).T
+        # (F|V|M) is real: two real products instead of one complex one
+        amp = (fvm @ cm.real) + 1j * (fvm @ cm.imag)
+        amp = amp.reshape(nlms, nfst, len(om), 3, ngst).transpose(2, 4, 1, 0, 3)
+        result[first:first + len(om)] = amp + direct
+    return result
+
+
+def xas_spectrum(model, omega, gamma=None):
+    """
+    Broadened XAS for an array of photon energies (columns q=-1, 0, 1 of xaqc.dat)
+
+    Returns:
+        Array (nomega, 3)
+    """
+    omega = np.atleast_1d(np.asarray(omega, dtype=float))
+    ngst = model.xasmatele.shape[1]
+    csum = np.einsum('qgm,wm->wq', model.xasmatele**2, _resonance(model, omega, gamma))
+    return -csum.imag / ngst / np.pi
+
+
+def rp_spectrum(amplitudes):
+    """Total RPES intensity per final state, as rp.dat: (nomega, nfst)"""
+    ngst = amplitudes.shape[1]
+    return (np.abs(amplitudes)**2).sum(axis=(1, 3, 4)) / ngst
+
+
+def rpc_spectrum(amplitudes):
+    """RPES intensity for LCP, linear and RCP light, as rpc.dat: (nomega, nfst, 3)"""
+    ngst = amplitudes.shape[1]
+    polarized = np.einsum('pq,wgjlq->wgjlp', EPS, amplitudes)
+    return (np.abs(polarized)**2).sum(axis=(1, 3)) / ngst
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 5:
+        print("Usage: python rpes_model.py run_dir omega_start omega_stop delta_omega [gamma]")
+        sys.exit(1)
+
+    model = load_model(sys.argv[1])
+    start, stop, delta = (float(x) for x in sys.argv[2:5])
+    omega = np.arange(start, stop + delta / 2, delta)
+    gamma = float(sys.argv[5]) if len(sys.argv) > 5 else None
+    rp = rp_spectrum(rpes_amplitudes(model, omega, gamma))
+    ef = model.gstenergy - model.nm1fenergy
+    for io, om in enumerate(omega):
+        print(f"{om:10.6f} {rp[io].sum():15.8e}  (max {rp[io].max():.4e} at Ef = {ef[rp[io].argmax()]:.4f})")
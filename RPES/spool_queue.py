@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Work queue in a shared directory, to spread sweeps over several nodes.
+A coordinator writes one job spec (input text, run directory, grid
+parameters) per grid point into spool_dir/pending. Workers on any node
+that sees the directory claim a job by renaming its spec into
+spool_dir/running (the rename is atomic, so exactly one worker gets
+it), run the engine in the job's run directory and write the run record
+into spool_dir/done or spool_dir/failed. Nothing but a shared POSIX
+directory is needed, no server and no locks.
+
+A worker touches its claim every heartbeat seconds. A claim that has not
+been touched for stale_timeout seconds belongs to a dead (or hung)
+worker and is moved back to pending by the next worker that looks for
+work; the old worker notices the lost claim at its next heartbeat and
+kills its engine. Times are compared on the file server's clock, so the
+nodes' clocks need not agree.
+
+Layout of spool_dir:
+    pending/<job>.json            specs waiting for a worker
+    running/<job>~<worker>.json   claimed specs, mtime = last heartbeat
+    done/<job>.json               records of successful runs
+    failed/<job>.json             records of failed or rejected runs
+    STOP                          workers exit when they see it
+"""
+
+import sys
+import os
+import json
+import time
+import socket
+import threading
+
+from multiplet_runner import run_multiplet, default_multiplet_path, threads_per_job
+
+STATES = ("pending", "running", "done", "failed")
+STOP_NAME = "STOP"
+HEARTBEAT = 30.
+STALE_TIMEOUT = 300.
+POLL_INTERVAL = 5.
+MAX_ATTEMPTS = 3
+
+# spec fields passed on to run_multiplet
+_RUN_FIELDS = ("verbosity", "eigen", "threads", "max_memory")
+
+
+def _write_json(path, data):
+    """Write a JSON file atomically (temporary file and rename in the same directory)"""
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp-{socket.gethostname()}-{os.getpid()}-"
+                            f"{threading.get_ident()}-{os.path.basename(path)}")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _specs(spool_dir, state):
+    """Names of the .json files of a state directory, sorted"""
+    try:
+        names = os.listdir(os.path.join(spool_dir, state))
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if name.endswith(".json") and not name.startswith("."))
+
+
+def job_name(spec_file):
+    """Job name of a spec file name ('run_0001.json', 'run_0001~node1-123.json')"""
+    return spec_file[:-len(".json")].split("~")[0]
+
+
+def server_time(spool_dir, worker):
+    """Current time on the clock of the file system holding spool_dir"""
+    path = os.path.join(spool_dir, "running", f".clock-{worker}")
+    with open(path, 'w'):
+        pass
+    now = os.path.getmtime(path)
+    os.remove(path)
+    return now
+
+
+def init_spool(spool_dir):
+    """Create the state directories of a spool directory"""
+    for state in STATES:
+        os.makedirs(os.path.join(spool_dir, state), exist_ok=True)
+
+
+def submit(jobs, spool_dir):
+    """
+    Put jobs into the queue
+
+    Args:
+        jobs: List of job dicts with name, run_dir and input_text, and
+            optionally params and the run_multiplet settings verbosity,
+            eigen, threads and max_memory (e.g. from multiplet_sweep.make_jobs)
+        spool_dir: Spool directory on a file system shared with the workers
+
+    Returns:
+        Number of submitted jobs; jobs whose name is already in the queue
+        (in any state) are skipped
+    """
+    init_spool(spool_dir)
+    known = {job_name(name) for state in STATES for name in _specs(spool_dir, state)}
+    submitted = 0
+    for job in jobs:
+        if job["name"] in known:
+            continue
+        spec = {
+            "name": job["name"],
+            "params": job.get("params"),
+            "run_dir": os.path.abspath(job["run_dir"]),
+            "input_text": job["input_text"],
+            "attempts": 0,
+            "submitted": time.time(),
+        }
+        spec.update({field: job[field] for field in _RUN_FIELDS if job.get(field) is not None})
+        _write_json(os.path.join(spool_dir, "pending", job["name"] + ".json"), spec)
+        submitted += 1
+    return submitted
+
+
+def submit_sweep(base_input_file, grid, sweep_dir, spool_dir, verbosity=None, max_memory=None):
+    """
+    Queue the grid points of a sweep (see multiplet_sweep.run_sweep)
+
+    The jobs are named <sweep_dir name>.run_NNNN, so several sweeps can
+    share a spool directory; their run directories are sweep_dir/run_NNNN
+    and must be on the shared file system.
+
+    Returns:
+        Number of submitted jobs
+    """
+    from multiplet_sweep import make_jobs
+
+    tag = os.path.basename(os.path.abspath(sweep_dir))
+    jobs = make_jobs(base_input_file, grid, sweep_dir, verbosity=verbosity)
+    for job in jobs:
+        job["name"] = f"{tag}.{job['name']}"
+        job["max_memory"] = max_memory
+    os.makedirs(sweep_dir, exist_ok=True)
+    return submit(jobs, spool_dir)
+
+
+def reclaim(spool_dir, worker, stale_timeout=STALE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+    """
+    Move claims without heartbeat for stale_timeout seconds back to pending
+
+    A job that was claimed max_attempts times goes to failed instead.
+
+    Returns:
+        Number of reclaimed jobs
+    """
+    now = server_time(spool_dir, worker)
+    reclaimed = 0
+    for name in _specs(spool_dir, "running"):
+        path = os.path.join(spool_dir, "running", name)
+        try:
+            if now - os.path.getmtime(path) < stale_timeout:
+                continue
+            # the rename decides which worker reclaims the job
+            private = os.path.join(spool_dir, "running", f".reclaim-{worker}-{name}")
+            os.rename(path, private)
+        except FileNotFoundError:
+            continue
+        spec = _read_json(private)
+        dead = name[:-len(".json")].split("~", 1)[-1]
+        spec.setdefault("reclaimed_from", []).append(dead)
+        if spec["attempts"] >= max_attempts:
+            record = {"name": spec["name"], "params": spec.get("params"), "run_dir": spec["run_dir"],
+                      "exit_code": None, "attempts": spec["attempts"], "spec": spec,
+                      "error": f"worker lost {spec['attempts']} times ({', '.join(spec['reclaimed_from'])})"}
+            _write_json(os.path.join(spool_dir, "failed", spec["name"] + ".json"), record)
+        else:
+            _write_json(os.path.join(spool_dir, "pending", spec["name"] + ".json"), spec)
+        os.remove(private)
+        reclaimed += 1
+    return reclaimed
+
+
+def claim(spool_dir, worker):
+    """
+    Claim the oldest pending job
+
+    Returns:
+        (claim path, spec) or (None, None) if nothing is pending
+    """
+    for name in _specs(spool_dir, "pending"):
+        path = os.path.join(spool_dir, "running", f"{job_name(name)}~{worker}.json")
+        pending = os.path.join(spool_dir, "pending", name)
+        try:
+            # fresh mtime first, or the claim would look stale to reclaim()
+            os.utime(pending)
+            os.rename(pending, path)
+        except FileNotFoundError:
+            # another worker was faster
+            continue
+        spec = _read_json(path)
+        # a worker died after writing the record but before releasing its claim
+        if os.path.exists(os.path.join(spool_dir, "done", name)):
+            os.remove(path)
+            continue
+        # the claim is ours: record the attempt ( this also renews the mtime )
+        spec["attempts"] += 1
+        _write_json(path, spec)
+        return path, spec
+    return None, None
+
+
+class _Heartbeat(threading.Thread):
+    """Touches a claim file; kills the engine if the claim was taken away"""
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.proc = None
+        self.lost = False
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost = True
+                if self.proc is not None and self.proc.poll() is None:
+                    self.proc.kill()
+                return
+
+
+def run_claimed(spool_dir, path, spec, worker, multiplet_path=None, cache=None,
+                threads=None, heartbeat=HEARTBEAT):
+    """
+    Run a claimed job and file its record under done or failed
+
+    Returns:
+        The run record, None if the claim was lost during the run
+    """
+    settings = {field: spec.get(field) for field in _RUN_FIELDS}
+    if settings["threads"] is None:
+        settings["threads"] = threads
+    beat = _Heartbeat(path, heartbeat)
+
+    def started(proc):
+        beat.proc = proc
+        if beat.lost:
+            proc.kill()
+
+    beat.start()
+    try:
+        record = run_multiplet(spec["input_text"], spec["run_dir"], multiplet_path, cache=cache,
+                               started=started, **settings)
+    finally:
+        beat.finished.set()
+        beat.join()
+    if beat.lost:
+        return None
+
+    record.update(name=spec["name"], params=spec.get("params"), worker=worker,
+                  attempts=spec["attempts"])
+    state = "done" if record["exit_code"] == 0 and not record["error"] else "failed"
+    if state == "failed":
+        # kept for requeue_failed
+        record["spec"] = spec
+    _write_json(os.path.join(spool_dir, state, spec["name"] + ".json"), record)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return record
+
+
+def work(spool_dir, multiplet_path=None, threads=None, max_jobs=None, idle_timeout=None,
+         heartbeat=HEARTBEAT, stale_timeout=STALE_TIMEOUT, poll_interval=POLL_INTERVAL):
+    """
+    Worker loop: reclaim stale jobs, claim and run pending jobs
+
+    Args:
+        spool_dir: Spool directory
+        multiplet_path: Engine on this node (default: default_multiplet_path)
+        threads: Engine threads for jobs that do not set them
+        max_jobs: Stop after this many jobs
+        idle_timeout: Stop after this many seconds without pending jobs
+            (default: wait until spool_dir/STOP exists)
+        heartbeat: Seconds between touches of the claim
+        stale_timeout: Seconds without heartbeat after which claims of
+            other workers are reclaimed
+        poll_interval: Seconds between looks into pending when idle
+
+    Returns:
+        Number of jobs run
+    """
+    init_spool(spool_dir)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    cache = None
+    if os.environ.get("MULTIPLET_CACHE_DIR"):
+        from result_cache import ResultCache
+        cache = ResultCache()
+    njobs = 0
+    idle_since = time.monotonic()
+    while max_jobs is None or njobs < max_jobs:
+        if os.path.exists(os.path.join(spool_dir, STOP_NAME)):
+            break
+        reclaim(spool_dir, worker, stale_timeout)
+        path, spec = claim(spool_dir, worker)
+        if path is None:
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+        record = run_claimed(spool_dir, path, spec, worker, multiplet_path, cache,
+                             threads, heartbeat)
+        status = "lost claim" if record is None else f"exit code {record['exit_code']}"
+        print(f"{worker}: {spec['name']} {status}", flush=True)
+        njobs += 1
+        idle_since = time.monotonic()
+    return njobs
+
+
+def _work_process(args):
+    spool_dir, multiplet_path, threads, idle_timeout = args
+    return work(spool_dir, multiplet_path, threads, idle_timeout=idle_timeout)
+
+
+def run_workers(spool_dir, nworkers, multiplet_path=None, idle_timeout=None):
+    """
+    Run nworkers worker processes on this node, sharing its cores
+
+    Returns:
+        Number of jobs run
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if multiplet_path is None:
+        multiplet_path = default_multiplet_path()
+    args = (spool_dir, multiplet_path, threads_per_job(nworkers), idle_timeout)
+    with ProcessPoolExecutor(max_workers=nworkers) as pool:
+        return sum(pool.map(_work_process, [args] * nworkers))
+
+
+def status(spool_dir):
+    """Number of jobs per state"""
+    return {state: len(_specs(spool_dir, state)) for state in STATES}
+
+
+def requeue_failed(spool_dir):
+    """
+    Move failed jobs back to pending (e.g. for workers with more memory)
+
+    Returns:
+        Number of requeued jobs
+    """
+    requeued = 0
+    for name in _specs(spool_dir, "failed"):
+        path = os.path.join(spool_dir, "failed", name)
+        record = _read_json(path)
+        spec = record.get("spec")
+        if spec is None:
+            continue
+        spec["attempts"] = 0
+        spec["previous_error"] = record.get("error")
+        _write_json(os.path.join(spool_dir, "pending", name), spec)
+        os.remove(path)
+        requeued += 1
+    return requeued
+
+
+def collect(spool_dir, sweep_dir):
+    """
+    Write sweep_dir/manifest.json from the finished jobs of a sweep
+    submitted with submit_sweep
+
+    Returns:
+        The manifest dict
+    """
+    from multiplet_sweep import write_manifest
+
+    tag = os.path.basename(os.path.abspath(sweep_dir)) + "."
+    records = []
+    for state in ("done", "failed"):
+        for name in _specs(spool_dir, state):
+            if name.startswith(tag):
+                record = _read_json(os.path.join(spool_dir, state, name))
+                record["name"] = record["name"][len(tag):]
+                records.append(record)
+    records.sort(key=lambda record: record["name"])
+    counts = status(spool_dir)
+    manifest = {
+        "spool_dir": os.path.abspath(spool_dir),
+        "queue": counts,
+        "run_time": sum(record.get("wall_time") or 0. for record in records),
+        "jobs": records,
+    }
+    write_manifest(sweep_dir, manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    usage = ("Usage: python spool_queue.py submit spool_dir base_input grid.json sweep_dir\n"
+             "       python spool_queue.py work spool_dir [nworkers] [idle_timeout]\n"
+             "       python spool_queue.py status spool_dir\n"
+             "       python spool_queue.py requeue spool_dir\n"
+             "       python spool_queue.py collect spool_dir sweep_dir")
+    commands = {"submit": 6, "work": 3, "status": 3, "requeue": 3, "collect": 4}
+    if len(sys.argv) < 3 or sys.argv[1] not in commands or len(sys.argv) < commands[sys.argv[1]]:
+        print(usage)
+        sys.exit(1)
+
+    command, spool_dir = sys.argv[1], sys.argv[2]
+    if command == "submit":
+        with open(sys.argv[4], 'r') as f:
+            grid = json.load(f)
+        n = submit_sweep(sys.argv[3], grid, sys.argv[5], spool_dir)
+        print(f"{n} jobs submitted to {spool_dir}")
+    elif command == "work":
+        nworkers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+        idle_timeout = float(sys.argv[4]) if len(sys.argv) > 4 else None
+        n = run_workers(spool_dir, nworkers, idle_timeout=idle_timeout)
+        print(f"{n} jobs run")
+    elif command == "status":
+        print(", ".join(f"{n} {state}" for state, n in status(spool_dir).items()))
+    elif command == "requeue":
+        print(f"{requeue_failed(spool_dir)} jobs requeued")
+    else:
+        manifest = collect(spool_dir, sys.argv[3])
+        failed = [job for job in manifest["jobs"] if job["exit_code"] != 0]
+        print(f"{len(manifest['jobs'])} finished jobs, {len(failed)} failed; "
+              f"manifest written to {os.path.join(sys.argv[3], 'manifest.json')}")
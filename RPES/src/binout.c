@@ -0,0 +1,66 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include "globals.h"
+
+/*
+   Binary output files. Each file holds one array :
+     char    magic[8] = "MPLTBIN1"
+     int32   dtype      BINDOUBLE (1) = float64, BINCOMPLEX (2) = complex128
+     int32   ndim
+     int64   dims[ndim]
+     data    row-major (C order), complex as (re,im) pairs
+   All numbers are little-endian. The file may be written record by record
+   along the first dimension; readers treat a short file as holding only
+   the complete records (see multiplet_data.py).
+*/
+
+static int islittleendian( void )
+{
+  int one = 1 ;
+  return *( char * ) &one ;
+}
+
+static void lewrite( FILE *fp, void *p, int size, long n )
+{
+  char *c = ( char * ) p, buf[8] ;
+  long i ;
+  int k ;
+  if ( islittleendian() ) { fwrite( p, size, n, fp ) ; return ; }
+  for ( i = 0 ; i < n ; i++, c += size ) {
+    for ( k = 0 ; k < size ; k++ ) buf[k] = c[size-1-k] ;
+    fwrite( buf, size, 1, fp ) ;
+  }
+}
+
+FILE *binopen( const char *name, int dtype, int ndim, long *dims )
+{
+  FILE *fp ;
+  int i, idum ;
+  long long lldum ;
+  fp = fopen( name, "wb" ) ;
+  if ( fp == 0 ) { printf("binopen: cannot open %s\n", name ) ; engineexit(1) ; }
+  fwrite( "MPLTBIN1", 1, 8, fp ) ;
+  idum = dtype ; lewrite( fp, &idum, 4, 1 ) ;
+  idum = ndim ;  lewrite( fp, &idum, 4, 1 ) ;
+  for ( i = 0 ; i < ndim ; i++ ) {
+    lldum = dims[i] ;
+    lewrite( fp, &lldum, 8, 1 ) ;
+  }
+  return fp ;
+}
+
+/* append n doubles */
+void binwrite( FILE *fp, double *data, long n )
+{
+  lewrite( fp, data, sizeof( double ), n ) ;
+}
+
+/* write a whole 1-dim array of doubles into file  name  */
+void binwritearray( const char *name, double *data, long n )
+{
+  FILE *fp ;
+  fp = binopen( name, BINDOUBLE, 1, &n ) ;
+  binwrite( fp, data, n ) ;
+  fclose( fp ) ;
+}
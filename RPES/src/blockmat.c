@@ -0,0 +1,104 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include "globals.h"
+
+/*
+   block matrices ( struct Blockmat in globals.h ) : nblk dense blocks of
+   nrow x ncol elements, stacked along the rows. Element (ib,i,j) is
+   block[ib][ i*ncol + j ]. Blocks that are identically zero are not
+   allocated ( block[ib] == 0 ). Used for (F|V|M), with one block per
+   photoelectron spin-orbital.
+*/
+
+/* Fortran function declaration ( BLAS ) */
+extern void dgemm_(char *transa, char *transb, int *m, int *n, int *k,
+                   double *alpha, double *a, int *lda, double *b, int *ldb,
+                   double *beta, double *c, int *ldc);
+
+struct Blockmat blockmatmake( int nblk, int nrow, int ncol )
+{
+  struct Blockmat bm ;
+
+  bm.nblk = nblk ;
+  bm.nrow = nrow ;
+  bm.ncol = ncol ;
+  bm.block = ( double ** ) calloc( nblk, sizeof( double * ) ) ;
+  return bm ;
+}
+
+/* allocate block ib ( zero ) and return it */
+double *blockmatalloc( struct Blockmat *bm, int ib )
+{
+  if ( bm -> block[ib] == 0 )
+    bm -> block[ib] = ( double * ) calloc( (size_t) bm -> nrow * bm -> ncol, sizeof( double ) ) ;
+  return bm -> block[ib] ;
+}
+
+void blockmatdelete( struct Blockmat *bm )
+{
+  int ib ;
+
+  for ( ib = 0 ; ib < bm -> nblk ; ib++ )
+    free( bm -> block[ib] ) ;
+  free( bm -> block ) ;
+  bm -> block = 0 ;
+}
+
+/* number of allocated blocks */
+int blockmatnblocks( struct Blockmat bm )
+{
+  int ib, n = 0 ;
+
+  for ( ib = 0 ; ib < bm.nblk ; ib++ )
+    if ( bm.block[ib] ) n++ ;
+  return n ;
+}
+
+/* write all elements in row order to a binary file ( see binout.c ) */
+void blockmatwrite( FILE *fpb, struct Blockmat bm )
+{
+  int ib, i ;
+  double *zero ;
+
+  zero = ( double * ) calloc( bm.ncol, sizeof( double ) ) ;
+  for ( ib = 0 ; ib < bm.nblk ; ib++ )
+    for ( i = 0 ; i < bm.nrow ; i++ )
+      binwrite( fpb, bm.block[ib] ? bm.block[ib] + (size_t) i * bm.ncol : zero, bm.ncol ) ;
+  free( zero ) ;
+}
+
+/*
+   f[j][m] = Sum_i vec[ i + nbas*j ] b[i][m]   ( j < nvec, m < ncol )
+   i.e. rows of  b  ( nbas x ncol, row-major ) transformed to the
+   eigenvectors  vec  ( columns of length nbas, as returned by solve_eigen ).
+   One DGEMM call: in column-major order f^T = b^T vec.
+*/
+void rotaterows( int nbas, int nvec, int ncol, double *vec, double *b, double *f )
+{
+  char N = 'N' ;
+  double one = 1., zero = 0. ;
+
+  if ( nbas <= 0 || nvec <= 0 || ncol <= 0 ) return ;
+  dgemm_( &N, &N, &ncol, &nvec, &nbas, &one, b, &ncol, vec, &nbas, &zero, f, &ncol ) ;
+}
+
+/*
+   y[ i + nrow*c ] = Sum_j block[ib][i][j] x[ j + ncol*c ]   ( c < nx )
+   i.e. block ib times the nx columns  x  ( each of length ncol ), the
+   result as nx columns of length nrow. A zero block gives zero columns.
+   One DGEMM call: in column-major order the block is its transpose.
+*/
+void blockmatmul( struct Blockmat bm, int ib, int nx, double *x, double *y )
+{
+  char N = 'N', T = 'T' ;
+  double one = 1., zero = 0. ;
+
+  if ( bm.nrow <= 0 || nx <= 0 ) return ;
+  if ( bm.block[ib] == 0 || bm.ncol <= 0 ) {
+    memset( y, 0, (size_t) bm.nrow * nx * sizeof( double ) ) ;
+    return ;
+  }
+  dgemm_( &T, &N, &bm.nrow, &nx, &bm.ncol, &one, bm.block[ib], &bm.ncol,
+          x, &bm.ncol, &zero, y, &bm.nrow ) ;
+}
@@ -13,7 +13,7 @@ int crystalfield2list( int nshells, int *lsh, int *sorb1sh, int ish,
 
   if ( lsh[ish] != 2 ) { 
     printf("crystalfield2list: Shell No %d is not a d-shell. Stop.\n",ish);
-    exit(1) ;
+    engineexit(1) ;
   }
   /* make cfdmat traceless */
   for ( dum = 0., m1 = -2 ; m1 <= 2 ; m1++)
@@ -45,17 +45,17 @@ int crystalfieldC42list( int nshells, int *lsh, int *sorb1sh, int ish,
 
   if ( lsh[ish] != 2 ) { 
      printf("crystalfieldC42list: Shell No %d is not a d-shell. Stop.\n",ish);
-     exit(1) ;
+     engineexit(1) ;
   }
   shift = 0.2*(ea1+eb1+eb2+2.*ee) ;
   ea1 -= shift ; eb1 -= shift ; eb2 -= shift ; ee -= shift ;
-  printf("Eav substracted. a1=%.4lf b1=%.4lf b2=%.4lf e=%.4lf\n", ea1,eb1,eb2,ee) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("Eav substracted. a1=%.4lf b1=%.4lf b2=%.4lf e=%.4lf\n", ea1,eb1,eb2,ee) ;
   /* diagonal elements: 0:ea1, 1,-1:ee,  <2|CF|2>=<-2|CF|-2>=(eb1+eb2)/2 */
   for ( m = -2 ; m <= 2 ; m++ ) {
     if ( m == 0 ) shift = ea1 ;
     else if ( m == 1 || m == -1 ) shift = ee ;
     else if ( m == 2 || m == -2 ) shift = 0.5*(eb1+eb2) ;
-    else { printf("TROUBLE in crystalfieldC42list\n") ; exit(1) ; }
+    else { printf("TROUBLE in crystalfieldC42list\n") ; engineexit(1) ; }
     if ( fabs( shift ) > EPSILON ) {
       for ( sigma = -1 ; sigma <= 1 ; sigma += 2 ) {
         i1 = sporbindex( sorb1sh, lsh, ish, m, sigma ) ; 
@@ -0,0 +1,309 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <complex.h>
+#include "globals.h"
+#include "ndimarraycalloc.h"
+#ifdef _WIN32
+#include <io.h>
+#else
+#include <unistd.h>
+#endif
+
+/*
+   Checkpoint and resume of the omega loop ( MULTIPLET_CHECKPOINT=1 ).
+   Everything before the loop ( diagonalizations, pesmatele, xasmatele,
+   (F|V|M) ) is saved in  checkpoint.bin  once; after every omega point
+   checkpoint.omega  records the number of completed points and the size
+   of each per-omega output file. A run of the same input in the same
+   directory then reads  checkpoint.bin, cuts the output files back to
+   the recorded sizes ( a point that was being written when the run died
+   is dropped ) and continues with the next omega, appending to them.
+   Both files are removed when the loop is complete.
+
+   checkpoint.bin  ( native byte order, only read back on the same machine ):
+     char    magic[8] = "MPLTCKP1"
+     int     1 ( byte order check )
+     uint64  hash of the input and of the options that change the output
+     int     gstdeg, nnm1fst, npesorb, nmstates, nomega
+     double  gstenergy, ommin, ommax, deltaom
+     double  gstweight[gstdeg], nm1fenergy[nnm1fst], menergy[nmstates],
+             gamst[nmstates], xasmatele[3][gstdeg][nmstates],
+             pesmatele[3][npesorb][gstdeg][nnm1fst]
+     per (F|V|M) block: int stored, and if stored nnm1fst x nmstates doubles
+   checkpoint.omega  ( text ):
+     hash done nomega
+     name size        one line per output file
+*/
+
+#define CKPBIN   "checkpoint.bin"
+#define CKPOMEGA "checkpoint.omega"
+#define CKPMAGIC "MPLTCKP1"
+#define MAXCKPFILES 16
+
+static unsigned long long inputhash ;
+static FILE *inputcopy ;
+static int nckpfiles ;
+static char ckpname[MAXCKPFILES][32] ;
+static long ckpsize[MAXCKPFILES] ;
+
+static void hashbytes( const void *p, size_t n )
+{
+  const unsigned char *c = ( const unsigned char * ) p ;
+  size_t i ;
+  for ( i = 0 ; i < n ; i++ ) {
+    inputhash ^= c[i] ;
+    inputhash *= 1099511628211ULL ;   /* FNV-1a */
+  }
+}
+
+/* replace a file: rename does not overwrite on Windows */
+static int replacefile( const char *from, const char *to )
+{
+#ifdef _WIN32
+  remove( to ) ;
+#endif
+  return rename( from, to ) ;
+}
+
+static long filesize( const char *name )
+{
+  FILE *fp ;
+  long size ;
+  fp = fopen( name, "rb" ) ;
+  if ( fp == 0 ) return -1 ;
+  fseek( fp, 0, SEEK_END ) ;
+  size = ftell( fp ) ;
+  fclose( fp ) ;
+  return size ;
+}
+
+/*
+   checkpointinput  reads the whole input from  finput  into a temporary
+   file, which becomes  finput , and hashes its numbers together with the
+   options that change the results, so that a checkpoint is only used for
+   the same calculation. The input is a plain stream of numbers read with
+   fscanf, so the tokens are hashed and comments or spacing do not matter.
+*/
+void checkpointinput( void )
+{
+  char token[256] ;
+  int i ;
+
+  inputcopy = tmpfile() ;
+  if ( inputcopy == 0 ) { printf("checkpoint: no temporary file for the input\n") ; engineexit(1) ; }
+  inputhash = 14695981039346656037ULL ;
+  while ( fscanf( finput, "%255s", token ) == 1 ) {
+    fprintf( inputcopy, "%s\n", token ) ;
+    hashbytes( token, strlen( token ) + 1 ) ;
+  }
+  rewind( inputcopy ) ;
+  finput = inputcopy ;
+  hashbytes( &options.output, sizeof( int ) ) ;
+  for ( i = 0 ; i < 3 ; i++ ) {
+    hashbytes( &options.eig[i].mode, sizeof( int ) ) ;
+    hashbytes( &options.eig[i].n, sizeof( int ) ) ;
+    hashbytes( &options.eig[i].emin, sizeof( double ) ) ;
+    hashbytes( &options.eig[i].emax, sizeof( double ) ) ;
+  }
+}
+
+/* write the state before the omega loop; a failure only disables the checkpoint */
+void checkpointwrite( struct Omegaloop *ol )
+{
+  FILE *fp ;
+  int one = 1, ib, iq, iso, igstdeg, stored ;
+  int ok ;
+
+  fp = fopen( CKPBIN ".tmp", "wb" ) ;
+  if ( fp == 0 ) { printf("checkpoint: cannot write %s, continuing without\n", CKPBIN ) ; return ; }
+  fwrite( CKPMAGIC, 1, 8, fp ) ;
+  fwrite( &one, sizeof( int ), 1, fp ) ;
+  fwrite( &inputhash, sizeof( inputhash ), 1, fp ) ;
+  fwrite( &ol -> gstdeg, sizeof( int ), 1, fp ) ;
+  fwrite( &ol -> nnm1fst, sizeof( int ), 1, fp ) ;
+  fwrite( &ol -> npesorb, sizeof( int ), 1, fp ) ;
+  fwrite( &ol -> nmstates, sizeof( int ), 1, fp ) ;
+  fwrite( &ol -> nomega, sizeof( int ), 1, fp ) ;
+  fwrite( &ol -> gstenergy, sizeof( double ), 1, fp ) ;
+  fwrite( &ol -> ommin, sizeof( double ), 1, fp ) ;
+  fwrite( &ol -> ommax, sizeof( double ), 1, fp ) ;
+  fwrite( &ol -> deltaom, sizeof( double ), 1, fp ) ;
+  fwrite( ol -> gstweight, sizeof( double ), ol -> gstdeg, fp ) ;
+  fwrite( ol -> nm1fenergy, sizeof( double ), ol -> nnm1fst, fp ) ;
+  fwrite( ol -> menergy, sizeof( double ), ol -> nmstates, fp ) ;
+  fwrite( ol -> gamst, sizeof( double ), ol -> nmstates, fp ) ;
+  for ( iq = 0 ; iq < 3 ; iq++ )
+    for ( igstdeg = 0 ; igstdeg < ol -> gstdeg ; igstdeg++ )
+      fwrite( ol -> xasmatele[iq][igstdeg], sizeof( double ), ol -> nmstates, fp ) ;
+  for ( iq = 0 ; iq < 3 ; iq++ )
+    for ( iso = 0 ; iso < ol -> npesorb ; iso++ )
+      for ( igstdeg = 0 ; igstdeg < ol -> gstdeg ; igstdeg++ )
+        fwrite( ol -> pesmatele[iq][iso][igstdeg], sizeof( double ), ol -> nnm1fst, fp ) ;
+  for ( ib = 0 ; ib < ol -> npesorb ; ib++ ) {
+    stored = ol -> fstvmst.block[ib] != 0 ;
+    fwrite( &stored, sizeof( int ), 1, fp ) ;
+    if ( stored )
+      fwrite( ol -> fstvmst.block[ib], sizeof( double ),
+              (size_t) ol -> nnm1fst * ol -> nmstates, fp ) ;
+  }
+  ok = ! ferror( fp ) ;
+  if ( fclose( fp ) != 0 ) ok = 0 ;
+  if ( ! ok || replacefile( CKPBIN ".tmp", CKPBIN ) != 0 ) {
+    printf("checkpoint: cannot write %s, continuing without\n", CKPBIN ) ;
+    remove( CKPBIN ".tmp" ) ;
+    options.checkpoint = 0 ;
+  }
+}
+
+static int readall( FILE *fp, void *p, size_t size, size_t n )
+{
+  return fread( p, size, n, fp ) == n ;
+}
+
+/*
+   checkpointread  fills ol from  checkpoint.bin  if it was written for
+   this input. Returns -1 if there is no such checkpoint, else the number
+   of completed omega points ( 0 if  checkpoint.omega  is missing, does
+   not belong to it or an output file is shorter than recorded ).
+*/
+int checkpointread( struct Omegaloop *ol )
+{
+  FILE *fp ;
+  char magic[8] ;
+  unsigned long long hash ;
+  int one, ok, ib, iq, iso, igstdeg, stored, done, nomega ;
+
+  fp = fopen( CKPBIN, "rb" ) ;
+  if ( fp == 0 ) return -1 ;
+  ok = readall( fp, magic, 1, 8 ) && memcmp( magic, CKPMAGIC, 8 ) == 0
+    && readall( fp, &one, sizeof( int ), 1 ) && one == 1
+    && readall( fp, &hash, sizeof( hash ), 1 ) && hash == inputhash
+    && readall( fp, &ol -> gstdeg, sizeof( int ), 1 )
+    && readall( fp, &ol -> nnm1fst, sizeof( int ), 1 )
+    && readall( fp, &ol -> npesorb, sizeof( int ), 1 )
+    && readall( fp, &ol -> nmstates, sizeof( int ), 1 )
+    && readall( fp, &ol -> nomega, sizeof( int ), 1 )
+    && readall( fp, &ol -> gstenergy, sizeof( double ), 1 )
+    && readall( fp, &ol -> ommin, sizeof( double ), 1 )
+    && readall( fp, &ol -> ommax, sizeof( double ), 1 )
+    && readall( fp, &ol -> deltaom, sizeof( double ), 1 )
+    && ol -> gstdeg > 0 && ol -> nnm1fst > 0 && ol -> npesorb > 0 && ol -> nmstates > 0 ;
+  if ( ! ok ) { fclose( fp ) ; return -1 ; }
+
+  ol -> gstweight = ( double * ) malloc( ol -> gstdeg * sizeof( double ) ) ;
+  ol -> nm1fenergy = ( double * ) malloc( ol -> nnm1fst * sizeof( double ) ) ;
+  ol -> menergy = ( double * ) malloc( ol -> nmstates * sizeof( double ) ) ;
+  ol -> gamst = ( double * ) malloc( ol -> nmstates * sizeof( double ) ) ;
+  ol -> xasmatele = calloc3double( 3, ol -> gstdeg, ol -> nmstates ) ;
+  ol -> pesmatele = calloc4double( 3, ol -> npesorb, ol -> gstdeg, ol -> nnm1fst ) ;
+  ol -> fstvmst = blockmatmake( ol -> npesorb, ol -> nnm1fst, ol -> nmstates ) ;
+  ok = readall( fp, ol -> gstweight, sizeof( double ), ol -> gstdeg )
+    && readall( fp, ol -> nm1fenergy, sizeof( double ), ol -> nnm1fst )
+    && readall( fp, ol -> menergy, sizeof( double ), ol -> nmstates )
+    && readall( fp, ol -> gamst, sizeof( double ), ol -> nmstates ) ;
+  for ( iq = 0 ; iq < 3 ; iq++ )
+    for ( igstdeg = 0 ; ok && igstdeg < ol -> gstdeg ; igstdeg++ )
+      ok = readall( fp, ol -> xasmatele[iq][igstdeg], sizeof( double ), ol -> nmstates ) ;
+  for ( iq = 0 ; iq < 3 ; iq++ )
+    for ( iso = 0 ; iso < ol -> npesorb ; iso++ )
+      for ( igstdeg = 0 ; ok && igstdeg < ol -> gstdeg ; igstdeg++ )
+        ok = readall( fp, ol -> pesmatele[iq][iso][igstdeg], sizeof( double ), ol -> nnm1fst ) ;
+  for ( ib = 0 ; ok && ib < ol -> npesorb ; ib++ ) {
+    ok = readall( fp, &stored, sizeof( int ), 1 ) ;
+    if ( ok && stored )
+      ok = readall( fp, blockmatalloc( &ol -> fstvmst, ib ), sizeof( double ),
+                    (size_t) ol -> nnm1fst * ol -> nmstates ) ;
+  }
+  fclose( fp ) ;
+  if ( ! ok ) {
+    printf("checkpoint: %s is incomplete, starting from the beginning\n", CKPBIN ) ;
+    omegaloopfree( ol ) ;
+    return -1 ;
+  }
+
+  done = 0 ;
+  nckpfiles = 0 ;
+  fp = fopen( CKPOMEGA, "r" ) ;
+  if ( fp ) {
+    if ( fscanf( fp, "%llx%d%d", &hash, &done, &nomega ) != 3
+         || hash != inputhash || nomega != ol -> nomega || done < 0 )
+      done = 0 ;
+    while ( done > 0 && nckpfiles < MAXCKPFILES
+            && fscanf( fp, "%31s%ld", ckpname[nckpfiles], &ckpsize[nckpfiles] ) == 2 ) {
+      if ( filesize( ckpname[nckpfiles] ) < ckpsize[nckpfiles] ) done = 0 ;
+      nckpfiles++ ;
+    }
+    fclose( fp ) ;
+  }
+  if ( done == 0 ) nckpfiles = 0 ;
+  return done ;
+}
+
+/*
+   checkpointreopen  opens an output file of the omega loop for appending,
+   cut back to the size recorded in  checkpoint.omega
+*/
+FILE *checkpointreopen( const char *name, const char *mode )
+{
+  FILE *fp ;
+  int i ;
+
+  for ( i = 0 ; i < nckpfiles ; i++ )
+    if ( strcmp( ckpname[i], name ) == 0 ) break ;
+  if ( i == nckpfiles ) { printf("checkpoint: no size of %s recorded\n", name ) ; engineexit(1) ; }
+  fp = fopen( name, mode ) ;
+  if ( fp == 0 ) { printf("checkpoint: cannot open %s\n", name ) ; engineexit(1) ; }
+#ifdef _WIN32
+  if ( _chsize( _fileno( fp ), ckpsize[i] ) != 0 ) {
+#else
+  if ( ftruncate( fileno( fp ), ckpsize[i] ) != 0 ) {
+#endif
+    printf("checkpoint: cannot truncate %s\n", name ) ;
+    engineexit(1) ;
+  }
+  fseek( fp, 0, SEEK_END ) ;
+  return fp ;
+}
+
+/*
+   checkpointmark  records that  done  of  nomega  points are complete,
+   with the sizes of the output files fps[i] ( 0 for files not written )
+*/
+void checkpointmark( int done, int nomega, int nfiles, const char **names, FILE **fps )
+{
+  FILE *fp ;
+  int i ;
+
+  fp = fopen( CKPOMEGA ".tmp", "w" ) ;
+  if ( fp == 0 ) return ;
+  fprintf( fp, "%016llx %d %d\n", inputhash, done, nomega ) ;
+  for ( i = 0 ; i < nfiles ; i++ ) {
+    if ( fps[i] == 0 ) continue ;
+    fflush( fps[i] ) ;
+    fprintf( fp, "%s %ld\n", names[i], ftell( fps[i] ) ) ;
+  }
+  if ( fclose( fp ) == 0 ) replacefile( CKPOMEGA ".tmp", CKPOMEGA ) ;
+}
+
+/* the omega loop is complete: remove the checkpoint */
+void checkpointfinish( void )
+{
+  if ( inputcopy ) fclose( inputcopy ) ;
+  inputcopy = 0 ;
+  finput = 0 ;
+  remove( CKPBIN ) ;
+  remove( CKPOMEGA ) ;
+}
+
+/* free the arrays of the omega loop */
+void omegaloopfree( struct Omegaloop *ol )
+{
+  free4double( 3, ol -> npesorb, ol -> gstdeg, ol -> pesmatele ) ;
+  free3double( 3, ol -> gstdeg, ol -> xasmatele ) ;
+  free( ol -> gstweight ) ;
+  free( ol -> nm1fenergy ) ;
+  free( ol -> menergy ) ;
+  free( ol -> gamst ) ;
+  blockmatdelete( &ol -> fstvmst ) ;
+}
@@ -2,6 +2,7 @@
 #include <complex.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include "globals.h"
 /* #define PI 3.141592653589793238512808959406186204433 */
 #define FOURPI 12.56637061435917295405123583762474481773
 
@@ -10,7 +11,7 @@ double plgndr( int l, int m, double x )
   double fact, pll, pmm, pmmp1, somx2 ;
   int i, ll ;
   if ( l < 0 || m < 0 || m > l || fabs(x) > 1. ) {
-    printf("bad args in plgdr()\n") ; exit(1) ; 
+    printf("bad args in plgdr()\n") ; engineexit(1) ; 
   }
   pmm = 1. ;
   if ( m > 0 ) {
@@ -42,7 +43,7 @@ double complex cylm( int l, int m, double x, double phi)
   int signm, absm, k, sign ;
   double dum, yre, yim ;
   if ( l < 0 || m < -l || m > l || fabs(x) > 1. ) {
-    printf("bad args in cylm()\n") ; exit(1) ; 
+    printf("bad args in cylm()\n") ; engineexit(1) ; 
   }
   signm = ( m >= 0 ? 1 : -1 ) ;
   absm  = signm * m ;
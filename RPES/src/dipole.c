@@ -40,8 +40,9 @@ int dipole2list( int nshells, int *lsh, int *sorb1sh, int inish, int q,
 	if ( -lf <= mf && mf <= lf ) {
 	  sign = ( lf - mf ) % 2 == 0 ? 1 : -1 ;
 	  val = sign * w3j( 2*lf, 2, 2*li, -2*mf, 2*q, 2*mi ) * reducedmatele ;
-	printf("li=%d, mi=%d, lf=%d, mf=%d, si=%d, w3j=%lf, re=%lf, val=%lf\n",
-	li,mi,lf,mf,sign,w3j(2*lf,2,2*li,-2*mf,2*q,2*mi),reducedmatele,val ) ;
+	  if ( VERBOSE( VERBFULL ) )
+	    printf("li=%d, mi=%d, lf=%d, mf=%d, si=%d, w3j=%lf, re=%lf, val=%lf\n",
+	    li,mi,lf,mf,sign,w3j(2*lf,2,2*li,-2*mf,2*q,2*mi),reducedmatele,val ) ;
 	  if ( val != 0 ) {
 	    /* write matrix elements in list */
 	    for ( sigma = -1 ; sigma <= 1 ; sigma += 2 ) {
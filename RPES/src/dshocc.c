@@ -15,7 +15,7 @@ int dxyocc2list( int nshells, int *lsh, int *sorb1sh, int ish,
 
   if ( lsh[ish] != 2 ) { 
      printf("dxyocc2list: Shell No %d is not a d-shell. Stop.\n",ish);
-     exit(1) ;
+     engineexit(1) ;
   }
   for ( m1 = -2 ; m1 <= 2 ; m1++ ) {
     for ( m2 = -2 ; m2 <= 2 ; m2++ ) {
@@ -44,7 +44,7 @@ int t2gocc2list( int nshells, int *lsh, int *sorb1sh, int ish,
 
   if ( lsh[ish] != 2 ) { 
      printf("t2gocc2list: Shell No %d is not a d-shell. Stop.\n",ish);
-     exit(1) ;
+     engineexit(1) ;
   }
   for ( m1 = -2 ; m1 <= 2 ; m1++ ) {
     for ( m2 = -2 ; m2 <= 2 ; m2++ ) {
@@ -73,7 +73,7 @@ int egocc2list( int nshells, int *lsh, int *sorb1sh, int ish,
 
   if ( lsh[ish] != 2 ) { 
      printf("t2gocc2list: Shell No %d is not a d-shell. Stop.\n",ish);
-     exit(1) ;
+     engineexit(1) ;
   }
   for ( m1 = -2 ; m1 <= 2 ; m1++ ) {
     for ( m2 = -2 ; m2 <= 2 ; m2++ ) {
@@ -33,6 +33,57 @@ struct O2plistitem { int i1,i2,i3,i4 ; double v ; struct O2plistitem *next ; };
 
 /* one line of a sparse matrix */
 struct Spamaline { int n, *j ; double *v ; } ;
+/* sparse matrix in compressed sparse row form ( see spama.c ) */
+struct Spamat { int nrow, ncol, *rowptr, *col ; double *val ; } ;
+/* sparse accumulator of one matrix column ( see spama.c ) */
+struct Spacc { int nj, *j ; char *hit ; double *v ; } ;
+
+/* nblk dense nrow x ncol blocks, block[ib] == 0 if zero ( see blockmat.c ) */
+struct Blockmat { int nblk, nrow, ncol ; double **block ; } ;
+
+/* run-time options ( see options.c ) */
+#define OUTNONE   0   /* no output files ( library runs, see library.c ) */
+#define OUTTEXT   1
+#define OUTBINARY 2
+#define VERBQUIET   0   /* errors only */
+#define VERBSUMMARY 1   /* counts, energies and progress */
+#define VERBFULL    2   /* also prompts, state vectors, operator and matrix dumps */
+#define VERBOSE( level ) ( options.verbosity >= ( level ) )
+/* selection of eigenpairs per block ( see solve_eigen in solve_dsyev.c ) */
+#define EIGALL    0   /* all eigenpairs ( dsyev ) */
+#define EIGLOWEST 1   /* the n lowest; n = 0: the lowest level */
+#define EIGWINDOW 2   /* emin < E - E_ref <= emax */
+#define BLKGROUND       0
+#define BLKFINAL        1
+#define BLKINTERMEDIATE 2
+struct Eigsel { int mode, n ; double emin, emax ; } ;
+struct Options { int output, dump, verbosity, progress, omegablock, threads, checkpoint ;
+                 struct Eigsel eig[3] ; } ;
+extern struct Options options ;
+
+/* results of one run, filled by multiplet( res ) if res != 0 ( see library.c ).
+   Row-major arrays: groundenergy[nground], nm1fenergy[nfinal],
+   menergy[nintermediate], gamst[nintermediate], omega[nomega],
+   pesmatele[3][npesorb][gstdeg][nfinal], xasmatele[3][gstdeg][nintermediate],
+   rpesalms[nomega][gstdeg][nfinal][npesorb][3] complex ( re, im pairs ) */
+struct Results { int nground, nfinal, nintermediate, gstdeg, npesorb, nomega ;
+                 double gstenergy, *groundenergy, *nm1fenergy, *menergy, *gamst,
+                        *omega, *pesmatele, *xasmatele, *rpesalms ; } ;
+
+/* state of the omega loop: computed before it, or read from a checkpoint
+   ( see checkpoint.c ). Arrays as in main.c: gstweight[gstdeg],
+   nm1fenergy[nnm1fst], menergy[nmstates], gamst[nmstates],
+   xasmatele[3][gstdeg][nmstates], pesmatele[3][npesorb][gstdeg][nnm1fst],
+   fstvmst npesorb blocks of nnm1fst x nmstates */
+struct Omegaloop { int gstdeg, nnm1fst, npesorb, nmstates, nomega ;
+                   double gstenergy, ommin, ommax, deltaom, *gstweight,
+                          *nm1fenergy, *menergy, *gamst, ***xasmatele,
+                          ****pesmatele ;
+                   struct Blockmat fstvmst ; } ;
+
+/* element types of binary output files ( see binout.c ) */
+#define BINDOUBLE  1
+#define BINCOMPLEX 2
 
 /* list of C.I. Slater integrals Rk(ish4,ish3;ish1,ish2) == rmx[k], k=0..nk-1*/
 struct CIlistitem { int ish1, ish2, ish3, ish4, nk ; double *rmx ;
@@ -73,16 +124,62 @@ int t2gocc2list( int nshells, int *lsh, int *sorb1sh, int ish,
 		 struct O1plistitem **ppo1plistitem0 ) ;
 int dxyocc2list( int nshells, int *lsh, int *sorb1sh, int ish,
 		 struct O1plistitem **ppo1plistitem0 ) ;
-int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
+int calcham( struct Spamat *pham, int nstates, struct Fock *state,
 	     int nconfs, int nshells, int *lsh, int *sorb1sh, int **occ, 
              double *ksish, double e2p, double e3d, double **cfdmat,
 	     double h, double theta ) ;
 int solve_dsyev(int n, double* a, double* lambda ) ;
+int solve_dsyevr(int n, double* a, double* lambda, char jobz, char range, char uplo,
+                 double vl, double vu, int il, int iu, double* z, int *pm ) ;
+int solve_eigen(int n, double* a, double* lambda, struct Eigsel sel,
+                double eref, int *pm ) ;
 int dipole2list( int nshells, int *lsh, int *sorb1sh, int inish, int q,
                  double **radipmatele, struct O1plistitem **ppitem0 ) ;
 int vai2list( int nshells, int *lsh, int *sorb1sh, 
               struct O2plistitem **ppo2plistitem0 ) ;
 
+/* the engine ( see main.c and library.c ) */
+extern FILE *finput ;
+int multiplet( struct Results *res ) ;
+void engineexit( int status ) ;
+int multiplet_run( const char *input, int verbosity, int threads,
+                   struct Results *res ) ;
+void multiplet_free( struct Results *res ) ;
+
+/* options and binary output */
+void readoptions( void ) ;
+void setthreads( int n ) ;
+int nthreads( void ) ;
+FILE *binopen( const char *name, int dtype, int ndim, long *dims ) ;
+void binwrite( FILE *fp, double *data, long n ) ;
+void binwritearray( const char *name, double *data, long n ) ;
+
+/* checkpoint and resume of the omega loop ( see checkpoint.c ) */
+void checkpointinput( void ) ;
+int checkpointread( struct Omegaloop *ol ) ;
+void checkpointwrite( struct Omegaloop *ol ) ;
+FILE *checkpointreopen( const char *name, const char *mode ) ;
+void checkpointmark( int done, int nomega, int nfiles, const char **names, FILE **fps ) ;
+void checkpointfinish( void ) ;
+void omegaloopfree( struct Omegaloop *ol ) ;
+
+/* block matrices ( see blockmat.c ) */
+struct Blockmat blockmatmake( int nblk, int nrow, int ncol ) ;
+double *blockmatalloc( struct Blockmat *bm, int ib ) ;
+void blockmatdelete( struct Blockmat *bm ) ;
+int blockmatnblocks( struct Blockmat bm ) ;
+void blockmatwrite( FILE *fpb, struct Blockmat bm ) ;
+void rotaterows( int nbas, int nvec, int ncol, double *vec, double *b, double *f ) ;
+void blockmatmul( struct Blockmat bm, int ib, int nx, double *x, double *y ) ;
+
+/* timing and progress records ( see progress.c ) */
+double walltime( void ) ;
+long peakrss( void ) ;
+void progressstart( void ) ;
+void progressphase( const char *phase, const char *block, int n, double t0 ) ;
+void progressomega( int i, int n, double omega, double t0 ) ;
+void progressdone( void ) ;
+
 /* for struct Fock */
 void fockcalcs( struct Fock *state ) ;
 void fockinitdual( struct Fock *state, Dualrep nin ) ;
@@ -101,9 +198,11 @@ void o1plistdelete( struct O1plistitem *pitem ) ;
 struct O1p o1pmake( struct O1plistitem *listp0 ) ;
 void o1pprint( struct O1p op1p ) ;
 void o1pdelete( struct O1p op1p ) ;
+void o1papply( struct Fock state0, struct O1p op1p, int nbrabasis,
+	       struct Fock *pbrabasis, struct Spacc *acc ) ;
 int o1ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis, 
 		struct Fock *pbrabasis, struct O1p op1p, 
-		struct Spamaline **ppsml0 ) ;
+		struct Spamat *psm ) ;
 
 /* for struct O2plistitem and struct O2p */
 void o2plistitemadd( struct O2plistitem **ppitem0,
@@ -112,14 +211,23 @@ void o2plistdelete( struct O2plistitem *pitem ) ;
 struct O2p o2pmake( struct O2plistitem *listp0 ) ;
 void o2pprint( struct O2p op2p ) ;
 void o2pdelete( struct O2p op2p ) ;
+void o2papply( struct Fock state0, struct O2p op2p, int nbrabasis,
+	       struct Fock *pbrabasis, struct Spacc *acc ) ;
 int o2ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis, 
 		struct Fock *pbrabasis, struct O2p op2p, 
-		struct Spamaline **ppsml0 ) ;
+		struct Spamat *psm ) ;
 
 /* for struct Spamaline */
 int darray2spamaline( struct Spamaline *sml, int n, double *a ) ;
-int spamatranspose( struct Spamaline **psm, int nlines, int ncolumns ) ;
 void spamalinewrite( struct Spamaline sml ) ;
 void spamadelete( struct Spamaline *spama, int nlines ) ;
-double spamarealmatele( int nketbasis, double *ketvec, int nbrabasis,
-     double *bravec, struct Spamaline *psmline0 ) ;
+struct Spamat spamatmake( int nrow, int ncol, int nnz ) ;
+void spamatdelete( struct Spamat *sm ) ;
+struct Spamat spamatfromcolumns( struct Spamaline *cols, int ncols, int nrows ) ;
+void spamat2dense( struct Spamat sm, double *a ) ;
+void spamatlinewrite( struct Spamat sm, int i ) ;
+struct Spacc spaccmake( int n ) ;
+void spaccdelete( struct Spacc acc ) ;
+void spaccadd( struct Spacc *acc, int j, double v ) ;
+int spacc2spamaline( struct Spacc *acc, struct Spamaline *sml ) ;
+double spamarealmatele( double *ketvec, double *bravec, struct Spamat sm ) ;
@@ -89,8 +89,8 @@ int vai2list( int nshells, int *lsh, int *sorb1sh,
     nk = ( n1 < n2 ? n1 : n2 ) + 1 ;
     r4312 = ( double * ) calloc( nk, sizeof( double ) ) ; 
     /* read or calculate r4312[k] == rk(4,3;1,2)  k=0..nk-1 */
-    printf("Enter Rk(%d,%d;%d,%d) for k=0..%d: ", l4, l3, l1, l2, nk-1 ) ;
-    for ( k = 0 ; k < nk ; k++ ) scanf("%lf", &r4312[k] ) ;
+    if ( VERBOSE( VERBFULL ) ) printf("Enter Rk(%d,%d;%d,%d) for k=0..%d: ", l4, l3, l1, l2, nk-1 ) ;
+    for ( k = 0 ; k < nk ; k++ ) fscanf( finput, "%lf", &r4312[k] ) ;
 
     for ( m1 = -l1 ; m1 <= l1 ; m1++ ) 
       for ( m2 = -l2 ; m2 <= l2 ; m2++ )
@@ -111,7 +111,8 @@ int vai2list( int nshells, int *lsh, int *sorb1sh,
 		    v0 += cklmlm(k,l4,m4,l1,m1) * cklmlm(k,l2,m2,l3,m3) 
 		          * r4312[k] ;
 		  if ( v0 != 0. ) {
-                    printf("<%d%2d%2d,%d%2d%2d|%d%2d%2d,%d%2d%2d> = %11.6lf\n",  
+                    if ( VERBOSE( VERBFULL ) )
+                      printf("<%d%2d%2d,%d%2d%2d|%d%2d%2d,%d%2d%2d> = %11.6lf\n",  
                               l4,m4,s4,l3,m3,s3,l1,m1,s1,l2,m2,s2, v0 ) ;
 		    o2plistitemadd( ppo2plistitem0, i1, i2, i3, i4, v0 ) ;
 		    counter++ ;
@@ -202,7 +203,7 @@ int exchangefield2list( int nshells, int *lsh, int *sorb1sh, int ish,
 	counter++ ;
       }
   }
-  else {printf("exchangefield2list: ish >= nshells\n");exit(1);}
+  else {printf("exchangefield2list: ish >= nshells\n");engineexit(1);}
   return counter ;
 }
 /* calculates magnetic field operator = -h.( l+2s) with h=(hx,0,hz) */
@@ -258,7 +259,7 @@ int exchfieldxz2list( int nshells, int *lsh, int *sorb1sh, int ish, double h,
 
   if ( ish >= nshells ) {
     printf("exchfieldxz2list: ish=%d >= nshells=%d. Stop.\n",ish,nshells);
-    exit(1) ;
+    engineexit(1) ;
   }
   hz = h * cos( theta ) ;  
   hx = h * sin( theta ) ;
@@ -293,7 +294,7 @@ int esh012list( int nshells, int *lsh, int *sorb1sh, double esh0, double esh1,
   int i1, counter = 0 ;
   for ( i1 = 0 ; i1 < sorb1sh[1] ; i1++ ) {
     o1plistitemadd( ppo1plistitem0, i1, i1, esh0 ) ;
-    /*    printf("%2d %2d %20.12e\n", i1, i1, esh0 ) ;*/
+    /*    if ( VERBOSE( VERBFULL ) ) printf("%2d %2d %20.12e\n", i1, i1, esh0 ) ;*/
     counter++ ;
   }
   for ( i1 = sorb1sh[1] ; i1 < sorb1sh[2] ; i1++ ) {
@@ -311,7 +312,7 @@ int esh02list( int nshells, int *lsh, int *sorb1sh, double esh0,
   int i1, counter = 0 ;
   for ( i1 = 0 ; i1 < sorb1sh[1] ; i1++ ) {
     o1plistitemadd( ppo1plistitem0, i1, i1, esh0 ) ;
-    printf("%2d %2d %20.12e\n", i1, i1, esh0 ) ;
+    if ( VERBOSE( VERBFULL ) ) printf("%2d %2d %20.12e\n", i1, i1, esh0 ) ;
     counter++ ;
   }
   return counter ;
@@ -0,0 +1,80 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <setjmp.h>
+#include "globals.h"
+
+/*
+   the engine as a shared library ( libmultiplet, built with
+   -DMULTIPLET_LIBRARY, see cross_platform_compile.py and
+   multiplet_engine.py ) :
+
+   multiplet_run( input, verbosity, threads, &res )
+       runs one calculation on the input text ( the stdin of the
+       executable ) without writing any files and returns the energies
+       and matrix elements in res ( struct Results in globals.h ).
+       verbosity < 0 and threads < 0 keep the values of the environment
+       ( see readoptions ). Returns 0, or the status of a failed run
+       ( bad input etc. ); the results are then empty.
+   multiplet_free( &res )
+       frees the arrays of res.
+
+   The w3j table is built by the first run only. Runs use global state
+   and must not overlap ( one run at a time per process ). Memory of a
+   failed run is not freed.
+*/
+
+FILE *finput ;
+
+static jmp_buf *failjmp = 0 ;
+
+/* exit of the engine: back to multiplet_run in a library run */
+void engineexit( int status )
+{
+  fflush( stdout ) ;
+  if ( failjmp ) longjmp( *failjmp, status ? status : 1 ) ;
+  exit( status ) ;
+}
+
+int multiplet_run( const char *input, int verbosity, int threads,
+                   struct Results *res )
+{
+  jmp_buf env ;
+  int status ;
+
+  memset( res, 0, sizeof( struct Results ) ) ;
+  failjmp = &env ;
+  status = setjmp( env ) ;
+  if ( status == 0 ) {
+    readoptions() ;
+    options.output = OUTNONE ;
+    options.dump = 0 ;
+    if ( verbosity >= 0 ) options.verbosity = verbosity ;
+    if ( threads >= 0 ) setthreads( threads ) ;
+    finput = tmpfile() ;
+    if ( finput == 0 ) { printf("multiplet_run: no temporary file for the input\n") ; engineexit(1) ; }
+    fputs( input, finput ) ;
+    rewind( finput ) ;
+    status = multiplet( res ) ;
+  }
+  else
+    multiplet_free( res ) ;
+  failjmp = 0 ;
+  if ( finput ) fclose( finput ) ;
+  finput = 0 ;
+  fflush( stdout ) ;
+  return status ;
+}
+
+void multiplet_free( struct Results *res )
+{
+  free( res -> groundenergy ) ;
+  free( res -> nm1fenergy ) ;
+  free( res -> menergy ) ;
+  free( res -> gamst ) ;
+  free( res -> omega ) ;
+  free( res -> pesmatele ) ;
+  free( res -> xasmatele ) ;
+  free( res -> rpesalms ) ;
+  memset( res, 0, sizeof( struct Results ) ) ;
+}
@@ -1,5 +1,6 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <math.h>
 #include <complex.h>
 #include "w3j.h"
@@ -11,6 +12,8 @@
 
 #define EPSILON 1.e-10
 #define EPSPES 1.e-10
+/* upper limit ( doubles ) of the resonant amplitudes of one omega block */
+#define OMEGABLOCKMEM (1L<<24)
 
 void printstatevector( int nstates, double *vec, struct Fock *state ) ;
 
@@ -20,17 +23,45 @@ int printspec( int dim, double *lambda, int *pgstdeg, double *pgstenergy ) ;
 void thetaphimesh( double thmin, double thmax, double thdelta, 
                    double phmin, double phmax, double phdelta, 
                 int *pntheta, double **ptheta, int **pnphi, double ***pphi ) ;
-void printrpesmatele( FILE *fp, double omega, int npesorb, int nnm1fst,
-		      int gstdeg, double *gstweight, double *nm1fenergy,
-		      double gstenergy, complex ****rpesmatele ) ;
-void printrpesxmat( FILE *fp, double omega, int npesorb, int nnm1fst,
-		    int gstdeg, double *gstweight, complex ****rpesmatele ) ;
+void printrpesmatele( FILE *fp, FILE *fpb, double omega, int npesorb,
+		      int nnm1fst, int gstdeg, double *gstweight,
+		      double *nm1fenergy, double gstenergy,
+		      complex ****rpesmatele ) ;
+void printrpesxmat( FILE *fp, FILE *fpb, double omega, int npesorb,
+		    int nnm1fst, int gstdeg, double *gstweight,
+		    complex ****rpesmatele ) ;
+void storerpesmatele( double *a, int npesorb, int nnm1fst, int gstdeg,
+		      complex ****rpesmatele ) ;
+double *copydouble( int n, double *a ) ;
+static void omegaloop( struct Omegaloop *ol, struct Results *res, int start ) ;
+
+/* per-omega output files, in the order of ckpfps in omegaloop */
+#define NCKPFILES 11
+static const char *ckpnames[NCKPFILES] = {
+  "rpes.dat", "xaqc.dat", "rpesalms.dat", "rp.dat", "rpc.dat", "xmat.dat",
+  "omega.bin", "rpesalms.bin", "xmat.bin", "rp.bin", "rpc.bin" } ;
+
+#ifndef MULTIPLET_LIBRARY
 int main() {
+  readoptions() ;
+  finput = stdin ;
+  return multiplet( 0 ) ;
+}
+#endif
+
+/*
+   multiplet  runs the whole calculation, reading its input from  finput .
+   The output files are selected by options.output ( none for OUTNONE );
+   if  res != 0  the energies and matrix elements are also returned in
+   res ( struct Results in globals.h, freed by multiplet_free ).
+*/
+int multiplet( struct Results *res ) {
   const int ncvsh = 2 ; /* BAD PROGRAMMING */
   int nshells, nconfs, nelectrons ;
   int i, j, k, npesorb, isorb, iso, jso, m, ksum = 0 ;
   int *lsh,  *sorb1sh, **occ;
   int ist, jst, fist, fjst, nstates, nnm1fst, nfstates ;
+  int nnm1bas, nfbas, nmbas, neig, kv ;
   int nhamele, degeneracy, info, gstdeg, nlevels, fst0deg ;
   int inishell, q, iq, nlistele, ngstbasis, nmstates ;
   int igstdeg, ntheta, *nphi, ngam, nomega ;
@@ -38,28 +69,48 @@ int main() {
   double e2p, e3d, *gstweight ;
   double **cfdmat, hmag, thetamag, sum, dum, buf[3], *nt2g, *neg, *ndxy ;
   double *ham, *lambda, **nm1fstvec, *nm1fenergy, **mstvec, *menergy, *fstvec ;
-  double ****pesmatele, ***xasmatele, **fbasvmst, **fstvmst ;
-  double **radipmatele, omega, ommin, ommax, deltaom, gamma ; 
+  double ****pesmatele, ***xasmatele, *fbasvmst, *fvm ;
+  double tbas, tfst ;
+  double **radipmatele, ommin, ommax, deltaom, gamma ; 
   double *egam, *gam, gamma0, *gamst ;
   double thmax, thmin, thdelta, phmax, phmin, phdelta, *theta, **phi ; 
-  double sumr, suml;
-  double eps[3][3]={{.5,SQRTHALF,.5},{-SQRTHALF,0.,SQRTHALF},{.5,-SQRTHALF,.5}};
-  double complex csum, *cmdum, csumxaq[3]; 
-  complex ****rpesmatele, zdum ;
   struct Fock *state, *gstbasis, *fstate, *nm1fstbas, *mstbas ;
-  struct Spamaline *hamsparse, *hamsparsep, *pdipsmline0[3], *pvaismline0 ;
-  struct Spamaline *pfvmsml0, *psml, *pt2gsmline0, *pegsmline0, *pdxysmline0 ;
+  struct Blockmat fstvmst ;
+  struct Spamat hamsparse, dipsm[3], vaism, t2gsm, egsm, dxysm ;
   struct O1plistitem *po1plistitem ;	
   struct O2plistitem *po2plistitem ;	
   struct O1p dipop[3], t2gop, egop, dxyop ;
   struct O2p vaiop ;
-  FILE *fp, *fpx, *fpy, *fpc, *fpa, *fpz ;
-
-
+  struct Omegaloop ol ;
+  FILE *fp, *fpb ;
+  long dims[5] ;
+  double t0 ;
+  int ckp, done ;
+
+
+  progressstart() ;
+  if ( options.verbosity == VERBSUMMARY && nthreads() > 1 )
+    printf("Using %d threads\n", nthreads() ) ;
+/* resume an interrupted run of the same input ( not for library runs ) */
+  ckp = options.checkpoint && options.output != OUTNONE && res == 0 ;
+  options.checkpoint = ckp ;
+  if ( ckp ) {
+    checkpointinput() ;
+    done = checkpointread( &ol ) ;
+    if ( done >= 0 ) {
+      if ( VERBOSE( VERBSUMMARY ) )
+        printf("Resuming from checkpoint: %d of %d omega points done\n", done, ol.nomega ) ;
+      omegaloop( &ol, res, done ) ;
+      omegaloopfree( &ol ) ;
+      checkpointfinish() ;
+      progressdone() ;
+      return 0 ;
+    }
+  }
   w3jtabmake(); 
 /*
   printf("Enter thmin, thmax, thdelta, phmin, phmax, phdelta\n") ;
-  scanf("%lf%lf%lf%lf%lf%lf", 
+  fscanf( finput, "%lf%lf%lf%lf%lf%lf", 
          &thmin, &thmax, &thdelta, &phmin, &phmax, &phdelta) ; 
 */
 /* make emission-angle mesh theta[i],phi[i][j], i<ntheta, j<nphi[i]
@@ -73,64 +124,60 @@ int main() {
 */
   cfdmat = (double **) malloc( 5 * sizeof(double *) );
   for (i=0;i<5;i++) cfdmat[i] = (double *) malloc( 5 * sizeof(double) );
-  printf("Enter e2p, e3d:") ; scanf("%lf%lf", &e2p, &e3d ) ;
-  printf("Enter CF on d-shell as real 5x5 matrix:\n") ;
+  if ( VERBOSE( VERBFULL ) ) printf("Enter e2p, e3d:") ; fscanf( finput, "%lf%lf", &e2p, &e3d ) ;
+  if ( VERBOSE( VERBFULL ) ) printf("Enter CF on d-shell as real 5x5 matrix:\n") ;
   for ( i = 0 ; i < 5 ; i++ )
     for ( j = 0 ; j < 5 ; j++ )
-      scanf("%lf", &cfdmat[i][j] ) ;
-  printf("Enter (mag.field) h, theta(in deg): ") ;
-  scanf("%lf%lf", &hmag, &thetamag ) ;
+      fscanf( finput, "%lf", &cfdmat[i][j] ) ;
+  if ( VERBOSE( VERBFULL ) ) printf("Enter (mag.field) h, theta(in deg): ") ;
+  fscanf( finput, "%lf%lf", &hmag, &thetamag ) ;
   thetamag *= PI/180. ;
   
-  printf("Enter ommin, ommax, deltaom, gamma0, ngam, egam[0], gam[0] .., gam[ngam-1] ") ;
-  scanf("%lf%lf%lf%lf%d", &ommin, &ommax, &deltaom, &gamma0, &ngam ) ;
+  if ( VERBOSE( VERBFULL ) ) printf("Enter ommin, ommax, deltaom, gamma0, ngam, egam[0], gam[0] .., gam[ngam-1] ") ;
+  fscanf( finput, "%lf%lf%lf%lf%d", &ommin, &ommax, &deltaom, &gamma0, &ngam ) ;
   nomega = (int) ( (ommax-ommin)/deltaom + 1.00001 ) ;  
   egam=(double *)malloc(ngam*sizeof(double));
   gam =(double *)malloc(ngam*sizeof(double));
-  for ( i = 0 ; i < ngam ; i++ )  scanf("%lf%lf", &egam[i], &gam[i] ) ;
+  for ( i = 0 ; i < ngam ; i++ )  fscanf( finput, "%lf%lf", &egam[i], &gam[i] ) ;
   readshells( &nshells, &lsh, &sorb1sh, &ksish) ;
   radipmatele = calloc2double( nshells, nshells) ;
-  printf("Enter radipmatele's shells: 0->1, 1->2, 1->3: ") ;
-  if ( nshells > 3 ) scanf("%lf%lf%lf",
+  if ( VERBOSE( VERBFULL ) ) printf("Enter radipmatele's shells: 0->1, 1->2, 1->3: ") ;
+  if ( nshells > 3 ) fscanf( finput, "%lf%lf%lf",
       &radipmatele[0][1],&radipmatele[1][2],&radipmatele[1][3] );
-  else { printf("radip trouble\n"); exit(1);}
+  else { printf("radip trouble\n"); engineexit(1);}
 
   readconfs( nshells, lsh, &nconfs, &nelectrons, &occ, &nstates ) ;
 
   makestates( nshells, lsh, sorb1sh, nconfs, nelectrons, occ, nstates,
 	      &state) ;
+  t0 = walltime() ;
   nhamele = calcham( &hamsparse, nstates, state, nconfs, nshells, lsh, 
 		     sorb1sh, occ, ksish, e2p, e3d, cfdmat, hmag, thetamag ) ;
+  progressphase( "calcham", "ground", nstates, t0 ) ;
 
   for ( i = 0 ; i < nconfs ; i++ )
     free( occ[i] ) ;
   free( occ ) ;
 
-  printf("nhamele = %d\n", nhamele ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("nhamele = %d\n", nhamele ) ;
   
   ham = ( double * ) calloc( nstates * nstates, sizeof( double ) ) ;
   lambda = ( double * ) malloc( nstates * sizeof( double ) ) ;
  
-  for ( i = 0 ; i < nstates * nstates ; i++ )
-    ham[i] = 0. ;
+  spamat2dense( hamsparse, ham ) ;
 
-  hamsparsep = hamsparse ; 
-  for ( ist = 0 ; ist < nstates ; ist++ ) {
-    for ( k = 0 ; k < hamsparsep -> n ; k++ ) 
-      ham[ ist + nstates * hamsparsep -> j[k] ] = hamsparsep -> v[k] ;
-    hamsparsep++ ;
-  }
-
-  info =  solve_dsyev( nstates, ham, lambda ) ; 
-  if ( info ) { printf(" DSYEV : INFO = %d\n", info ) ; exit(1) ; } 
+  t0 = walltime() ;
+  info =  solve_eigen( nstates, ham, lambda, options.eig[BLKGROUND], 0., &neig ) ; 
+  progressphase( "dsyev", "ground", nstates, t0 ) ;
+  if ( info ) { printf(" DSYEV : INFO = %d\n", info ) ; engineexit(1) ; } 
 
 
    
-  spamadelete( hamsparse, nstates ) ; 
+  spamatdelete( &hamsparse ) ; 
   
-  nlevels = printspec( nstates, lambda, &gstdeg, &gstenergy ) ; 
+  nlevels = printspec( neig, lambda, &gstdeg, &gstenergy ) ; 
 
-  printf("nlevels = %d\n", nlevels ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("nlevels = %d\n", nlevels ) ;
 
   /* store degenerate ground states in gstvec[gstdeg][nstates] */
 
@@ -142,9 +189,16 @@ int main() {
     for ( ist = 0 ; ist < nstates ; ist++ )
       gstvec[k][ist] = ham[ ist + nstates * k ] ;
   }
-  printf("gstenergy = %lf.  %d degen. gstvec's:\n", gstenergy, gstdeg ) ;
-  for ( k = 0 ; k < gstdeg ; k++ ) 
-    printstatevector( nstates, gstvec[k], state ) ;
+  if ( res ) {
+    res -> nground = neig ;
+    res -> groundenergy = copydouble( neig, lambda ) ;
+    res -> gstdeg = gstdeg ;
+    res -> gstenergy = gstenergy ;
+  }
+  if ( VERBOSE( VERBSUMMARY ) ) printf("gstenergy = %lf.  %d degen. gstvec's:\n", gstenergy, gstdeg ) ;
+  if ( VERBOSE( VERBFULL ) )
+    for ( k = 0 ; k < gstdeg ; k++ ) 
+      printstatevector( nstates, gstvec[k], state ) ;
 
   ngstbasis = nstates ;
   gstbasis = state ;
@@ -157,41 +211,40 @@ int main() {
 
   makestates( nshells, lsh, sorb1sh, nconfs, nelectrons, occ, nstates,
 	      &state) ;
+  t0 = walltime() ;
   nhamele = calcham( &hamsparse, nstates, state, nconfs, nshells, lsh, 
 		     sorb1sh, occ, ksish, e2p, e3d, cfdmat, hmag, thetamag ) ;
-  printf("nhamele = %d\n", nhamele ) ;
+  progressphase( "calcham", "final", nstates, t0 ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("nhamele = %d\n", nhamele ) ;
 
   for ( i = 0 ; i < nconfs ; i++ )
     free( occ[i] ) ;
   free( occ ) ;
 
-  printf("after free occ\n");
+  if ( VERBOSE( VERBFULL ) ) printf("after free occ\n");
 
 
   ham = ( double * ) calloc( nstates * nstates, sizeof( double ) ) ;
   nm1fenergy = ( double * ) malloc( nstates * sizeof( double ) ) ;
 
-  for ( i = 0 ; i < nstates * nstates ; i++ )
-    ham[i] = 0. ;
-
-  hamsparsep = hamsparse ; 
-  for ( ist = 0 ; ist < nstates ; ist++ ) {
-    for ( k = 0 ; k < hamsparsep -> n ; k++ ) 
-      ham[ ist + nstates * hamsparsep -> j[k] ] = hamsparsep -> v[k] ;
-    hamsparsep++ ;
-  }
-  spamadelete( hamsparse, nstates ) ; 
+  spamat2dense( hamsparse, ham ) ;
+  spamatdelete( &hamsparse ) ; 
 
-  info =  solve_dsyev( nstates, ham, nm1fenergy ) ; 
-  if ( info ) { printf(" DSYEV : INFO = %d\n", info ) ; exit(1) ; } 
+  t0 = walltime() ;
+  info =  solve_eigen( nstates, ham, nm1fenergy, options.eig[BLKFINAL], gstenergy, &nnm1fst ) ; 
+  progressphase( "dsyev", "final", nstates, t0 ) ;
+  if ( info ) { printf(" DSYEV : INFO = %d\n", info ) ; engineexit(1) ; } 
+  if ( nnm1fst == 0 ) { printf("No final states in MULTIPLET_EIGEN_FINAL window\n") ; engineexit(1) ; }
 
-  nnm1fst = nstates ;
+  nnm1bas = nstates ;  /* basis size; nnm1fst = number of eigenstates kept */
   nm1fstbas = state ;  /* keep this N-1 final state basis */
+  if ( nnm1fst < nnm1bas )
+    ham = ( double * ) realloc( ham, nnm1bas * nnm1fst * sizeof( double ) ) ;
 
  /* store nm1-final state vectors */
   nm1fstvec = ( double ** ) malloc( nnm1fst * sizeof( double * ) ) ;
   for ( jst = 0 ; jst < nnm1fst ; jst++ ) 
-    nm1fstvec[jst] = ham + nnm1fst * jst ;        
+    nm1fstvec[jst] = ham + nnm1bas * jst ;        
 
 /* long way ... safer ? ...
   nm1fstvec = calloc2double(nnm1fst,nnm1fst) ;
@@ -203,32 +256,38 @@ int main() {
 */
 
 
-  nlevels = printspec( nstates, nm1fenergy, &fst0deg, &fst0energy ) ; 
+  nlevels = printspec( nnm1fst, nm1fenergy, &fst0deg, &fst0energy ) ; 
 
-  printf("nlevels = %d\n", nlevels ) ;
-  for ( i = 0 ; i < nstates ; i++ ) { 
-    printf(" %5.3lf", nm1fenergy[i]) ; 
-    if ( i%20==19 ) printf("\n"); 
+  if ( VERBOSE( VERBSUMMARY ) ) printf("nlevels = %d\n", nlevels ) ;
+  if ( VERBOSE( VERBFULL ) ) {
+    for ( i = 0 ; i < nnm1fst ; i++ ) { 
+      printf(" %5.3lf", nm1fenergy[i]) ; 
+      if ( i%20==19 ) printf("\n"); 
+    }
+    printf("\n"); 
   }
-  printf("\n"); 
   
 /* from |N-1> final states to |N-1>|PE> final states */
   npesorb = sorb1sh[nshells] - sorb1sh[ncvsh] ;
   nfstates = nnm1fst * npesorb ; 
-  fstate = ( struct Fock * ) calloc( nfstates, sizeof( struct Fock ) ) ;
+  nfbas = nnm1bas * npesorb ; 
+  fstate = ( struct Fock * ) calloc( nfbas, sizeof( struct Fock ) ) ;
   fstenergy = ( double * ) calloc( nfstates, sizeof( double ) ) ;
-  fstvec = ( double * ) malloc( nfstates * sizeof( double ) ) ;
+  fstvec = ( double * ) malloc( nfbas * sizeof( double ) ) ;
   for ( iso = 0 ; iso < npesorb ; iso++ ) {
     isorb = sorb1sh[ncvsh] + iso  ;
-    for ( ist = 0 ; ist < nnm1fst ; ist++ ) {
-      fist = iso*nnm1fst + ist ;
+    for ( ist = 0 ; ist < nnm1bas ; ist++ ) {
+      fist = iso*nnm1bas + ist ;
       fstate[fist] = state[ist] ;
       fockcre( fstate + fist, isorb ) ;
-      printf("%3d:%18llu)=", fist, fstate[fist].n) ; 
-      fockdisplay( fstate + fist ) ; printf("\n") ;
-/* Note: Energy of PE=   ep[fist] = gstenergy + omega - nm1fenergy[ist] ; */
-      fstenergy[fist] = nm1fenergy[ist] ; 
+      if ( VERBOSE( VERBFULL ) ) {
+        printf("%3d:%18llu)=", fist, fstate[fist].n) ; 
+        fockdisplay( fstate + fist ) ; printf("\n") ;
+      }
     }
+/* Note: Energy of PE=   ep[fist] = gstenergy + omega - nm1fenergy[ist] ; */
+    for ( ist = 0 ; ist < nnm1fst ; ist++ ) 
+      fstenergy[iso*nnm1fst + ist] = nm1fenergy[ist] ; 
   }
 
 
@@ -239,16 +298,20 @@ int main() {
     po1plistitem = 0 ;
     nlistele = dipole2list( nshells, lsh, sorb1sh, inishell, q, radipmatele,
 			       &po1plistitem) ;
-    printf("Dipole Op. q = %d. nlistele = %d.\n", q, nlistele ) ;
+    if ( VERBOSE( VERBSUMMARY ) ) printf("Dipole Op. q = %d. nlistele = %d.\n", q, nlistele ) ;
     dipop[iq] = o1pmake( po1plistitem ) ;
     o1plistdelete( po1plistitem ) ;
-    nhamele = o1ptospama( ngstbasis, gstbasis, nfstates, fstate, 
-			  dipop[iq], &pdipsmline0[iq] ) ;
-    printf("numtotele = %d\n", nhamele ) ;
-    for ( i = 0 ;  i < nfstates ; i++ ) {
-      printf("<%3d|r_{%2d}| . > . :", i, q ) ;   
-      spamalinewrite( pdipsmline0[iq][i] ) ;
-    }
+    t0 = walltime() ;
+    nhamele = o1ptospama( ngstbasis, gstbasis, nfbas, fstate, 
+			  dipop[iq], &dipsm[iq] ) ;
+    progressphase( "o1ptospama", "final", nfbas, t0 ) ;
+    o1pdelete( dipop[iq] ) ;
+    if ( VERBOSE( VERBSUMMARY ) ) printf("numtotele = %d\n", nhamele ) ;
+    if ( VERBOSE( VERBFULL ) )
+      for ( i = 0 ;  i < nfbas ; i++ ) {
+        printf("<%3d|r_{%2d}| . > . :", i, q ) ;   
+        spamatlinewrite( dipsm[iq], i ) ;
+      }
   }
 
   pesmatele = calloc4double( 3, npesorb, gstdeg, nnm1fst ) ;
@@ -259,24 +322,34 @@ int main() {
 Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
                                = Sum_i |bas_i>|jso> C_ij
 */
-      for ( fist = 0 ; fist < nfstates ; fist++ ) fstvec[fist] = 0. ;
-      for ( ist = 0 ; ist < nnm1fst ; ist++ ) 
-        fstvec[jso*nnm1fst + ist] = nm1fstvec[jst][ist] ; /* = ham[ist + nnm1fst * jst] */
+      for ( fist = 0 ; fist < nfbas ; fist++ ) fstvec[fist] = 0. ;
+      for ( ist = 0 ; ist < nnm1bas ; ist++ ) 
+        fstvec[jso*nnm1bas + ist] = nm1fstvec[jst][ist] ; /* = ham[ist + nnm1bas * jst] */
       for ( iq = 0 ; iq < 3 ; iq++ ) {
         for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ ) {
           pesmatele[iq][jso][igstdeg][jst] =
-          spamarealmatele( ngstbasis, gstvec[igstdeg], nfstates, fstvec, 
-  			 pdipsmline0[iq] ) ;
+          spamarealmatele( gstvec[igstdeg], fstvec, dipsm[iq] ) ;
         }
       }
     }
   }
-/* free pdipsmline0 */
+/* free dipsm */
   for ( iq = 0 ; iq < 3 ; iq++ ) 
-    spamadelete( pdipsmline0[iq], nfstates ) ;
+    spamatdelete( &dipsm[iq] ) ;
+  if ( res ) {
+    res -> nfinal = nnm1fst ;
+    res -> npesorb = npesorb ;
+    res -> nm1fenergy = copydouble( nnm1fst, nm1fenergy ) ;
+    res -> pesmatele = ( double * ) malloc( (size_t) 3 * npesorb * gstdeg * nnm1fst * sizeof( double ) ) ;
+    for ( i = 0, iq = 0 ; iq < 3 ; iq++ )
+      for ( iso = 0 ; iso < npesorb ; iso++ )
+        for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
+          for ( j = 0 ; j < nnm1fst ; j++ )
+            res -> pesmatele[i++] = pesmatele[iq][iso][igstdeg][j] ;
+  }
 
 /*  print out total PES spectrum Sum_q Sum_lms */
-  fp = fopen("pes.dat","w") ;
+  fp = options.output ? fopen("pes.dat","w") : 0 ;
   for ( ist = 0 ; ist <  nnm1fst ; ist++ ) {
     sum = 0. ;
     for ( iq = 0 ; iq < 3 ; iq++ ) 
@@ -285,14 +358,19 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
           dum = pesmatele[iq][iso][igstdeg][ist] ;
           sum += dum*dum ;
 	}
-    if ( sum > EPSPES) {
+    if ( fp && sum > EPSPES) {
       fprintf(fp,"%11.6lf %15.8e\n",fstenergy[ist]-gstenergy, sum/gstdeg ) ;
      /* picks up fist = ist (iso=0) */
     }
   }   
-  fclose(fp) ;
+  if ( fp ) fclose(fp) ;
   /*  print out q-lms resolved PES spectrum */
-  fp = fopen("peslm.dat","w") ;
+  fp = fpb = 0 ;
+  if ( options.output & OUTTEXT ) fp = fopen("peslm.dat","w") ;
+  if ( options.output & OUTBINARY ) {
+    dims[0] = nnm1fst ; dims[1] = 3 ; dims[2] = npesorb ;
+    fpb = binopen("peslm.bin", BINDOUBLE, 3, dims ) ;
+  }
   for ( ist = 0 ; ist <  nnm1fst ; ist++ )
     for ( iq = 0 ; iq < 3 ; iq++ ) 
       for ( iso = 0 ; iso < npesorb ; iso++ ) {
@@ -302,50 +380,58 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
           sum += dum*dum ;
 	}
 /*        if ( sum > EPSPES) */
+        if ( fp ) 
 	  fprintf(fp,"%11.6lf %16.10lf %2dq %2dn\n",
 		  fstenergy[ist]-gstenergy, sum/gstdeg, iq-1, iso ) ;
+        if ( fpb ) { dum = sum/gstdeg ; binwrite( fpb, &dum, 1 ) ; }
       }
-  fclose(fp) ;
+  if ( fp ) fclose(fp) ;
+  if ( fpb ) fclose(fpb) ;
 
 /*   BUILD INTERMED STATE BASIS    {mstbas} */
-  readconfs( nshells, lsh, &nconfs, &nelectrons, &occ, &nmstates ) ;
-  makestates( nshells, lsh, sorb1sh, nconfs, nelectrons, occ, nmstates,
+  readconfs( nshells, lsh, &nconfs, &nelectrons, &occ, &nmbas ) ;
+  makestates( nshells, lsh, sorb1sh, nconfs, nelectrons, occ, nmbas,
 	      &mstbas) ;
-  nhamele = calcham( &hamsparse, nmstates, mstbas, nconfs, nshells, lsh, 
+  t0 = walltime() ;
+  nhamele = calcham( &hamsparse, nmbas, mstbas, nconfs, nshells, lsh, 
 		     sorb1sh, occ, ksish, e2p, e3d, cfdmat, hmag, thetamag ) ;
+  progressphase( "calcham", "intermediate", nmbas, t0 ) ;
   for ( i = 0 ; i < nconfs ; i++ )
     free( occ[i] ) ;
   free( occ ) ;
 
 /* diagonalize ham. and find intermed. eigen-states */
-  ham = ( double * ) calloc( nmstates * nmstates, sizeof( double ) ) ;
-  menergy = ( double * ) malloc( nmstates * sizeof( double ) ) ;
-  for ( i = 0 ; i < nmstates * nmstates ; i++ ) ham[i] = 0. ;
-
-  hamsparsep = hamsparse ; 
-  for ( ist = 0 ; ist < nmstates ; ist++ ) {
-    for ( k = 0 ; k < hamsparsep -> n ; k++ ) 
-      ham[ ist + nmstates * hamsparsep -> j[k] ] = hamsparsep -> v[k] ;
-    hamsparsep++ ;
-  }
-  spamadelete( hamsparse, nmstates ) ; 
-
-  info =  solve_dsyev( nmstates, ham, menergy ) ; 
-  if ( info ) { printf(" DSYEV : INFO = %d\n", info ) ; exit(1) ; } 
+  ham = ( double * ) calloc( nmbas * nmbas, sizeof( double ) ) ;
+  menergy = ( double * ) malloc( nmbas * sizeof( double ) ) ;
+  spamat2dense( hamsparse, ham ) ;
+  spamatdelete( &hamsparse ) ; 
+
+  t0 = walltime() ;
+  info =  solve_eigen( nmbas, ham, menergy, options.eig[BLKINTERMEDIATE], gstenergy, &nmstates ) ; 
+  progressphase( "dsyev", "intermediate", nmbas, t0 ) ;
+  if ( info ) { printf(" DSYEV : INFO = %d\n", info ) ; engineexit(1) ; } 
+  if ( nmstates == 0 ) { printf("No intermediate states in MULTIPLET_EIGEN_INTERMEDIATE window\n") ; engineexit(1) ; }
+  /* nmbas = basis size; nmstates = number of eigenstates kept */
+  if ( nmstates < nmbas )
+    ham = ( double * ) realloc( ham, nmbas * nmstates * sizeof( double ) ) ;
 
   nlevels = printspec( nmstates, menergy, &fst0deg, &fst0energy ) ; 
 
-  printf("nlevels = %d\n", nlevels ) ;
-  for ( i = 0 ; i < nmstates ; i++ ) { 
-    printf(" %5.3lf", menergy[i]) ; 
-    if ( i%20==19 ) printf("\n"); 
+  if ( VERBOSE( VERBSUMMARY ) ) printf("nlevels = %d\n", nlevels ) ;
+  if ( VERBOSE( VERBFULL ) ) {
+    for ( i = 0 ; i < nmstates ; i++ ) { 
+      printf(" %5.3lf", menergy[i]) ; 
+      if ( i%20==19 ) printf("\n"); 
+    }
+    printf("\n"); 
   }
-  printf("\n"); 
 /* define gamst */
-  printf("Gamma grid: %8.3lf ", gamma0 ) ;
-  for ( i = 0 ; i < ngam; i++ )  
-    printf("%8.3lf %8.3lf ", egam[i], gam[i] ) ;
-  printf("\n");
+  if ( VERBOSE( VERBSUMMARY ) ) {
+    printf("Gamma grid: %8.3lf ", gamma0 ) ;
+    for ( i = 0 ; i < ngam; i++ )  
+      printf("%8.3lf %8.3lf ", egam[i], gam[i] ) ;
+    printf("\n");
+  }
   gamst = (double *) malloc( nmstates*sizeof(double) );
   for ( jst = 0 ; jst < nmstates ; jst++ ) {
     gamma = gamma0 ; 
@@ -367,7 +453,7 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
 /* store intermed. eigen state vectors */
   mstvec = ( double ** ) malloc( nmstates * sizeof( double * ) ) ;
   for ( jst = 0 ; jst < nmstates ; jst++ )
-    mstvec[jst] = ham + nmstates * jst ;    
+    mstvec[jst] = ham + nmbas * jst ;    
 
 
 /* DON'T print out intermediate eigensates 
@@ -390,41 +476,38 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
   t2gop = o1pmake( po1plistitem ) ;
   o1plistdelete( po1plistitem ) ;
   nhamele = o1ptospama( nmstates, mstbas, nmstates, mstbas,
-			t2gop, &pt2gsmline0 ) ;
+			t2gop, &t2gsm ) ;
   po1plistitem = 0 ;
   nlistele = egocc2list( nshells, lsh, sorb1sh, 1, &po1plistitem ) ;
   printf("egocc Op. nlistele = %d.\n", nlistele ) ;
   egop = o1pmake( po1plistitem ) ;
   o1plistdelete( po1plistitem ) ;
   nhamele = o1ptospama( nmstates, mstbas, nmstates, mstbas,
-			egop, &pegsmline0 ) ;
+			egop, &egsm ) ;
   po1plistitem = 0 ;
   nlistele = dxyocc2list( nshells, lsh, sorb1sh, 1, &po1plistitem ) ;
   printf("dxyocc Op. nlistele = %d.\n", nlistele ) ;
   dxyop = o1pmake( po1plistitem ) ;
   o1plistdelete( po1plistitem ) ;
   nhamele = o1ptospama( nmstates, mstbas, nmstates, mstbas,
-			dxyop, &pdxysmline0 ) ;
+			dxyop, &dxysm ) ;
 */
   /*
   for ( i = 0 ;  i < nmstates ; i++ ) {
-    printf("\n<%3d|n( eg)|.> :", i ) ; spamalinewrite( pegsmline0[i] ) ;
-    printf("       t2g     :" ) ;     spamalinewrite( pt2gsmline0[i] ) ;
+    printf("\n<%3d|n( eg)|.> :", i ) ; spamatlinewrite( egsm, i ) ;
+    printf("       t2g     :" ) ;     spamatlinewrite( t2gsm, i ) ;
   }
   */
   /*
   nt2g = ( double * ) malloc( nmstates * sizeof( double ) ) ;
   for ( jst = 0 ; jst < nmstates ; jst++ )
-    nt2g[jst] = spamarealmatele( nmstates, mstvec[jst], nmstates, mstvec[jst], 
-  			 pt2gsmline0 ) ;
+    nt2g[jst] = spamarealmatele( mstvec[jst], mstvec[jst], t2gsm ) ;
   neg  = ( double * ) malloc( nmstates * sizeof( double ) ) ;
   for ( jst = 0 ; jst < nmstates ; jst++ )
-    neg[jst] = spamarealmatele( nmstates, mstvec[jst], nmstates, mstvec[jst], 
-  			 pegsmline0 ) ;
+    neg[jst] = spamarealmatele( mstvec[jst], mstvec[jst], egsm ) ;
   ndxy = ( double * ) malloc( nmstates * sizeof( double ) ) ;
   for ( jst = 0 ; jst < nmstates ; jst++ )
-    ndxy[jst] = spamarealmatele( nmstates, mstvec[jst], nmstates, mstvec[jst], 
-  			 pdxysmline0 ) ;
+    ndxy[jst] = spamarealmatele( mstvec[jst], mstvec[jst], dxysm ) ;
   */
 
 /* construct dipole operator  P^(1)_q = r C^(1)_q , q=-1,0,1 [Cowan (14.24)] */
@@ -434,16 +517,19 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
     po1plistitem = 0 ;
     nlistele = dipole2list( nshells, lsh, sorb1sh, inishell, q, radipmatele,
 			       &po1plistitem) ;
-    printf("Dipole Op. q = %d. nlistele = %d.\n", q, nlistele ) ;
+    if ( VERBOSE( VERBSUMMARY ) ) printf("Dipole Op. q = %d. nlistele = %d.\n", q, nlistele ) ;
     dipop[iq] = o1pmake( po1plistitem ) ;
     o1plistdelete( po1plistitem ) ;
-    nhamele = o1ptospama( ngstbasis, gstbasis, nmstates, mstbas, 
-			  dipop[iq], &pdipsmline0[iq] ) ;
-    printf("numtotele = %d\n", nhamele ) ;
+    t0 = walltime() ;
+    nhamele = o1ptospama( ngstbasis, gstbasis, nmbas, mstbas, 
+			  dipop[iq], &dipsm[iq] ) ;
+    progressphase( "o1ptospama", "intermediate", nmbas, t0 ) ;
+    o1pdelete( dipop[iq] ) ;
+    if ( VERBOSE( VERBSUMMARY ) ) printf("numtotele = %d\n", nhamele ) ;
     /*    
       for ( i = 0 ;  i < nmstates ; i++ ) {
       printf("<%3d|r_{%2d}| . > . :", i, q ) ;   
-      spamalinewrite( pdipsmline0[iq][i] ) ;
+      spamatlinewrite( dipsm[iq], i ) ;
       }
     */
   }
@@ -453,11 +539,20 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
     for ( iq = 0 ; iq < 3 ; iq++ )
       for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
         xasmatele[iq][igstdeg][jst] =
-        spamarealmatele( ngstbasis, gstvec[igstdeg], nmstates, mstvec[jst], 
-  			 pdipsmline0[iq] ) ;
+        spamarealmatele( gstvec[igstdeg], mstvec[jst], dipsm[iq] ) ;
+  if ( res ) {
+    res -> nintermediate = nmstates ;
+    res -> menergy = copydouble( nmstates, menergy ) ;
+    res -> gamst = copydouble( nmstates, gamst ) ;
+    res -> xasmatele = ( double * ) malloc( (size_t) 3 * gstdeg * nmstates * sizeof( double ) ) ;
+    for ( i = 0, iq = 0 ; iq < 3 ; iq++ )
+      for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
+        for ( jst = 0 ; jst < nmstates ; jst++ )
+          res -> xasmatele[i++] = xasmatele[iq][igstdeg][jst] ;
+  }
 
 /*  print out q-resolved XAS spectrum */
-  fp = fopen("xaq.dat","w") ;
+  fp = options.output ? fopen("xaq.dat","w") : 0 ;
   for ( i = 0 ; i <  nmstates ; i++ ) {
     sum = 0. ;
     for ( iq = 0 ; iq < 3 ; iq++ ) {
@@ -467,17 +562,17 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
       buf[iq] = dum / gstdeg ;
       sum += buf[iq] ;
     }
-    if ( sum > EPSPES) {
+    if ( fp && sum > EPSPES) {
       fprintf(fp,"%11.6lf %16.10lf", menergy[i]-gstenergy, sum ) ;
       for ( iq = 0 ; iq < 3 ; iq++ ) fprintf(fp," %16.10lf", buf[iq] ) ;
       fprintf(fp,"\n") ;
     }
   }   
-  fclose(fp) ;
+  if ( fp ) fclose(fp) ;
 
   /*  print out XAS for LCP RCP from positive x-axix (i.e. y(pi/2) rotation 
       LCP = [(-1)+sqrt2*(0)+(1)]/2 RCP = [(-1)-sqrt2*(0)+(1)]/2 */
-  fp = fopen("xaqx.dat","w") ;
+  fp = options.output ? fopen("xaqx.dat","w") : 0 ;
   for ( i = 0 ; i <  nmstates ; i++ ) {
     sum = 0. ; /* lcp */
     for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ ) {
@@ -498,13 +593,13 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
     }
     buf[2] = sum/gstdeg ;
     sum = buf[0]+buf[1]+buf[2] ;
-    if ( sum > EPSPES) {
+    if ( fp && sum > EPSPES) {
       fprintf(fp,"%11.6lf %16.10lf", menergy[i]-gstenergy, sum ) ;
       for ( iq = 0 ; iq < 3 ; iq++ ) fprintf(fp," %16.10lf", buf[iq] ) ;
       fprintf(fp,"\n") ;
     }
   }
-  fclose(fp) ;
+  if ( fp ) fclose(fp) ;
 
 /*  print out t2g/eg/dxy-weighted XAS spectrum 
   fp = fopen("xte.dat","w") ;
@@ -533,111 +628,326 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
    VAI = Sum_{1,p,2!=2'}<1p|V|22'>c1+ cp+ c2 c2' */ 
   po2plistitem = 0 ;
   nlistele = vai2list( nshells, lsh, sorb1sh, &po2plistitem) ;
-  printf("VAI. nlistele = %d.\n", nlistele ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("VAI. nlistele = %d.\n", nlistele ) ;
   vaiop = o2pmake( po2plistitem ) ;
   o2plistdelete( po2plistitem ) ;
   o2pprint( vaiop ) ;
 
 /* calculate VAI matrix elements between basis states <Fbas|V|Ibas> */
-  nhamele = o2ptospama( nmstates, mstbas, nfstates, fstate, 
-	                vaiop, &pvaismline0 ) ;
-  printf("numtotele = %d\n", nhamele ) ;
+  t0 = walltime() ;
+  nhamele = o2ptospama( nmbas, mstbas, nfbas, fstate, 
+	                vaiop, &vaism ) ;
+  progressphase( "o2ptospama", "vai", nfbas, t0 ) ;
+  o2pdelete( vaiop ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("numtotele = %d\n", nhamele ) ;
 /*  for ( i = 0 ;  i < nfstates ; i++ ) {
-    printf("<%3d|V| . > . :", i ) ; spamalinewrite( pvaismline0[i] ) ;  } 
+    printf("<%3d|V| . > . :", i ) ; spamatlinewrite( vaism, i ) ;  } 
 */
 
-/* calculate VAI matrix elements <fist|V|M)=<i,iso|V|M) */
-/* allocate fbasvmst */ /* here full matrix. could be improved using spama */
-  fbasvmst = calloc2double( nfstates, nmstates ) ;
-  for ( i = 0 ; i < nnm1fst ; i++ ) 
-    for ( iso = 0 ; iso < npesorb ; iso++ ) {
-      fist = iso*nnm1fst + i ;
-      psml = pvaismline0 + fist ;
+/* calculate (F|V|M) block by block, one block per photoelectron orbital iso :
+   first the VAI matrix elements <i,iso|V|M) of the N-1 basis states i
+   ( fbasvmst, nnm1bas x nmstates, reused for every block ), then
+   (j,iso|V|M) = Sum_i C_ij <i,iso|V|M) by one DGEMM. Blocks without any
+   VAI matrix element stay unallocated. */
+  tbas = tfst = 0. ;
+  k = 0 ;
+  fstvmst = blockmatmake( npesorb, nnm1fst, nmstates ) ;
+  fbasvmst = ( double * ) malloc( (size_t) nnm1bas * nmstates * sizeof( double ) ) ;
+  for ( iso = 0 ; iso < npesorb ; iso++ ) {
+    t0 = walltime() ;
+    nhamele = 0 ;
+    for ( i = 0 ; i < nnm1bas ; i++ ) {
+      fist = iso*nnm1bas + i ;
+      nhamele += vaism.rowptr[fist+1] - vaism.rowptr[fist] ;
       for ( m = 0 ; m < nmstates ; m++ ) { 
         sum = 0. ;
-        for ( k = 0 ; k < psml -> n ; k++ ) {
-          if ( psml -> j[k] >= nmstates ) { printf("PANIC\n");exit(1);}
-          sum  +=  psml -> v[k]  *  mstvec[m][ psml -> j[k] ] ;
+        for ( kv = vaism.rowptr[fist] ; kv < vaism.rowptr[fist+1] ; kv++ ) {
+          if ( vaism.col[kv] >= nmbas ) { printf("PANIC\n");engineexit(1);}
+          sum  +=  vaism.val[kv]  *  mstvec[m][ vaism.col[kv] ] ;
         }
-        fbasvmst[fist][m] = sum ;
+        fbasvmst[ (size_t) i * nmstates + m ] = sum ;
       }
     }
-
-/* calculate (F|V|M) as full matrix */
-  k = 0 ;
-  fstvmst = calloc2double( nfstates, nmstates ) ;
-  for ( iso = 0 ; iso < npesorb ; iso++ ) 
-    for ( j = 0 ; j < nnm1fst ; j++ ) {
-      fjst = iso*nnm1fst + j ;
-      for ( m = 0 ; m < nmstates ; m++ ) { 
-        sum = 0. ;
-        for ( i = 0 ; i < nnm1fst ; i++ ) 
-	  sum += nm1fstvec[j][i] * fbasvmst[ iso*nnm1fst + i ][m] ; 
-        fstvmst[fjst][m] = sum ;
-        if ( fabs(sum) > EPSPES ) k++ ; 
-      } 
-    }  
-  free2double( nfstates, fbasvmst ) ;       
-  printf("Total # (F|V|M) = %d. #F=%d #M=%d NonZero/#F*#M=%lf\n", 
+    tbas += walltime() - t0 ;
+    if ( nhamele == 0 ) continue ;
+
+    t0 = walltime() ;
+    fvm = blockmatalloc( &fstvmst, iso ) ;
+    rotaterows( nnm1bas, nnm1fst, nmstates, nm1fstvec[0], fbasvmst, fvm ) ;
+    for ( fjst = 0 ; fjst < nnm1fst * nmstates ; fjst++ )
+      if ( fabs( fvm[fjst] ) > EPSPES ) k++ ; 
+    tfst += walltime() - t0 ;
+  }
+  free( fbasvmst ) ;       
+  spamatdelete( &vaism ) ;
+  progressphase( "fbasvmst", "vai", nfbas, walltime() - tbas ) ;
+  progressphase( "fstvmst", "vai", nfstates, walltime() - tfst ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("Total # (F|V|M) = %d. #F=%d #M=%d NonZero/#F*#M=%lf\n", 
          k, nfstates, nmstates, k/(double)(nfstates*nmstates) ) ;
+  if ( VERBOSE( VERBSUMMARY ) && blockmatnblocks( fstvmst ) < npesorb ) 
+    printf("(F|V|M) blocks stored: %d of %d\n", blockmatnblocks( fstvmst ), npesorb ) ;
+
+/* dump everything the omega loop needs, so that rpesmatele can be
+   recomputed for other omega grids and lifetimes (see rpes_model.py) */
+  if ( options.dump ) {
+    binwritearray( "gstenergy.bin", &gstenergy, 1 ) ;
+    binwritearray( "gstweight.bin", gstweight, gstdeg ) ;
+    binwritearray( "nm1fenergy.bin", nm1fenergy, nnm1fst ) ;
+    binwritearray( "menergy.bin", menergy, nmstates ) ;
+    binwritearray( "gamst.bin", gamst, nmstates ) ;
+    dims[0] = 3 ; dims[1] = gstdeg ; dims[2] = nmstates ;
+    fpb = binopen( "xasmatele.bin", BINDOUBLE, 3, dims ) ;
+    for ( iq = 0 ; iq < 3 ; iq++ )
+      for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
+        binwrite( fpb, xasmatele[iq][igstdeg], nmstates ) ;
+    fclose( fpb ) ;
+    dims[0] = npesorb ; dims[1] = nnm1fst ; dims[2] = nmstates ;
+    fpb = binopen( "fstvmst.bin", BINDOUBLE, 3, dims ) ;
+    blockmatwrite( fpb, fstvmst ) ;
+    fclose( fpb ) ;
+    dims[0] = 3 ; dims[1] = npesorb ; dims[2] = gstdeg ; dims[3] = nnm1fst ;
+    fpb = binopen( "pesmatele.bin", BINDOUBLE, 4, dims ) ;
+    for ( iq = 0 ; iq < 3 ; iq++ )
+      for ( iso = 0 ; iso < npesorb ; iso++ )
+        for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
+          binwrite( fpb, pesmatele[iq][iso][igstdeg], nnm1fst ) ;
+    fclose( fpb ) ;
+  }
+
+/* everything the omega loop needs, saved for a restart ( see checkpoint.c ) */
+  ol.gstdeg = gstdeg ; ol.nnm1fst = nnm1fst ; ol.npesorb = npesorb ;
+  ol.nmstates = nmstates ; ol.nomega = nomega ;
+  ol.gstenergy = gstenergy ; ol.ommin = ommin ; ol.ommax = ommax ; ol.deltaom = deltaom ;
+  ol.gstweight = gstweight ; ol.nm1fenergy = nm1fenergy ; ol.menergy = menergy ;
+  ol.gamst = gamst ; ol.xasmatele = xasmatele ; ol.pesmatele = pesmatele ;
+  ol.fstvmst = fstvmst ;
+  if ( ckp ) checkpointwrite( &ol ) ;
+  omegaloop( &ol, res, 0 ) ;
+  blockmatdelete( &fstvmst ) ;
+
+
+
+  for ( iq = 0 ; iq < 3 ; iq++ ) 
+    spamatdelete( &dipsm[iq] ) ;
+  for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
+    free( gstvec[igstdeg] ) ;
+  free( gstvec ) ;
+  free( gstbasis ) ;
+/* the rest, so that repeated library runs do not leak */
+  free4double( 3, npesorb, gstdeg, pesmatele ) ;
+  free3double( 3, gstdeg, xasmatele ) ;
+  free( gstweight ) ;
+  free( nm1fstvec[0] ) ;
+  free( nm1fstvec ) ;
+  free( nm1fenergy ) ;
+  free( nm1fstbas ) ;
+  free( fstate ) ;
+  free( fstenergy ) ;
+  free( fstvec ) ;
+  free( mstvec[0] ) ;
+  free( mstvec ) ;
+  free( menergy ) ;
+  free( gamst ) ;
+  free( mstbas ) ;
+  free( egam ) ;
+  free( gam ) ;
+  free2double( nshells, radipmatele ) ;
+  free( lsh ) ;
+  free( sorb1sh ) ;
+  free( ksish ) ;
+  for ( i = 0 ; i < 5 ; i++ ) free( cfdmat[i] ) ;
+  free( cfdmat ) ;
+  if ( ckp ) checkpointfinish() ;
+  progressdone() ;
+  return 0 ;
+}
+
+
+/*
+   omegaloop  computes the resonant amplitudes and writes the per-omega
+   output files, from omega point  start  on ( start > 0: resumed from a
+   checkpoint, the files of the points before are appended to )
+*/
+static void omegaloop( struct Omegaloop *ol, struct Results *res, int start )
+{
+  int gstdeg = ol -> gstdeg, nnm1fst = ol -> nnm1fst, npesorb = ol -> npesorb ;
+  int nmstates = ol -> nmstates, nomega = ol -> nomega ;
+  double gstenergy = ol -> gstenergy, ommin = ol -> ommin, ommax = ol -> ommax ;
+  double deltaom = ol -> deltaom, *gstweight = ol -> gstweight ;
+  double *nm1fenergy = ol -> nm1fenergy, *menergy = ol -> menergy, *gamst = ol -> gamst ;
+  double ***xasmatele = ol -> xasmatele, ****pesmatele = ol -> pesmatele ;
+  struct Blockmat fstvmst = ol -> fstvmst ;
+  int j, k, m, iq, iso, igstdeg, iomega ;
+  int io, io0, nomblk, nob, ncb, nomgrid ;
+  double omega, sum, dum, buf[3], sumr, suml, tomega ;
+  double eps[3][3]={{.5,SQRTHALF,.5},{-SQRTHALF,0.,SQRTHALF},{.5,-SQRTHALF,.5}};
+  double complex cdum, *xaqblk, csumxaq[3]; 
+  double *omgrid, *cmblk, *rablk, *ra, *efarr ;
+  size_t lrablk ;
+  complex ****rpesmatele, zdum ;
+  FILE *fp, *fpx, *fpy, *fpc, *fpa, *fpz ;
+  FILE *fpob, *fpyb, *fpcb, *fpab, *fpzb ;
+  FILE *ckpfps[NCKPFILES] ;
+  long dims[5] ;
 
   rpesmatele = calloc4cplx( 3, npesorb, gstdeg, nnm1fst ) ;
-  cmdum = ( double complex * ) malloc( nmstates * sizeof( double complex ) ) ;
-
-  fp = fopen("rpes.dat","w") ;
-  fpa = fopen("rpesalms.dat","w") ;
-  fprintf( fpa,"%d %d %d %d\n", nomega, gstdeg, nnm1fst, npesorb ) ;
-  fpy = fopen("rp.dat","w") ;
-  fpc = fopen("rpc.dat","w") ;
-  fpz = fopen("xmat.dat","w") ;
-  fprintf( fpz,"%d %d x %d\n", nomega, npesorb/2, npesorb/2) ;
-  
-  fprintf(fpy,"%d\n", nnm1fst ) ;
-  for ( j = 0 ; j < nnm1fst ; j++ ) 
-    fprintf(fpy,"%11.6lf\n", gstenergy - nm1fenergy[j] ) ;
-  fprintf(fpy,"%d\n", nomega ) ;
 
-  fprintf(fpc,"%d\n", nnm1fst ) ;
-  for ( j = 0 ; j < nnm1fst ; j++ ) 
-    fprintf(fpc,"%11.6lf\n", gstenergy - nm1fenergy[j] ) ;
-  fprintf(fpc,"%d\n", nomega ) ;
+  fp = fpx = fpa = fpy = fpc = fpz = 0 ;
+  fpob = fpab = fpyb = fpcb = fpzb = 0 ;
+  if ( start > 0 ) {
+/* resumed run: append to the files of the completed omega points */
+    fp = checkpointreopen( "rpes.dat", "r+" ) ;
+    fpx = checkpointreopen( "xaqc.dat", "r+" ) ;
+    if ( options.output & OUTTEXT ) {
+      fpa = checkpointreopen( "rpesalms.dat", "r+" ) ;
+      fpy = checkpointreopen( "rp.dat", "r+" ) ;
+      fpc = checkpointreopen( "rpc.dat", "r+" ) ;
+      fpz = checkpointreopen( "xmat.dat", "r+" ) ;
+    }
+    if ( options.output & OUTBINARY ) {
+      fpob = checkpointreopen( "omega.bin", "r+b" ) ;
+      fpab = checkpointreopen( "rpesalms.bin", "r+b" ) ;
+      fpzb = checkpointreopen( "xmat.bin", "r+b" ) ;
+      fpyb = checkpointreopen( "rp.bin", "r+b" ) ;
+      fpcb = checkpointreopen( "rpc.bin", "r+b" ) ;
+    }
+  }
+  else {
+    fp = options.output ? fopen("rpes.dat","w") : 0 ;
+    fpx = options.output ? fopen("xaqc.dat","w") : 0 ;
+    if ( options.output & OUTTEXT ) {
+      fpa = fopen("rpesalms.dat","w") ;
+      fprintf( fpa,"%d %d %d %d\n", nomega, gstdeg, nnm1fst, npesorb ) ;
+      fpy = fopen("rp.dat","w") ;
+      fpc = fopen("rpc.dat","w") ;
+      fpz = fopen("xmat.dat","w") ;
+      fprintf( fpz,"%d %d x %d\n", nomega, npesorb/2, npesorb/2) ;
+
+      fprintf(fpy,"%d\n", nnm1fst ) ;
+      for ( j = 0 ; j < nnm1fst ; j++ ) 
+        fprintf(fpy,"%11.6lf\n", gstenergy - nm1fenergy[j] ) ;
+      fprintf(fpy,"%d\n", nomega ) ;
+
+      fprintf(fpc,"%d\n", nnm1fst ) ;
+      for ( j = 0 ; j < nnm1fst ; j++ ) 
+        fprintf(fpc,"%11.6lf\n", gstenergy - nm1fenergy[j] ) ;
+      fprintf(fpc,"%d\n", nomega ) ;
+    }
+    if ( options.output & OUTBINARY ) {
+/* axes: final state energies Ef = E_G - E_f, ground state weights */
+      efarr = ( double * ) malloc( nnm1fst * sizeof( double ) ) ;
+      for ( j = 0 ; j < nnm1fst ; j++ ) efarr[j] = gstenergy - nm1fenergy[j] ;
+      binwritearray( "ef.bin", efarr, nnm1fst ) ;
+      free( efarr ) ;
+      binwritearray( "gstweight.bin", gstweight, gstdeg ) ;
+/* omega axis and per-omega arrays, written omega by omega */
+      dims[0] = nomega ;
+      fpob = binopen( "omega.bin", BINDOUBLE, 1, dims ) ;
+      dims[1] = gstdeg ; dims[2] = nnm1fst ; dims[3] = npesorb ; dims[4] = 3 ;
+      fpab = binopen( "rpesalms.bin", BINCOMPLEX, 5, dims ) ;
+      dims[1] = npesorb/2 ; dims[2] = npesorb/2 ; dims[3] = 3 ;
+      fpzb = binopen( "xmat.bin", BINCOMPLEX, 4, dims ) ;
+      dims[1] = nnm1fst ;
+      fpyb = binopen( "rp.bin", BINDOUBLE, 2, dims ) ;
+      dims[2] = 3 ;
+      fpcb = binopen( "rpc.bin", BINDOUBLE, 3, dims ) ;
+    }
+  }
+/* omega grid, accumulated as in a plain loop over omega */
+  nomgrid = 0 ;
+  for ( omega = ommin ; omega <= ommax+EPSILON ; omega += deltaom ) nomgrid++ ;
+  omgrid = ( double * ) malloc( ( nomgrid + 1 ) * sizeof( double ) ) ;
+  nomgrid = 0 ;
+  for ( omega = ommin ; omega <= ommax+EPSILON ; omega += deltaom ) omgrid[nomgrid++] = omega ;
+
+/* omega block: (M|D|G)/[om+EG-EM+iGa] for nomblk omega points, both
+   polarizations iq and all ground states igstdeg are the columns of one
+   matrix ( real parts first, then imaginary parts, as (F|V|M) is real ), so
+   (F|V|M)(M|D|G)/[om+EG-EM+iGa] is one DGEMM per photoelectron orbital */
+  nomblk = options.omegablock < nomgrid ? options.omegablock : nomgrid ;
+  if ( nomblk < 1 ) nomblk = 1 ;
+  lrablk = (size_t) npesorb * nnm1fst * 6 * gstdeg ;
+  if ( lrablk * nomblk > OMEGABLOCKMEM ) 
+    nomblk = lrablk > OMEGABLOCKMEM ? 1 : OMEGABLOCKMEM / lrablk ;
+  cmblk = ( double * ) malloc( (size_t) nmstates * 6 * gstdeg * nomblk * sizeof( double ) ) ;
+  rablk = ( double * ) malloc( lrablk * nomblk * sizeof( double ) ) ;
+  xaqblk = ( double complex * ) malloc( 3 * nomblk * sizeof( double complex ) ) ;
+  /* summary level only: the full log stays that of the original engine */
+  if ( options.verbosity == VERBSUMMARY )
+    printf("omega loop: %d points in blocks of %d\n", nomgrid, nomblk ) ;
+  if ( res ) {
+    res -> nomega = nomgrid ;
+    res -> omega = copydouble( nomgrid, omgrid ) ;
+    res -> rpesalms = ( double * ) malloc( (size_t) nomgrid * gstdeg * nnm1fst * npesorb * 6 * sizeof( double ) ) ;
+  }
 
-  fpx = fopen("xaqc.dat","w") ;
-/* main calculation: loop over omega */
-  for ( omega = ommin ; omega <= ommax+EPSILON ; omega += deltaom ) {
-/*    fprintf(fp,"omega=%lf\n",omega); */
+  ckpfps[0] = fp ; ckpfps[1] = fpx ; ckpfps[2] = fpa ; ckpfps[3] = fpy ;
+  ckpfps[4] = fpc ; ckpfps[5] = fpz ; ckpfps[6] = fpob ; ckpfps[7] = fpab ;
+  ckpfps[8] = fpzb ; ckpfps[9] = fpyb ; ckpfps[10] = fpcb ;
+  if ( options.checkpoint && start == 0 )
+    checkpointmark( 0, nomega, NCKPFILES, ckpnames, ckpfps ) ;
+
+/* main calculation: loop over omega blocks. A resumed run recomputes the
+   block of its first point, so that the blocks and the rounding of the
+   DGEMMs are those of an uninterrupted run, and skips the points done */
+  iomega = start ;
+  for ( io0 = start / nomblk * nomblk ; io0 < nomgrid ; io0 += nomblk ) {
+  tomega = walltime() ;
+  nob = nomgrid - io0 < nomblk ? nomgrid - io0 : nomblk ;
+  ncb = nob * 3 * gstdeg ;
 
 /* calculate resonant matrix element (F|V|M)(M|D|G)/[om+EG-EM+iGa] */
+  for ( io = 0 ; io < nob ; io++ ) {
+    omega = omgrid[io0+io] ;
+    for ( iq = 0 ; iq < 3 ; iq++ ) {
+      xaqblk[io*3+iq] = 0. ;
+      for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ ) {
+        k = ( io*3 + iq ) * gstdeg + igstdeg ;
+        for ( m = 0 ; m < nmstates ; m++ )  {
+	  /* linear increase: 
+	  gamst[m] = 0.2 + ((menergy[m]>-5.)?(menergy[m]+5.):0.)*0.04 ; 
+          */
+          cdum = xasmatele[iq][igstdeg][m]
+               / ( omega + gstenergy - menergy[m] + I*gamst[m] ) ;
+          xaqblk[io*3+iq] += xasmatele[iq][igstdeg][m]*cdum ;
+          cmblk[ (size_t) k * nmstates + m ] = creal( cdum ) ;
+          cmblk[ (size_t) ( k + ncb ) * nmstates + m ] = cimag( cdum ) ;
+        }
+      }
+    }
+  }
+  for ( iso = 0 ; iso < npesorb ; iso++ )
+    blockmatmul( fstvmst, iso, 2*ncb, cmblk, rablk + (size_t) iso * nnm1fst * 2 * ncb ) ;
+
+/* output omega by omega */
+  for ( io = 0 ; io < nob ; io++ ) {
+  if ( io0 + io < start ) continue ;
+  omega = omgrid[io0+io] ;
   for ( iq = 0 ; iq < 3 ; iq++ ) {
-    csumxaq[iq] = 0. ; 
+    csumxaq[iq] = xaqblk[io*3+iq] ;
     for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ ) {
-      for ( m = 0 ; m < nmstates ; m++ )  {
-	/* linear increase: 
-	gamst[m] = 0.2 + ((menergy[m]>-5.)?(menergy[m]+5.):0.)*0.04 ; 
-        */
-        cmdum[m] = xasmatele[iq][igstdeg][m]
-                 / ( omega + gstenergy - menergy[m] + I*gamst[m] ) ;
-        csumxaq[iq] += xasmatele[iq][igstdeg][m]*cmdum[m] ;
-      } 
+      k = ( io*3 + iq ) * gstdeg + igstdeg ;
       for ( iso = 0 ; iso < npesorb ; iso++ ) {
-        for ( j = 0 ; j < nnm1fst ; j++ ) {
-          fjst = iso*nnm1fst + j ;
-          csum = 0. ;
-          for ( m = 0 ; m < nmstates ; m++ ) 
-            csum += fstvmst[fjst][m]*cmdum[m] ;
-          rpesmatele[iq][iso][igstdeg][j] = csum
+        ra = rablk + (size_t) iso * nnm1fst * 2 * ncb ;
+        for ( j = 0 ; j < nnm1fst ; j++ ) 
+          rpesmatele[iq][iso][igstdeg][j] = ra[ (size_t) k * nnm1fst + j ]
+                 + I*ra[ (size_t) ( k + ncb ) * nnm1fst + j ]
                  + pesmatele[iq][iso][igstdeg][j] ;
-        }
       }
     }
   }
-  printrpesmatele( fpa, omega, npesorb, nnm1fst, gstdeg, gstweight,
+  if ( fpob ) binwrite( fpob, &omega, 1 ) ;
+  if ( res )
+    storerpesmatele( res -> rpesalms + (size_t) ( io0 + io ) * gstdeg * nnm1fst * npesorb * 6,
+                     npesorb, nnm1fst, gstdeg, rpesmatele ) ;
+  printrpesmatele( fpa, fpab, omega, npesorb, nnm1fst, gstdeg, gstweight,
 		   nm1fenergy, gstenergy, rpesmatele ) ;
-  printrpesxmat( fpz, omega, npesorb, nnm1fst, gstdeg, gstweight, rpesmatele );
+  printrpesxmat( fpz, fpzb, omega, npesorb, nnm1fst, gstdeg, gstweight,
+		 rpesmatele );
 
   
 /*  print out total RPES spectrum Sum_lms LCP and RCP */
-  fprintf(fpc,"\n%15.8e\n\n", omega) ;
+  if ( fpc ) fprintf(fpc,"\n%15.8e\n\n", omega) ;
   for ( j = 0 ; j < nnm1fst ; j++ ) {
     suml = sum = sumr = 0. ;
     for ( iso = 0 ; iso < npesorb ; iso++ ) {
@@ -653,10 +963,15 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
 	sumr += conj(zdum)*zdum ;
       }
     }
-    fprintf(fpc,"%15.8e %15.8e %15.8e\n",suml/gstdeg,sum/gstdeg,sumr/gstdeg);
+    if ( fpc )
+      fprintf(fpc,"%15.8e %15.8e %15.8e\n",suml/gstdeg,sum/gstdeg,sumr/gstdeg);
+    if ( fpcb ) {
+      buf[0] = suml/gstdeg ; buf[1] = sum/gstdeg ; buf[2] = sumr/gstdeg ;
+      binwrite( fpcb, buf, 3 ) ;
+    }
   }
 /*  print out total RPES spectrum Sum_q Sum_lms */
-  fprintf(fpy,"\n%15.8e\n\n", omega) ;
+  if ( fpy ) fprintf(fpy,"\n%15.8e\n\n", omega) ;
   for ( j = 0 ; j < nnm1fst ; j++ ) {
     sum = 0. ;
     for ( iq = 0 ; iq < 3 ; iq++ ) {      
@@ -667,38 +982,50 @@ Here: direct product: |j)|jso) = Sum_{i,iso} |bas_i>|iso> C_{i,iso;j,jso}
         }
       }
     }
-    if ( sum > EPSPES) 
+    if ( fp && sum > EPSPES) 
       fprintf(fp,"%10.6lf %11.6lf %15.8e\n",
               omega, gstenergy - nm1fenergy[j], sum/gstdeg ) ;
-    fprintf(fpy,"%15.8e\n", sum/gstdeg ) ;    
+    if ( fpy ) fprintf(fpy,"%15.8e\n", sum/gstdeg ) ;    
+    if ( fpyb ) { dum = sum/gstdeg ; binwrite( fpyb, &dum, 1 ) ; }
   }
   /* print broadened XAS spectrum */
-  fprintf(fpx,"%10.6lf ", omega ) ;
-  sum = 0. ;
-  for ( iq = 0 ; iq < 3 ; iq++ ) {
-    dum = -cimag( csumxaq[iq] ) / gstdeg / PI ;
-    fprintf(fpx,"%15.8e ", dum ) ; 
-    sum += dum ;
+  if ( fpx ) {
+    fprintf(fpx,"%10.6lf ", omega ) ;
+    sum = 0. ;
+    for ( iq = 0 ; iq < 3 ; iq++ ) {
+      dum = -cimag( csumxaq[iq] ) / gstdeg / PI ;
+      fprintf(fpx,"%15.8e ", dum ) ; 
+      sum += dum ;
+    }
+    fprintf(fpx,"%15.8e\n", sum) ;
   }
-  fprintf(fpx,"%15.8e\n", sum) ;
+  progressomega( ++iomega, nomega, omega, tomega ) ;
+  if ( options.checkpoint )
+    checkpointmark( iomega, nomega, NCKPFILES, ckpnames, ckpfps ) ;
+  tomega = walltime() ;
 
+  } /* end omega block */
   } /* end omega loop */
-  fclose(fpz) ;
-  fclose(fpy) ;
-  fclose(fpa) ;
-  fclose(fpx) ;
-  fclose(fp) ;
-  free( cmdum ) ;  
+  if ( options.output & OUTTEXT ) {
+    fclose(fpz) ;
+    fclose(fpy) ;
+    fclose(fpc) ;
+    fclose(fpa) ;
+  }
+  if ( options.output & OUTBINARY ) {
+    fclose(fpob) ;
+    fclose(fpzb) ;
+    fclose(fpyb) ;
+    fclose(fpcb) ;
+    fclose(fpab) ;
+  }
+  if ( fpx ) fclose(fpx) ;
+  if ( fp ) fclose(fp) ;
+  free( omgrid ) ;
+  free( cmblk ) ;
+  free( rablk ) ;
+  free( xaqblk ) ;
   free4cplx( 3, npesorb, gstdeg, rpesmatele ) ;
-
-
-
-  for ( iq = 0 ; iq < 3 ; iq++ ) 
-    spamadelete( pdipsmline0[iq], nmstates ) ;
-  for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
-    free( gstvec[igstdeg] ) ;
-  free( gstvec ) ;
-  free( gstbasis ) ;
 }
 
 
@@ -733,7 +1060,8 @@ int printspec( int dim, double *lambda, int *pgstdeg, double *pgstenergy )
     else if ( fabs( newlambda - oldlambda ) < EPSILON )
       degeneracy++ ;
     else {
-      printf(" %12.6lf  -  degeneracy = %d\n", oldlambda, degeneracy ) ;
+      if ( VERBOSE( VERBFULL ) )
+        printf(" %12.6lf  -  degeneracy = %d\n", oldlambda, degeneracy ) ;
       if ( nlevels == 1 ) {
 	gstenergy = oldlambda ;
 	gstdeg = degeneracy ;
@@ -743,7 +1071,8 @@ int printspec( int dim, double *lambda, int *pgstdeg, double *pgstenergy )
       nlevels++ ;
     }
   }      
-  printf(" %12.6lf  -  degeneracy = %d\n", oldlambda, degeneracy ) ;
+  if ( VERBOSE( VERBFULL ) )
+    printf(" %12.6lf  -  degeneracy = %d\n", oldlambda, degeneracy ) ;
   if ( nlevels == 1 ) {
     gstenergy = oldlambda ;
     gstdeg = degeneracy ;
@@ -753,35 +1082,45 @@ int printspec( int dim, double *lambda, int *pgstdeg, double *pgstenergy )
   *pgstenergy = gstenergy ;
   return nlevels ;
 }
-void printrpesmatele( FILE *fp, double omega, int npesorb, int nnm1fst,
-		      int gstdeg, double *gstweight, double *nm1fenergy,
-		      double gstenergy, complex ****rpesmatele )
+/* print rpesmatele to text file fp and/or binary file fpb (either may be 0) */
+void printrpesmatele( FILE *fp, FILE *fpb, double omega, int npesorb,
+		      int nnm1fst, int gstdeg, double *gstweight,
+		      double *nm1fenergy, double gstenergy,
+		      complex ****rpesmatele )
 {
   int j, iso, iq, igstdeg ;
   complex dum ;
-  fprintf(fp,"%17.10e\n", omega ) ;
+  double reim[2] ;
+  if ( fp ) fprintf(fp,"%17.10e\n", omega ) ;
   for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ ) {
-    fprintf(fp,"%lf\n", gstweight[igstdeg] ) ;	    
+    if ( fp ) fprintf(fp,"%lf\n", gstweight[igstdeg] ) ;	    
     /* fprintf(fp,"# ground state No. %d / %d\n", igstdeg+1, gstdeg ) ;	*/    
     for ( j = 0 ; j < nnm1fst ; j++ ) {
-      fprintf(fp,"%17.10e\n", gstenergy - nm1fenergy[j] ) ;
+      if ( fp ) fprintf(fp,"%17.10e\n", gstenergy - nm1fenergy[j] ) ;
       for ( iso = 0 ; iso < npesorb ; iso++ ) {
 	for ( iq = 0 ; iq < 3 ; iq++ ) {
 	  dum = rpesmatele[iq][iso][igstdeg][j] ;
-	  fprintf(fp,"   %13.6e %13.6e", creal(dum), cimag(dum) ) ;
+	  if ( fp ) fprintf(fp,"   %13.6e %13.6e", creal(dum), cimag(dum) ) ;
+	  if ( fpb ) {
+	    reim[0] = creal(dum) ; reim[1] = cimag(dum) ;
+	    binwrite( fpb, reim, 2 ) ;
+	  }
 	}
-	fprintf(fp,"\n") ;	
+	if ( fp ) fprintf(fp,"\n") ;	
       }
     }
   }
 }  
-void printrpesxmat( FILE *fp, double omega, int npesorb, int nnm1fst,
-		    int gstdeg, double *gstweight, complex ****rpesmatele )
+/* print xmat to text file fp and/or binary file fpb (either may be 0) */
+void printrpesxmat( FILE *fp, FILE *fpb, double omega, int npesorb,
+		    int nnm1fst, int gstdeg, double *gstweight,
+		    complex ****rpesmatele )
 {
   int io, jo, iq, igstdeg, j, isp, npeorb ;
   complex sum, sumg ;
+  double reim[2] ;
   npeorb = npesorb/2 ;
-  fprintf(fp,"%17.10e\n", omega ) ;
+  if ( fp ) fprintf(fp,"%17.10e\n", omega ) ;
   for ( io = 0 ; io < npeorb ; io++ ) {
     for ( jo = 0 ; jo < npeorb ; jo++ ) {
       for ( iq = 0 ; iq < 3 ; iq++ ) {
@@ -794,12 +1133,42 @@ void printrpesxmat( FILE *fp, double omega, int npesorb, int nnm1fst,
 		* conj( rpesmatele[iq][2*jo+isp][igstdeg][j] ) ;
 	  sum += gstweight[igstdeg] * sumg ;
 	}
-	fprintf(fp," %13.6e %13.6e", creal(sum), cimag(sum) ) ;
+	if ( fp ) fprintf(fp," %13.6e %13.6e", creal(sum), cimag(sum) ) ;
+	if ( fpb ) {
+	  reim[0] = creal(sum) ; reim[1] = cimag(sum) ;
+	  binwrite( fpb, reim, 2 ) ;
+	}
       }
-      fprintf(fp,"\n") ;	
+      if ( fp ) fprintf(fp,"\n") ;	
     }
   }
-  fprintf(fp,"\n") ;	
+  if ( fp ) fprintf(fp,"\n") ;	
+}
+
+/* store rpesmatele of one omega in  a  in the order of rpesalms.bin :
+   a[ 2*( ( ( igstdeg*nnm1fst + j )*npesorb + iso )*3 + iq ) ] = re, +1 = im */
+void storerpesmatele( double *a, int npesorb, int nnm1fst, int gstdeg,
+		      complex ****rpesmatele )
+{
+  int j, iso, iq, igstdeg ;
+
+  for ( igstdeg = 0 ; igstdeg < gstdeg ; igstdeg++ )
+    for ( j = 0 ; j < nnm1fst ; j++ )
+      for ( iso = 0 ; iso < npesorb ; iso++ )
+	for ( iq = 0 ; iq < 3 ; iq++ ) {
+	  *a++ = creal( rpesmatele[iq][iso][igstdeg][j] ) ;
+	  *a++ = cimag( rpesmatele[iq][iso][igstdeg][j] ) ;
+	}
+}
+
+/* malloc'ed copy of a[n] */
+double *copydouble( int n, double *a )
+{
+  double *b ;
+
+  b = ( double * ) malloc( ( n > 0 ? n : 1 ) * sizeof( double ) ) ;
+  if ( n > 0 ) memcpy( b, a, n * sizeof( double ) ) ;
+  return b ;
 }
 
 /*  print out angle-indep. RPES spectrum
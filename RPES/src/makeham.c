@@ -13,36 +13,33 @@ void cilistdelete( struct CIlistitem *ip ) ;
 
 /* calcham 
    calculates the hamiltonian matrix, and stores it as a sparse
-   matrix named " ham == *pham ". ( see sparsemat.c for details )
-   ham is a pointer to (array of) struct sparsematline. 
+   matrix named " ham == *pham ". ( see spama.c for details )
+   ham is a struct Spamat ( compressed sparse rows ). 
    Return value : number of stored (i.e. non-zero) matrix elements.
    All memory allocation is done here.
    The matrix elements are stored as follows :
-   < state[i] | H | state[j] > = ham[i].v[k], where i = i and j = ham[i].j[k]
+   < state[i] | H | state[j] > = ham.val[k], where j = ham.col[k] and
+   ham.rowptr[i] <= k < ham.rowptr[i+1]
 */
-int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
+int calcham( struct Spamat *pham, int nstates, struct Fock *state,
 	     int nconfs, int nshells, int *lsh, int *sorb1sh, int **occ, 
              double *ksish, double e2p, double e3d, double **cfdmat,
 	     double h, double theta ) 
 {
-  int i, ish, iconf, k1, k2, k3, k4, totnumele, k ;
-  int i1, i2, i3, i4, sign1, sign2, sign3, sign4 ;
-  int ist, jst ;
+  int i, ish, iconf, totnumele, k ;
+  int i1, i2, i3, i4 ;
+  int ist ;
   int *occdum, ish1, ish2, ish3, ish4, ishd ;
   int  no1plistitems, no2plistitems ;
-  double val, *hamcol, diagsum ;
+  double *hamdiag, diagsum ;
 /* double  esh0 ; */
-  struct Fock state0, state1, state2, state3, state4 ;
   struct O1plistitem *po1plistitem0 ;
   struct O1p h1p ;
-  struct O1p2 h1p1 ;
   struct O2plistitem *po2plistitem0, *lip ;
   struct O2p vcb ;
-  struct O2p2 vcb1 ;
-  struct O2p3 vcb2 ;
-  struct O2p4 vcb3 ;
   struct CIlistitem *interactlist0, *ip ;
   struct Spamaline *hamtransp ;
+  struct Spacc hamcol ;
 
 
   po1plistitem0 = 0 ;
@@ -62,19 +59,19 @@ int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
 
   ishd = ISHD ; 
   if ( nshells <= ishd || lsh[ishd] != 2 )
-   { printf("main: lsh[%d] != 2. Stop.\n", ishd ) ; exit(1) ; }
+   { printf("main: lsh[%d] != 2. Stop.\n", ishd ) ; engineexit(1) ; }
 
   /*
   if ( hz != 0.) {
   no1plistitems += 
     exchangefield2list( nshells, lsh, sorb1sh, ishd, hz, &po1plistitem0 ) ;
-  printf("An exchange field hz = %lf ( with E = -hz * 2 * sz ) is applied to shell No %d.\n", hz, ishd ) ;  
+  if ( VERBOSE( VERBSUMMARY ) ) printf("An exchange field hz = %lf ( with E = -hz * 2 * sz ) is applied to shell No %d.\n", hz, ishd ) ;  
   }
   */
   if ( h != 0.) {
   no1plistitems +=
     exchfieldxz2list( nshells, lsh, sorb1sh, ishd, h, theta, &po1plistitem0 ) ;
-    printf("An exchange field h = %lf theta= %lf ( with E = -2 h.s ) is applied to shell No %d.\n", h, theta, ishd ) ;  
+    if ( VERBOSE( VERBSUMMARY ) ) printf("An exchange field h = %lf theta= %lf ( with E = -2 h.s ) is applied to shell No %d.\n", h, theta, ishd ) ;  
   }
   /* no1plistitems += 
     crystalfieldC42list( nshells, lsh, sorb1sh, ishd, ea1,eb1,eb2,ee,
@@ -82,7 +79,7 @@ int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
   */
   crystalfield2list( nshells, lsh, sorb1sh, ishd, cfdmat, &po1plistitem0 ) ;
 
-  printf("no1plistitems = %d\n", no1plistitems ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("no1plistitems = %d\n", no1plistitems ) ;
 
   h1p = o1pmake( po1plistitem0 ) ;
 
@@ -124,36 +121,37 @@ int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
   }
   free( occdum ) ;
 
-  printf("\n\n");
-  printf("Warning: subtracting conf.average energies of pd(G) and dd(F)\n") ;
-  if ( lsh[0] != 1 || lsh[1] != 2 ){printf("makeham.c lsh Trouble\n");exit(1);}
+  if ( VERBOSE( VERBFULL ) ) printf("\n\n");
+  if ( VERBOSE( VERBSUMMARY ) ) printf("Warning: subtracting conf.average energies of pd(G) and dd(F)\n") ;
+  if ( lsh[0] != 1 || lsh[1] != 2 ){printf("makeham.c lsh Trouble\n");engineexit(1);}
   for( ip = interactlist0, i = 0 ; ip != 0 ; ip = ip -> next ) {
     i1 = ip->ish1 ; i2 = ip->ish2 ; i3 = ip->ish3 ; i4 = ip->ish4 ; 
     if ( i1==1 && i2==1 && i3==1 && i4==1 )
       if ( ip->nk > 4 ) 
 	ip->rmx[0] += (2./63.)*( ip->rmx[2] + ip->rmx[4] ) ;
       else { printf("%d %d %d %d  %d\n", i1,i2,i3,i4,ip->nk) ;
-	printf("makeham.c ip->rmx Trouble\n");exit(1);}
+	printf("makeham.c ip->rmx Trouble\n");engineexit(1);}
     if ( i1==0 && i2==1 && i3==0 && i4==1 ||
 	 i1==1 && i2==0 && i3==1 && i4==0 )
       if ( ip->nk > 3 ) 
 	ip->rmx[0] += (1./15.)*ip->rmx[1] + (3./70.)*ip->rmx[3] ;
       else { printf("%d %d %d %d  %d\n", i1,i2,i3,i4,ip->nk) ;
-	printf("makeham.c ip->rmx Trouble\n");exit(1);}
+	printf("makeham.c ip->rmx Trouble\n");engineexit(1);}
   }
-  for( ip = interactlist0, i = 0 ; ip != 0 ; ip = ip -> next ) {
-    printf("%2d) %d %d %d %d",++i, ip->ish4, ip->ish3, ip->ish2, ip->ish1);
-    for ( k = 0 ; k < ip -> nk ; k++ ) 
-      printf(" %lf", ip -> rmx[k] ) ;
-    printf("\n") ;
-  } 
+  if ( VERBOSE( VERBFULL ) )
+    for( ip = interactlist0, i = 0 ; ip != 0 ; ip = ip -> next ) {
+      printf("%2d) %d %d %d %d",++i, ip->ish4, ip->ish3, ip->ish2, ip->ish1);
+      for ( k = 0 ; k < ip -> nk ; k++ ) 
+        printf(" %lf", ip -> rmx[k] ) ;
+      printf("\n") ;
+    } 
 
   po2plistitem0 = 0 ;
 
   no2plistitems = 
     coulomb2list( nshells, lsh, sorb1sh, interactlist0, &po2plistitem0 ) ;
 
-  printf("no2plistitems = %d\n", no2plistitems ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("no2plistitems = %d\n", no2plistitems ) ;
 
   cilistdelete( interactlist0 ) ; 
 
@@ -168,99 +166,32 @@ int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
   hamtransp = ( struct Spamaline * )
     malloc( nstates * sizeof( struct Spamaline ) ) ;
 
-  hamcol = ( double * ) malloc( nstates * sizeof( double ) ) ;
+  hamdiag = ( double * ) malloc( nstates * sizeof( double ) ) ;
   totnumele = 0 ;
-  diagsum = 0. ;
+/* kets in parallel ( see o1ptospama ), one column accumulator per thread */
+#pragma omp parallel private( ist, hamcol )
+  {
+  hamcol = spaccmake( nstates ) ;
+#pragma omp for schedule( dynamic, 16 ) reduction( +:totnumele )
   for ( ist = 0 ; ist < nstates ; ist++ ) {
-    state0 = state[ist] ;
-    /* fockdisplay( &state0 ) ; printf("\n") ; */
-
-    /* clear hamcol */
-    for ( jst = 0 ; jst < nstates ; jst++ ) 
-      hamcol[jst] = 0. ;
-
-/* apply h1p to state */
-    for ( k1 = 0 ; k1 < h1p.n ; k1++ ) {
-      state1 = state0 ;
-      i1 = h1p.i[k1] ;
-      sign1 = fockdes( &state1, i1 ) ;
-      if ( sign1 != 0 ) {
-	h1p1 = h1p.p[k1] ;
-	for ( k2 = 0 ; k2 < h1p1.n ; k2++ ) {
-	  state2 = state1 ;
-	  i2 = h1p1.i[k2] ;
-	  sign2 = fockcre( &state2, i2 ) ;
-	  if ( sign2 != 0 ) {
-	    val = sign2 * sign1 *  h1p1.v[k2] ;
-	    /* printf("c+%d c%d  -> %lf ", i2, i1, val ); 
-	       fockdisplay( &state2 ) ; */
-	    if( findstate(nstates, state, &state2, &jst ) ) {
-	      /* printf(" = state No %d\n", jst ) ; */
-	      hamcol[jst] += val ;
-	    }
-	    else { 
-	      printf("c+%d c%d  -> %lf ", i2, i1, val ); 
-	      fockdisplay( &state2 ) ;
-	      printf(" = new state under No %d\n", jst ) ;
-	    } 
-	  }
-	}
-      }
-    }
-/* apply vcb to state */
-    for ( k1 = 0 ; k1 < vcb.n ; k1++ ) {
-      state1 = state0 ;
-      i1 = vcb.i[k1] ;
-      sign1 = fockdes( &state1, i1 ) ;
-      if ( sign1 != 0 ) {
-	vcb1 = vcb.p[k1] ;
-	for ( k2 = 0 ; k2 < vcb1.n ; k2++ ) {
-	  state2 = state1 ;
-	  i2 = vcb1.i[k2] ;
-	  sign2 = fockdes( &state2, i2 ) ;
-	  if ( sign2 != 0 ) {
-	    vcb2 = vcb1.p[k2] ;
-	    for ( k3 = 0 ; k3 < vcb2.n ; k3++ ) {
-	      state3 = state2 ;
-	      i3 = vcb2.i[k3] ;
-	      sign3 = fockcre( &state3, i3 ) ;
-	      if ( sign3 != 0 ) {
-		vcb3 = vcb2.p[k3] ;
-		for ( k4 = 0 ; k4 < vcb3.n ; k4++ ) {
-		  state4 = state3 ;
-		  i4 = vcb3.i[k4] ;
-		  sign4 = fockcre( &state4, i4 ) ;
-		  if ( sign4 != 0 ) {
-		    val = sign4 * sign3 * sign2 * sign1 *  vcb3.v[k4] ;
-		    /* printf("c+%d c+%d c%d c%d  -> %lf ", i4,i3,i2,i1,val );
-		       fockdisplay( &state4 ) ; */
-                    if( findstate(nstates, state, &state4, &jst ) ) {
-		      /* printf(" = state No %d\n", jst ) ; */
-		      hamcol[jst] += val ;
-		    }
-		    else {
-		      printf("c+%d c+%d c%d c%d  -> %lf ", i4,i3,i2,i1,val );
-		      fockdisplay( &state4 ) ;		      
-	              printf(" = new state under No %d\n", jst ) ;
-		    } 
-		  }
-		}
-	      }
-	    }
-	  }
-	}
-      }
-    }
-    totnumele += darray2spamaline( &hamtransp[ist], nstates, hamcol ) ;
-    diagsum += hamcol[ist] ;
+/* apply h1p and vcb to state */
+    o1papply( state[ist], h1p, nstates, state, &hamcol ) ;
+    o2papply( state[ist], vcb, nstates, state, &hamcol ) ;
+    hamdiag[ist] = hamcol.v[ist] ;
+    totnumele += spacc2spamaline( &hamcol, &hamtransp[ist] ) ;
+  }
+  spaccdelete( hamcol ) ; 
   }
+/* summed in order, independent of the threads */
+  diagsum = 0. ;
+  for ( ist = 0 ; ist < nstates ; ist++ ) 
+    diagsum += hamdiag[ist] ;
+  free( hamdiag ) ;
 
   o1pdelete( h1p ) ;
   o2pdelete( vcb ) ;
 
-  free( hamcol ) ; 
-
-  printf("\n hamtransp. totnumele = %d. diagaverage = %lf \n\n",  
+  if ( VERBOSE( VERBSUMMARY ) ) printf("\n hamtransp. totnumele = %d. diagaverage = %lf \n\n",  
 	 totnumele, diagsum / ( double ) nstates ) ;
   
   /* 
@@ -271,22 +202,22 @@ int calcham( struct Spamaline **pham, int nstates, struct Fock *state,
   */
   
   /*
-  printf("calcham: spamatranspose( &hamtransp, nstates, nstates ) commented out\n");
+  printf("calcham: spamatfromcolumns( hamtransp, nstates, nstates ) commented out\n");
   */
       
-  totnumele = spamatranspose( &hamtransp, nstates, nstates ) ;
+  *pham = spamatfromcolumns( hamtransp, nstates, nstates ) ;
+  totnumele = pham -> rowptr[nstates] ;
  
-  printf("\n ham. totnumele = %d \n\n",  totnumele ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("\n ham. totnumele = %d \n\n",  totnumele ) ;
   
   /*
   for ( ist = 0 ; ist < nstates ; ist++ ) {
     printf("i =%3d --", ist ) ;   
-    spamalinewrite( hamtransp[ist] ) ;
+    spamatlinewrite( *pham, ist ) ;
   }
   */
   
 
-  *pham = hamtransp ;
 
   return totnumele ;
 }
@@ -339,10 +270,10 @@ int cilistitemadd( struct CIlistitem **ip0, int j1, int j2, int j3, int j4,
   ip -> nk = nk ;
   ip -> rmx = ( double * ) calloc( nk, sizeof( double ) ) ; 
   /* read or calculate  ip -> rmx[k] == rk(4,3;1,2)  */
-  printf("Enter Rk(%d,%d;%d,%d) for k=0..%d: ", 
+  if ( VERBOSE( VERBFULL ) ) printf("Enter Rk(%d,%d;%d,%d) for k=0..%d: ", 
 	 lsh[j4], lsh[j3], lsh[j1], lsh[j2], nk-1 ) ;
   for ( k = 0 ; k < nk ; k++ )  
-    scanf("%lf", &(ip -> rmx[k]) ) ;
+    fscanf( finput, "%lf", &(ip -> rmx[k]) ) ;
   ip -> next = *ip0 ;
   *ip0 = ip ;
   return ++nitems ;
@@ -10,7 +10,7 @@ void makestates( int nshells, int *lsh, int *sorb1sh, int nconfs,
   int *nstsh, ***combsh, *kst, *occorbs ;
   struct Fock *state ;
 
-  printf("nconfs = %d, nstates = %d\n",	nconfs, nstates0 ) ;
+  if ( VERBOSE( VERBSUMMARY ) ) printf("nconfs = %d, nstates = %d\n",	nconfs, nstates0 ) ;
   state = ( struct Fock * ) calloc( nstates0, sizeof( struct Fock ) ) ;
 
   combsh  = ( int *** ) malloc( nshells * sizeof( int ** ) ) ;
@@ -21,10 +21,12 @@ void makestates( int nshells, int *lsh, int *sorb1sh, int nconfs,
 
   nstates = 0 ;
   for ( iconf = 0 ; iconf < nconfs ; iconf++ ) {
-    printf("Conf No %2d = ( ", iconf ) ;
-    for ( ish = 0 ; ish < nshells ; ish++ )
-      printf("%d ", occ[iconf][ish] ) ;
-    printf(").\n") ;
+    if ( VERBOSE( VERBSUMMARY ) ) {
+      printf("Conf No %2d = ( ", iconf ) ;
+      for ( ish = 0 ; ish < nshells ; ish++ )
+        printf("%d ", occ[iconf][ish] ) ;
+      printf(").\n") ;
+    }
     for ( ish = 0 ; ish < nshells ; ish++ ) {
       k = occ[iconf][ish] ;
       nstsh[ish] = 
@@ -43,10 +45,12 @@ void makestates( int nshells, int *lsh, int *sorb1sh, int nconfs,
       if ( ishrun < nshells ) kst[ishrun]++ ;
       for ( ish = 0 ;  ish < ishrun ; ish++ ) 
 	kst[ish] = 0 ;
-      printf("%4d : ", nstates ) ;
-      for ( jel = 0 ; jel < nelectrons ;  jel++ ) 
-	printf("%2d ", occorbs[jel] ) ;
-      printf("\n") ;
+      if ( VERBOSE( VERBFULL ) ) {
+        printf("%4d : ", nstates ) ;
+        for ( jel = 0 ; jel < nelectrons ;  jel++ ) 
+	  printf("%2d ", occorbs[jel] ) ;
+        printf("\n") ;
+      }
       fockinit( state + nstates, iel, occorbs ) ; 
       nstates++ ;
     } while ( ishrun < nshells ) ; 
@@ -67,15 +71,16 @@ void makestates( int nshells, int *lsh, int *sorb1sh, int nconfs,
   free( combsh ) ;
 
 
-  if ( nstates != nstates0 ) { printf("nstates != nstates0\n") ; exit(1) ; }
+  if ( nstates != nstates0 ) { printf("nstates != nstates0\n") ; engineexit(1) ; }
 
   /* sorting the states */
   focklinearsort( nstates, state ) ;
-  for ( ist = 0 ; ist < nstates ; ist++ ) {
-    printf("%3d:%18llu)=", ist, state[ist].n) ; 
-    fockdisplay( state + ist ) ;
-    printf("\n") ;
-  }
+  if ( VERBOSE( VERBFULL ) )
+    for ( ist = 0 ; ist < nstates ; ist++ ) {
+      printf("%3d:%18llu)=", ist, state[ist].n) ; 
+      fockdisplay( state + ist ) ;
+      printf("\n") ;
+    }
   *pstate = state ;
   /*  return nstates ;
    */
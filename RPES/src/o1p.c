@@ -19,15 +19,17 @@ void o1plistdelete( struct O1plistitem *pitem )
 {
   int counter = 0 ;
   struct O1plistitem *pnextitem ;
-  printf("Deleting op1plist. Deleted items :\n") ;
+  if ( VERBOSE( VERBFULL ) ) printf("Deleting op1plist. Deleted items :\n") ;
   while ( pitem != 0 ) {
-    printf("(%d,%d,%7lf) ", pitem -> i1, pitem -> i2, pitem -> v ) ;
+    if ( VERBOSE( VERBFULL ) )
+      printf("(%d,%d,%7lf) ", pitem -> i1, pitem -> i2, pitem -> v ) ;
     pnextitem = pitem -> next ;
     free( pitem ) ;
     pitem = pnextitem ;
     counter++ ;
   }
-  printf("\n In all %d items have been deleted.\n", counter ) ;
+  if ( VERBOSE( VERBFULL ) )
+    printf("\n In all %d items have been deleted.\n", counter ) ;
 }
 
 
@@ -120,6 +122,7 @@ struct O1p o1pmake( struct O1plistitem *listp0 )
 
 void o1pprint( struct O1p h1p ) {
   int k1, k2 ;
+  if ( !VERBOSE( VERBFULL ) ) return ;
 /* print out the dynamical 2-dim array v1p */
   for ( k1 = 0 ; k1 < h1p.n ; k1++ ) 
     for ( k2 = 0 ; k2 < h1p.p[k1].n ; k2++ )
@@ -139,66 +142,82 @@ void o1pdelete( struct O1p h1p ) {
 }
 
 
+/*
+   o1papply  adds  op1p |state0>  to the sparse column accumulator  acc
+   ( coefficients in the basis pbrabasis of dimension nbrabasis ). Used
+   for one ket at a time, also by several threads at once ( each with its
+   own acc ).
+*/
+void o1papply( struct Fock state0, struct O1p op1p, int nbrabasis,
+	       struct Fock *pbrabasis, struct Spacc *acc )
+{
+  int brai, i1, i2, k1, k2, sign1, sign2 ;
+  double val ;
+  struct Fock state1, state2 ;
+  struct O1p2 op1p2 ;
+
+  for ( k1 = 0 ; k1 < op1p.n ; k1++ ) {
+    state1 = state0 ;
+    i1 = op1p.i[k1] ;
+    sign1 = fockdes( &state1, i1 ) ;
+    if ( sign1 != 0 ) {
+      op1p2 = op1p.p[k1] ;
+      for ( k2 = 0 ; k2 < op1p2.n ; k2++ ) {
+	state2 = state1 ;
+	i2 = op1p2.i[k2] ;
+	sign2 = fockcre( &state2, i2 ) ;
+	if ( sign2 != 0 ) {
+	  val = sign2 * sign1 *  op1p2.v[k2] ;
+	  if( findstate(nbrabasis, pbrabasis, &state2, &brai ) ) 
+	    spaccadd( acc, brai, val ) ;
+	  else {
+#pragma omp critical ( newstate )
+	    { 
+	    printf("c+%d c%d  -> %lf ", i2, i1, val ); 
+	    fockdisplay( &state2 ) ;
+	    printf(" = new state under No %d\n", brai ) ;
+	    }
+	  } 
+	}
+      }
+    }
+  }
+}
+
+
+/*
+   o1ptospama  matrix of op1p between the ket and bra bases, one line
+   per bra ( *psm, CSR ). The kets are independent: with OpenMP they are
+   shared among the threads, each with its own sparse accumulator; column
+   ketj only depends on ketj, so the result does not depend on the threads.
+   The columns are sorted into lines by spamatfromcolumns.
+*/
 int o1ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis, 
 		struct Fock *pbrabasis, struct O1p op1p, 
-		struct Spamaline **ppsml0 ) 
+		struct Spamat *psm ) 
 {
-  int ketj, brai, i1, i2, k1, k2, sign1, sign2, totnumele ;
-  double *columnj, val ;
-  struct Fock state0, state1, state2 ;
-  struct O1p2 op1p2 ;
+  int ketj, totnumele ;
+  struct Spacc acc ;
   struct Spamaline *psmcol0 ;
 	
 
   psmcol0 = ( struct Spamaline * )
     malloc( nketbasis * sizeof( struct Spamaline ) ) ;
 
-  columnj = ( double * ) malloc( nbrabasis * sizeof( double ) ) ;
   totnumele = 0 ;
 
+#pragma omp parallel private( ketj, acc )
+  {
+  acc = spaccmake( nbrabasis ) ;
+#pragma omp for schedule( dynamic, 16 ) reduction( +:totnumele )
   for ( ketj = 0 ; ketj < nketbasis ; ketj++ ) {
-    state0 = pketbasis[ketj] ;
-    /* fockdisplay( &state0 ) ; printf("\n") ; */
-
-    /* clear columnj */
-    for ( brai = 0 ; brai < nbrabasis ; brai++ ) 
-      columnj[brai] = 0. ;
-
 /* apply op1p to state */
-    for ( k1 = 0 ; k1 < op1p.n ; k1++ ) {
-      state1 = state0 ;
-      i1 = op1p.i[k1] ;
-      sign1 = fockdes( &state1, i1 ) ;
-      if ( sign1 != 0 ) {
-	op1p2 = op1p.p[k1] ;
-	for ( k2 = 0 ; k2 < op1p2.n ; k2++ ) {
-	  state2 = state1 ;
-	  i2 = op1p2.i[k2] ;
-	  sign2 = fockcre( &state2, i2 ) ;
-	  if ( sign2 != 0 ) {
-	    val = sign2 * sign1 *  op1p2.v[k2] ;
-	    /*
-	       printf("c+%d c%d  -> %lf ", i2, i1, val ); 
-	       fockdisplay( &state2 ) ;
-	    */ 
-	    if( findstate(nbrabasis, pbrabasis, &state2, &brai ) ) {
-	      /* printf(" = state No %d\n", brai ) ;  */
-	       columnj[brai] += val ;
-	    }
-	    else { 
-	      printf("c+%d c%d  -> %lf ", i2, i1, val ); 
-	      fockdisplay( &state2 ) ;
-	      printf(" = new state under No %d\n", brai ) ;
-	    } 
-	  }
-	}
-      }
-    }
-    totnumele += darray2spamaline( psmcol0 + ketj, nbrabasis, columnj ) ;
+    o1papply( pketbasis[ketj], op1p, nbrabasis, pbrabasis, &acc ) ;
+    totnumele += spacc2spamaline( &acc, psmcol0 + ketj ) ;
   }
 
-
-  free( columnj ) ; 
+  spaccdelete( acc ) ;
+  }
 /*
   printf("\n psmcol0[] totnumele = %d.\n\n", totnumele ) ;
   
@@ -208,15 +227,14 @@ int o1ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis,
   }
 */
 
-  totnumele = spamatranspose( &psmcol0, nketbasis, nbrabasis ) ;
+  *psm = spamatfromcolumns( psmcol0, nketbasis, nbrabasis ) ;
 
 /*
   for ( brai = 0 ; brai < nbrabasis ; brai++ ) {
     printf("brai =%3d --", brai) ;   
-    spamalinewrite( psmcol0[brai] ) ;
+    spamatlinewrite( *psm, brai ) ;
   }
 */
 
-  *ppsml0 = psmcol0 ;
   return totnumele ;
 }
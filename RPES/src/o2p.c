@@ -197,6 +197,7 @@ struct O2p o2pmake( struct O2plistitem *listp0 )
 
 void o2pprint( struct O2p vcb ) {
   int k1, k2, k3, k4 ;
+  if ( !VERBOSE( VERBFULL ) ) return ;
 /* print out the dimensions n1, n2(i1), n3(i1,i2), n4(i1,i2,i3,i4)  */
 /*
   printf("Dimensions. n1 = %d\n",  vcb.n ) ;
@@ -241,80 +242,94 @@ void o2pdelete( struct O2p vcb ) {
 }
 
 
-int o2ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis, 
-		struct Fock *pbrabasis, struct O2p op2p, 
-		struct Spamaline **ppsml0 ) 
+/*
+   o2papply  adds  op2p |state0>  to the sparse column accumulator  acc
+   ( coefficients in the basis pbrabasis of dimension nbrabasis ), see
+   o1papply.
+*/
+void o2papply( struct Fock state0, struct O2p op2p, int nbrabasis,
+	       struct Fock *pbrabasis, struct Spacc *acc )
 {
-  int ketj, brai, i1, i2, i3, i4, k1, k2, k3, k4, sign1, sign2, sign3, sign4 ;
-  int totnumele ;
-  double *columnj, val ;
-  struct Fock state0, state1, state2, state3, state4 ;
+  int brai, i1, i2, i3, i4, k1, k2, k3, k4, sign1, sign2, sign3, sign4 ;
+  double val ;
+  struct Fock state1, state2, state3, state4 ;
   struct O2p2 op2p2 ;
   struct O2p3 op2p3 ;
   struct O2p4 op2p4 ;
+
+  for ( k1 = 0 ; k1 < op2p.n ; k1++ ) {
+    state1 = state0 ;
+    i1 = op2p.i[k1] ;
+    sign1 = fockdes( &state1, i1 ) ;
+    if ( sign1 != 0 ) {
+      op2p2 = op2p.p[k1] ;
+      for ( k2 = 0 ; k2 < op2p2.n ; k2++ ) {
+	state2 = state1 ;
+	i2 = op2p2.i[k2] ;
+	sign2 = fockdes( &state2, i2 ) ;
+	if ( sign2 != 0 ) {
+	  op2p3 = op2p.p[k1].p[k2] ;
+	  for ( k3 = 0 ; k3 < op2p3.n ; k3++ ) {
+	    state3 = state2 ;
+	    i3 = op2p3.i[k3] ;
+	    sign3 = fockcre( &state3, i3 ) ;
+	    if ( sign3 != 0 ) {
+	      op2p4 = op2p.p[k1].p[k2].p[k3] ;
+	      for ( k4 = 0 ; k4 < op2p4.n ; k4++ ) {
+		state4 = state3 ;
+		i4 = op2p4.i[k4] ;
+		sign4 = fockcre( &state4, i4 ) ;
+		if ( sign4 != 0 ) {
+		  val = sign4 * sign3 * sign2 * sign1 *  op2p4.v[k4] ;
+		  if( findstate( nbrabasis, pbrabasis, &state4, &brai ) ) 
+		    spaccadd( acc, brai, val ) ;
+		  else { 
+#pragma omp critical ( newstate )
+		    {
+		    printf("c+%d c+%d c%d c%d  -> %lf ", i4,i3,i2,i1, val );
+		    fockdisplay( &state4 ) ; 
+		    printf(" = new state under No %d\n", brai ) ;
+		    }
+		  }
+		}
+	      }
+	    }
+	  } 
+	}
+      }
+    }
+  }
+}
+
+
+/* o2ptospama  as o1ptospama, for a two-particle operator */
+int o2ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis, 
+		struct Fock *pbrabasis, struct O2p op2p, 
+		struct Spamat *psm ) 
+{
+  int ketj ;
+  int totnumele ;
+  struct Spacc acc ;
   struct Spamaline *psmcol0 ;
 	
 
   psmcol0 = ( struct Spamaline * )
     malloc( nketbasis * sizeof( struct Spamaline ) ) ;
 
-  columnj = ( double * ) malloc( nbrabasis * sizeof( double ) ) ;
   totnumele = 0 ;
 
+#pragma omp parallel private( ketj, acc )
+  {
+  acc = spaccmake( nbrabasis ) ;
+#pragma omp for schedule( dynamic, 16 ) reduction( +:totnumele )
   for ( ketj = 0 ; ketj < nketbasis ; ketj++ ) {
-    state0 = pketbasis[ketj] ;
-    /* fockdisplay( &state0 ) ; printf("\n") ; */
-
-    /* clear columnj */
-    for ( brai = 0 ; brai < nbrabasis ; brai++ ) 
-      columnj[brai] = 0. ;
-
 /* apply op2p to state */
-    for ( k1 = 0 ; k1 < op2p.n ; k1++ ) {
-      state1 = state0 ;
-      i1 = op2p.i[k1] ;
-      sign1 = fockdes( &state1, i1 ) ;
-      if ( sign1 != 0 ) {
-	op2p2 = op2p.p[k1] ;
-	for ( k2 = 0 ; k2 < op2p2.n ; k2++ ) {
-	  state2 = state1 ;
-	  i2 = op2p2.i[k2] ;
-	  sign2 = fockdes( &state2, i2 ) ;
-	  if ( sign2 != 0 ) {
-	    op2p3 = op2p.p[k1].p[k2] ;
-	    for ( k3 = 0 ; k3 < op2p3.n ; k3++ ) {
-	      state3 = state2 ;
-	      i3 = op2p3.i[k3] ;
-	      sign3 = fockcre( &state3, i3 ) ;
-	      if ( sign3 != 0 ) {
-		op2p4 = op2p.p[k1].p[k2].p[k3] ;
-		for ( k4 = 0 ; k4 < op2p4.n ; k4++ ) {
-		  state4 = state3 ;
-		  i4 = op2p4.i[k4] ;
-		  sign4 = fockcre( &state4, i4 ) ;
-		  if ( sign4 != 0 ) {
-		    val = sign4 * sign3 * sign2 * sign1 *  op2p4.v[k4] ;
-		    if( findstate( nbrabasis, pbrabasis, &state4, &brai ) ) {
-		      columnj[brai] += val ;
-		    }
-		    else { 
-		      printf("c+%d c+%d c%d c%d  -> %lf ", i4,i3,i2,i1, val );
-		      fockdisplay( &state4 ) ; 
-		      printf(" = new state under No %d\n", brai ) ;
-		    }
-		  }
-		}
-	      }
-	    } 
-	  }
-	}
-      }
-    }
-    totnumele += darray2spamaline( psmcol0 + ketj, nbrabasis, columnj ) ;
+    o2papply( pketbasis[ketj], op2p, nbrabasis, pbrabasis, &acc ) ;
+    totnumele += spacc2spamaline( &acc, psmcol0 + ketj ) ;
   }
 
-
-  free( columnj ) ; 
+  spaccdelete( acc ) ;
+  }
 /*
   printf("\n psmcol0[] totnumele = %d.\n\n", totnumele ) ;
   
@@ -324,15 +339,14 @@ int o2ptospama( int nketbasis, struct Fock *pketbasis, int nbrabasis,
   }
 */
 
-  totnumele = spamatranspose( &psmcol0, nketbasis, nbrabasis ) ;
+  *psm = spamatfromcolumns( psmcol0, nketbasis, nbrabasis ) ;
 
 /*
   for ( brai = 0 ; brai < nbrabasis ; brai++ ) {
     printf("brai =%3d --", brai) ;   
-    spamalinewrite( psmcol0[brai] ) ;
+    spamatlinewrite( *psm, brai ) ;
   }
 */
 
-  *ppsml0 = psmcol0 ;
   return totnumele ;
 }
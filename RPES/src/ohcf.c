@@ -18,7 +18,7 @@ int crystalfieldOh2list( int nshells, int *lsh, int *sorb1sh,
 	  if ( m == 0 ) shift = 0.6 * tendq ;
 	  else if ( m == 1 || m == -1 ) shift = -0.4 * tendq ;
 	  else if ( m == 2 || m == -2 ) shift =  0.1 * tendq ;
-	  else { printf("TROUBLE in crystalfieldOh2list\n") ; exit(1) ; }
+	  else { printf("TROUBLE in crystalfieldOh2list\n") ; engineexit(1) ; }
 	  for ( sigma = -1 ; sigma <= 1 ; sigma += 2 ) {
 	    i1 = sporbindex( sorb1sh, lsh, ish, m, sigma ) ; 
 	    o1plistitemadd( ppo1plistitem0, i1, i1, shift ) ;
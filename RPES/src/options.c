@@ -0,0 +1,130 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include "globals.h"
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+/* run-time options. defaults reproduce the original behaviour */
+static const struct Options defaults = { OUTTEXT, 0, VERBFULL, 0, 32, 0, 0,
+  { { EIGALL, 0, 0., 0. }, { EIGALL, 0, 0., 0. }, { EIGALL, 0, 0., 0. } } } ;
+struct Options options = { OUTTEXT, 0, VERBFULL, 0, 32, 0, 0,
+  { { EIGALL, 0, 0., 0. }, { EIGALL, 0, 0., 0. }, { EIGALL, 0, 0., 0. } } } ;
+
+/* 
+   readoptions  sets  options  from environment variables :
+   MULTIPLET_OUTPUT = text | binary | both | none
+       format of rpesalms, xmat, rp, rpc and peslm output (see binout.c);
+       none: no output files at all ( pes, xaq, xaqx, xaqc and rpes.dat
+       are otherwise always written as text )
+   MULTIPLET_DUMP = 0 | 1
+       1: write the arrays of the omega loop (menergy, gamst, xasmatele,
+       fstvmst, pesmatele, nm1fenergy, gstenergy) as .bin files
+   MULTIPLET_VERBOSITY = 0 | 1 | 2  (or quiet | summary | full)
+       amount of diagnostic printing on stdout, see VERB* in globals.h
+   MULTIPLET_PROGRESS = 0 | 1
+       1: timing, progress and memory records on stderr ( see progress.c )
+   MULTIPLET_OMEGA_BLOCK = N  (default 32)
+       omega points whose resonant matrix elements are computed together
+       in one matrix-matrix product per photoelectron orbital
+   MULTIPLET_THREADS = N  (default 0: OMP_NUM_THREADS or all cores)
+       threads of the Hamiltonian and operator matrix builders ( calcham,
+       o1ptospama, o2ptospama ) if compiled with OpenMP ( -fopenmp );
+       the results do not depend on N
+   MULTIPLET_CHECKPOINT = 0 | 1
+       1: save the state before the omega loop and the progress of the
+       loop, and resume an interrupted run of the same input from its
+       last completed omega point ( see checkpoint.c )
+   MULTIPLET_EIGEN_GROUND, MULTIPLET_EIGEN_FINAL, MULTIPLET_EIGEN_INTERMEDIATE
+       eigenpairs computed for the block ( see solve_eigen ) :
+       all                 all ( dsyev, default )
+       lowest | lowest:K   the lowest | the K lowest ( dsyevr ), up to
+                           the end of the level of the last one
+       window:EMIN:EMAX    final and intermediate block: states with
+                           EMIN < E - E_ground <= EMAX ( dsyevr ), i.e.
+                           -binding energy resp. resonance photon energy
+*/
+static const char *eigenvars[3] = { "MULTIPLET_EIGEN_GROUND",
+  "MULTIPLET_EIGEN_FINAL", "MULTIPLET_EIGEN_INTERMEDIATE" } ;
+
+static void readeigsel( int blk )
+{
+  char *s ;
+  struct Eigsel *sel = &options.eig[blk] ;
+
+  s = getenv( eigenvars[blk] ) ;
+  if ( s == 0 || strcmp( s, "all" ) == 0 ) return ;
+  if ( strcmp( s, "lowest" ) == 0 ) { sel->mode = EIGLOWEST ; sel->n = 0 ; return ; }
+  if ( sscanf( s, "lowest:%d", &sel->n ) == 1 && sel->n > 0 ) { sel->mode = EIGLOWEST ; return ; }
+  if ( blk != BLKGROUND && sscanf( s, "window:%lf:%lf", &sel->emin, &sel->emax ) == 2
+       && sel->emin < sel->emax ) { sel->mode = EIGWINDOW ; return ; }
+  printf("%s=%s unknown. Use all, lowest, lowest:K or window:EMIN:EMAX%s\n", eigenvars[blk], s,
+         blk == BLKGROUND ? " (not for the ground block)" : "" ) ;
+  engineexit(1) ;
+}
+
+void readoptions( void )
+{
+  int blk ;
+  char *s ;
+
+  /* every run starts from the defaults ( repeated library runs ) */
+  options = defaults ;
+  s = getenv("MULTIPLET_OUTPUT") ;
+  if ( s != 0 ) {
+    if ( strcmp( s, "text" ) == 0 ) options.output = OUTTEXT ;
+    else if ( strcmp( s, "binary" ) == 0 ) options.output = OUTBINARY ;
+    else if ( strcmp( s, "both" ) == 0 ) options.output = OUTTEXT | OUTBINARY ;
+    else if ( strcmp( s, "none" ) == 0 ) options.output = OUTNONE ;
+    else { printf("MULTIPLET_OUTPUT=%s unknown. Use text, binary, both or none\n", s ) ; engineexit(1) ; }
+  }
+  s = getenv("MULTIPLET_VERBOSITY") ;
+  if ( s != 0 ) {
+    if ( strcmp( s, "quiet" ) == 0 ) options.verbosity = VERBQUIET ;
+    else if ( strcmp( s, "summary" ) == 0 ) options.verbosity = VERBSUMMARY ;
+    else if ( strcmp( s, "full" ) == 0 ) options.verbosity = VERBFULL ;
+    else if ( s[0] >= '0' && s[0] <= '9' ) options.verbosity = atoi( s ) ;
+    else { printf("MULTIPLET_VERBOSITY=%s unknown. Use 0|quiet, 1|summary or 2|full\n", s ) ; engineexit(1) ; }
+  }
+  s = getenv("MULTIPLET_DUMP") ;
+  if ( s != 0 ) options.dump = atoi( s ) ;
+  s = getenv("MULTIPLET_PROGRESS") ;
+  if ( s != 0 ) options.progress = atoi( s ) ;
+  s = getenv("MULTIPLET_OMEGA_BLOCK") ;
+  if ( s != 0 ) {
+    options.omegablock = atoi( s ) ;
+    if ( options.omegablock < 1 ) { printf("MULTIPLET_OMEGA_BLOCK=%s must be a positive integer\n", s ) ; engineexit(1) ; }
+  }
+  s = getenv("MULTIPLET_CHECKPOINT") ;
+  if ( s != 0 ) options.checkpoint = atoi( s ) ;
+  s = getenv("MULTIPLET_THREADS") ;
+  if ( s != 0 ) {
+    options.threads = atoi( s ) ;
+    if ( options.threads < 0 ) { printf("MULTIPLET_THREADS=%s must be 0 or a positive integer\n", s ) ; engineexit(1) ; }
+  }
+  setthreads( options.threads ) ;
+  for ( blk = 0 ; blk < 3 ; blk++ ) readeigsel( blk ) ;
+}
+
+/* threads of the parallel builders, n = 0: OMP_NUM_THREADS or all cores */
+void setthreads( int n )
+{
+#ifdef _OPENMP
+  static int ompdefault = 0 ;
+
+  if ( ompdefault == 0 ) ompdefault = omp_get_max_threads() ;
+  omp_set_num_threads( n > 0 ? n : ompdefault ) ;
+#endif
+  options.threads = n ;
+}
+
+/* number of threads of the parallel builders ( 1 without OpenMP ) */
+int nthreads( void )
+{
+#ifdef _OPENMP
+  return omp_get_max_threads() ;
+#else
+  return 1 ;
+#endif
+}
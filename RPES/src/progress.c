@@ -0,0 +1,87 @@
+#include <stdio.h>
+#include <sys/time.h>
+#ifndef _WIN32
+#include <sys/resource.h>
+#endif
+#include "globals.h"
+
+/*
+   machine readable timing and progress records, one line per record
+   on stderr ( enabled by MULTIPLET_PROGRESS=1, see options.c ) :
+
+   @progress phase=calcham block=ground n=120 time=0.0123 elapsed=0.2 rss=14236
+   @progress phase=omega i=3 n=15 omega=646.000000 time=0.0170 elapsed=7.9 rss=201012
+
+   time is the duration of the phase (s), elapsed the wall time since
+   the start of the run (s), rss the peak resident set size (kB).
+   Parsed by engine_progress.py.
+*/
+
+static double tstart = -1. ;
+
+double walltime( void )
+{
+  struct timeval tv ;
+
+  gettimeofday( &tv, 0 ) ;
+  return tv.tv_sec + 1.e-6 * tv.tv_usec ;
+}
+
+/* peak resident set size of this process in kB, 0 if unknown */
+long peakrss( void )
+{
+#ifndef _WIN32
+  struct rusage ru ;
+
+  if ( getrusage( RUSAGE_SELF, &ru ) ) return 0 ;
+#ifdef __APPLE__
+  return ru.ru_maxrss / 1024 ;  /* bytes on macOS */
+#else
+  return ru.ru_maxrss ;
+#endif
+#else
+  return 0 ;
+#endif
+}
+
+void progressstart( void )
+{
+  tstart = walltime() ;
+}
+
+/* phase  of  block  ( n = matrix dimension ) finished; t0 = walltime() at its start */
+void progressphase( const char *phase, const char *block, int n, double t0 )
+{
+  double t ;
+
+  if ( !options.progress ) return ;
+  fflush( stdout ) ;  /* keep records between complete lines of a shared log */
+  t = walltime() ;
+  fprintf( stderr, "@progress phase=%s block=%s n=%d time=%.4f elapsed=%.3f rss=%ld\n",
+           phase, block, n, t - t0, t - tstart, peakrss() ) ;
+  fflush( stderr ) ;
+}
+
+/* omega point i ( 1 .. n ) finished; t0 = walltime() at its start */
+void progressomega( int i, int n, double omega, double t0 )
+{
+  double t ;
+
+  if ( !options.progress ) return ;
+  fflush( stdout ) ;
+  t = walltime() ;
+  fprintf( stderr, "@progress phase=omega i=%d n=%d omega=%lf time=%.4f elapsed=%.3f rss=%ld\n",
+           i, n, omega, t - t0, t - tstart, peakrss() ) ;
+  fflush( stderr ) ;
+}
+
+void progressdone( void )
+{
+  double t ;
+
+  if ( !options.progress ) return ;
+  fflush( stdout ) ;
+  t = walltime() ;
+  fprintf( stderr, "@progress phase=done elapsed=%.3f rss=%ld\n", t - tstart, peakrss() ) ;
+  fflush( stderr ) ;
+}
@@ -1,7 +1,11 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
+#include <math.h>
+#include "globals.h"
 
 #define LWORKFAC 40 ;
+#define EPSILON 1.e-10  /* degeneracy, as in main.c */
 
 /* Fortran function declaration */
 extern void dsyev_(char *jobz, char *uplo, int *n, double *a, int *lda,
@@ -31,10 +35,142 @@ int solve_dsyev(int n, double* a, double* lambda ) {
 
     dsyev_( &JOBZ, &UPLO, &n, a, &n, lambda, WORK, &LWORK, &INFO ) ;
 
-    printf(" LWORK: actual = %d, optimal = %d\n", LWORK, (int)(WORK[0]) ) ;
+    if ( VERBOSE( VERBFULL ) ) printf(" LWORK: actual = %d, optimal = %d\n", LWORK, (int)(WORK[0]) ) ;
     free( WORK ) ;
 
     return INFO ;
 }
 
 #undef LWORKFAC
+
+extern void dsyevr_(char *jobz, char *range, char *uplo, int *n, double *a,
+                    int *lda, double *vl, double *vu, int *il, int *iu,
+                    double *abstol, int *m, double *w, double *z, int *ldz,
+                    int *isuppz, double *work, int *lwork, int *iwork,
+                    int *liwork, int *info);
+
+int solve_dsyevr(int n, double* a, double* lambda, char jobz, char range, char uplo,
+                 double vl, double vu, int il, int iu, double* z, int *pm ) {
+/*
+   C-wrapper function for the Lapack routine DSYEVR ( MRRR algorithm ),
+   which computes only the selected eigenpairs :
+     range = 'A' : all eigenpairs
+     range = 'I' : eigenpairs il .. iu ( 1-based, ascending )
+     range = 'V' : eigenvalues in the interval ( vl, vu ]
+   jobz = 'N' : eigenvalues only ( z is not used ), 'V' : also the
+   eigenvectors, as columns of  z  ( z[ i + n * k ], room for all of them ).
+   Only the  uplo  triangle of  a  is read; it is destroyed, including the
+   diagonal, the other triangle is not touched.
+   On output  *pm  eigenvalues are in  lambda.
+*/
+    int LWORK, LIWORK, INFO, M, LDZ, IWORKQ, *IWORK, *ISUPPZ ;
+    double ABSTOL = 0., WORKQ, *WORK ;
+
+    *pm = 0 ;
+    if ( n <= 0 ) return 0 ;
+
+    LDZ = jobz == 'V' ? n : 1 ;
+    if ( jobz != 'V' ) z = lambda ;
+    ISUPPZ = ( int * ) malloc( 2 * n * sizeof( int ) ) ;
+    LWORK = LIWORK = -1 ;  /* workspace query */
+    dsyevr_( &jobz, &range, &uplo, &n, a, &n, &vl, &vu, &il, &iu, &ABSTOL,
+             &M, lambda, z, &LDZ, ISUPPZ, &WORKQ, &LWORK, &IWORKQ, &LIWORK, &INFO ) ;
+    LWORK = (int) WORKQ ;
+    LIWORK = IWORKQ ;
+    WORK = ( double * ) malloc( LWORK * sizeof( double ) ) ;
+    IWORK = ( int * ) malloc( LIWORK * sizeof( int ) ) ;
+
+    dsyevr_( &jobz, &range, &uplo, &n, a, &n, &vl, &vu, &il, &iu, &ABSTOL,
+             &M, lambda, z, &LDZ, ISUPPZ, WORK, &LWORK, IWORK, &LIWORK, &INFO ) ;
+
+    if ( VERBOSE( VERBFULL ) ) printf(" DSYEVR: %d of %d eigen%s, LWORK = %d, LIWORK = %d\n", M, n,
+                                      jobz == 'V' ? "pairs" : "values", LWORK, LIWORK ) ;
+    if ( INFO == 0 ) *pm = M ;
+    free( IWORK ) ;
+    free( WORK ) ;
+    free( ISUPPZ ) ;
+
+    return INFO ;
+}
+
+static void upper_from_lower( int n, double* a, double* diag ) {
+/*
+   restore the upper triangle and the diagonal of the symmetric matrix  a
+   from its lower triangle and  diag, before a dsyevr call with uplo = 'U'
+   ( which leaves the lower triangle, the one dsyev reads, untouched )
+*/
+    int i, j ;
+
+    for ( j = 0 ; j < n ; j++ ) {
+      a[ j + n * j ] = diag[j] ;
+      for ( i = j + 1 ; i < n ; i++ ) a[ j + n * i ] = a[ i + n * j ] ;
+    }
+}
+
+int solve_eigen(int n, double* a, double* lambda, struct Eigsel sel,
+                double eref, int *pm ) {
+/*
+   eigenpairs of the symmetric matrix  a  ( lower triangle ) selected by
+   sel  ( see options.c ) :
+     EIGALL    : all  n  eigenpairs ( solve_dsyev )
+     EIGLOWEST : the  sel.n  lowest ( sel.n = 0 : the lowest one ), extended
+                 to the end of the degenerate level of the last ( a level is
+                 never split )
+     EIGWINDOW : eigenvalues with  sel.emin < lambda - eref <= sel.emax
+   Returns the Lapack INFO; the number of eigenpairs is stored in  *pm  and
+   a  holds the eigenvectors as columns ( a[ i + n * k ] ).
+   Only the selected eigenvectors are stored besides  a : EIGLOWEST
+   computes a few more than  sel.n  and retries with more if the level is
+   not complete, EIGWINDOW first counts the eigenvalues in the window.
+*/
+    int info, i, k, nlow, il, iu ;
+    double *diag, *z ;
+
+    if ( sel.mode == EIGALL ) {
+      *pm = n ;
+      return solve_dsyev( n, a, lambda ) ;
+    }
+    *pm = 0 ;
+    if ( n <= 0 ) return 0 ;
+    /* dsyevr runs on the upper triangle, restored from the lower one */
+    diag = ( double * ) malloc( n * sizeof( double ) ) ;
+    for ( i = 0 ; i < n ; i++ ) diag[i] = a[ i + n * i ] ;
+
+    if ( sel.mode == EIGWINDOW ) {
+      upper_from_lower( n, a, diag ) ;
+      info = solve_dsyevr( n, a, lambda, 'N', 'A', 'U', 0., 0., 1, n, 0, &k ) ;
+      for ( il = 1 ; il <= n && lambda[il-1] - eref <= sel.emin ; il++ ) ;
+      for ( iu = il - 1 ; iu < n && lambda[iu] - eref <= sel.emax ; iu++ ) ;
+      nlow = iu ;
+      k = iu - il + 1 ;
+    }
+    else {
+      nlow = sel.n > 0 ? ( sel.n < n ? sel.n : n ) : 1 ;
+      il = 1 ;
+      k = nlow + 7 ;
+      info = 0 ;
+    }
+
+    for ( ; info == 0 && k > 0 ; k *= 2 ) {
+      if ( il - 1 + k > n ) k = n - il + 1 ;
+      upper_from_lower( n, a, diag ) ;
+      z = ( double * ) malloc( (size_t) n * k * sizeof( double ) ) ;
+      info = solve_dsyevr( n, a, lambda, 'V', 'I', 'U', 0., 0., il, il - 1 + k, z, pm ) ;
+      /* the level of the nlow-th eigenvalue is complete once a higher
+         eigenvalue is found ( a window is complete after one call ) */
+      if ( info || sel.mode == EIGWINDOW || il - 1 + k == n
+           || fabs( lambda[k-1] - lambda[nlow-1] ) >= EPSILON ) {
+        /* keep the lowest nlow and the rest of the nlow-th level */
+        if ( info == 0 && sel.mode == EIGLOWEST )
+          while ( *pm > nlow && fabs( lambda[*pm-1] - lambda[nlow-1] ) >= EPSILON ) (*pm)-- ;
+        if ( info == 0 ) memcpy( a, z, (size_t) n * (*pm) * sizeof( double ) ) ;
+        free( z ) ;
+        break ;
+      }
+      free( z ) ;
+    }
+    free( diag ) ;
+    return info ;
+}
+
+#undef EPSILON
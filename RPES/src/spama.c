@@ -1,5 +1,6 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <math.h>
 #include "globals.h"
 #define EPSZERO 1.e-8
@@ -28,52 +29,154 @@ int darray2spamaline( struct Spamaline *sml, int n, double *a )
 }
 
 
-int spamatranspose( struct Spamaline **psm, int nlines, int ncolumns ) 
+/*
+   sparse matrices in compressed sparse row form ( struct Spamat ) : one
+   contiguous array of column indices and values, line i is
+   col[k], val[k] for rowptr[i] <= k < rowptr[i+1], ordered by column.
+*/
+struct Spamat spamatmake( int nrow, int ncol, int nnz ) 
 {
-  int *nextk, *ibuf, i, j, k, kt, counter = 0 ;
-  double *vbuf ;
-  struct Spamaline *sm, *smtransposed ;
-  
-  nextk = ( int * ) calloc( nlines, sizeof( int ) ) ;
-  ibuf  = ( int * ) malloc( nlines * sizeof( int ) ) ;
-  vbuf  = ( double * ) malloc( nlines * sizeof( double ) ) ;
-  smtransposed = ( struct Spamaline * ) 
-    malloc( ncolumns * sizeof( struct Spamaline ) ) ;
-  sm = *psm ;
+  struct Spamat sm ;
 
-  for ( j = 0 ; j < ncolumns ; j++ ) {
-    kt = 0 ;
-    for ( i = 0 ; i < nlines ; i++ ) {
-      k = nextk[i] ;
-      if ( k < sm[i].n && j == sm[i].j[k] ) {  /* bingo: the element (i,j) is non zero */
-	ibuf[kt] = i ;
-	vbuf[kt] = sm[i].v[k] ;
-	kt++ ;
-	nextk[i]++ ;
-      }
-    }
-    smtransposed[j].n = kt ;
-    smtransposed[j].j = ( int * ) malloc( kt * sizeof( int ) ) ;
-    smtransposed[j].v = ( double * ) malloc( kt * sizeof( double ) ) ;
-    for ( k = 0 ; k < kt ; k++ ) {
-      smtransposed[j].j[k] = ibuf[k] ;
-      smtransposed[j].v[k] = vbuf[k] ;
+  sm.nrow = nrow ;
+  sm.ncol = ncol ;
+  sm.rowptr = ( int * ) calloc( nrow + 1, sizeof( int ) ) ;
+  sm.col = ( int * ) malloc( nnz * sizeof( int ) ) ;
+  sm.val = ( double * ) malloc( nnz * sizeof( double ) ) ;
+  return sm ;
+}
+
+void spamatdelete( struct Spamat *sm ) 
+{
+  free( sm -> rowptr ) ;
+  free( sm -> col ) ;
+  free( sm -> val ) ;
+  sm -> rowptr = sm -> col = 0 ;
+  sm -> val = 0 ;
+}
+
+/*
+   spamatfromcolumns  builds the nrows x ncols matrix whose column j is
+   the sparse line cols[j] ( as collected per ket by the operator
+   builders ) and frees cols. Counting sort: the elements of every line
+   are counted, then copied column by column, so the lines are ordered
+   and the cost is linear in the number of elements.
+*/
+struct Spamat spamatfromcolumns( struct Spamaline *cols, int ncols, int nrows ) 
+{
+  int i, j, k, nnz = 0, *next ;
+  struct Spamat sm ;
+
+  for ( j = 0 ; j < ncols ; j++ ) 
+    nnz += cols[j].n ;
+  sm = spamatmake( nrows, ncols, nnz ) ;
+  for ( j = 0 ; j < ncols ; j++ ) 
+    for ( k = 0 ; k < cols[j].n ; k++ ) 
+      sm.rowptr[ cols[j].j[k] + 1 ]++ ;
+  for ( i = 0 ; i < nrows ; i++ ) 
+    sm.rowptr[i+1] += sm.rowptr[i] ;
+  next = ( int * ) malloc( ( nrows + 1 ) * sizeof( int ) ) ;
+  for ( i = 0 ; i < nrows ; i++ ) 
+    next[i] = sm.rowptr[i] ;
+  for ( j = 0 ; j < ncols ; j++ ) 
+    for ( k = 0 ; k < cols[j].n ; k++ ) {
+      i = cols[j].j[k] ;
+      sm.col[ next[i] ] = j ;
+      sm.val[ next[i] ] = cols[j].v[k] ;
+      next[i]++ ;
     }
-    counter += kt ;
-  }
+  free( next ) ;
+  spamadelete( cols, ncols ) ;
+  return sm ;
+}
 
-  /* deallocate  sm  == *psm  completely */  
-  for ( i = 0 ; i < nlines ; i++ ) {
-    free( sm[i].j ) ;
-    free( sm[i].v ) ;
+/* dense column-major copy  a[ i + nrow*j ]  of the matrix */
+void spamat2dense( struct Spamat sm, double *a ) 
+{
+  int i, k ;
+
+  memset( a, 0, (size_t) sm.nrow * sm.ncol * sizeof( double ) ) ;
+  for ( i = 0 ; i < sm.nrow ; i++ ) 
+    for ( k = sm.rowptr[i] ; k < sm.rowptr[i+1] ; k++ ) 
+      a[ i + (size_t) sm.nrow * sm.col[k] ] = sm.val[k] ;
+}
+
+void spamatlinewrite( struct Spamat sm, int i ) 
+{
+  int k ;
+  for ( k = sm.rowptr[i] ; k < sm.rowptr[i+1] ; k++ ) 
+    printf(" %2d %7.4lf,", sm.col[k], sm.val[k] ) ;
+  printf("\n") ;
+}
+
+
+/*
+   sparse accumulator ( struct Spacc ) for one column of an operator
+   matrix in a basis of dimension n : v[n] is dense and zero except at the
+   nj indices j[] hit so far ( marked in hit[] ). Adding, collecting and
+   clearing a column costs only the number of hits, not n.
+*/
+struct Spacc spaccmake( int n ) 
+{
+  struct Spacc acc ;
+
+  acc.nj = 0 ;
+  acc.j = ( int * ) malloc( n * sizeof( int ) ) ;
+  acc.hit = ( char * ) calloc( n, sizeof( char ) ) ;
+  acc.v = ( double * ) calloc( n, sizeof( double ) ) ;
+  return acc ;
+}
+
+void spaccdelete( struct Spacc acc ) 
+{
+  free( acc.j ) ;
+  free( acc.hit ) ;
+  free( acc.v ) ;
+}
+
+void spaccadd( struct Spacc *acc, int j, double v ) 
+{
+  if ( !acc -> hit[j] ) {
+    acc -> hit[j] = 1 ;
+    acc -> j[ acc -> nj++ ] = j ;
   }
-  free( *psm ) ;
+  acc -> v[j] += v ;
+}
 
-  *psm = smtransposed ;
-  
-  /* now, on exit, *psm is the transposed sparse matrix */
+static int intcompare( const void *a, const void *b ) 
+{
+  return *( const int * ) a - *( const int * ) b ;
+}
+
+/* 
+   move the accumulated column to the Spamaline sml ( ordered, elements
+   with |v| > EPSZERO as in darray2spamaline ) and clear the accumulator
+*/
+int spacc2spamaline( struct Spacc *acc, struct Spamaline *sml ) 
+{
+  int j, k, nsml ;
 
-  return counter ;  /* total number of elements in  *psm  on exit */
+  qsort( acc -> j, acc -> nj, sizeof( int ), intcompare ) ;
+  nsml = 0 ;
+  for ( k = 0 ; k < acc -> nj ; k++ ) 
+    if ( fabs( acc -> v[ acc -> j[k] ] ) > EPSZERO ) 
+      nsml++ ;
+  sml -> n = nsml ;
+  sml -> j = ( int * ) malloc( nsml * sizeof( int ) ) ;
+  sml -> v = ( double * ) malloc( nsml * sizeof( double ) ) ;
+  nsml = 0 ;
+  for ( k = 0 ; k < acc -> nj ; k++ ) {
+    j = acc -> j[k] ;
+    if ( fabs( acc -> v[j] ) > EPSZERO ) {
+      sml -> j[nsml] = j ;
+      sml -> v[nsml] = acc -> v[j] ;
+      nsml++ ;
+    }
+    acc -> v[j] = 0. ;
+    acc -> hit[j] = 0 ;
+  }
+  acc -> nj = 0 ;
+  return nsml ;
 }
 
 
@@ -107,36 +210,33 @@ void spamadelete( struct Spamaline *sparsemat, int nlines )
 
 /* 
    sparsematrealmatele   returns matrix element  <bra|A|ket>  
-   where the operator  A  is described by psmline0,
+   where the operator  A  is described by the sparse matrix sm,
    <bra| = \sum_i^{nbrabasis} bravec[i] <brabasis[i]|,  
    |ket> = \sum_j^{nketbasis} ketvec[j] |ketbasis[j]>   
    For consistency we must have that 
-   psmline0 (as an array)  has dimension  nbrabasis  and that the 
-   indices j = psmline0[i].j[k] do not exceed  nketbasis.
+   sm  has  nbrabasis  lines and  nketbasis  columns.
    <bra|A|ket> = \sum_i^{nbrabasis} \sum_j^{nketbasis} 
                  bravec[i] <brabasis[i]|A|ketbasis[j]> ketvec[j] 
         = \sum_i^{nbrabasis} bravec[i] *
-          \sum_k^{psmline0[i].n} psmline0[i].v[k] * ketvec[psmline0[i].j[k]]
+          \sum_{k=rowptr[i]}^{rowptr[i+1]-1} val[k] * ketvec[col[k]]
 
    WARNING : ONLY VALID WHEN COEFFICIENTS bravec[i] ARE REAL 
 */ 
 /* 
-  fast version. here we denote the pointer psmline rather then psmline0 
+  fast version ( nbrabasis = sm.nrow, nketbasis = sm.ncol ) 
 */
-double spamarealmatele( int nketbasis, double *ketvec, int nbrabasis,
-     double *bravec, struct Spamaline *psmline ) 
+double spamarealmatele( double *ketvec, double *bravec, struct Spamat sm ) 
 {
   int i, k ;
   double sumk, sum ;
 
   sum = 0. ;  
-  for ( i = 0 ; i < nbrabasis ; i++ ) {
+  for ( i = 0 ; i < sm.nrow ; i++ ) {
     sumk = 0. ;
-    for ( k = 0 ; k < psmline -> n ; k++ ) {
-      sumk  +=  psmline -> v[k]  *  ketvec[ psmline -> j[k] ] ;
+    for ( k = sm.rowptr[i] ; k < sm.rowptr[i+1] ; k++ ) {
+      sumk  +=  sm.val[k]  *  ketvec[ sm.col[k] ] ;
     }
-    sum  +=  (*bravec++) * sumk ;
-    psmline++ ;
+    sum  +=  bravec[i] * sumk ;
   }
   return sum ;
 }
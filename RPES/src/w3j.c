@@ -2,6 +2,7 @@
 #include<stdlib.h>
 #include<math.h>
 #include "w3j.h"
+#include "globals.h"
 
 #define LMAX  4
 #define SDMAX 8
@@ -88,7 +89,7 @@ double w3jtabval(int jd1, int jd2, int jd3, int md1, int md2){
 	return w3jtab[imid].val ;
     else {
 	printf("error in w3jtabval: (jd1 ... md2) not found\n");
-	exit(1);
+	engineexit(1);
     }
 }
 
@@ -148,7 +149,7 @@ double w3jcalc(int jd1, int jd2, int jd3, int md1, int md2, int md3){
 
     if (!w3jdefined(jd1, jd2, jd3, md1, md2, md3)){
        printf(" !w3jdefined in w3jcalc\n"); 
-       exit(1);
+       engineexit(1);
     }
     else if (!w3jnonzero(jd1, jd2, jd3, md1, md2, md3))
        return 0.e0;
@@ -206,8 +207,10 @@ void w3jtabmake(){
 /* 
    defines and allocates table (W3jord*) w3jtab, 
    and its dimension (int) w3jtabdim 
+   ( once per process: repeated runs of the library reuse the table )
 */
     int jd1,jd2,jd3,md1,md2,md3,count ;
+    if ( w3jtab ) return ;
 /*
     count w3jtabdim
 */
@@ -271,8 +274,10 @@ void w3jtabmake(){
       }
      }	
     }
-    printf(" w3jtabmake: LMAX = %d, SDMAX = %d, JDMAX = %d,",LMAX,SDMAX,JDMAX);
-    printf(" count = %d, w3jtabdim = %d\n", count, w3jtabdim);
+    if ( VERBOSE( VERBSUMMARY ) ) {
+      printf(" w3jtabmake: LMAX = %d, SDMAX = %d, JDMAX = %d,",LMAX,SDMAX,JDMAX);
+      printf(" count = %d, w3jtabdim = %d\n", count, w3jtabdim);
+    }
 }
 
 double w3j(int jd1, int jd2, int jd3, int md1, int md2, int md3){
@@ -284,7 +289,7 @@ double w3j(int jd1, int jd2, int jd3, int md1, int md2, int md3){
 
     if (!w3jdefined(jd1, jd2, jd3, md1, md2, md3)){
        printf(" !w3jdefined in w3j\n"); 
-       exit(1);
+       engineexit(1);
     }
     else if (!w3jnonzero(jd1, jd2, jd3, md1, md2, md3))
        return 0.e0;
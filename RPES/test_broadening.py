@@ -0,0 +1,136 @@
+"""
+Tests of broadening.py: unit areas, the FFT path against direct
+evaluation, narrow lines against the exact Voigt profile and the grids
+that cannot go through the FFT
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from broadening import (broaden, broaden_direct, broaden_fft, check_widths, profile,
+                        read_sticks, uniform_step)
+
+TEST_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Test_Output")
+
+
+def _voigt_quadrature(x, gamma, sigma, npoints=200001):
+    """Voigt profile as the numerical convolution of a Lorentzian with a Gaussian"""
+    t = np.linspace(-12. * sigma, 12. * sigma, npoints)
+    gauss = np.exp(-0.5 * (t / sigma)**2) / (np.sqrt(2. * np.pi) * sigma)
+    return np.array([np.trapezoid(gauss * gamma / np.pi / ((xi - t)**2 + gamma**2), t)
+                     for xi in np.atleast_1d(x)])
+
+
+def _sticks(n=40, ncolumns=2, seed=1):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-1., 1., n), rng.uniform(0.5, 1., (n, ncolumns))
+
+
+def test_profile():
+    x = np.linspace(-1., 1., 21)
+    for gamma, sigma in [(0.01, 0.01), (0.05, 0.05), (0.2, 0.3), (1., 0.01)]:
+        np.testing.assert_allclose(profile(x, gamma, sigma), _voigt_quadrature(x, gamma, sigma),
+                                   rtol=1e-9)
+    np.testing.assert_allclose(profile(x, 0.1, 0.), 0.1 / np.pi / (x**2 + 0.01), rtol=1e-14)
+    gauss = np.exp(-0.5 * (x / 0.2)**2) / (np.sqrt(2. * np.pi) * 0.2)
+    np.testing.assert_allclose(profile(x, 0., 0.2), gauss, rtol=1e-14)
+    with pytest.raises(ValueError):
+        profile(x, 0., 0.)
+    with pytest.raises(ValueError):
+        check_widths([0.1, -0.1], 0.)
+
+
+@pytest.mark.parametrize("direct", [False, True])
+def test_area(direct):
+    energy, intensity = _sticks()
+    grid = np.arange(-40., 40., 0.01)
+    width = np.full(len(energy), 0.05) if direct else 0.05
+    for gamma, sigma, inside in [
+            # fraction of each line on the grid
+            (0., width, np.ones(len(energy))),
+            (width, 0., (np.arctan((grid[-1] - energy) / 0.05)
+                         + np.arctan((energy - grid[0]) / 0.05)) / np.pi)]:
+        if direct:
+            spectrum = broaden_direct(energy, intensity, grid, gamma, sigma)
+        else:
+            spectrum = broaden(energy, intensity, grid, gamma, sigma)
+        # the FFT adds the tails of the periodic images ( see FFT_TAIL_GAMMAS )
+        np.testing.assert_allclose(np.trapezoid(spectrum, grid, axis=0), inside @ intensity,
+                                   rtol=1e-6 if direct else 2e-4)
+
+
+def test_fft_matches_direct():
+    energy, intensity = _sticks()
+    grid = np.arange(-2., 2., 0.01)
+    widths = [(0.01, 0.), (0., 0.01), (0.01, 0.01), (0.05, 0.05), (0.2, 0.3), (0.001, 0.)]
+    fft = broaden_fft(energy, intensity, grid, *zip(*widths))
+    for (gamma, sigma), result in zip(widths, fft):
+        direct = broaden_direct(energy, intensity, grid, gamma, sigma)
+        np.testing.assert_allclose(result, direct, atol=2e-3 * direct.max(),
+                                   err_msg=f"gamma={gamma} sigma={sigma}")
+
+
+def test_narrow_lines():
+    # widths of one or two grid steps: the sticks are binned on a finer grid
+    grid = np.arange(-1., 1., 0.01)
+    energy, intensity = np.array([0.0033]), np.ones(1)
+    x = grid - energy[0]
+    for gamma, sigma, exact in [(0.01, 0., 0.01 / np.pi / (x**2 + 1e-4)),
+                                (0.01, 0.01, _voigt_quadrature(x, 0.01, 0.01))]:
+        spectrum = broaden(energy, intensity, grid, gamma, sigma)
+        np.testing.assert_allclose(spectrum, exact, atol=2e-3 * exact.max())
+        assert abs(spectrum.max() / exact.max() - 1.) < 2e-3
+
+
+def test_constant_widths():
+    # a constant per-level array is the scalar
+    energy, intensity = _sticks()
+    grid = np.arange(-2., 2., 0.01)
+    scalar = broaden(energy, intensity, grid, 0.05, 0.03)
+    np.testing.assert_array_equal(broaden(energy, intensity, grid, np.full(len(energy), 0.05),
+                                          np.full(len(energy), 0.03)), scalar)
+    # per-level widths are evaluated directly, with the same profile
+    gamma = np.full(len(energy), 0.05)
+    gamma[0] = 0.0500001
+    np.testing.assert_allclose(broaden(energy, intensity, grid, gamma, 0.03), scalar,
+                               atol=1e-3 * scalar.max())
+
+
+def test_grids():
+    energy, intensity = _sticks()
+    grid = np.arange(-2., 2., 0.01)
+    assert uniform_step(grid) == pytest.approx(0.01)
+    uniform = broaden(energy, intensity, grid, 0.05, 0.03)
+
+    nonuniform = np.concatenate([grid[:100], grid[100::3]])
+    assert uniform_step(nonuniform) is None
+    with pytest.raises(ValueError):
+        broaden_fft(energy, intensity, nonuniform, [0.05], [0.03])
+    spectrum = broaden(energy, intensity, nonuniform, 0.05, 0.03)
+    np.testing.assert_array_equal(spectrum,
+                                  broaden_direct(energy, intensity, nonuniform, 0.05, 0.03))
+    np.testing.assert_allclose(spectrum[:100], uniform[:100], atol=1e-3 * uniform.max())
+
+    assert uniform_step(grid[:1]) is None
+    point = broaden(energy, intensity, grid[50:51], 0.05, 0.03)
+    np.testing.assert_allclose(point, uniform[50:51], atol=1e-3 * uniform.max())
+
+
+def test_read_sticks():
+    pes = read_sticks(os.path.join(TEST_OUTPUT, "pes.dat"))
+    assert pes.intensity.shape == (len(pes.energy), 1) and pes.columns == ["total"]
+    peslm = read_sticks(os.path.join(TEST_OUTPUT, "peslm.dat"))
+    # peslm.dat has a line per state, pes.dat per level
+    assert len(peslm.energy) == 210 and np.isin(pes.energy, peslm.energy).all()
+    assert peslm.columns[0] == "q=-1,n=0" and len(peslm.columns) == 3 * 42
+    xaq = read_sticks(os.path.join(TEST_OUTPUT, "xaq.dat"))
+    assert xaq.columns == ["total", "q=-1", "q=0", "q=1"]
+    # printed with 10 decimals
+    np.testing.assert_allclose(xaq.intensity[:, 1:].sum(axis=1), xaq.intensity[:, 0], atol=2e-10)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,76 @@
+"""
+Tests of the omega-loop checkpoint: a scan killed in its omega loop and
+run again resumes, and gives the outputs of an uninterrupted run
+"""
+
+import os
+import sys
+import time
+import filecmp
+import threading
+
+from conftest import TEST_OUTPUT, TEST_OUTPUT_OMEGA, assert_outputs_close, write_omega_rows
+from multiplet_runner import (CHECKPOINT_FILES, CHECKPOINT_MIN_TIME, LOG_NAME, checkpoint_setting,
+                              has_checkpoint, run_multiplet)
+
+
+def _omega_done(run_dir):
+    """Completed omega points recorded in checkpoint.omega, -1 before the loop"""
+    try:
+        with open(os.path.join(run_dir, CHECKPOINT_FILES[1]), 'r') as f:
+            return int(f.readline().split()[1])
+    except (OSError, IndexError, ValueError):
+        return -1
+
+
+def _kill_after(run_dir, npoints):
+    """started callback of run_multiplet that kills the engine after npoints omega points"""
+    def started(proc):
+        def watch():
+            while proc.poll() is None:
+                if _omega_done(run_dir) >= npoints:
+                    proc.kill()
+                    return
+                time.sleep(0.002)
+        threading.Thread(target=watch, daemon=True).start()
+    return started
+
+
+def test_checkpoint_setting(tmp_path, monkeypatch):
+    monkeypatch.delenv("MULTIPLET_CHECKPOINT", raising=False)
+    assert checkpoint_setting(tmp_path) == (False, False)
+    assert checkpoint_setting(tmp_path, {"total_time": CHECKPOINT_MIN_TIME}) == (True, False)
+    assert checkpoint_setting(tmp_path, checkpoint=True) == (True, False)
+    (tmp_path / CHECKPOINT_FILES[0]).write_bytes(b"")
+    assert has_checkpoint(tmp_path)
+    assert checkpoint_setting(tmp_path) == (True, True)
+    # a run without checkpoint starts from the beginning
+    assert checkpoint_setting(tmp_path, checkpoint=False) == (False, False)
+
+
+def test_resume_killed_scan(multiplet_path, scan_input, scan_run, tmp_path):
+    run_dir = str(tmp_path / "run")
+    killed = run_multiplet(scan_input, run_dir, multiplet_path, checkpoint=True,
+                           started=_kill_after(run_dir, 1))
+    assert killed["exit_code"] != 0
+    assert has_checkpoint(run_dir)
+    assert 1 <= _omega_done(run_dir) < 5
+
+    resumed = run_multiplet(scan_input, run_dir, multiplet_path)
+    assert resumed["exit_code"] == 0 and resumed["resumed"]
+    assert not any(os.path.exists(os.path.join(run_dir, name)) for name in CHECKPOINT_FILES)
+    with open(os.path.join(run_dir, LOG_NAME), 'r') as f:
+        assert "Resuming from checkpoint" in f.read()
+
+    names = sorted(name for name in os.listdir(scan_run) if name.endswith(".dat"))
+    assert "rpesalms.dat" in names
+    for name in names:
+        assert filecmp.cmp(os.path.join(run_dir, name), os.path.join(scan_run, name),
+                           shallow=False), name
+    write_omega_rows(run_dir, TEST_OUTPUT_OMEGA, tmp_path / "slice")
+    assert_outputs_close(tmp_path / "slice", TEST_OUTPUT, ["rpes.dat", "xaqc.dat"])
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
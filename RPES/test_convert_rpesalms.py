@@ -0,0 +1,77 @@
+"""
+Tests of convert_rpesalms.py against Test_Output/rpesalms.edac
+"""
+
+import os
+import sys
+import time
+import threading
+
+from convert_rpesalms import convert_rpesalms
+
+TEST_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Test_Output")
+REFERENCE_RPESALMS = os.path.join(TEST_OUTPUT, "rpesalms.dat")
+REFERENCE_EDAC = os.path.join(TEST_OUTPUT, "rpesalms.edac")
+
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def test_reference_conversion(tmp_path):
+    output_file = tmp_path / "rpesalms.edac"
+    assert convert_rpesalms(REFERENCE_RPESALMS, output_file) == 210
+    assert _read(output_file) == _read(REFERENCE_EDAC)
+
+
+def test_truncated_input(tmp_path):
+    # cut inside the amplitude lines of the 101st Ef block
+    lines = _read(REFERENCE_RPESALMS).splitlines(keepends=True)
+    cut = 3 + 100 * 43 + 20
+    input_file = tmp_path / "rpesalms.dat"
+    input_file.write_text("".join(lines[:cut]))
+    output_file = tmp_path / "rpesalms.edac"
+    assert convert_rpesalms(input_file, output_file) == 100
+    # header, omega and weight lines, then an Ef line and an amplitude line per block
+    expected = _read(REFERENCE_EDAC).splitlines(keepends=True)[:3 + 2 * 100]
+    assert _read(output_file) == "".join(expected)
+
+
+def test_follow_growing_file(tmp_path):
+    text = _read(REFERENCE_RPESALMS)
+    input_file = tmp_path / "rpesalms.dat"
+    input_file.write_text("")
+
+    def engine():
+        # appended in chunks that end inside lines, as the engine's buffered writes do
+        step = len(text) // 5 + 7
+        with open(input_file, 'a') as f:
+            for start in range(0, len(text), step):
+                f.write(text[start:start + step])
+                f.flush()
+                time.sleep(0.2)
+
+    writer = threading.Thread(target=engine)
+    writer.start()
+    output_file = tmp_path / "rpesalms.edac"
+    nblocks = convert_rpesalms(input_file, output_file, follow=True, timeout=5.)
+    writer.join()
+    assert nblocks == 210
+    assert _read(output_file) == _read(REFERENCE_EDAC)
+
+
+def test_engine_output(reference_run, tmp_path):
+    output_file = tmp_path / "rpesalms.edac"
+    assert convert_rpesalms(os.path.join(reference_run, "rpesalms.dat"), output_file) == 210
+    lines = _read(output_file).splitlines()
+    reference = _read(REFERENCE_EDAC).splitlines()
+    assert len(lines) == len(reference)
+    # the Ef block lines hold 42 lms x 3 q complex amplitudes
+    assert [len(line.split()) for line in lines] == [len(line.split()) for line in reference]
+    assert len(lines[4].split()) == 42 * 6
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,142 @@
+"""
+Tests of the eigenpair selections ( MULTIPLET_EIGEN_<BLOCK>, see
+src/options.c ): the states they keep and that the kept states have the
+results of the run with all eigenpairs
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import assert_outputs_close, level_sums
+from multiplet_params import MultipletInput
+from multiplet_runner import LOG_NAME, engine_environment, run_multiplet
+from preflight import _kept, state_counts
+
+
+def _run(input_text, run_dir, multiplet_path, eigen=None):
+    record = run_multiplet(input_text, str(run_dir), multiplet_path, eigen=eigen, checkpoint=False)
+    assert record["exit_code"] == 0, record["error"]
+    return str(run_dir)
+
+
+def _table(run_dir, name):
+    return np.loadtxt(os.path.join(run_dir, name), ndmin=2)
+
+
+def _assert_levels_close(rows, reference, energy=1):
+    """Compare the rows of two tables summed over the levels of their energy column"""
+    for result, expected in zip(level_sums(rows[:, energy], rows[:, energy + 1:]),
+                                level_sums(reference[:, energy], reference[:, energy + 1:])):
+        np.testing.assert_allclose(result, expected, rtol=1e-5)
+
+
+def _window(levels, first, last):
+    """window:EMIN:EMAX around levels[first:last + 1], ending halfway to the next levels"""
+    emin, emax = (levels[first - 1] + levels[first]) / 2, (levels[last] + levels[last + 1]) / 2
+    return f"window:{emin:.6f}:{emax:.6f}", emin, emax
+
+
+@pytest.fixture(scope="module")
+def degenerate_input(small_input):
+    """small_input without magnetic field: the final states (3d7) are Kramers pairs"""
+    params = MultipletInput(small_input)
+    params.set("hmag", 0.)
+    return params.text()
+
+
+@pytest.fixture(scope="module")
+def all_run(multiplet_path, degenerate_input, tmp_path_factory):
+    """Run directory of degenerate_input with all eigenpairs"""
+    return _run(degenerate_input, tmp_path_factory.mktemp("all"), multiplet_path)
+
+
+def test_kept():
+    assert _kept(10, "all") == (10, False)
+    assert _kept(10, "lowest") == (1, True)
+    assert _kept(10, "lowest:3") == (3, True)
+    assert _kept(10, "lowest:30") == (10, True)
+    assert _kept(10, "window:0:5") == (10, True)
+
+
+def test_state_counts(small_input):
+    counts = state_counts(small_input)
+    assert (counts["nstates"], counts["nnm1bas"], counts["nmbas"]) == (45, 120, 60)
+    assert (counts["nnm1fst"], counts["nmstates"]) == (120, 60)
+    counts = state_counts(small_input, {"final": "lowest:3", "intermediate": "window:640:650"})
+    assert counts["nnm1fst"] == 3 and counts["nfstates"] == 3 * counts["npesorb"]
+    assert counts["nmstates"] == 60
+
+
+def test_engine_environment():
+    env = engine_environment(eigen={"ground": "lowest", "final": "window:0:5"})
+    assert env["MULTIPLET_EIGEN_GROUND"] == "lowest"
+    assert env["MULTIPLET_EIGEN_FINAL"] == "window:0:5"
+    with pytest.raises(ValueError):
+        engine_environment(eigen={"initial": "lowest"})
+
+
+def test_ground_lowest(multiplet_path, degenerate_input, all_run, tmp_path):
+    # the whole degenerate ground level is kept, which is all the engine uses
+    run_dir = _run(degenerate_input, tmp_path, multiplet_path, {"ground": "lowest"})
+    assert_outputs_close(run_dir, all_run)
+
+
+def test_ground_window_rejected(multiplet_path, degenerate_input, tmp_path):
+    record = run_multiplet(degenerate_input, str(tmp_path), multiplet_path,
+                           eigen={"ground": "window:0:1"}, checkpoint=False)
+    assert record["exit_code"] != 0
+
+
+@pytest.mark.parametrize("selection, nkept", [("lowest", 2), ("lowest:1", 2), ("lowest:3", 4),
+                                              ("lowest:4", 4), ("lowest:5", 6)])
+def test_final_lowest_completes_level(multiplet_path, degenerate_input, all_run, tmp_path,
+                                      selection, nkept):
+    run_dir = _run(degenerate_input, tmp_path, multiplet_path, {"final": selection})
+    rpes, full = _table(run_dir, "rpes.dat"), _table(all_run, "rpes.dat")
+    # one omega point: a row per final state, in order of energy
+    assert len(rpes) == nkept
+    kept = full[:nkept]
+    _assert_levels_close(rpes, kept)
+
+
+@pytest.mark.parametrize("selection", ["lowest", "lowest:3", "lowest:200"])
+def test_final_lowest_nondegenerate(multiplet_path, small_input, tmp_path, selection):
+    # without degeneracy the pre-flight count is what the engine writes
+    eigen = {"final": selection}
+    run_dir = _run(small_input, tmp_path, multiplet_path, eigen)
+    assert len(_table(run_dir, "rpes.dat")) == state_counts(small_input, eigen)["nnm1fst"]
+
+
+def test_final_window(multiplet_path, degenerate_input, all_run, tmp_path):
+    full = _table(all_run, "rpes.dat")
+    # rpes.dat holds E_ground - E_final
+    levels = np.unique(np.round(-full[:, 1], 5))
+    selection, emin, emax = _window(levels, 2, 10)
+    run_dir = _run(degenerate_input, tmp_path, multiplet_path, {"final": selection})
+    rpes = _table(run_dir, "rpes.dat")
+    kept = full[(-full[:, 1] > emin) & (-full[:, 1] < emax)]
+    assert len(rpes) == len(kept) == 18
+    _assert_levels_close(rpes, kept)
+
+
+def test_intermediate_window(multiplet_path, degenerate_input, all_run, tmp_path):
+    full = _table(all_run, "xaq.dat")
+    # xaq.dat holds the resonance energies E_intermediate - E_ground
+    levels = np.unique(np.round(full[:, 0], 5))
+    selection, emin, emax = _window(levels, 5, 30)
+    run_dir = _run(degenerate_input, tmp_path, multiplet_path, {"intermediate": selection})
+    xaq = _table(run_dir, "xaq.dat")
+    kept = full[(full[:, 0] > emin) & (full[:, 0] < emax)]
+    assert len(xaq) == len(kept) < len(full)
+    assert emin < xaq[:, 0].min() and xaq[:, 0].max() < emax
+    # the absorption of a kept state does not depend on the others
+    _assert_levels_close(xaq, kept, energy=0)
+    with open(os.path.join(run_dir, LOG_NAME), 'r') as f:
+        assert f"#M={len(kept)} " in f.read()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+"""
+Tests of multiplet_data.py against the reference results in Test_Output
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from conftest import assert_outputs_close
+from multiplet_data import load_rpesalms, load_run_bin, bin_to_text
+
+TEST_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Test_Output")
+REFERENCE_RPESALMS = os.path.join(TEST_OUTPUT, "rpesalms.dat")
+
+
+def _rpes_intensities(amplitudes, gstweight):
+    """
+    Intensities (nomega, nfst) of rpes.dat: sum over lms and q of |amplitude|^2,
+    weighted over the ground states. They do not depend on the phases of
+    the eigenvectors, unlike the amplitudes themselves (but on the choice
+    of eigenvectors inside a degenerate level).
+    """
+    return np.einsum("g,ogf->of", gstweight, (np.abs(amplitudes)**2).sum(axis=(3, 4)))
+
+
+def test_load_rpesalms_reference():
+    data = load_rpesalms(REFERENCE_RPESALMS)
+    assert data.amplitudes.shape == (1, 1, 210, 42, 3)
+    assert np.allclose(data.omega, [651.8])
+    assert np.allclose(data.gstweight, [1.])
+    assert data.ef[0] == -4.3327275492
+    assert data.amplitudes[0, 0, 0, 0, 0] == 3.529523e-03 + 1.558591e-02j
+    assert data.amplitudes[0, 0, 0, 0, 1] == 1.620621e-03 + 1.861600e-02j
+
+    rpes = np.loadtxt(os.path.join(TEST_OUTPUT, "rpes.dat"))
+    assert np.allclose(rpes[:, 1], data.ef, atol=1e-6)
+    assert np.allclose(_rpes_intensities(data.amplitudes, data.gstweight)[0], rpes[:, 2],
+                       rtol=1e-5, atol=1e-12)
+
+
+def test_text_parser_matches_fixed_width(tmp_path):
+    # other whitespace is not the engine's fixed-width layout: numpy's parser reads it
+    with open(REFERENCE_RPESALMS, 'r') as f:
+        lines = f.read().splitlines()
+    path = tmp_path / "rpesalms.dat"
+    path.write_text("\n".join(" \t".join(line.split()) for line in lines) + "\n")
+    fixed, parsed = load_rpesalms(REFERENCE_RPESALMS), load_rpesalms(path)
+    assert np.array_equal(fixed.amplitudes, parsed.amplitudes)
+    assert np.array_equal(fixed.ef, parsed.ef)
+    assert np.array_equal(fixed.omega, parsed.omega)
+
+
+def test_truncated_file(tmp_path):
+    # a two-omega file cut in the middle of the second block, as while the engine writes it
+    with open(REFERENCE_RPESALMS, 'r') as f:
+        header, block = f.read().split("\n", 1)
+    second = block.replace(" 6.5180000000e+02", " 6.5280000000e+02", 1)
+    path = tmp_path / "rpesalms.dat"
+    path.write_text(header.replace("1 1", "2 1", 1) + "\n" + block + second[:len(second) // 2])
+    data = load_rpesalms(path)
+    reference = load_rpesalms(REFERENCE_RPESALMS)
+    assert data.amplitudes.shape == reference.amplitudes.shape
+    assert np.array_equal(data.amplitudes, reference.amplitudes)
+    assert np.allclose(data.omega, [651.8])
+
+
+def test_text_output_matches_test_output(reference_run):
+    # MULTIPLET_OUTPUT=both writes the same text files as the original engine
+    assert_outputs_close(reference_run, TEST_OUTPUT)
+    data = load_rpesalms(os.path.join(reference_run, "rpesalms.dat"))
+    rpes = np.loadtxt(os.path.join(reference_run, "rpes.dat"))
+    assert np.allclose(_rpes_intensities(data.amplitudes, data.gstweight)[0], rpes[:, 2],
+                       rtol=1e-5, atol=1e-12)
+
+
+def test_binary_output_matches_text(reference_run):
+    arrays = load_run_bin(reference_run)
+    text = load_rpesalms(os.path.join(reference_run, "rpesalms.dat"))
+    assert arrays["rpesalms"].shape == text.amplitudes.shape
+    assert np.allclose(arrays["omega"], text.omega)
+    assert np.allclose(arrays["ef"], text.ef, atol=1e-9)
+    assert np.allclose(arrays["gstweight"], text.gstweight, atol=1e-6)
+    # the text file has 7 significant digits
+    assert np.allclose(arrays["rpesalms"], text.amplitudes, rtol=1e-6, atol=1e-12)
+
+    rpes = np.loadtxt(os.path.join(reference_run, "rpes.dat"))
+    assert np.allclose(_rpes_intensities(arrays["rpesalms"], arrays["gstweight"])[0], rpes[:, 2],
+                       rtol=1e-5, atol=1e-12)
+
+
+def test_bin_to_text(reference_run, tmp_path):
+    written = bin_to_text(reference_run, tmp_path)
+    names = sorted(os.path.basename(path) for path in written)
+    assert names == ["peslm.dat", "rp.dat", "rpc.dat", "rpesalms.dat", "xmat.dat"]
+    assert_outputs_close(tmp_path, reference_run, names, rtol=1e-6)
+    assert_outputs_close(tmp_path, TEST_OUTPUT, ["peslm.dat", "rp.dat", "rpc.dat", "xmat.dat"])
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,48 @@
+"""
+Tests of omega_split.py: the merged outputs of a split scan equal those of
+the scan run in one piece and, at 651.8 eV, Test_Output
+"""
+
+import os
+import sys
+import filecmp
+
+from conftest import SCAN, TEST_OUTPUT, TEST_OUTPUT_OMEGA, assert_outputs_close, write_omega_rows
+from omega_split import split_ranges, omega_count, run_split, OMEGA_FILES
+
+
+def test_split_ranges():
+    start, stop, delta = 640., 659.8, 0.2
+    for nparts in (1, 3, 7, 100, 200):
+        ranges = split_ranges(start, stop, delta, nparts)
+        assert len(ranges) == min(nparts, 100)
+        assert abs(ranges[0][0] - start) < 1e-9 and abs(ranges[-1][1] - stop) < 1e-9
+        counts = [omega_count(a, b, delta) for a, b in ranges]
+        assert sum(counts) == 100 and max(counts) - min(counts) <= 1
+        for (_, stop1), (start2, _) in zip(ranges, ranges[1:]):
+            assert abs(start2 - stop1 - delta) < 1e-9
+
+
+def test_split_scan(multiplet_path, scan_input, scan_run, tmp_path):
+    input_file = tmp_path / "scan.txt"
+    input_file.write_text(scan_input)
+    manifest = run_split(str(input_file), 2, str(tmp_path / "split"), str(tmp_path / "merged"),
+                         multiplet_path=multiplet_path)
+    assert [job["exit_code"] for job in manifest["jobs"]] == [0, 0]
+    assert omega_count(*SCAN) == 5
+
+    merged = {os.path.basename(path) for path in manifest["merged"]}
+    assert set(OMEGA_FILES) <= merged
+    for name in sorted(merged):
+        assert filecmp.cmp(tmp_path / "merged" / name, os.path.join(scan_run, name),
+                           shallow=False), name
+
+    assert_outputs_close(tmp_path / "merged", TEST_OUTPUT,
+                         ["pes.dat", "peslm.dat", "xaq.dat", "xaqx.dat"])
+    write_omega_rows(tmp_path / "merged", TEST_OUTPUT_OMEGA, tmp_path / "slice")
+    assert_outputs_close(tmp_path / "slice", TEST_OUTPUT, ["rpes.dat", "xaqc.dat"])
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,147 @@
+"""
+Tests of result_cache.py: misses, hits, LRU eviction, keys of the output
+modes, and that an engine run after a hit leaves the cache entry intact
+"""
+
+import os
+import sys
+
+from result_cache import ResultCache, ENTRY_INFO
+from multiplet_runner import OUTPUT_FILES, result_settings, output_files, run_multiplet
+
+INPUT = "651.8 651.8 2. 0.4 0   # omega\n1 2 1 3 5\n"
+
+
+def _executable(tmp_path):
+    """Any file stands in for the executable: the key only hashes it"""
+    path = tmp_path / "multiplet"
+    path.write_bytes(b"engine build 1")
+    return str(path)
+
+
+def _outputs(run_dir, text="1.0 2.0\n", names=OUTPUT_FILES[:3]):
+    os.makedirs(run_dir, exist_ok=True)
+    for name in names:
+        with open(os.path.join(run_dir, name), 'w') as f:
+            f.write(name + " " + text)
+    return list(names)
+
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def test_miss(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    key = cache.key(INPUT, _executable(tmp_path))
+    assert cache.fetch(key, tmp_path / "run") is None
+    assert cache.entries() == []
+
+
+def test_store_and_hit(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    key = cache.key(INPUT, _executable(tmp_path))
+    names = _outputs(tmp_path / "run")
+    assert cache.store(key, tmp_path / "run")
+    assert not cache.store(key, tmp_path / "run")
+
+    # comments and whitespace do not change the key
+    same = cache.key(INPUT.replace("   # omega", "").replace(" ", "  "), _executable(tmp_path))
+    assert same == key
+    placed = cache.fetch(same, tmp_path / "hit")
+    assert sorted(os.path.basename(p) for p in placed) == sorted(names)
+    for name in names:
+        assert _read(tmp_path / "hit" / name) == _read(tmp_path / "run" / name)
+        # copies, not links into the cache
+        assert os.stat(tmp_path / "hit" / name).st_nlink == 1
+
+
+def test_other_executable_misses(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    executable = _executable(tmp_path)
+    _outputs(tmp_path / "run")
+    cache.store(cache.key(INPUT, executable), tmp_path / "run")
+    with open(executable, 'ab') as f:
+        f.write(b", rebuilt")
+    assert cache.fetch(cache.key(INPUT, executable), tmp_path / "hit") is None
+
+
+def test_rewrite_after_hit_keeps_entry(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    key = cache.key(INPUT, _executable(tmp_path))
+    names = _outputs(tmp_path / "run")
+    cache.store(key, tmp_path / "run")
+    cache.fetch(key, tmp_path / "hit")
+
+    # the engine truncates and rewrites its outputs when it runs again
+    for name in names:
+        with open(tmp_path / "hit" / name, 'w') as f:
+            f.write("rerun\n")
+    cache.fetch(key, tmp_path / "again")
+    for name in names:
+        assert _read(tmp_path / "again" / name) == _read(tmp_path / "run" / name)
+        assert _read(os.path.join(cache.cache_dir, key, name)) == _read(tmp_path / "run" / name)
+
+
+def test_lru_eviction(tmp_path):
+    executable = _executable(tmp_path)
+    cache = ResultCache(tmp_path / "cache")
+    keys = []
+    for i in range(3):
+        keys.append(cache.key(INPUT + f"# run {i}\n{i}\n", executable))
+        _outputs(tmp_path / f"run{i}", text="0.5 " * 200)
+        cache.store(keys[-1], tmp_path / f"run{i}")
+        # distinct, deterministic times of last use
+        os.utime(os.path.join(cache.cache_dir, keys[-1]), (1000. + i, 1000. + i))
+    entry_size = max(size for _, size, _ in cache.entries())
+
+    # using the oldest entry makes the second one the least recently used
+    assert cache.fetch(keys[0], tmp_path / "hit") is not None
+    cache.max_bytes = 3 * entry_size
+    keys.append(cache.key(INPUT + "3\n", executable))
+    _outputs(tmp_path / "run3", text="0.5 " * 200)
+    cache.store(keys[-1], tmp_path / "run3")
+
+    left = {key for _, _, key in cache.entries()}
+    assert left == {keys[0], keys[2], keys[3]}
+    assert sum(size for _, size, _ in cache.entries()) <= cache.max_bytes
+    assert not any(name.startswith(".") for name in os.listdir(cache.cache_dir))
+
+
+def test_output_mode_keys():
+    text = result_settings({})
+    binary = result_settings({"MULTIPLET_OUTPUT": "binary"})
+    assert text != binary
+    assert result_settings({"MULTIPLET_OUTPUT": "text", "MULTIPLET_EIGEN_FINAL": "all"}) == text
+    assert "rpesalms.bin" in output_files({"MULTIPLET_OUTPUT": "binary"})
+    assert "rpesalms.dat" not in output_files({"MULTIPLET_OUTPUT": "binary"})
+    assert "rpesalms.bin" not in output_files({})
+    assert output_files({"MULTIPLET_OUTPUT": "none"}) == []
+
+
+def test_engine_rerun_after_hit(tmp_path, multiplet_path, small_input):
+    cache = ResultCache(tmp_path / "cache")
+    run_dir = str(tmp_path / "run")
+    first = run_multiplet(small_input, run_dir, multiplet_path, cache=cache)
+    assert first["exit_code"] == 0 and not first["cached"]
+    second = run_multiplet(small_input, run_dir, multiplet_path, cache=cache)
+    assert second["cached"] and second["outputs"] == first["outputs"]
+
+    key = cache.key(small_input, multiplet_path, result_settings(os.environ))
+    entry = os.path.join(cache.cache_dir, key)
+    stored = {name: _read(os.path.join(entry, name))
+              for name in os.listdir(entry) if name != ENTRY_INFO}
+    assert "rpesalms.dat" in stored
+
+    # the engine runs again in the directory the hit was copied into
+    third = run_multiplet(small_input.replace("651.8", "652.8"), run_dir, multiplet_path)
+    assert third["exit_code"] == 0
+    assert _read(os.path.join(run_dir, "rpesalms.dat")) != stored["rpesalms.dat"]
+    for name, content in stored.items():
+        assert _read(os.path.join(entry, name)) == content
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
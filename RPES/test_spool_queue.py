@@ -0,0 +1,160 @@
+"""
+Tests of spool_queue.py: submitting, claiming and reclaiming jobs. Only
+run_claimed needs the engine.
+"""
+
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+from spool_queue import (STALE_TIMEOUT, claim, job_name, reclaim, requeue_failed, run_claimed,
+                         server_time, status, submit)
+
+
+def _jobs(tmp_path, n, input_text="input"):
+    return [{"name": f"run_{i:04d}", "run_dir": str(tmp_path / f"run_{i:04d}"),
+             "input_text": input_text} for i in range(n)]
+
+
+def _make_stale(path, spool_dir):
+    """Set the heartbeat of a claim to longer ago than STALE_TIMEOUT"""
+    old = server_time(spool_dir, "test") - STALE_TIMEOUT - 1
+    os.utime(path, (old, old))
+
+
+def _concurrently(nworkers, target):
+    """Run target(worker) in nworkers threads, started together; their results"""
+    barrier = threading.Barrier(nworkers)
+    results = [None] * nworkers
+
+    def run(i):
+        barrier.wait()
+        results[i] = target(f"worker{i}")
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(nworkers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_job_name():
+    assert job_name("run_0001.json") == "run_0001"
+    assert job_name("sweep.run_0001~node1-123.json") == "sweep.run_0001"
+
+
+def test_submit(tmp_path):
+    spool = str(tmp_path / "spool")
+    assert submit(_jobs(tmp_path, 3), spool) == 3
+    assert status(spool) == {"pending": 3, "running": 0, "done": 0, "failed": 0}
+    # names already in the queue are skipped, in any state
+    claim(spool, "worker")
+    assert submit(_jobs(tmp_path, 4), spool) == 1
+    assert status(spool) == {"pending": 3, "running": 1, "done": 0, "failed": 0}
+
+
+def test_claim(tmp_path):
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 2), spool)
+    path, spec = claim(spool, "node1-123")
+    assert path == os.path.join(spool, "running", "run_0000~node1-123.json")
+    assert spec["name"] == "run_0000" and spec["attempts"] == 1
+    with open(path, 'r') as f:
+        assert json.load(f)["attempts"] == 1
+    assert status(spool)["pending"] == 1
+    assert claim(spool, "node1-123")[1]["name"] == "run_0001"
+    assert claim(spool, "node1-123") == (None, None)
+
+
+def test_claim_skips_done_job(tmp_path):
+    # a worker died between writing the record and removing its claim
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 2), spool)
+    with open(os.path.join(spool, "done", "run_0000.json"), 'w') as f:
+        json.dump({"name": "run_0000", "exit_code": 0}, f)
+    path, spec = claim(spool, "worker")
+    assert spec["name"] == "run_0001"
+    assert status(spool) == {"pending": 0, "running": 1, "done": 1, "failed": 0}
+
+
+def test_concurrent_claims(tmp_path):
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 40), spool)
+
+    def claim_all(worker):
+        names = []
+        while True:
+            path, spec = claim(spool, worker)
+            if path is None:
+                return names
+            names.append(spec["name"])
+
+    claimed = [name for names in _concurrently(8, claim_all) for name in names]
+    assert sorted(claimed) == [job["name"] for job in _jobs(tmp_path, 40)]
+    assert status(spool) == {"pending": 0, "running": 40, "done": 0, "failed": 0}
+
+
+def test_reclaim(tmp_path):
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 1), spool)
+    path, _ = claim(spool, "dead")
+    # a claim with a recent heartbeat stays
+    assert reclaim(spool, "worker") == 0
+    _make_stale(path, spool)
+    assert reclaim(spool, "worker") == 1
+    assert status(spool) == {"pending": 1, "running": 0, "done": 0, "failed": 0}
+    path, spec = claim(spool, "worker")
+    assert spec["attempts"] == 2 and spec["reclaimed_from"] == ["dead"]
+
+
+def test_reclaim_max_attempts(tmp_path):
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 1), spool)
+    for attempt in range(1, 4):
+        path, spec = claim(spool, f"dead{attempt}")
+        assert spec["attempts"] == attempt
+        _make_stale(path, spool)
+        assert reclaim(spool, "worker", max_attempts=3) == 1
+    assert status(spool) == {"pending": 0, "running": 0, "done": 0, "failed": 1}
+    with open(os.path.join(spool, "failed", "run_0000.json"), 'r') as f:
+        record = json.load(f)
+    assert record["exit_code"] is None and "dead1, dead2, dead3" in record["error"]
+
+    # requeue_failed starts the count again
+    assert requeue_failed(spool) == 1
+    assert claim(spool, "worker")[1]["attempts"] == 1
+
+
+def test_concurrent_reclaims(tmp_path):
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 10), spool)
+    for _ in range(10):
+        path, _ = claim(spool, "dead")
+        _make_stale(path, spool)
+    assert sum(_concurrently(8, lambda worker: reclaim(spool, worker))) == 10
+    assert status(spool) == {"pending": 10, "running": 0, "done": 0, "failed": 0}
+    assert not os.listdir(os.path.join(spool, "running"))
+
+
+def test_run_claimed(multiplet_path, small_input, tmp_path):
+    spool = str(tmp_path / "spool")
+    submit(_jobs(tmp_path, 2, small_input), spool)
+    path, spec = claim(spool, "worker")
+    record = run_claimed(spool, path, spec, "worker", multiplet_path)
+    assert record["exit_code"] == 0 and record["attempts"] == 1
+    assert os.path.exists(os.path.join(tmp_path, "run_0000", "rpes.dat"))
+    assert status(spool) == {"pending": 1, "running": 0, "done": 1, "failed": 0}
+
+    # a claim taken away during the run ( reclaimed as stale ) kills the engine
+    path, spec = claim(spool, "worker")
+    os.remove(path)
+    assert run_claimed(spool, path, spec, "worker", multiplet_path, heartbeat=0.001) is None
+    assert status(spool) == {"pending": 0, "running": 0, "done": 1, "failed": 0}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))